@@ -0,0 +1,95 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <cstdio>
+#include <limits>
+#include <string>
+#include <vector>
+#include <quantsim/lob/Order_book.hpp>
+
+// An event log is a 32 byte EventLogHeader followed by eventCount fixed size MarketEvent records
+constexpr char EVENT_LOG_MAGIC[8] = {'Q', 'S', 'E', 'V', 'L', 'O', 'G', '1'};
+constexpr std::uint32_t EVENT_LOG_VERSION = 1;
+// The event count of a log whose writer has not closed it yet
+constexpr std::uint64_t EVENT_LOG_UNFINISHED = std::numeric_limits<std::uint64_t>::max();
+
+struct EventLogHeader {
+    char magic[8];
+    std::uint32_t version;
+    std::uint32_t recordSize;
+    double tickSize;
+    std::uint64_t eventCount;
+};
+
+// Appends events to a new log file. The event count of the header is only written by close: a writer destroyed or discarded
+// before close leaves a file that EventLog refuses as unfinished
+class EventLogWriter {
+    public:
+        EventLogWriter(const std::string& path, double tickSize);
+        ~EventLogWriter();
+        EventLogWriter(const EventLogWriter&) = delete;
+        EventLogWriter& operator=(const EventLogWriter&) = delete;
+
+        void write(const MarketEvent* events, std::size_t count);
+        void close();
+        void discard();
+        std::uint64_t eventCount() const;
+
+    private:
+        std::FILE* file;
+        EventLogHeader header;
+};
+
+// A read-only memory mapping of an event log: the events are read straight from the page cache, never loaded as a whole
+class EventLog {
+    public:
+        explicit EventLog(const std::string& path);
+        ~EventLog();
+        EventLog(const EventLog&) = delete;
+        EventLog& operator=(const EventLog&) = delete;
+
+        const MarketEvent* events() const;
+        std::uint64_t eventCount() const;
+        double tickSize() const;
+
+    private:
+        void* mapping;
+        std::size_t mappedBytes;
+        const EventLogHeader* header;
+};
+
+// Book snapshots of a replay: the depth vectors hold one row of depthLevels entries per snapshot, zeros past the last level
+struct ReplaySnapshots {
+    int depthLevels = 0;
+    std::vector<std::int64_t> eventIndex;   // events applied before the snapshot
+    std::vector<std::int64_t> time;
+    std::vector<std::int64_t> bidPrice;
+    std::vector<std::int64_t> bidVolume;
+    std::vector<std::int64_t> askPrice;
+    std::vector<std::int64_t> askVolume;
+};
+
+struct ReplayStatistics {
+    std::uint64_t events;
+    std::uint64_t fills;
+    std::uint64_t volume;
+    std::uint64_t rejected;     // events the book could not apply, like a cancel of an unknown order
+};
+
+// Drives the book with count events of the log from first. A snapshot is taken after every everyEvents events and / or at
+// every everyTime step of the event timestamps from the first event (the book before the first event at or after that time)
+ReplayStatistics replayEventLog(
+    const EventLog& log,
+    OrderBook& book,
+    std::size_t first,
+    std::size_t count,
+    std::int64_t everyEvents,
+    std::int64_t everyTime,
+    ReplaySnapshots& snapshots
+);
+
+// Converts a CSV file with a header row of ts, type, side, id, price, qty and optionally new_id columns to an event log.
+// type is ADD, CANCEL, DELETE, EXECUTE or REPLACE (or the ITCH letters A, X, D, E, U), side B / BUY / BID or S / SELL / ASK,
+// and price a decimal price rounded to ticks. Returns the number of events written
+std::uint64_t convertCsvToEventLog(const std::string& csvPath, const std::string& logPath, double tickSize);
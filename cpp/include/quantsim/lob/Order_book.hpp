@@ -1,6 +1,13 @@
 #pragma once
 
-#include <string>
+#include <cstddef>
+#include <cstdint>
+#include <functional>
+#include <limits>
+#include <map>
+#include <mutex>
+#include <optional>
+#include <utility>
 #include <vector>
 
 enum class OrderBookRecordType {
@@ -8,37 +15,379 @@ enum class OrderBookRecordType {
     ASK
 };
 
+enum class OrderType {
+    LIMIT,      // matches what it can, the rest rests on the book
+    MARKET,     // matches at any price, the rest is dropped
+    IOC         // immediate or cancel: matches up to its limit price, the rest is dropped
+};
+
+// The actions of a batch row: the first three are the OrderType of a new order
+enum class BatchAction : std::int8_t {
+    LIMIT,
+    MARKET,
+    IOC,
+    CANCEL,
+    MODIFY      // qty and price are the new volume and price of the resting order
+};
+
+// One row of a NumPy batch (ORDER_DTYPE): type is a BatchAction, side an OrderBookRecordType, price in ticks
+struct BatchOrder {
+    std::int8_t type;
+    std::int8_t side;
+    std::int64_t price;
+    std::int64_t qty;
+    std::int64_t id;
+    std::int64_t ts;
+};
+
+// One row of the NumPy fill output (FILL_DTYPE): side is the side of the taker, price in ticks
+struct BatchFill {
+    std::int64_t taker;
+    std::int64_t maker;
+    std::int64_t price;
+    std::int64_t qty;
+    std::int64_t ts;
+    std::int8_t side;
+};
+
+// The messages of an L3 market data feed
+enum class MarketEventType : std::int8_t {
+    ADD,        // a new limit order
+    CANCEL,     // qty of a resting order is cancelled, all of it when qty is 0
+    EXECUTE,    // qty of a resting order trades against an aggressor the feed does not show
+    REPLACE     // a resting order is replaced by the order newId with a new price and qty, losing its time priority
+};
+
+// One record of an event log (EVENT_DTYPE): type is a MarketEventType, side an OrderBookRecordType, price in ticks
+struct MarketEvent {
+    std::int64_t ts;
+    std::int64_t id;
+    std::int64_t price;
+    std::int64_t qty;
+    std::int64_t newId;
+    std::int8_t type;
+    std::int8_t side;
+    std::int8_t reserved[6];    // zeros, so the files are byte for byte reproducible
+};
+
+struct BatchResult {
+    std::size_t orders;     // batch rows processed, rejected ones included
+    std::size_t fills;      // fills written to the output
+    std::size_t rejected;   // invalid rows: a duplicate id, a non positive qty, an unknown order to cancel or modify
+};
+
+// A copy of an order handed to Python, the price in ticks
 class OrderBookRecord {
     public:
-        int id;
+        long long id;
         long long time;
-        int volume;
-        float price;
+        long long volume;
+        long long price;
         OrderBookRecordType recordType;
-        
+
         OrderBookRecord(
-            int id, 
-            long long time, 
-            int volume, 
-            float price, 
+            long long id,
+            long long time,
+            long long volume,
+            long long price,
             enum OrderBookRecordType recordType
         );
-        
+
         void displayContents() const;
 };
 
-class AskPrices {
+// One execution between an incoming (taker) order and a resting (maker) order, at the maker's price in ticks
+struct Fill {
+    long long takerId;
+    long long makerId;
+    long long price;
+    long long volume;
+    long long time;
+    OrderBookRecordType takerSide;
+};
+
+struct PriceLevel;
+
+constexpr std::uint32_t NO_SLOT = std::numeric_limits<std::uint32_t>::max();
+
+// A resting order: 48 bytes, linked into the FIFO queue of its price level by slot numbers
+struct OrderSlot {
+    std::int64_t id;
+    std::int64_t volume;
+    std::int64_t time;
+    PriceLevel* level;
+    std::uint32_t previous;
+    std::uint32_t next;     // also links the free slots of the pool
+    OrderBookRecordType side;
+};
+
+// The orders resting at one price in time priority, with their total volume kept up to date
+struct PriceLevel {
+    std::int64_t price = 0;
+    std::int64_t volume = 0;
+    std::uint32_t head = NO_SLOT;
+    std::uint32_t tail = NO_SLOT;
+};
+
+// Orders live in one contiguous arena. Released slots go on an intrusive free list and are reused before the arena grows,
+// so a book in steady state allocates nothing per order
+class OrderPool {
+    public:
+        std::uint32_t allocate() {
+            if (freeHead != NO_SLOT) {
+                std::uint32_t slot = freeHead;
+                freeHead = slots[slot].next;
+                return slot;
+            }
+            slots.emplace_back();
+            return static_cast<std::uint32_t>(slots.size() - 1);
+        }
+
+        void release(std::uint32_t slot) {
+            slots[slot].next = freeHead;
+            freeHead = slot;
+        }
+
+        void reserve(std::size_t capacity) {
+            slots.reserve(capacity);
+        }
+
+        std::size_t capacity() const {
+            return slots.size();
+        }
+
+        OrderSlot& operator[](std::uint32_t slot) {
+            return slots[slot];
+        }
+
+        const OrderSlot& operator[](std::uint32_t slot) const {
+            return slots[slot];
+        }
+
+    private:
+        std::vector<OrderSlot> slots;
+        std::uint32_t freeHead = NO_SLOT;
+};
+
+// The id -> slot index of the resting orders: an open addressing table with linear probing in one flat array, kept at most
+// half full, so finding, adding and removing an order is O(1) without an allocation per order
+class OrderIndex {
+    public:
+        std::size_t size() const {
+            return count;
+        }
+
+        void reserve(std::size_t orders) {
+            if (2 * orders > entries.size()) {
+                rehash(2 * orders);
+            }
+        }
+
+        std::uint32_t find(std::int64_t id) const {
+            if (entries.empty()) {
+                return NO_SLOT;
+            }
+            for (std::size_t position = home(id);; position = (position + 1) & mask) {
+                const Entry& entry = entries[position];
+                if (entry.slot == NO_SLOT || entry.id == id) {
+                    return entry.slot;
+                }
+            }
+        }
+
+        bool contains(std::int64_t id) const {
+            return find(id) != NO_SLOT;
+        }
+
+        // The id must not be in the index yet
+        void insert(std::int64_t id, std::uint32_t slot) {
+            if (2 * (count + 1) > entries.size()) {
+                rehash(2 * (count + 1));
+            }
+            std::size_t position = home(id);
+            while (entries[position].slot != NO_SLOT) {
+                position = (position + 1) & mask;
+            }
+            entries[position] = Entry{id, slot};
+            ++count;
+        }
+
+        bool erase(std::int64_t id) {
+            if (entries.empty()) {
+                return false;
+            }
+            std::size_t hole = home(id);
+            while (entries[hole].id != id || entries[hole].slot == NO_SLOT) {
+                if (entries[hole].slot == NO_SLOT) {
+                    return false;
+                }
+                hole = (hole + 1) & mask;
+            }
+            // Backward shift: later entries of the probe run move into the hole unless they would move before their home
+            for (std::size_t position = (hole + 1) & mask; entries[position].slot != NO_SLOT; position = (position + 1) & mask) {
+                std::size_t entryHome = home(entries[position].id);
+                if (((position - entryHome) & mask) >= ((position - hole) & mask)) {
+                    entries[hole] = entries[position];
+                    hole = position;
+                }
+            }
+            entries[hole].slot = NO_SLOT;
+            --count;
+            return true;
+        }
+
+    private:
+        struct Entry {
+            std::int64_t id = 0;
+            std::uint32_t slot = NO_SLOT;
+        };
+
+        std::vector<Entry> entries;
+        std::size_t count = 0;
+        std::size_t mask = 0;
+        int shift = 64;
+
+        std::size_t home(std::int64_t id) const {
+            // Fibonacci hashing: the top bits of the product spread consecutive ids over the table
+            return static_cast<std::size_t>((static_cast<std::uint64_t>(id) * 0x9E3779B97F4A7C15ULL) >> shift);
+        }
+
+        void rehash(std::size_t minimumSize) {
+            std::size_t size = 16;
+            int bits = 4;
+            while (size < minimumSize) {
+                size <<= 1;
+                ++bits;
+            }
+            std::vector<Entry> previous(size);
+            previous.swap(entries);
+            mask = size - 1;
+            shift = 64 - bits;
+            count = 0;
+            for (const Entry& entry : previous) {
+                if (entry.slot != NO_SLOT) {
+                    insert(entry.id, entry.slot);
+                }
+            }
+        }
+};
+
+// One side of the book: price levels sorted from the best price, so the best level is always levels.begin(). Map nodes never
+// move, so the orders of a level point straight at it
+template <typename Compare>
+class PriceLevels {
+    public:
+        std::map<std::int64_t, PriceLevel, Compare> levels;
+
+        int size() const {
+            return static_cast<int>(levels.size());
+        }
+
+        bool empty() const {
+            return levels.empty();
+        }
+
+        // True when a resting price is at least as good as the limit of an incoming order on the other side
+        static bool crosses(std::int64_t restingPrice, std::int64_t limitPrice) {
+            return !Compare{}(limitPrice, restingPrice);
+        }
+
+        PriceLevel& levelAt(std::int64_t price) {
+            auto [position, inserted] = levels.try_emplace(price);
+            if (inserted) {
+                position->second.price = price;
+            }
+            return position->second;
+        }
+
+        std::int64_t volumeAt(std::int64_t price) const {
+            auto position = levels.find(price);
+            return position == levels.end() ? 0 : position->second.volume;
+        }
+
+        // Writes the best maxLevels levels, zeros past the last level
+        void writeDepth(int maxLevels, std::int64_t* prices, std::int64_t* volumes) const {
+            auto position = levels.begin();
+            for (int level = 0; level < maxLevels; ++level) {
+                bool filled = position != levels.end();
+                prices[level] = filled ? position->first : 0;
+                volumes[level] = filled ? position->second.volume : 0;
+                if (filled) {
+                    ++position;
+                }
+            }
+        }
+
+        std::vector<std::pair<std::int64_t, std::int64_t>> depth(int maxLevels) const {
+            std::vector<std::pair<std::int64_t, std::int64_t>> result;
+            for (auto position = levels.begin(); position != levels.end() && static_cast<int>(result.size()) < maxLevels; ++position) {
+                result.emplace_back(position->first, position->second.volume);
+            }
+            return result;
+        }
+};
+
+class AskPrices : public PriceLevels<std::less<std::int64_t>> {
     public:
         OrderBookRecordType type = OrderBookRecordType::ASK;
-        std::vector<OrderBookRecord> askPricesRecords;
-        AskPrices(std::string s);
-        int size();
 };
 
-class BidPrices {
+class BidPrices : public PriceLevels<std::greater<std::int64_t>> {
     public:
         enum OrderBookRecordType type = OrderBookRecordType::BID;
-        std::vector<OrderBookRecord> bidPricesRecords;
-        BidPrices(std::string s);
-        int size();
-};
\ No newline at end of file
+};
+
+// Price-time priority matching engine: the best price matches first, and orders at one price match in arrival order.
+// Prices are integer ticks of tickSize, so they are exact price level keys
+class OrderBook {
+    public:
+        explicit OrderBook(double tickSize = 0.01, std::size_t expectedOrders = 0);
+
+        double tickSize() const;
+        long long toTicks(double price) const;
+        double toPrice(long long ticks) const;
+
+        std::vector<Fill> submitOrder(long long id, long long time, OrderType type, OrderBookRecordType side, long long volume, long long price);
+        std::vector<Fill> addLimitOrder(long long id, long long time, OrderBookRecordType side, long long volume, long long price);
+        std::vector<Fill> submitMarketOrder(long long id, long long time, OrderBookRecordType side, long long volume);
+        std::vector<Fill> submitIocOrder(long long id, long long time, OrderBookRecordType side, long long volume, long long price);
+        bool cancelOrder(long long id);
+        std::vector<Fill> modifyOrder(long long id, long long time, long long volume, long long price);
+        BatchResult submitBatch(const BatchOrder* orders, std::size_t count, BatchFill* fills, std::size_t capacity);
+        std::size_t pendingFillCount() const;
+        bool applyEvent(const MarketEvent& event, std::vector<Fill>& fills);
+
+        std::optional<long long> bestBid() const;
+        std::optional<long long> bestAsk() const;
+        long long volumeAtPrice(OrderBookRecordType side, long long price) const;
+        std::vector<std::pair<std::int64_t, std::int64_t>> depth(OrderBookRecordType side, int levels) const;
+        void writeDepth(OrderBookRecordType side, int levels, std::int64_t* prices, std::int64_t* volumes) const;
+        int levelCount(OrderBookRecordType side) const;
+        int orderCount() const;
+        std::size_t poolCapacity() const;
+        bool hasOrder(long long id) const;
+        OrderBookRecord getOrder(long long id) const;
+        // The methods do not lock: callers sharing a book between threads hold this mutex around every call
+        std::mutex& mutex() const;
+
+    private:
+        double tick;
+        mutable std::mutex bookMutex;
+        BidPrices bids;
+        AskPrices asks;
+        OrderPool pool;
+        OrderIndex orderIndex;
+        // Fills of a batch row, reused between rows, and the fills that did not fit in the last output array
+        std::vector<Fill> batchFills;
+        std::vector<Fill> pendingFills;
+
+        bool applyBatchOrder(const BatchOrder& order, std::vector<Fill>& fills);
+        std::size_t writeFills(const std::vector<Fill>& source, BatchFill* fills, std::size_t position, std::size_t capacity) const;
+        void amend(std::uint32_t slot, long long time, long long volume, long long price, std::vector<Fill>& fills);
+        void process(OrderBookRecord& taker, OrderType type, std::vector<Fill>& fills);
+        template <typename Levels>
+        void match(Levels& opposite, OrderBookRecord& taker, bool anyPrice, std::vector<Fill>& fills);
+        void rest(const OrderBookRecord& record);
+        void unlink(std::uint32_t slot);
+        void reduce(std::uint32_t slot, std::int64_t volume);
+};
@@ -1,6 +1,10 @@
-#include "include/quantsim/lob/Order_book.hpp"
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
-#include <ctime>
+#include <pybind11/stl.h>
+#include <string>
+#include <limits>
+#include <mutex>
+#include <quantsim/lob/Event_log.hpp>
 #include <quantsim/lob/Order_book.hpp>
 
 namespace py = pybind11;
@@ -9,6 +13,100 @@ int add(int a, int b) {
     return a + b;
 }
 
+// The buffer of a 1-D C contiguous array of the given record dtype. Anything else is refused instead of copied
+template <typename Record>
+static py::buffer_info recordBuffer(const py::array& array, const std::string& name, bool writeable) {
+    if (!array.dtype().equal(py::dtype::of<Record>())) {
+        throw py::type_error(name + " must be a NumPy array of dtype " + py::str(py::dtype::of<Record>()).cast<std::string>());
+    }
+    if (array.ndim() != 1 || !(array.flags() & py::array::c_style)) {
+        throw py::value_error(name + " must be a 1-D C contiguous array");
+    }
+    if (writeable && !array.writeable()) {
+        throw py::value_error(name + " must be writeable");
+    }
+    return array.request(writeable);
+}
+
+// Locks a book for a call made with the GIL held. When another thread holds the book, the GIL is given up while waiting so a
+// batch or replay running without the GIL can finish
+static std::unique_lock<std::mutex> lockBook(const OrderBook& book) {
+    std::unique_lock<std::mutex> lock(book.mutex(), std::try_to_lock);
+    if (!lock.owns_lock()) {
+        py::gil_scoped_release release;
+        lock.lock();
+    }
+    return lock;
+}
+
+// Binds a book method to run under the book's lock
+template <typename Result, typename... Args>
+static auto locked(Result (OrderBook::*method)(Args...)) {
+    return [method](OrderBook& book, Args... args) -> Result {
+        std::unique_lock<std::mutex> lock = lockBook(book);
+        return (book.*method)(args...);
+    };
+}
+
+template <typename Result, typename... Args>
+static auto locked(Result (OrderBook::*method)(Args...) const) {
+    return [method](const OrderBook& book, Args... args) -> Result {
+        std::unique_lock<std::mutex> lock = lockBook(book);
+        return (book.*method)(args...);
+    };
+}
+
+static py::tuple submitBatch(OrderBook& book, const py::array& orders, const py::array& fills) {
+    py::buffer_info orderBuffer = recordBuffer<BatchOrder>(orders, "orders", false);
+    py::buffer_info fillBuffer = recordBuffer<BatchFill>(fills, "fills", true);
+    BatchResult result;
+    {
+        py::gil_scoped_release release;
+        std::lock_guard<std::mutex> lock(book.mutex());
+        result = book.submitBatch(
+            static_cast<const BatchOrder*>(orderBuffer.ptr),
+            static_cast<std::size_t>(orderBuffer.size),
+            static_cast<BatchFill*>(fillBuffer.ptr),
+            static_cast<std::size_t>(fillBuffer.size)
+        );
+    }
+    return py::make_tuple(result.orders, result.fills, result.rejected);
+}
+
+// Moves a vector into a NumPy array of the given shape without copying it
+static py::array_t<std::int64_t> toNumpy(std::vector<std::int64_t>&& values, std::vector<py::ssize_t> shape) {
+    auto* owned = new std::vector<std::int64_t>(std::move(values));
+    py::capsule owner(owned, [](void* pointer) { delete static_cast<std::vector<std::int64_t>*>(pointer); });
+    return py::array_t<std::int64_t>(shape, owned->data(), owner);
+}
+
+static py::dict replay(OrderBook& book, const EventLog& log, int depthLevels, std::int64_t everyEvents, std::int64_t everyTime, std::size_t first, std::size_t count) {
+    if (depthLevels < 1 || everyEvents < 0 || everyTime < 0) {
+        throw py::value_error("depthLevels must be positive and the snapshot intervals cannot be negative");
+    }
+    ReplaySnapshots snapshots;
+    snapshots.depthLevels = depthLevels;
+    ReplayStatistics statistics;
+    {
+        py::gil_scoped_release release;
+        std::lock_guard<std::mutex> lock(book.mutex());
+        statistics = replayEventLog(log, book, first, count, everyEvents, everyTime, snapshots);
+    }
+    py::ssize_t rows = static_cast<py::ssize_t>(snapshots.time.size());
+    py::dict result;
+    result["events"] = statistics.events;
+    result["fills"] = statistics.fills;
+    result["volume"] = statistics.volume;
+    result["rejected"] = statistics.rejected;
+    result["event_index"] = toNumpy(std::move(snapshots.eventIndex), {rows});
+    result["time"] = toNumpy(std::move(snapshots.time), {rows});
+    result["bid_price"] = toNumpy(std::move(snapshots.bidPrice), {rows, depthLevels});
+    result["bid_volume"] = toNumpy(std::move(snapshots.bidVolume), {rows, depthLevels});
+    result["ask_price"] = toNumpy(std::move(snapshots.askPrice), {rows, depthLevels});
+    result["ask_volume"] = toNumpy(std::move(snapshots.askVolume), {rows, depthLevels});
+    return result;
+}
+
 PYBIND11_MODULE(quantsim_core_engine, module_handle, py::mod_gil_not_used()) {
     module_handle.doc() = "Core engine for Quantsim project - for Limit Order Book implementation";
     module_handle.def("quantsim_fn_python_name_add", &add, "A function that adds 2 numbers");
@@ -17,9 +115,126 @@ PYBIND11_MODULE(quantsim_core_engine, module_handle, py::mod_gil_not_used()) {
         .value("BID", OrderBookRecordType::BID)
         .value("ASK", OrderBookRecordType::ASK)
         .export_values();
+
+    py::enum_<OrderType>(module_handle, "OrderType")
+        .value("LIMIT", OrderType::LIMIT)
+        .value("MARKET", OrderType::MARKET)
+        .value("IOC", OrderType::IOC)
+        .export_values();
     
+    py::enum_<BatchAction>(module_handle, "BatchAction", "The type field of a batch row")
+        .value("LIMIT", BatchAction::LIMIT)
+        .value("MARKET", BatchAction::MARKET)
+        .value("IOC", BatchAction::IOC)
+        .value("CANCEL", BatchAction::CANCEL)
+        .value("MODIFY", BatchAction::MODIFY);
+
+    PYBIND11_NUMPY_DTYPE(BatchOrder, type, side, price, qty, id, ts);
+    PYBIND11_NUMPY_DTYPE(BatchFill, taker, maker, price, qty, ts, side);
+    py::enum_<MarketEventType>(module_handle, "MarketEventType", "The type field of an event log record")
+        .value("ADD", MarketEventType::ADD)
+        .value("CANCEL", MarketEventType::CANCEL)
+        .value("EXECUTE", MarketEventType::EXECUTE)
+        .value("REPLACE", MarketEventType::REPLACE);
+
+    PYBIND11_NUMPY_DTYPE_EX(MarketEvent, ts, "ts", id, "id", price, "price", qty, "qty", newId, "new_id", type, "type", side, "side");
+    module_handle.attr("ORDER_DTYPE") = py::dtype::of<BatchOrder>();
+    module_handle.attr("FILL_DTYPE") = py::dtype::of<BatchFill>();
+    module_handle.attr("EVENT_DTYPE") = py::dtype::of<MarketEvent>();
+
     py::class_<OrderBookRecord>(module_handle, "OrderBookRecord")
-        .def(py::init<int, long long, int, float, OrderBookRecordType>())
+        .def(py::init<long long, long long, long long, long long, OrderBookRecordType>())
+        .def_readonly("id", &OrderBookRecord::id)
+        .def_readonly("time", &OrderBookRecord::time)
+        .def_readonly("volume", &OrderBookRecord::volume)
+        .def_readonly("price", &OrderBookRecord::price)
+        .def_readonly("recordType", &OrderBookRecord::recordType)
         .def("displayContents", &OrderBookRecord::displayContents);
-}
 
+    py::class_<Fill>(module_handle, "Fill", "An execution between an incoming (taker) and a resting (maker) order at the maker's price in ticks")
+        .def_readonly("takerId", &Fill::takerId)
+        .def_readonly("makerId", &Fill::makerId)
+        .def_readonly("price", &Fill::price)
+        .def_readonly("volume", &Fill::volume)
+        .def_readonly("time", &Fill::time)
+        .def_readonly("takerSide", &Fill::takerSide)
+        .def("__repr__", [](const Fill& fill) {
+            return "Fill(takerId=" + std::to_string(fill.takerId) + ", makerId=" + std::to_string(fill.makerId)
+                + ", price=" + std::to_string(fill.price) + ", volume=" + std::to_string(fill.volume) + ")";
+        });
+
+    py::class_<OrderBook>(module_handle, "OrderBook", "Price-time priority limit order book and matching engine. Prices are integer ticks of tickSize. Every call locks the book, so it can "
+        "be shared between threads")
+        .def(py::init<double, std::size_t>(), py::arg("tickSize") = 0.01, py::arg("expectedOrders") = 0,
+            "expectedOrders preallocates the order pool and id index")
+        .def_property_readonly("tickSize", &OrderBook::tickSize)
+        .def("toTicks", &OrderBook::toTicks, py::arg("price"), "The nearest number of ticks of a price")
+        .def("toPrice", &OrderBook::toPrice, py::arg("ticks"))
+        .def("submitOrder", locked(&OrderBook::submitOrder), py::arg("id"), py::arg("time"), py::arg("type"), py::arg("side"), py::arg("volume"), py::arg("price"),
+            "Submits a limit, market or IOC order and returns its fills")
+        .def("addLimitOrder", locked(&OrderBook::addLimitOrder), py::arg("id"), py::arg("time"), py::arg("side"), py::arg("volume"), py::arg("price"),
+            "Matches a limit order and rests what is left of it on the book")
+        .def("submitMarketOrder", locked(&OrderBook::submitMarketOrder), py::arg("id"), py::arg("time"), py::arg("side"), py::arg("volume"),
+            "Matches an order at any price, what is left of it is dropped")
+        .def("submitIocOrder", locked(&OrderBook::submitIocOrder), py::arg("id"), py::arg("time"), py::arg("side"), py::arg("volume"), py::arg("price"),
+            "Matches an order up to its limit price, what is left of it is dropped")
+        .def("cancelOrder", locked(&OrderBook::cancelOrder), py::arg("id"), "Removes a resting order, False if there is none with this id")
+        .def("modifyOrder", locked(&OrderBook::modifyOrder), py::arg("id"), py::arg("time"), py::arg("volume"), py::arg("price"),
+            "Changes a resting order. A volume reduction at the same price keeps the time priority, anything else re-enters the book")
+        .def("submitBatch", &submitBatch, py::arg("orders"), py::arg("fills"),
+            "Processes an ORDER_DTYPE array without the GIL, holding the book's lock for the whole call, and writes its fills to a preallocated FILL_DTYPE array. When the fills array "
+            "is full, processing stops after the row that filled it and the fills that did not fit are written first by the next call. "
+            "Returns (rows processed, fills written, rows rejected)")
+        .def("pendingFillCount", locked(&OrderBook::pendingFillCount), "Fills of the last batch still waiting for an output array")
+        .def("bestBid", locked(&OrderBook::bestBid))
+        .def("bestAsk", locked(&OrderBook::bestAsk))
+        .def("volumeAtPrice", locked(&OrderBook::volumeAtPrice), py::arg("side"), py::arg("price"))
+        .def("depth", locked(&OrderBook::depth), py::arg("side"), py::arg("levels"), "The (price, volume) of the best price levels of a side")
+        .def("levelCount", locked(&OrderBook::levelCount), py::arg("side"))
+        .def("orderCount", locked(&OrderBook::orderCount))
+        .def("poolCapacity", locked(&OrderBook::poolCapacity), "Order slots allocated by the pool, free ones included")
+        .def("hasOrder", locked(&OrderBook::hasOrder), py::arg("id"))
+        .def("getOrder", locked(&OrderBook::getOrder), py::arg("id"));
+
+    py::class_<EventLogWriter>(module_handle, "EventLogWriter", "Writes EVENT_DTYPE records to a new binary event log")
+        .def(py::init<const std::string&, double>(), py::arg("path"), py::arg("tickSize"))
+        .def("write", [](EventLogWriter& writer, const py::array& events) {
+            py::buffer_info buffer = recordBuffer<MarketEvent>(events, "events", false);
+            writer.write(static_cast<const MarketEvent*>(buffer.ptr), static_cast<std::size_t>(buffer.size));
+        }, py::arg("events"))
+        .def("close", &EventLogWriter::close, "Writes the event count to the header and closes the file")
+        .def_property_readonly("eventCount", &EventLogWriter::eventCount)
+        .def("__enter__", [](EventLogWriter& writer) -> EventLogWriter& { return writer; }, py::return_value_policy::reference)
+        .def("discard", &EventLogWriter::discard, "Closes the file without its header, the unfinished log cannot be opened")
+        .def("__exit__", [](EventLogWriter& writer, const py::object& type, const py::object&, const py::object&) {
+            // A with block that raised leaves an unfinished log instead of a valid looking prefix
+            if (type.is_none()) {
+                writer.close();
+            } else {
+                writer.discard();
+            }
+        });
+
+    py::class_<EventLog>(module_handle, "EventLog", "A read-only memory mapping of a binary event log")
+        .def(py::init<const std::string&>(), py::arg("path"))
+        .def_property_readonly("eventCount", &EventLog::eventCount)
+        .def_property_readonly("tickSize", &EventLog::tickSize)
+        .def("events", [](const py::object& self) {
+            const EventLog& log = self.cast<const EventLog&>();
+            py::array events(py::dtype::of<MarketEvent>(), {static_cast<py::ssize_t>(log.eventCount())}, {}, log.events(), self);
+            events.attr("setflags")(py::arg("write") = false);
+            return events;
+        }, "A read-only EVENT_DTYPE view of the mapped records, no copy is made");
+
+    module_handle.def("replayEventLog", &replay, py::arg("book"), py::arg("log"), py::arg("depthLevels") = 5, py::arg("everyEvents") = 0,
+        py::arg("everyTime") = 0, py::arg("first") = 0, py::arg("count") = std::numeric_limits<std::size_t>::max(),
+        "Drives the book with the events of the log without the GIL, holding the book's lock for the whole replay. A book snapshot of depthLevels levels per side is taken after every "
+        "everyEvents events and / or every everyTime units of the event timestamps. Returns the replay statistics and the snapshot arrays "
+        "event_index, time, bid_price, bid_volume, ask_price and ask_volume (snapshots x depthLevels)");
+
+    module_handle.def("convertCsvToEventLog", [](const std::string& csvPath, const std::string& logPath, double tickSize) {
+        py::gil_scoped_release release;
+        return convertCsvToEventLog(csvPath, logPath, tickSize);
+    }, py::arg("csvPath"), py::arg("logPath"), py::arg("tickSize"),
+        "Streams a CSV file of ts, type, side, id, price, qty (and optionally new_id) columns into a binary event log. Returns the events written");
+}
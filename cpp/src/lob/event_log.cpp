@@ -0,0 +1,367 @@
+#include <algorithm>
+#include <cctype>
+#include <cerrno>
+#include <cmath>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <limits>
+#include <stdexcept>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <quantsim/lob/Event_log.hpp>
+
+static_assert(sizeof(EventLogHeader) == 32, "The event log header must stay 32 bytes");
+static_assert(sizeof(MarketEvent) == 48, "The event log records must stay 48 bytes");
+
+EventLogWriter::EventLogWriter(const std::string& path, double tickSize):
+    file(nullptr),
+    header{}
+{
+    if (!(tickSize > 0) || !std::isfinite(tickSize)) {
+        throw std::invalid_argument("The tick size must be a positive number");
+    }
+    file = std::fopen(path.c_str(), "wb");
+    if (file == nullptr) {
+        throw std::runtime_error("Cannot create the event log " + path + ": " + std::strerror(errno));
+    }
+    std::memcpy(header.magic, EVENT_LOG_MAGIC, sizeof(EVENT_LOG_MAGIC));
+    header.version = EVENT_LOG_VERSION;
+    header.recordSize = sizeof(MarketEvent);
+    header.tickSize = tickSize;
+    EventLogHeader unfinished = header;
+    unfinished.eventCount = EVENT_LOG_UNFINISHED;
+    if (std::fwrite(&unfinished, sizeof(unfinished), 1, file) != 1) {
+        std::fclose(file);
+        file = nullptr;
+        throw std::runtime_error("Cannot write to the event log " + path + ": " + std::strerror(errno));
+    }
+}
+
+EventLogWriter::~EventLogWriter() {
+    discard();
+}
+
+void EventLogWriter::write(const MarketEvent* events, std::size_t count) {
+    if (file == nullptr) {
+        throw std::runtime_error("The event log is closed");
+    }
+    // Records are copied through a small buffer to zero their padding, which NumPy copies do not preserve
+    MarketEvent buffer[1024];
+    for (std::size_t start = 0; start < count; start += 1024) {
+        std::size_t size = std::min<std::size_t>(1024, count - start);
+        std::memcpy(buffer, events + start, size * sizeof(MarketEvent));
+        for (std::size_t position = 0; position < size; ++position) {
+            std::memset(buffer[position].reserved, 0, sizeof(buffer[position].reserved));
+        }
+        if (std::fwrite(buffer, sizeof(MarketEvent), size, file) != size) {
+            throw std::runtime_error("Cannot write to the event log: " + std::string(std::strerror(errno)));
+        }
+        header.eventCount += size;
+    }
+}
+
+void EventLogWriter::close() {
+    if (file == nullptr) {
+        return;
+    }
+    bool written = std::fseek(file, 0, SEEK_SET) == 0 && std::fwrite(&header, sizeof(header), 1, file) == 1;
+    written = std::fclose(file) == 0 && written;
+    file = nullptr;
+    if (!written) {
+        throw std::runtime_error("Cannot finish the event log: " + std::string(std::strerror(errno)));
+    }
+}
+
+void EventLogWriter::discard() {
+    if (file != nullptr) {
+        std::fclose(file);
+        file = nullptr;
+    }
+}
+
+std::uint64_t EventLogWriter::eventCount() const {
+    return header.eventCount;
+}
+
+EventLog::EventLog(const std::string& path):
+    mapping(nullptr),
+    mappedBytes(0),
+    header(nullptr)
+{
+    int descriptor = open(path.c_str(), O_RDONLY);
+    if (descriptor < 0) {
+        throw std::runtime_error("Cannot open the event log " + path + ": " + std::strerror(errno));
+    }
+    struct stat status;
+    if (fstat(descriptor, &status) != 0 || static_cast<std::size_t>(status.st_size) < sizeof(EventLogHeader)) {
+        ::close(descriptor);
+        throw std::runtime_error(path + " is not an event log: it is shorter than the header");
+    }
+    mappedBytes = static_cast<std::size_t>(status.st_size);
+    mapping = mmap(nullptr, mappedBytes, PROT_READ, MAP_PRIVATE, descriptor, 0);
+    ::close(descriptor);
+    if (mapping == MAP_FAILED) {
+        mapping = nullptr;
+        throw std::runtime_error("Cannot map the event log " + path + ": " + std::strerror(errno));
+    }
+    // A replay reads the records once from front to back
+    madvise(mapping, mappedBytes, MADV_SEQUENTIAL);
+
+    header = static_cast<const EventLogHeader*>(mapping);
+    std::string problem;
+    if (std::memcmp(header->magic, EVENT_LOG_MAGIC, sizeof(EVENT_LOG_MAGIC)) != 0) {
+        problem = " is not an event log";
+    } else if (header->version != EVENT_LOG_VERSION || header->recordSize != sizeof(MarketEvent)) {
+        problem = " has an unsupported event log version";
+    } else if (header->eventCount == EVENT_LOG_UNFINISHED) {
+        problem = " was not closed by its writer";
+    } else if (mappedBytes != sizeof(EventLogHeader) + header->eventCount * sizeof(MarketEvent)) {
+        problem = " is truncated";
+    }
+    if (!problem.empty()) {
+        munmap(mapping, mappedBytes);
+        mapping = nullptr;
+        throw std::runtime_error(path + problem);
+    }
+}
+
+EventLog::~EventLog() {
+    if (mapping != nullptr) {
+        munmap(mapping, mappedBytes);
+    }
+}
+
+const MarketEvent* EventLog::events() const {
+    return reinterpret_cast<const MarketEvent*>(static_cast<const char*>(mapping) + sizeof(EventLogHeader));
+}
+
+std::uint64_t EventLog::eventCount() const {
+    return header->eventCount;
+}
+
+double EventLog::tickSize() const {
+    return header->tickSize;
+}
+
+static void takeSnapshot(const OrderBook& book, std::int64_t eventIndex, std::int64_t time, ReplaySnapshots& snapshots) {
+    std::size_t row = snapshots.time.size() * static_cast<std::size_t>(snapshots.depthLevels);
+    std::size_t size = row + static_cast<std::size_t>(snapshots.depthLevels);
+    snapshots.eventIndex.push_back(eventIndex);
+    snapshots.time.push_back(time);
+    snapshots.bidPrice.resize(size);
+    snapshots.bidVolume.resize(size);
+    snapshots.askPrice.resize(size);
+    snapshots.askVolume.resize(size);
+    book.writeDepth(OrderBookRecordType::BID, snapshots.depthLevels, snapshots.bidPrice.data() + row, snapshots.bidVolume.data() + row);
+    book.writeDepth(OrderBookRecordType::ASK, snapshots.depthLevels, snapshots.askPrice.data() + row, snapshots.askVolume.data() + row);
+}
+
+ReplayStatistics replayEventLog(
+    const EventLog& log,
+    OrderBook& book,
+    std::size_t first,
+    std::size_t count,
+    std::int64_t everyEvents,
+    std::int64_t everyTime,
+    ReplaySnapshots& snapshots
+) {
+    if (std::abs(log.tickSize() - book.tickSize()) > 1e-12 * log.tickSize()) {
+        throw std::invalid_argument("The tick size of the book does not match the tick size of the event log");
+    }
+    if (first > log.eventCount()) {
+        throw std::out_of_range("The first event is past the end of the event log");
+    }
+    count = std::min<std::size_t>(count, log.eventCount() - first);
+    const MarketEvent* events = log.events() + first;
+
+    ReplayStatistics statistics{0, 0, 0, 0};
+    std::vector<Fill> fills;
+    std::int64_t nextTime = count > 0 && everyTime > 0 ? events[0].ts + everyTime : std::numeric_limits<std::int64_t>::max();
+    for (std::size_t position = 0; position < count; ++position) {
+        const MarketEvent& event = events[position];
+        while (event.ts >= nextTime) {
+            takeSnapshot(book, static_cast<std::int64_t>(first + position), nextTime, snapshots);
+            nextTime += everyTime;
+        }
+        fills.clear();
+        if (!book.applyEvent(event, fills)) {
+            ++statistics.rejected;
+        }
+        for (const Fill& fill : fills) {
+            statistics.volume += static_cast<std::uint64_t>(fill.volume);
+        }
+        statistics.fills += fills.size();
+        ++statistics.events;
+        if (everyEvents > 0 && (position + 1) % static_cast<std::size_t>(everyEvents) == 0) {
+            takeSnapshot(book, static_cast<std::int64_t>(first + position + 1), event.ts, snapshots);
+        }
+    }
+    return statistics;
+}
+
+static std::string trim(const std::string& text) {
+    std::size_t start = 0, end = text.size();
+    while (start < end && std::isspace(static_cast<unsigned char>(text[start]))) {
+        ++start;
+    }
+    while (end > start && std::isspace(static_cast<unsigned char>(text[end - 1]))) {
+        --end;
+    }
+    return text.substr(start, end - start);
+}
+
+static std::string upper(std::string text) {
+    std::transform(text.begin(), text.end(), text.begin(), [](unsigned char character) { return static_cast<char>(std::toupper(character)); });
+    return text;
+}
+
+static std::vector<std::string> splitCsvLine(const std::string& line) {
+    std::vector<std::string> fields;
+    std::size_t start = 0;
+    while (true) {
+        std::size_t comma = line.find(',', start);
+        fields.push_back(trim(line.substr(start, comma == std::string::npos ? std::string::npos : comma - start)));
+        if (comma == std::string::npos) {
+            return fields;
+        }
+        start = comma + 1;
+    }
+}
+
+static std::int64_t parseInteger(const std::string& field, std::uint64_t lineNumber) {
+    if (field.empty()) {
+        return 0;
+    }
+    char* end = nullptr;
+    long long value = std::strtoll(field.c_str(), &end, 10);
+    if (*end != '\0') {
+        throw std::invalid_argument("Line " + std::to_string(lineNumber) + ": " + field + " is not an integer");
+    }
+    return value;
+}
+
+static std::int64_t parsePriceTicks(const std::string& field, double tickSize, std::uint64_t lineNumber) {
+    if (field.empty()) {
+        return 0;
+    }
+    char* end = nullptr;
+    double price = std::strtod(field.c_str(), &end);
+    if (*end != '\0' || !std::isfinite(price)) {
+        throw std::invalid_argument("Line " + std::to_string(lineNumber) + ": " + field + " is not a price");
+    }
+    return std::llround(price / tickSize);
+}
+
+static std::int8_t parseEventType(const std::string& field, std::uint64_t lineNumber, bool& deleteAll) {
+    std::string type = upper(field);
+    deleteAll = type == "DELETE" || type == "D";
+    if (type == "ADD" || type == "A") {
+        return static_cast<std::int8_t>(MarketEventType::ADD);
+    }
+    if (type == "CANCEL" || type == "X" || deleteAll) {
+        return static_cast<std::int8_t>(MarketEventType::CANCEL);
+    }
+    if (type == "EXECUTE" || type == "E") {
+        return static_cast<std::int8_t>(MarketEventType::EXECUTE);
+    }
+    if (type == "REPLACE" || type == "U") {
+        return static_cast<std::int8_t>(MarketEventType::REPLACE);
+    }
+    throw std::invalid_argument("Line " + std::to_string(lineNumber) + ": unknown event type " + field);
+}
+
+static std::int8_t parseSide(const std::string& field, std::uint64_t lineNumber) {
+    std::string side = upper(field);
+    if (side.empty() || side == "B" || side == "BUY" || side == "BID") {
+        return static_cast<std::int8_t>(OrderBookRecordType::BID);
+    }
+    if (side == "S" || side == "SELL" || side == "ASK") {
+        return static_cast<std::int8_t>(OrderBookRecordType::ASK);
+    }
+    throw std::invalid_argument("Line " + std::to_string(lineNumber) + ": unknown side " + field);
+}
+
+static void writeCsvEvents(
+    std::ifstream& csv,
+    std::size_t columnCount,
+    const std::vector<std::size_t>& positions,
+    bool hasNewId,
+    std::size_t newIdPosition,
+    double tickSize,
+    EventLogWriter& writer
+) {
+    std::string line;
+    std::vector<MarketEvent> buffer;
+    const std::size_t bufferSize = 65536;
+    buffer.reserve(bufferSize);
+    std::uint64_t lineNumber = 1;
+    while (std::getline(csv, line)) {
+        ++lineNumber;
+        if (trim(line).empty()) {
+            continue;
+        }
+        std::vector<std::string> fields = splitCsvLine(line);
+        if (fields.size() < columnCount) {
+            throw std::invalid_argument("Line " + std::to_string(lineNumber) + " has " + std::to_string(fields.size()) + " of " + std::to_string(columnCount) + " columns");
+        }
+        bool deleteAll = false;
+        MarketEvent event{};
+        event.ts = parseInteger(fields[positions[0]], lineNumber);
+        event.type = parseEventType(fields[positions[1]], lineNumber, deleteAll);
+        event.side = parseSide(fields[positions[2]], lineNumber);
+        event.id = parseInteger(fields[positions[3]], lineNumber);
+        event.price = parsePriceTicks(fields[positions[4]], tickSize, lineNumber);
+        event.qty = deleteAll ? 0 : parseInteger(fields[positions[5]], lineNumber);
+        event.newId = hasNewId && !fields[newIdPosition].empty() ? parseInteger(fields[newIdPosition], lineNumber) : event.id;
+        buffer.push_back(event);
+        if (buffer.size() == bufferSize) {
+            writer.write(buffer.data(), buffer.size());
+            buffer.clear();
+        }
+    }
+    writer.write(buffer.data(), buffer.size());
+}
+
+std::uint64_t convertCsvToEventLog(const std::string& csvPath, const std::string& logPath, double tickSize) {
+    std::ifstream csv(csvPath);
+    if (!csv) {
+        throw std::runtime_error("Cannot open the CSV file " + csvPath);
+    }
+    std::string line;
+    if (!std::getline(csv, line)) {
+        throw std::invalid_argument(csvPath + " is empty");
+    }
+    const std::vector<std::string> required = {"ts", "type", "side", "id", "price", "qty"};
+    std::vector<std::string> columns = splitCsvLine(line);
+    std::vector<std::size_t> positions;
+    for (const std::string& name : required) {
+        auto found = std::find(columns.begin(), columns.end(), name);
+        if (found == columns.end()) {
+            throw std::invalid_argument(csvPath + " has no " + name + " column");
+        }
+        positions.push_back(static_cast<std::size_t>(found - columns.begin()));
+    }
+    auto newIdColumn = std::find(columns.begin(), columns.end(), "new_id");
+    bool hasNewId = newIdColumn != columns.end();
+    std::size_t newIdPosition = static_cast<std::size_t>(newIdColumn - columns.begin());
+
+    // The log is written under a temporary name and only renamed to logPath once complete, so a failed conversion never
+    // leaves a log behind
+    const std::string partialPath = logPath + ".partial";
+    EventLogWriter writer(partialPath, tickSize);
+    try {
+        writeCsvEvents(csv, columns.size(), positions, hasNewId, newIdPosition, tickSize, writer);
+        writer.close();
+        if (std::rename(partialPath.c_str(), logPath.c_str()) != 0) {
+            throw std::runtime_error("Cannot move the event log to " + logPath + ": " + std::strerror(errno));
+        }
+    } catch (...) {
+        writer.discard();
+        std::remove(partialPath.c_str());
+        throw;
+    }
+    return writer.eventCount();
+}
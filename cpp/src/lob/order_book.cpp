@@ -1,9 +1,10 @@
-#include <pybind11/pybind11.h>
+#include <algorithm>
+#include <cmath>
 #include <iostream>
+#include <stdexcept>
+#include <string>
 #include <quantsim/lob/Order_book.hpp>
 
-namespace py = pybind11;
-
 static const char* to_string(OrderBookRecordType type) {
     switch (type) {
         case OrderBookRecordType::BID: return "BID";
@@ -12,14 +13,14 @@ static const char* to_string(OrderBookRecordType type) {
     }
 }
 
-OrderBookRecord::OrderBookRecord(int id, long long time, int volume, float price, OrderBookRecordType recordType):
+OrderBookRecord::OrderBookRecord(long long id, long long time, long long volume, long long price, OrderBookRecordType recordType):
     id(id),
     time(time),
     volume(volume),
     price(price),
     recordType(recordType)
 {
-    
+
 }
 
 void OrderBookRecord::displayContents() const{
@@ -27,23 +28,351 @@ void OrderBookRecord::displayContents() const{
         << "ID: " << id
         << ", Time: " << time
         << ", Volume: " << volume
-        << ", Price: " << price
+        << ", Price (ticks): " << price
         << ", Type: " << to_string(recordType)
         << std::endl;
 }
 
-AskPrices::AskPrices(std::string s) {
-    std::cout << "This is the first AskPrices List";
+OrderBook::OrderBook(double tickSize, std::size_t expectedOrders):
+    tick(tickSize)
+{
+    if (!(tickSize > 0) || !std::isfinite(tickSize)) {
+        throw std::invalid_argument("The tick size must be a positive number");
+    }
+    pool.reserve(expectedOrders);
+    orderIndex.reserve(expectedOrders);
+}
+
+double OrderBook::tickSize() const {
+    return tick;
+}
+
+long long OrderBook::toTicks(double price) const {
+    return std::llround(price / tick);
+}
+
+double OrderBook::toPrice(long long ticks) const {
+    return static_cast<double>(ticks) * tick;
+}
+
+std::vector<Fill> OrderBook::submitOrder(long long id, long long time, OrderType type, OrderBookRecordType side, long long volume, long long price) {
+    if (volume <= 0) {
+        throw std::invalid_argument("The order volume must be positive");
+    }
+    if (orderIndex.contains(id)) {
+        throw std::invalid_argument("An order with id " + std::to_string(id) + " is already resting on the book");
+    }
+    OrderBookRecord taker(id, time, volume, price, side);
+    std::vector<Fill> fills;
+    process(taker, type, fills);
+    return fills;
+}
+
+std::vector<Fill> OrderBook::addLimitOrder(long long id, long long time, OrderBookRecordType side, long long volume, long long price) {
+    return submitOrder(id, time, OrderType::LIMIT, side, volume, price);
+}
+
+std::vector<Fill> OrderBook::submitMarketOrder(long long id, long long time, OrderBookRecordType side, long long volume) {
+    return submitOrder(id, time, OrderType::MARKET, side, volume, 0);
+}
+
+std::vector<Fill> OrderBook::submitIocOrder(long long id, long long time, OrderBookRecordType side, long long volume, long long price) {
+    return submitOrder(id, time, OrderType::IOC, side, volume, price);
+}
+
+void OrderBook::process(OrderBookRecord& taker, OrderType type, std::vector<Fill>& fills) {
+    bool anyPrice = type == OrderType::MARKET;
+    if (taker.recordType == OrderBookRecordType::BID) {
+        match(asks, taker, anyPrice, fills);
+    } else {
+        match(bids, taker, anyPrice, fills);
+    }
+    if (taker.volume > 0 && type == OrderType::LIMIT) {
+        rest(taker);
+    }
+}
+
+template <typename Levels>
+void OrderBook::match(Levels& opposite, OrderBookRecord& taker, bool anyPrice, std::vector<Fill>& fills) {
+    while (taker.volume > 0 && !opposite.empty()) {
+        auto best = opposite.levels.begin();
+        PriceLevel& level = best->second;
+        if (!anyPrice && !Levels::crosses(level.price, taker.price)) {
+            break;
+        }
+        while (taker.volume > 0 && level.head != NO_SLOT) {
+            std::uint32_t slot = level.head;
+            OrderSlot& maker = pool[slot];
+            long long traded = std::min(taker.volume, static_cast<long long>(maker.volume));
+            fills.push_back(Fill{taker.id, maker.id, level.price, traded, taker.time, taker.recordType});
+            taker.volume -= traded;
+            maker.volume -= traded;
+            level.volume -= traded;
+            if (maker.volume == 0) {
+                level.head = maker.next;
+                orderIndex.erase(maker.id);
+                pool.release(slot);
+            }
+        }
+        if (level.head == NO_SLOT) {
+            opposite.levels.erase(best);
+        } else {
+            pool[level.head].previous = NO_SLOT;
+        }
+    }
+}
+
+void OrderBook::rest(const OrderBookRecord& record) {
+    PriceLevel& level = record.recordType == OrderBookRecordType::BID ? bids.levelAt(record.price) : asks.levelAt(record.price);
+    std::uint32_t slot = pool.allocate();
+    pool[slot] = OrderSlot{record.id, record.volume, record.time, &level, level.tail, NO_SLOT, record.recordType};
+    if (level.tail != NO_SLOT) {
+        pool[level.tail].next = slot;
+    } else {
+        level.head = slot;
+    }
+    level.tail = slot;
+    level.volume += record.volume;
+    orderIndex.insert(record.id, slot);
+}
+
+void OrderBook::unlink(std::uint32_t slot) {
+    OrderSlot& order = pool[slot];
+    PriceLevel& level = *order.level;
+    if (order.previous != NO_SLOT) {
+        pool[order.previous].next = order.next;
+    } else {
+        level.head = order.next;
+    }
+    if (order.next != NO_SLOT) {
+        pool[order.next].previous = order.previous;
+    } else {
+        level.tail = order.previous;
+    }
+    level.volume -= order.volume;
+    if (level.head == NO_SLOT) {
+        if (order.side == OrderBookRecordType::BID) {
+            bids.levels.erase(level.price);
+        } else {
+            asks.levels.erase(level.price);
+        }
+    }
+    pool.release(slot);
+}
+
+void OrderBook::reduce(std::uint32_t slot, std::int64_t volume) {
+    OrderSlot& order = pool[slot];
+    if (volume >= order.volume) {
+        std::int64_t id = order.id;
+        unlink(slot);
+        orderIndex.erase(id);
+        return;
+    }
+    order.volume -= volume;
+    order.level->volume -= volume;
+}
+
+bool OrderBook::cancelOrder(long long id) {
+    std::uint32_t slot = orderIndex.find(id);
+    if (slot == NO_SLOT) {
+        return false;
+    }
+    unlink(slot);
+    orderIndex.erase(id);
+    return true;
+}
+
+std::vector<Fill> OrderBook::modifyOrder(long long id, long long time, long long volume, long long price) {
+    std::uint32_t slot = orderIndex.find(id);
+    if (slot == NO_SLOT) {
+        throw std::out_of_range("No order with id " + std::to_string(id) + " is resting on the book");
+    }
+    if (volume <= 0) {
+        throw std::invalid_argument("The order volume must be positive, cancel the order instead");
+    }
+    std::vector<Fill> fills;
+    amend(slot, time, volume, price, fills);
+    return fills;
+}
+
+void OrderBook::amend(std::uint32_t slot, long long time, long long volume, long long price, std::vector<Fill>& fills) {
+    OrderSlot& order = pool[slot];
+    // Reducing the volume at the same price keeps the time priority, anything else re-enters the queue
+    if (price == order.level->price && volume <= order.volume) {
+        order.level->volume -= order.volume - volume;
+        order.volume = volume;
+        return;
+    }
+    long long id = order.id;
+    OrderBookRecordType side = order.side;
+    unlink(slot);
+    orderIndex.erase(id);
+    OrderBookRecord taker(id, time, volume, price, side);
+    process(taker, OrderType::LIMIT, fills);
+}
+
+BatchResult OrderBook::submitBatch(const BatchOrder* orders, std::size_t count, BatchFill* fills, std::size_t capacity) {
+    BatchResult result{0, 0, 0};
+    // The fills left over from the previous call come first, no row is processed until they are all written
+    result.fills = writeFills(pendingFills, fills, 0, capacity);
+    pendingFills.erase(pendingFills.begin(), pendingFills.begin() + result.fills);
+    if (!pendingFills.empty()) {
+        return result;
+    }
+    while (result.orders < count) {
+        batchFills.clear();
+        if (!applyBatchOrder(orders[result.orders++], batchFills)) {
+            ++result.rejected;
+            continue;
+        }
+        std::size_t written = writeFills(batchFills, fills, result.fills, capacity);
+        result.fills += written;
+        if (written < batchFills.size()) {
+            pendingFills.assign(batchFills.begin() + written, batchFills.end());
+            break;
+        }
+    }
+    return result;
+}
+
+bool OrderBook::applyBatchOrder(const BatchOrder& order, std::vector<Fill>& fills) {
+    if (order.side != static_cast<std::int8_t>(OrderBookRecordType::BID) && order.side != static_cast<std::int8_t>(OrderBookRecordType::ASK)) {
+        return false;
+    }
+    switch (static_cast<BatchAction>(order.type)) {
+        case BatchAction::LIMIT:
+        case BatchAction::MARKET:
+        case BatchAction::IOC: {
+            if (order.qty <= 0 || orderIndex.contains(order.id)) {
+                return false;
+            }
+            OrderBookRecord taker(order.id, order.ts, order.qty, order.price, static_cast<OrderBookRecordType>(order.side));
+            process(taker, static_cast<OrderType>(order.type), fills);
+            return true;
+        }
+        case BatchAction::CANCEL:
+            return cancelOrder(order.id);
+        case BatchAction::MODIFY: {
+            std::uint32_t slot = orderIndex.find(order.id);
+            if (slot == NO_SLOT || order.qty <= 0) {
+                return false;
+            }
+            amend(slot, order.ts, order.qty, order.price, fills);
+            return true;
+        }
+        default:
+            return false;
+    }
 }
 
-int AskPrices::size() {
-    return askPricesRecords.size();
+bool OrderBook::applyEvent(const MarketEvent& event, std::vector<Fill>& fills) {
+    if (static_cast<MarketEventType>(event.type) == MarketEventType::ADD) {
+        BatchOrder order{static_cast<std::int8_t>(BatchAction::LIMIT), event.side, event.price, event.qty, event.id, event.ts};
+        return applyBatchOrder(order, fills);
+    }
+    std::uint32_t slot = orderIndex.find(event.id);
+    if (slot == NO_SLOT) {
+        return false;
+    }
+    OrderSlot& order = pool[slot];
+    switch (static_cast<MarketEventType>(event.type)) {
+        case MarketEventType::CANCEL:
+            reduce(slot, event.qty > 0 ? event.qty : order.volume);
+            return true;
+        case MarketEventType::EXECUTE: {
+            if (event.qty <= 0) {
+                return false;
+            }
+            // The aggressor of an executed order is not in the feed, its fills have the taker id -1
+            OrderBookRecordType takerSide = order.side == OrderBookRecordType::BID ? OrderBookRecordType::ASK : OrderBookRecordType::BID;
+            fills.push_back(Fill{-1, order.id, order.level->price, std::min(event.qty, order.volume), event.ts, takerSide});
+            reduce(slot, event.qty);
+            return true;
+        }
+        case MarketEventType::REPLACE: {
+            if (event.qty <= 0 || (event.newId != event.id && orderIndex.contains(event.newId))) {
+                return false;
+            }
+            OrderBookRecordType side = order.side;
+            unlink(slot);
+            orderIndex.erase(event.id);
+            OrderBookRecord taker(event.newId, event.ts, event.qty, event.price, side);
+            process(taker, OrderType::LIMIT, fills);
+            return true;
+        }
+        default:
+            return false;
+    }
 }
 
-BidPrices::BidPrices(std::string s) {
-    std::cout << "This is the first BidPrices List";
+std::size_t OrderBook::writeFills(const std::vector<Fill>& source, BatchFill* fills, std::size_t position, std::size_t capacity) const {
+    std::size_t written = std::min(source.size(), capacity - position);
+    for (std::size_t index = 0; index < written; ++index) {
+        const Fill& fill = source[index];
+        fills[position + index] = BatchFill{fill.takerId, fill.makerId, fill.price, fill.volume, fill.time, static_cast<std::int8_t>(fill.takerSide)};
+    }
+    return written;
+}
+
+std::size_t OrderBook::pendingFillCount() const {
+    return pendingFills.size();
+}
+
+std::optional<long long> OrderBook::bestBid() const {
+    if (bids.empty()) {
+        return std::nullopt;
+    }
+    return bids.levels.begin()->first;
 }
 
-int BidPrices::size() {
-    return bidPricesRecords.size();
+std::optional<long long> OrderBook::bestAsk() const {
+    if (asks.empty()) {
+        return std::nullopt;
+    }
+    return asks.levels.begin()->first;
+}
+
+long long OrderBook::volumeAtPrice(OrderBookRecordType side, long long price) const {
+    return side == OrderBookRecordType::BID ? bids.volumeAt(price) : asks.volumeAt(price);
+}
+
+std::vector<std::pair<std::int64_t, std::int64_t>> OrderBook::depth(OrderBookRecordType side, int levels) const {
+    return side == OrderBookRecordType::BID ? bids.depth(levels) : asks.depth(levels);
+}
+
+void OrderBook::writeDepth(OrderBookRecordType side, int levels, std::int64_t* prices, std::int64_t* volumes) const {
+    if (side == OrderBookRecordType::BID) {
+        bids.writeDepth(levels, prices, volumes);
+    } else {
+        asks.writeDepth(levels, prices, volumes);
+    }
+}
+
+int OrderBook::levelCount(OrderBookRecordType side) const {
+    return side == OrderBookRecordType::BID ? bids.size() : asks.size();
+}
+
+int OrderBook::orderCount() const {
+    return static_cast<int>(orderIndex.size());
+}
+
+std::size_t OrderBook::poolCapacity() const {
+    return pool.capacity();
+}
+
+std::mutex& OrderBook::mutex() const {
+    return bookMutex;
+}
+
+bool OrderBook::hasOrder(long long id) const {
+    return orderIndex.contains(id);
+}
+
+OrderBookRecord OrderBook::getOrder(long long id) const {
+    std::uint32_t slot = orderIndex.find(id);
+    if (slot == NO_SLOT) {
+        throw std::out_of_range("No order with id " + std::to_string(id) + " is resting on the book");
+    }
+    const OrderSlot& order = pool[slot];
+    return OrderBookRecord(order.id, order.time, order.volume, order.level->price, order.side);
 }
@@ -1,3 +1,5 @@
+from typing import Dict
+
 price_data_table_creation_query: str = """
 CREATE TABLE IF NOT EXISTS price_data (
     ticker TEXT NOT NULL,
@@ -133,15 +135,33 @@ CREATE TABLE IF NOT EXISTS analysis_results (
     ticker_volatility REAL,
     benchmark_volatility REAL,
     correlation REAL,
-    data_quality_score REAL
+    data_quality_score REAL,
+    max_drawdown REAL,
+    max_drawdown_duration INTEGER,
+    time_to_recovery INTEGER,
+    calmar_ratio REAL,
+    ulcer_index REAL
 )
 """
 
 insert_record_into_analysis_results_table: str = """
-INSERT INTO analysis_results (timestamp, ticker, benchmark, start_date, end_date, alpha, beta, sharpe_ratio, ticker_volatility, benchmark_volatility, correlation, data_quality_score)
-values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+INSERT INTO analysis_results (timestamp, ticker, benchmark, start_date, end_date, alpha, beta, sharpe_ratio, ticker_volatility, benchmark_volatility, correlation, data_quality_score, max_drawdown, max_drawdown_duration, time_to_recovery, calmar_ratio, ulcer_index)
+values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+get_analysis_results_columns_query: str = """
+SELECT name FROM pragma_table_info('analysis_results')
 """
 
+# Drawdown columns added to analysis_results tables created before they existed
+add_drawdown_columns_to_analysis_results_queries: Dict[str, str] = {
+    'max_drawdown': "ALTER TABLE analysis_results ADD COLUMN max_drawdown REAL",
+    'max_drawdown_duration': "ALTER TABLE analysis_results ADD COLUMN max_drawdown_duration INTEGER",
+    'time_to_recovery': "ALTER TABLE analysis_results ADD COLUMN time_to_recovery INTEGER",
+    'calmar_ratio': "ALTER TABLE analysis_results ADD COLUMN calmar_ratio REAL",
+    'ulcer_index': "ALTER TABLE analysis_results ADD COLUMN ulcer_index REAL",
+}
+
 rename_volatility_to_ticker_volatility_in_analysis_results_query: str = """
 ALTER TABLE analysis_results RENAME COLUMN volatility to ticker_volatility 
 """
@@ -173,4 +193,227 @@ SELECT ticker, timestamp, open, close, high, low, volume FROM temp_price_staging
 
 drop_staging_table_for_cleanup_query: str = """
 DROP TABLE temp_price_staging
-"""
\ No newline at end of file
+"""
+
+validation_cache_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS validation_cache (
+    cache_key TEXT NOT NULL PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    rules_version INTEGER NOT NULL,
+    gap_number INTEGER NOT NULL,
+    outlier_number INTEGER NOT NULL,
+    stale_data_number INTEGER NOT NULL,
+    issues TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+)
+"""
+
+get_validation_cache_entry_query: str = """
+SELECT gap_number, outlier_number, stale_data_number, issues FROM validation_cache WHERE cache_key = ?
+"""
+
+insert_or_replace_validation_cache_entry_query: str = """
+INSERT OR REPLACE INTO validation_cache (cache_key, ticker, rules_version, gap_number, outlier_number, stale_data_number, issues, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+get_system_config_value_query: str = """
+SELECT value FROM system_config WHERE key = ?
+"""
+
+insert_or_replace_system_config_value_query: str = """
+INSERT OR REPLACE INTO system_config (key, value, description) VALUES (?, ?, ?)
+"""
+
+rolling_analysis_results_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS rolling_analysis_results (
+    ticker TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    beta REAL,
+    alpha REAL,
+    correlation REAL,
+    ticker_volatility REAL,
+    benchmark_volatility REAL,
+    sharpe_ratio REAL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (ticker, benchmark, window, timestamp)
+)
+"""
+
+insert_or_replace_rolling_analysis_results_query: str = """
+INSERT OR REPLACE INTO rolling_analysis_results (ticker, benchmark, window, timestamp, beta, alpha, correlation, ticker_volatility, benchmark_volatility, sharpe_ratio, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+get_rolling_analysis_results_query: str = """
+SELECT timestamp, beta, alpha, correlation, ticker_volatility, benchmark_volatility, sharpe_ratio FROM rolling_analysis_results
+WHERE ticker = ? AND benchmark = ? AND window = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp ASC
+"""
+
+get_historical_data_for_multiple_tickers_query: str = """
+SELECT * FROM price_data WHERE ticker IN (SELECT value FROM json_each(?)) AND timestamp BETWEEN ? AND ? ORDER BY timestamp ASC
+"""
+
+get_price_data_version_query: str = """
+SELECT COUNT(*), MAX(timestamp), TOTAL(close) FROM price_data WHERE ticker IN (SELECT value FROM json_each(?)) AND timestamp BETWEEN ? AND ?
+"""
+
+covariance_cache_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS covariance_cache (
+    cache_key TEXT NOT NULL PRIMARY KEY,
+    tickers TEXT NOT NULL,
+    start_date INTEGER NOT NULL,
+    end_date INTEGER NOT NULL,
+    data_version TEXT NOT NULL,
+    covariance BLOB NOT NULL,
+    created_at INTEGER NOT NULL
+)
+"""
+
+get_covariance_cache_entry_query: str = """
+SELECT covariance FROM covariance_cache WHERE cache_key = ?
+"""
+
+insert_or_replace_covariance_cache_entry_query: str = """
+INSERT OR REPLACE INTO covariance_cache (cache_key, tickers, start_date, end_date, data_version, covariance, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+factor_data_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS factor_data (
+    factor TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (factor, timestamp)
+)
+"""
+
+insert_or_replace_factor_data_query: str = """
+INSERT OR REPLACE INTO factor_data (factor, timestamp, value) VALUES (?, ?, ?)
+"""
+
+get_factor_data_for_multiple_factors_query: str = """
+SELECT factor, timestamp, value FROM factor_data WHERE factor IN (SELECT value FROM json_each(?)) AND timestamp BETWEEN ? AND ? ORDER BY timestamp ASC
+"""
+
+analysis_confidence_intervals_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS analysis_confidence_intervals (
+    timestamp INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    start_date INTEGER NOT NULL,
+    end_date INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    method TEXT NOT NULL,
+    confidence_level REAL NOT NULL,
+    resamples INTEGER NOT NULL,
+    block_length REAL,
+    estimate REAL,
+    lower REAL,
+    upper REAL,
+    standard_error REAL,
+    PRIMARY KEY (timestamp, ticker, benchmark, start_date, end_date, metric)
+)
+"""
+
+insert_or_replace_analysis_confidence_interval_query: str = """
+INSERT OR REPLACE INTO analysis_confidence_intervals (timestamp, ticker, benchmark, start_date, end_date, metric, method, confidence_level, resamples, block_length, estimate, lower, upper, standard_error)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+backtest_results_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS backtest_results (
+    id INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    strategy TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    tickers TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    start_date INTEGER NOT NULL,
+    end_date INTEGER NOT NULL,
+    fill TEXT NOT NULL,
+    commission_bps REAL NOT NULL,
+    slippage_bps REAL NOT NULL,
+    total_return REAL,
+    annualized_return REAL,
+    annualized_volatility REAL,
+    sharpe_ratio REAL,
+    beta REAL,
+    log_returns_alpha REAL,
+    correlation REAL,
+    max_drawdown REAL,
+    calmar_ratio REAL,
+    average_annual_turnover REAL,
+    total_costs REAL,
+    trades INTEGER
+)
+"""
+
+insert_record_into_backtest_results_query: str = """
+INSERT INTO backtest_results (timestamp, strategy, parameters, tickers, benchmark, start_date, end_date, fill, commission_bps, slippage_bps, total_return, annualized_return, annualized_volatility, sharpe_ratio, beta, log_returns_alpha, correlation, max_drawdown, calmar_ratio, average_annual_turnover, total_costs, trades)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+backtest_equity_curves_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS backtest_equity_curves (
+    backtest_id INTEGER NOT NULL REFERENCES backtest_results (id),
+    timestamp INTEGER NOT NULL,
+    equity REAL NOT NULL,
+    turnover REAL NOT NULL,
+    costs REAL NOT NULL,
+    PRIMARY KEY (backtest_id, timestamp)
+)
+"""
+
+insert_into_backtest_equity_curves_query: str = """
+INSERT INTO backtest_equity_curves (backtest_id, timestamp, equity, turnover, costs) VALUES (?, ?, ?, ?, ?)
+"""
+
+get_backtest_equity_curve_query: str = """
+SELECT timestamp, equity, turnover, costs FROM backtest_equity_curves WHERE backtest_id = ? ORDER BY timestamp ASC
+"""
+
+parameter_sweep_results_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS parameter_sweep_results (
+    sweep_id TEXT NOT NULL,
+    parameters_key TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    elapsed_seconds REAL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (sweep_id, parameters_key)
+)
+"""
+
+insert_or_replace_parameter_sweep_result_query: str = """
+INSERT OR REPLACE INTO parameter_sweep_results (sweep_id, parameters_key, parameters, metrics, elapsed_seconds, created_at) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+get_parameter_sweep_results_query: str = """
+SELECT parameters_key, parameters, metrics FROM parameter_sweep_results WHERE sweep_id = ? ORDER BY created_at ASC
+"""
+
+walk_forward_results_table_creation_query: str = """
+CREATE TABLE IF NOT EXISTS walk_forward_results (
+    walk_forward_id TEXT NOT NULL,
+    fold INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    train_start INTEGER NOT NULL,
+    train_end INTEGER NOT NULL,
+    test_start INTEGER NOT NULL,
+    test_end INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (walk_forward_id, fold, subject)
+)
+"""
+
+insert_or_replace_walk_forward_result_query: str = """
+INSERT OR REPLACE INTO walk_forward_results (walk_forward_id, fold, subject, train_start, train_end, test_start, test_end, metrics, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+get_walk_forward_results_query: str = """
+SELECT fold, subject, train_start, train_end, test_start, test_end, metrics FROM walk_forward_results WHERE walk_forward_id = ? ORDER BY fold ASC, subject ASC
+"""
@@ -1,17 +1,19 @@
 import pandas as pd
 import logging
 
-from typing import Dict, Any
+from typing import Dict, Any, Sequence
 from src.data_loader.data_loader import DataLoader
-from src.modules.analytics.returns_analyzer import (
-    calculate_log_returns,
-    calculate_cummulative_returns,
-    calculate_annualized_volatility,
-    calculate_beta,
-    calculate_log_return_alpha,
-    calculate_sharp_ratio, 
-    calculate_correlation_coefficient
+from src.modules.analytics.bootstrap_analyzer import bootstrap_pair_metrics
+from src.modules.analytics.drawdown_analyzer import calculate_drawdown_metrics, drawdown_summary
+from src.modules.analytics.metrics_kernel import (
+    BENCHMARK_LOG,
+    TICKER_LOG,
+    compute_cross_sectional_metrics,
+    derive_pair_metrics,
+    stack_return_series,
+    summarize_return_series
 )
+from src.modules.analytics.rolling_analyzer import calculate_rolling_metrics
 #from src.data_validator import DataValidator
 logger = logging.getLogger("analytics")
 
@@ -23,25 +25,84 @@ class AnalysisModule:
 
     def compute_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
-        Perform all the mathematical computations needed for the analysis
+        Perform all the mathematical computations needed for the analysis. The close prices are turned into simple and log
+        returns once, reduced to their sufficient statistics by the fused metrics kernel and every metric is derived from them.
+        The drawdown metrics of the ticker come from one running-max scan over both close columns. The input dataframe is not
+        modified
 
-        Returns - A dict object containing all the compute metrics from log returns to beta
+        Returns - A dict object containing all the compute metrics from log returns to beta and the ticker's drawdown metrics
         """
         logger.debug('Successfully entered the compute_metrics function')
-        df = df.dropna()
-        ticker_annualized_volatility, benchmark_annualized_volatility = calculate_annualized_volatility(df, 'ticker_close_returns', 'benchmark_close_returns')
+        prices = df[['ticker_close', 'benchmark_close']].dropna()
+        return_series = stack_return_series(prices['ticker_close'].to_numpy(), prices['benchmark_close'].to_numpy())
+        stats = summarize_return_series(return_series)
 
+        log_returns = pd.DataFrame(
+            {
+                'ticker_close_log_return': return_series[TICKER_LOG],
+                'benchmark_close_log_return': return_series[BENCHMARK_LOG],
+            },
+            index=prices.index[1:]
+        )
+
+        ticker_drawdown, benchmark_drawdown = (drawdown_summary(row) for _, row in calculate_drawdown_metrics(prices).iterrows())
         compute_metrics_dict = {
-            'log_returns': calculate_log_returns(df),
-            'cummulative_returns': calculate_cummulative_returns(df),
-            'ticker_annualized_volatility': ticker_annualized_volatility,
-            'benchmark_annualized_volatility': benchmark_annualized_volatility,
-            'beta': calculate_beta(df),
-            'log_returns_alpha': calculate_log_return_alpha(df),
-            'sharpe_ratio': calculate_sharp_ratio(df),
-            'correlation_coefficient': calculate_correlation_coefficient(df),
-            'sample_size': len(df)
+            'log_returns': log_returns,
+            **derive_pair_metrics(stats),
+            **ticker_drawdown,
+            'benchmark_max_drawdown': benchmark_drawdown['max_drawdown'],
         }
-        
+
         logger.info('\n The compute metrics dict is: \n %s', compute_metrics_dict)
-        return compute_metrics_dict 
\ No newline at end of file
+        return compute_metrics_dict
+
+    def compute_rolling_metrics(self, df: pd.DataFrame, windows: Sequence[int]) -> Dict[int, pd.DataFrame]:
+        """
+        Computes the time-varying metrics (rolling beta, alpha, correlation, volatility and Sharpe ratio) for every window length
+
+        Returns - A dict mapping each window length to a dataframe of rolling metrics indexed by the window end date
+        """
+        prices = df[['ticker_close', 'benchmark_close']].dropna()
+        rolling_metrics = calculate_rolling_metrics(
+            prices['ticker_close'].to_numpy(),
+            prices['benchmark_close'].to_numpy(),
+            windows=windows,
+            index=prices.index
+        )
+        logger.info('Rolling metrics computed for windows: %s', list(rolling_metrics))
+        return rolling_metrics
+
+    def compute_batch_metrics(self, asset_close: pd.DataFrame, benchmark_close: pd.Series) -> pd.DataFrame:
+        """
+        Computes beta, alpha, Sharpe ratio, volatility, correlation and the drawdown metrics for every column of a (T x N)
+        close price panel against one benchmark, as matrix operations over the whole panel
+
+        Returns - A dataframe with one row per ticker and one column per metric
+        """
+        metrics = compute_cross_sectional_metrics(asset_close.to_numpy(dtype=float), benchmark_close.to_numpy(dtype=float))
+        batch_metrics = pd.DataFrame(metrics, index=asset_close.columns).join(self.compute_drawdown_metrics(asset_close))
+        logger.info('Batch metrics computed for %d tickers', len(batch_metrics))
+        return batch_metrics
+
+    def compute_drawdown_metrics(self, prices: pd.DataFrame | pd.Series) -> pd.DataFrame:
+        """
+        Computes the drawdown metrics (max drawdown, durations, recovery, Calmar ratio, Ulcer index) of every column of a price
+        or NAV panel - single tickers, portfolios or whole universes - with vectorized running-max scans
+
+        Returns - A dataframe with one row per column of the prices and one column per drawdown metric
+        """
+        drawdown_metrics = calculate_drawdown_metrics(prices)
+        logger.info('Drawdown metrics computed for %d series', len(drawdown_metrics))
+        return drawdown_metrics
+
+    def compute_confidence_intervals(self, asset_close: pd.DataFrame | pd.Series, benchmark_close: pd.Series, **bootstrap_options: Any) -> pd.DataFrame:
+        """
+        Computes block or stationary bootstrap confidence intervals of the beta, alpha, Sharpe ratio, correlation and
+        volatilities of one or many tickers against the benchmark. See bootstrap_pair_metrics for the options (method,
+        resamples, block_length, confidence_level, seed, workers)
+
+        Returns - A long dataframe with the estimate, interval bounds and standard error of every ticker and metric
+        """
+        intervals = bootstrap_pair_metrics(asset_close, benchmark_close, **bootstrap_options)
+        logger.info('Bootstrap confidence intervals computed for %d tickers', intervals['ticker'].nunique())
+        return intervals
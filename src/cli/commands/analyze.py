@@ -22,7 +22,43 @@ def run_analyze(args: argparse.Namespace, flow_controller: FlowController | None
     input_ticker = args.ticker
     input_benchmark = args.benchmark if args.benchmark else 'NIFTY50_id.csv'
 
-    analysis_report = flow_controller.dispatch_analysis_request(input_ticker, input_benchmark, args.startDate, args.endDate)
+    if args.factors or args.customFactors:
+        regression = flow_controller.dispatch_factor_regression_request(
+            args.tickers or [input_ticker], args.factors, args.customFactors, args.startDate, args.endDate, risk_free_rate=args.riskFreeRate
+        )
+        factor_summary = regression.summary()
+        print(f'\n Factor regression results: \n{factor_summary}')
+        logger.debug('The factor regression results are: \n%s', factor_summary)
+        return {'factor_regression': factor_summary}
+
+    bootstrap_options = {
+        'method': args.bootstrapMethod,
+        'block_length': args.blockLength,
+        'confidence_level': args.confidenceLevel,
+        'seed': args.seed,
+        'workers': args.workers,
+    }
+
+    if args.tickers:
+        batch_metrics = flow_controller.dispatch_batch_analysis_request(
+            args.tickers, input_benchmark, args.startDate, args.endDate, bootstrap_resamples=args.bootstrapResamples, **bootstrap_options
+        )
+        print(f'\n Batch analysis results: \n{batch_metrics}')
+        logger.debug('The batch analysis results are: \n%s', batch_metrics)
+        return {'batch_metrics': batch_metrics}
+
+    if args.windows:
+        rolling_metrics = flow_controller.dispatch_rolling_analysis_request(input_ticker, input_benchmark, args.startDate, args.endDate, args.windows, persist=args.persist)
+        for window, metrics_df in rolling_metrics.items():
+            print(f'\n Rolling metrics ({window} day window): \n{metrics_df.tail()}')
+        logger.debug('The rolling metrics are: %s', rolling_metrics)
+        return {'rolling_metrics': rolling_metrics}
+
+    analysis_report = flow_controller.dispatch_analysis_request(
+        input_ticker, input_benchmark, args.startDate, args.endDate, bootstrap_resamples=args.bootstrapResamples, **bootstrap_options
+    )
+    if 'confidence_intervals' in analysis_report:
+        print(f'\n Bootstrap confidence intervals: \n{analysis_report["confidence_intervals"]}')
     logger.debug('The analysis report is: %s', analysis_report)
     
     return analysis_report
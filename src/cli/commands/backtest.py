@@ -0,0 +1,51 @@
+import argparse
+import logging
+import time
+from typing import Any, Dict
+
+from src.flow_controller import FlowController
+
+logger = logging.getLogger("cli")
+
+STRATEGY_PARAMETERS = {
+    'equal_weight': (),
+    'buy_and_hold': (),
+    'sma_crossover': ('fast', 'slow'),
+    'momentum': ('lookback', 'top'),
+}
+
+
+def run_backtest(args: argparse.Namespace, flow_controller: FlowController) -> Dict[str, Any]:
+    """
+    Runs the backtest command: simulates the strategy, prints its metrics and saves the run into the backtest_results table
+    Returns - the stored run record (settings, metrics and backtest_id)
+    """
+    logger.debug('Entered the run backtest function block!')
+    if args.startDate >= args.endDate:
+        raise ValueError('Start date must be earlier than end date')
+
+    rebalance: str | int = int(args.rebalance) if args.rebalance.isdigit() else args.rebalance
+    strategy_parameters = {name: getattr(args, name) for name in STRATEGY_PARAMETERS[args.strategy]}
+    started_at = time.perf_counter()
+    result, run = flow_controller.dispatch_backtest_request(
+        args.tickers,
+        args.benchmark,
+        args.startDate,
+        args.endDate,
+        args.strategy,
+        strategy_parameters,
+        rebalance=rebalance,
+        fill=args.fill,
+        commission_bps=args.commission,
+        slippage_bps=args.slippage,
+        initial_value=args.capital
+    )
+    elapsed = time.perf_counter() - started_at
+
+    print(f'\n Backtest {run["backtest_id"]} of {args.strategy} on {len(run["tickers"])} tickers over {len(result.equity)} days in {elapsed:.2f}s: \n')
+    print(f'final equity: {result.equity.iloc[-1]:.2f}')
+    for key, value in run.items():
+        if key not in ('timestamp', 'tickers', 'start_date', 'end_date', 'backtest_id'):
+            print(f'{key}: {value}')
+    logger.info('The backtest run is: %s', run)
+    return run
@@ -0,0 +1,55 @@
+import argparse
+import logging
+import time
+from typing import Any, Dict
+
+from src.cli.commands.simulate import build_convergence_target, print_convergence_trace
+from src.flow_controller import FlowController
+
+logger = logging.getLogger("cli")
+
+
+def run_montecarlo(args: argparse.Namespace, flow_controller: FlowController) -> Dict[str, Any]:
+    """
+    Runs the Monte Carlo price path simulation command
+    Returns - the summary statistics of the simulated paths
+    """
+    logger.debug('Entered the run montecarlo function block!')
+    if args.startDate >= args.endDate:
+        raise ValueError('Start date must be earlier than end date')
+
+    target = build_convergence_target(args, args.paths)
+    started_at = time.perf_counter()
+    if target is None:
+        statistics = flow_controller.dispatch_path_simulation_request(
+            args.ticker,
+            args.startDate,
+            args.endDate,
+            model=args.model,
+            steps=args.steps,
+            paths=args.paths,
+            seed=args.seed,
+            workers=args.workers,
+            memory_budget_mb=args.memoryBudget
+        )
+    else:
+        statistics, trace = flow_controller.dispatch_converged_path_simulation_request(
+            args.ticker,
+            args.startDate,
+            args.endDate,
+            target,
+            model=args.model,
+            steps=args.steps,
+            seed=args.seed,
+            workers=args.workers,
+            memory_budget_mb=args.memoryBudget
+        )
+        print_convergence_trace(trace)
+    elapsed = time.perf_counter() - started_at
+
+    summary = statistics.summary()
+    print(f'\n Monte Carlo simulation of {args.ticker} ({args.model}, {statistics.paths} paths x {args.steps} steps) in {elapsed:.2f}s: \n')
+    for key, value in summary.items():
+        print(f'{key}: {value}')
+    logger.info('The Monte Carlo summary is: %s', summary)
+    return summary
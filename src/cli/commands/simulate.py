@@ -1,18 +1,158 @@
 import argparse
 import logging
+import time
+from typing import Dict, List
 
-from src.modules.probability import display_distribution_table, display_multiple_dice_simulation_parameters
+from src.flow_controller import FlowController
+from src.modules.convergence import MIN_INITIAL_BATCH, ConvergenceTarget, ConvergenceTrace
+from src.modules.distribution_solver import (
+    exact_dice_sum_distribution,
+    exact_experiment_distribution,
+    simulation_error_report
+)
+from src.modules.event_simulator import (
+    MAX_INTEGER_OUTCOMES,
+    EventDistribution,
+    Stage,
+    coin_distribution,
+    experiment_histogram_edges,
+    load_distribution_spec,
+    parse_distribution_spec,
+    parse_stage_spec,
+    simulate_experiment,
+    simulate_experiment_until_converged
+)
+from src.modules.probability import (
+    build_frequency_table,
+    display_distribution_table,
+    display_multiple_dice_simulation_parameters,
+    simulate_dice_until_converged
+)
 
 logger = logging.getLogger("cli")
 
 
-def run_simulate(args: argparse.Namespace) -> None:
+def build_experiment_stages(args: argparse.Namespace) -> List[Stage]:
+    """
+    Builds the stages of a coin, custom or multi-stage experiment from the simulation arguments. Without -stages, the coin or
+    custom distribution is drawn once, or -dice times with -multi, and the draws are added up
+    Returns - the stages of the experiment
+    """
+    custom: EventDistribution | None = None
+    if args.distributionFile:
+        custom = load_distribution_spec(args.distributionFile)
+    elif args.distribution:
+        custom = parse_distribution_spec(args.distribution)
+    if args.stages:
+        return [parse_stage_spec(spec, custom) for spec in args.stages]
+
+    draws = args.diceNumber if args.multiDice else 1
+    if args.objectType == 'coin':
+        return [Stage(coin_distribution(args.headsProbability), draws)]
+    if custom is None:
+        raise ValueError('A custom simulation needs a distribution: -pmf value=weight ... or -spec <file>')
+    return [Stage(custom, draws)]
+
+
+def print_error_report(report: Dict[str, float]) -> None:
+    """Prints the simulation error against the exact distribution"""
+    print('\n Simulation error against the exact distribution: \n')
+    for key, value in report.items():
+        print(f'{key}: {value}')
+    logger.info('The simulation error report is: %s', report)
+
+
+def build_convergence_target(args: argparse.Namespace, initial_batch: int) -> ConvergenceTarget | None:
+    """
+    Builds the convergence target of the -targetse / -targetwidth options, shared by the simulation and montecarlo commands.
+    The first batch is the size of the fixed run, but at least MIN_INITIAL_BATCH samples
+    Returns - the ConvergenceTarget, None for a run of a fixed size
+    """
+    if args.targetStandardError is None and args.targetIntervalWidth is None:
+        return None
+    initial_batch = max(initial_batch, MIN_INITIAL_BATCH)
+    return ConvergenceTarget(
+        standard_error=args.targetStandardError,
+        interval_width=args.targetIntervalWidth,
+        confidence_level=args.confidenceLevel,
+        initial_batch=initial_batch,
+        max_samples=max(args.maxSamples, initial_batch)
+    )
+
+
+def print_convergence_trace(trace: ConvergenceTrace) -> None:
+    """Prints the estimate, standard error and elapsed time after every batch of a convergence run"""
+    print('\n Convergence trace: \n')
+    print(trace.trace.to_string(index=False))
+    if not trace.converged:
+        print('\n The target was not met before the maximum number of samples')
+    logger.info('The convergence summary is: %s', trace.summary())
+
+
+def run_simulate(args: argparse.Namespace, flow_controller: FlowController) -> None:
     object_type = args.objectType
     multi_dice = args.multiDice
     dice_number = args.diceNumber
     sides = args.diceTotalSides
     tries = args.totalTries
+    target = build_convergence_target(args, tries)
+    trace: ConvergenceTrace | None = None
 
-    dice_roll_frequency_results = display_multiple_dice_simulation_parameters(dice_number=dice_number, sides_per_dice=sides, total_rolls=tries)
-    display_distribution_table(dice_roll_frequency_results, multi_dice=multi_dice)
-    return
\ No newline at end of file
+    started_at = time.perf_counter()
+    if object_type == 'dice' and not args.stages:
+        if target is None:
+            dice_roll_frequency_results = display_multiple_dice_simulation_parameters(
+                dice_number=dice_number, sides_per_dice=sides, total_rolls=tries, chunk_size=args.chunkSize, seed=args.seed
+            )
+        else:
+            counts, trace = simulate_dice_until_converged(dice_number, sides, target, measure=args.convergenceMeasure, chunk_size=args.chunkSize, seed=args.seed)
+            dice_roll_frequency_results = build_frequency_table(counts, dice_number)
+            tries = int(counts.sum())
+        elapsed = time.perf_counter() - started_at
+        if args.exact:
+            exact = exact_dice_sum_distribution(dice_number, sides)
+            display_distribution_table(dice_roll_frequency_results, multi_dice=multi_dice, exact_probabilities=exact.as_dict())
+            outcomes = list(dice_roll_frequency_results)
+            print_error_report(simulation_error_report(exact, outcomes, [dice_roll_frequency_results[outcome][0] for outcome in outcomes]))
+        else:
+            display_distribution_table(dice_roll_frequency_results, multi_dice=multi_dice)
+    else:
+        stages = build_experiment_stages(args)
+        if args.exact and not experiment_histogram_edges(stages)[1]:
+            raise ValueError(
+                f'-exact needs integer outcomes spanning fewer than {MAX_INTEGER_OUTCOMES} values, the simulated histogram of this experiment is binned'
+            )
+        if target is None:
+            statistics = simulate_experiment(
+                stages,
+                tries,
+                chunk_size=args.chunkSize,
+                seed=args.seed,
+                workers=args.workers,
+                on_chunk=lambda running: logger.debug('%d trials simulated, running mean %s', running.trials, running.mean)
+            )
+        else:
+            statistics, trace = simulate_experiment_until_converged(
+                stages, target, measure=args.convergenceMeasure, chunk_size=args.chunkSize, seed=args.seed, workers=args.workers
+            )
+            tries = statistics.trials
+        elapsed = time.perf_counter() - started_at
+        table = statistics.distribution_table()
+        if args.exact:
+            exact = exact_experiment_distribution(stages)
+            exact_probabilities = exact.as_dict()
+            table['exact_probability'] = [exact_probabilities.get(outcome, 0.0) for outcome in table['outcome']]
+            table['error'] = table['probability'] - table['exact_probability']
+        print(f'\n Distribution table of the {object_type if not args.stages else "multi-stage"} experiment ({len(stages)} stages): \n')
+        print(table.to_string(index=False))
+        print()
+        for key, value in statistics.summary().items():
+            print(f'{key}: {value}')
+        if args.exact:
+            print_error_report(simulation_error_report(exact, table['outcome'], table['frequency']))
+    if trace is not None:
+        print_convergence_trace(trace)
+    unit = 'rolls' if object_type == 'dice' and not args.stages else 'trials'
+    print(f'\n Simulated {tries} {unit} in {elapsed:.2f}s ({tries / max(elapsed, 1e-9):,.0f} {unit} per second)')
+    logger.info('Simulated %d %s trials in %.2fs', tries, object_type, elapsed)
+    return
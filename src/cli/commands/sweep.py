@@ -0,0 +1,70 @@
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.flow_controller import FlowController
+
+logger = logging.getLogger("cli")
+
+
+def parse_parameter_value(text: str) -> Any:
+    """Returns - the value as an int or a float when it is a number, otherwise the text itself"""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            continue
+    return text
+
+
+def parse_parameter_values(spec: str) -> Tuple[str, List[Any]]:
+    """
+    Parses a swept parameter given as name=v1,v2,... or as an inclusive range name=start:stop:step
+
+    Returns - a tuple of (name, list of values)
+    """
+    name, separator, values = spec.partition('=')
+    if not separator or not name or not values:
+        raise ValueError(f'Parameters must look like name=v1,v2 or name=start:stop:step, got: {spec}')
+    if ':' in values:
+        start, stop, step = (parse_parameter_value(bound) for bound in (values.split(':') + ['1'])[:3])
+        return name, [parse_parameter_value(str(value)) for value in np.arange(start, stop + step / 2, step).tolist()]
+    return name, [parse_parameter_value(value) for value in values.split(',')]
+
+
+def run_sweep(args: argparse.Namespace, flow_controller: FlowController) -> pd.DataFrame:
+    """
+    Runs the parameter sweep command and prints the best parameter sets by the rank metric
+    Returns - the metrics of every parameter set
+    """
+    logger.debug('Entered the run sweep function block!')
+    if args.startDate >= args.endDate:
+        raise ValueError('Start date must be earlier than end date')
+
+    parameter_space = dict(parse_parameter_values(spec) for spec in args.parameters)
+    fixed_parameters: Dict[str, Any] = {name: values[0] for name, values in (parse_parameter_values(spec) for spec in args.fixedParameters)}
+    started_at = time.perf_counter()
+    results = flow_controller.dispatch_parameter_sweep_request(
+        args.tickers,
+        args.benchmark,
+        args.startDate,
+        args.endDate,
+        args.evaluator,
+        parameter_space,
+        fixed_parameters=fixed_parameters,
+        samples=args.samples,
+        seed=args.seed,
+        workers=args.workers,
+        sweep_id=args.sweepId
+    )
+    elapsed = time.perf_counter() - started_at
+
+    print(f'\n Sweep of {len(results)} {args.evaluator} parameter sets in {elapsed:.2f}s: \n')
+    ranked = results.sort_values(args.rankMetric, ascending=False) if args.rankMetric in results else results
+    print(ranked.head(20).to_string(index=False))
+    logger.info('The sweep results are: \n%s', ranked)
+    return results
@@ -0,0 +1,48 @@
+import argparse
+import logging
+from typing import Any, Dict
+
+import pandas as pd
+
+from src.cli.commands.sweep import parse_parameter_values
+from src.flow_controller import FlowController
+from src.modules.analytics.walk_forward import walk_forward_summary
+
+logger = logging.getLogger("cli")
+
+
+def run_walk_forward(args: argparse.Namespace, flow_controller: FlowController) -> pd.DataFrame:
+    """
+    Runs the walk-forward command, prints the per-fold report and the out-of-sample averages
+    Returns - the per-fold report
+    """
+    logger.debug('Entered the run walk forward function block!')
+    if args.startDate >= args.endDate:
+        raise ValueError('Start date must be earlier than end date')
+
+    parameter_space = dict(parse_parameter_values(spec) for spec in args.parameters)
+    fixed_parameters: Dict[str, Any] = {name: values[0] for name, values in (parse_parameter_values(spec) for spec in args.fixedParameters)}
+    report, walk_forward_id = flow_controller.dispatch_walk_forward_request(
+        args.tickers,
+        args.benchmark,
+        args.startDate,
+        args.endDate,
+        args.evaluation,
+        args.trainSize,
+        args.testSize,
+        step=args.step,
+        mode=args.mode,
+        gap=args.gap,
+        parameter_space=parameter_space,
+        fixed_parameters=fixed_parameters,
+        selection_metric=args.selectionMetric,
+        workers=args.workers
+    )
+
+    print(f'\n Walk-forward {args.evaluation} over {report["fold"].nunique()} {args.mode} folds (saved as {walk_forward_id}): \n')
+    print(report.to_string(index=False))
+    print('\n Out-of-sample averages: \n')
+    for metric, value in walk_forward_summary(report).items():
+        print(f'{metric}: {value:.4f}')
+    logger.info('The walk-forward report is: \n%s', report)
+    return report
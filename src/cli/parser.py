@@ -11,12 +11,25 @@ def build_parser() -> argparse.ArgumentParser:
 
     #Analyze
     analyze_parser = subparsers.add_parser("analyze", help="Analyze historical price data")
-    analyze_parser.add_argument("-ticker", '--ticker_element', help='The target symbol to perform analysis on', required=True, dest='ticker')
+    analyze_targets = analyze_parser.add_mutually_exclusive_group(required=True)
+    analyze_targets.add_argument("-ticker", '--ticker_element', help='The target symbol to perform analysis on', dest='ticker')
+    analyze_targets.add_argument("-tickers", '--ticker_list', help='Batch mode: several symbols analysed together against the benchmark', nargs='+', dest='tickers')
     analyze_parser.add_argument("-texchange", '--ticker_exchange', help='The exchange where the ticker is being traded', default="BSE", dest='tExchange')
     analyze_parser.add_argument("-benchmark", '--benchmrk_element', help='The benchmark element which the analysis is being performed against', default='NIFTY50_id.csv', dest='benchmark')
     analyze_parser.add_argument("-bexchange", '--benchmark_exchange', help = 'The the exchange from where this benchmark data is collected', default="NSE", dest='bExchange')
     analyze_parser.add_argument("-start", '--start_date', help = 'The start date for data collection and analysis', default='2025-09-01', dest='startDate')
     analyze_parser.add_argument("-end", '--end_date', help = 'The end date for data collection and analysis', default='2025-09-21', dest='endDate')
+    analyze_parser.add_argument("-windows", '--rolling_windows', help = 'Window lengths (in trading days) for rolling metrics, e.g. -windows 20 60', nargs='+', type=int, dest='windows')
+    analyze_parser.add_argument("-persist", '--persist_rolling', help = 'Save the rolling metrics into the rolling_analysis_results table', action='store_true', dest='persist')
+    analyze_parser.add_argument("-factors", '--factor_tickers', help = 'Factor regression: symbols used as factors (benchmark, sector indices), e.g. -factors NIFTY50 NIFTYIT', nargs='+', default=[], dest='factors')
+    analyze_parser.add_argument("-customfactors", '--custom_factors', help = 'Factor regression: custom factor series stored in the factor_data table', nargs='+', default=[], dest='customFactors')
+    analyze_parser.add_argument("-riskfree", '--risk_free_rate', help = 'Annualized risk-free rate of the factor regression', default=0.05, type=float, dest='riskFreeRate')
+    analyze_parser.add_argument("-bootstrap", '--bootstrap_resamples', help = 'Bootstrap the confidence intervals of the metrics with this many resamples, e.g. 1000 (0, the default, skips them)', default=0, type=int, dest='bootstrapResamples')
+    analyze_parser.add_argument("-bootmethod", '--bootstrap_method', help = 'Bootstrap scheme: stationary (random block lengths) or block (fixed length blocks)', choices=['stationary', 'block'], default='stationary', dest='bootstrapMethod')
+    analyze_parser.add_argument("-blocklength", '--block_length', help = 'The (mean) bootstrap block length in trading days, the cube root of the sample size by default', type=float, dest='blockLength')
+    analyze_parser.add_argument("-confidence", '--confidence_level', help = 'Confidence level of the bootstrap intervals', default=0.95, type=float, dest='confidenceLevel')
+    analyze_parser.add_argument("-seed", '--bootstrap_seed', help = 'Seed of the bootstrap resamples, for reproducible intervals', type=int, dest='seed')
+    analyze_parser.add_argument("-workers", '--bootstrap_workers', help = 'Number of worker processes for the bootstrap', default=1, type=int, dest='workers')
 
 
     #Download
@@ -35,6 +48,84 @@ def build_parser() -> argparse.ArgumentParser:
     parser_simulation.add_argument('-dice', '--dicenumber', default=2, type=int, dest='diceNumber', help='number of dice to be used in the sim')
     parser_simulation.add_argument('-sides', '--diceTotalSides', default=6, type=int, dest='diceTotalSides', help='Total sides of each dice')
     parser_simulation.add_argument('-tries', '-totalTries', default=10, type=int, dest='totalTries', help='The number of tries in the simulation')
+    parser_simulation.add_argument('-chunk', '--chunk', default=1_000_000, type=int, dest='chunkSize', help='Number of rolls simulated at once, bounds the memory used')
+    parser_simulation.add_argument('-seed', '--random_seed', default=None, type=int, dest='seed', help='Seed for reproducible runs')
+    parser_simulation.add_argument('-bias', '--heads_probability', default=0.5, type=float, dest='headsProbability', help='Probability of heads of the coin')
+    parser_simulation.add_argument('-pmf', '--distribution', nargs='+', default=[], dest='distribution', help='Custom distribution as value=weight (PMF) and low:high=weight (uniform PDF pieces), e.g. -pmf 1=0.2 2=0.3 5=0.5')
+    parser_simulation.add_argument('-spec', '--distribution_file', default=None, dest='distributionFile', help='File with the custom distribution: value=weight / low:high=weight tokens or value,weight / low,high,weight CSV lines')
+    parser_simulation.add_argument('-stages', '--experiment_stages', nargs='+', default=[], dest='stages', help='Multi-stage experiment as <draws>x<distribution> stages, e.g. -stages 1xdice6 prevxcoin (roll a die, then toss that many coins)')
+    parser_simulation.add_argument('-workers', '--total_workers', default=1, type=int, dest='workers', help='Number of worker processes simulating the chunks')
+    parser_simulation.add_argument('-exact', '--exact_distribution', action='store_true', dest='exact', help='Show the exact distribution (FFT convolution) and the simulation error next to the simulated one')
+    parser_simulation.add_argument('-targetse', '--target_standard_error', type=float, dest='targetStandardError', help='Run batches until the standard error is at most this (-tries is then the first batch, at least 1000)')
+    parser_simulation.add_argument('-targetwidth', '--target_interval_width', type=float, dest='targetIntervalWidth', help='Run batches until the confidence interval is at most this wide (-tries is then the first batch, at least 1000)')
+    parser_simulation.add_argument('-confidence', '--confidence_level', default=0.95, type=float, dest='confidenceLevel', help='Confidence level of the target interval width')
+    parser_simulation.add_argument('-maxtries', '--max_tries', default=1_000_000_000, type=int, dest='maxSamples', help='Stop a convergence run after this many tries even if the target is not met')
+    parser_simulation.add_argument('-converge', '--convergence_measure', choices=['mean', 'table'], default='table', dest='convergenceMeasure', help='The target applies to every probability of the table or to the mean outcome')
+
+    #montecarlo
+    parser_montecarlo = subparsers.add_parser('montecarlo', help='Monte Carlo stock price path simulation calibrated from the stored price data')
+    parser_montecarlo.add_argument('-ticker', '--ticker_element', help='The symbol whose price history calibrates the model', required=True, dest='ticker')
+    parser_montecarlo.add_argument('-model', '--path_model', help='Model of the daily log returns', choices=['gbm', 'merton', 'bootstrap'], default='gbm', dest='model')
+    parser_montecarlo.add_argument('-start', '--start_date', help='The start date of the calibration window', default='2025-01-01', dest='startDate')
+    parser_montecarlo.add_argument('-end', '--end_date', help='The end date of the calibration window', default='2025-09-21', dest='endDate')
+    parser_montecarlo.add_argument('-steps', '--total_steps', help='Number of daily steps of every path', default=252, type=int, dest='steps')
+    parser_montecarlo.add_argument('-paths', '--total_paths', help='Number of simulated paths', default=100_000, type=int, dest='paths')
+    parser_montecarlo.add_argument('-seed', '--random_seed', help='Seed for reproducible runs', default=None, type=int, dest='seed')
+    parser_montecarlo.add_argument('-workers', '--total_workers', help='Number of worker processes (defaults to every core)', default=None, type=int, dest='workers')
+    parser_montecarlo.add_argument('-memory', '--memory_budget', help='Memory budget in MB of one chunk of paths', default=64, type=float, dest='memoryBudget')
+    parser_montecarlo.add_argument('-targetse', '--target_standard_error', help='Run batches until the standard error of the mean terminal price is at most this (-paths is then the first batch, at least 1000)', type=float, dest='targetStandardError')
+    parser_montecarlo.add_argument('-targetwidth', '--target_interval_width', help='Run batches until the confidence interval of the mean terminal price is at most this wide', type=float, dest='targetIntervalWidth')
+    parser_montecarlo.add_argument('-confidence', '--confidence_level', help='Confidence level of the target interval width', default=0.95, type=float, dest='confidenceLevel')
+    parser_montecarlo.add_argument('-maxpaths', '--max_paths', help='Stop a convergence run after this many paths even if the target is not met', default=100_000_000, type=int, dest='maxSamples')
+
+    #backtest
+    parser_backtest = subparsers.add_parser('backtest', help='Backtest a trading strategy on the stored price data and save the results')
+    parser_backtest.add_argument('-tickers', '--ticker_list', help='The symbols the strategy trades', nargs='+', required=True, dest='tickers')
+    parser_backtest.add_argument('-benchmark', '--benchmark_element', help='The benchmark the equity curve is compared against', default='NIFTY50', dest='benchmark')
+    parser_backtest.add_argument('-strategy', '--strategy_name', help='The built-in strategy generating the signals', choices=['equal_weight', 'buy_and_hold', 'sma_crossover', 'momentum'], default='equal_weight', dest='strategy')
+    parser_backtest.add_argument('-start', '--start_date', help='The start date of the backtest', default='2025-01-01', dest='startDate')
+    parser_backtest.add_argument('-end', '--end_date', help='The end date of the backtest', default='2025-09-21', dest='endDate')
+    parser_backtest.add_argument('-fast', '--fast_window', help='sma_crossover: window of the fast moving average', default=20, type=int, dest='fast')
+    parser_backtest.add_argument('-slow', '--slow_window', help='sma_crossover: window of the slow moving average', default=100, type=int, dest='slow')
+    parser_backtest.add_argument('-lookback', '--lookback_window', help='momentum: window of the trailing returns', default=126, type=int, dest='lookback')
+    parser_backtest.add_argument('-top', '--top_assets', help='momentum: number of assets held', default=10, type=int, dest='top')
+    parser_backtest.add_argument('-rebalance', '--rebalance_frequency', help='daily, weekly, monthly, quarterly or a number of trading days', default='daily', dest='rebalance')
+    parser_backtest.add_argument('-fill', '--fill_price', help='Fill the orders at the same close or at the next open', choices=['close', 'next_open'], default='close', dest='fill')
+    parser_backtest.add_argument('-commission', '--commission_bps', help='Commission in basis points of the traded value', default=0.0, type=float, dest='commission')
+    parser_backtest.add_argument('-slippage', '--slippage_bps', help='Slippage in basis points of the traded value', default=0.0, type=float, dest='slippage')
+    parser_backtest.add_argument('-capital', '--initial_capital', help='Starting value of the portfolio', default=100_000.0, type=float, dest='capital')
+
+    #sweep
+    parser_sweep = subparsers.add_parser('sweep', help='Grid or random search over backtest / analysis parameters, resumable from the saved results')
+    parser_sweep.add_argument('-tickers', '--ticker_list', help='The symbols loaded into the shared price panel', nargs='+', required=True, dest='tickers')
+    parser_sweep.add_argument('-benchmark', '--benchmark_element', help='The benchmark of the metrics', default='NIFTY50', dest='benchmark')
+    parser_sweep.add_argument('-start', '--start_date', help='The start date of the price panel', default='2025-01-01', dest='startDate')
+    parser_sweep.add_argument('-end', '--end_date', help='The end date of the price panel', default='2025-09-21', dest='endDate')
+    parser_sweep.add_argument('-evaluator', '--sweep_evaluator', help='What every parameter set runs', choices=['backtest', 'rolling_metrics'], default='backtest', dest='evaluator')
+    parser_sweep.add_argument('-param', '--swept_parameter', help='A swept parameter as name=v1,v2,... or name=start:stop:step, e.g. -param lookback=20:120:20 top=5,10', nargs='+', required=True, dest='parameters')
+    parser_sweep.add_argument('-set', '--fixed_parameter', help='A parameter shared by every set as name=value, e.g. -set strategy=momentum commission_bps=5', nargs='+', default=[], dest='fixedParameters')
+    parser_sweep.add_argument('-random', '--random_samples', help='Random search over this many combinations instead of the full grid', type=int, dest='samples')
+    parser_sweep.add_argument('-seed', '--random_seed', help='Seed of the random search', type=int, dest='seed')
+    parser_sweep.add_argument('-workers', '--total_workers', help='Number of worker processes (defaults to every core)', type=int, dest='workers')
+    parser_sweep.add_argument('-sweepid', '--sweep_id', help='Name of the sweep in the parameter_sweep_results table (derived from the inputs by default)', dest='sweepId')
+    parser_sweep.add_argument('-rank', '--rank_metric', help='Metric the printed results are sorted by (descending)', default='sharpe_ratio', dest='rankMetric')
+
+    #walkforward
+    parser_walkforward = subparsers.add_parser('walkforward', help='Walk-forward evaluation over rolling or expanding train / test windows')
+    parser_walkforward.add_argument('-tickers', '--ticker_list', help='The symbols to evaluate', nargs='+', required=True, dest='tickers')
+    parser_walkforward.add_argument('-benchmark', '--benchmark_element', help='The benchmark of the metrics', default='NIFTY50', dest='benchmark')
+    parser_walkforward.add_argument('-start', '--start_date', help='The start date of the history', default='2025-01-01', dest='startDate')
+    parser_walkforward.add_argument('-end', '--end_date', help='The end date of the history', default='2025-09-21', dest='endDate')
+    parser_walkforward.add_argument('-evaluation', '--walk_forward_evaluation', help='pair_metrics: ticker vs benchmark metrics and the train beta hedge, strategy: parameter selection on every train window', choices=['pair_metrics', 'strategy'], default='pair_metrics', dest='evaluation')
+    parser_walkforward.add_argument('-mode', '--window_mode', help='Rolling train windows of fixed length or expanding ones from the first day', choices=['rolling', 'expanding'], default='rolling', dest='mode')
+    parser_walkforward.add_argument('-train', '--train_size', help='Daily returns in the (first) train window', type=int, default=120, dest='trainSize')
+    parser_walkforward.add_argument('-test', '--test_size', help='Daily returns in every test window', type=int, default=20, dest='testSize')
+    parser_walkforward.add_argument('-step', '--fold_step', help='Daily returns between consecutive folds (defaults to the test size)', type=int, dest='step')
+    parser_walkforward.add_argument('-gap', '--embargo_gap', help='Daily returns skipped between a train and its test window', type=int, default=0, dest='gap')
+    parser_walkforward.add_argument('-param', '--swept_parameter', help='A strategy parameter selected on every train window, as name=v1,v2,... or name=start:stop:step', nargs='+', default=[], dest='parameters')
+    parser_walkforward.add_argument('-set', '--fixed_parameter', help='A strategy parameter shared by every set as name=value, e.g. -set strategy=momentum', nargs='+', default=[], dest='fixedParameters')
+    parser_walkforward.add_argument('-select', '--selection_metric', help='Metric the parameters are selected by on the train windows', choices=['sharpe_ratio', 'log_returns_alpha', 'ticker_cummulative_return'], default='sharpe_ratio', dest='selectionMetric')
+    parser_walkforward.add_argument('-workers', '--total_workers', help='Number of worker processes backtesting the parameter sets (defaults to every core)', type=int, dest='workers')
 
     #validate
     parser_validator = subparsers.add_parser('validate', help='Helps validate data to be used')
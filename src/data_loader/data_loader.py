@@ -1,8 +1,9 @@
+import json
 import logging
 import sqlite3
 from datetime import datetime, timezone
 from sqlite3 import Connection
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
 from zoneinfo import ZoneInfo
 
 import numpy as np
@@ -31,7 +32,38 @@ from db.db_queries import (
     check_if_db_is_empty_query, 
     temp_price_staging_table_creation_query, 
     execute_upsert_from_staging_to_main_in_price_data_table_query,
-    drop_staging_table_for_cleanup_query
+    drop_staging_table_for_cleanup_query,
+    validation_cache_table_creation_query,
+    get_validation_cache_entry_query,
+    insert_or_replace_validation_cache_entry_query,
+    get_system_config_value_query,
+    insert_or_replace_system_config_value_query,
+    rolling_analysis_results_table_creation_query,
+    insert_or_replace_rolling_analysis_results_query,
+    get_rolling_analysis_results_query,
+    get_historical_data_for_multiple_tickers_query,
+    get_price_data_version_query,
+    covariance_cache_table_creation_query,
+    get_covariance_cache_entry_query,
+    insert_or_replace_covariance_cache_entry_query,
+    get_analysis_results_columns_query,
+    add_drawdown_columns_to_analysis_results_queries,
+    factor_data_table_creation_query,
+    insert_or_replace_factor_data_query,
+    get_factor_data_for_multiple_factors_query,
+    analysis_confidence_intervals_table_creation_query,
+    insert_or_replace_analysis_confidence_interval_query,
+    backtest_results_table_creation_query,
+    insert_record_into_backtest_results_query,
+    backtest_equity_curves_table_creation_query,
+    insert_into_backtest_equity_curves_query,
+    get_backtest_equity_curve_query,
+    parameter_sweep_results_table_creation_query,
+    insert_or_replace_parameter_sweep_result_query,
+    get_parameter_sweep_results_query,
+    walk_forward_results_table_creation_query,
+    insert_or_replace_walk_forward_result_query,
+    get_walk_forward_results_query
 )
 from src.quant_enums import Circuit_State, LogLevel
 #from scripts.hydrate_db import hydrate_environment
@@ -82,6 +114,19 @@ class DataLoader:
                 cursor.execute(validation_log_table_creation_query)
                 cursor.execute(system_config_table_creation_query)
                 cursor.execute(analysis_results_table_creation_query)
+                existing_analysis_columns = {row[0] for row in cursor.execute(get_analysis_results_columns_query).fetchall()}
+                for column, add_column_query in add_drawdown_columns_to_analysis_results_queries.items():
+                    if column not in existing_analysis_columns:
+                        cursor.execute(add_column_query)
+                cursor.execute(validation_cache_table_creation_query)
+                cursor.execute(rolling_analysis_results_table_creation_query)
+                cursor.execute(covariance_cache_table_creation_query)
+                cursor.execute(factor_data_table_creation_query)
+                cursor.execute(analysis_confidence_intervals_table_creation_query)
+                cursor.execute(backtest_results_table_creation_query)
+                cursor.execute(backtest_equity_curves_table_creation_query)
+                cursor.execute(parameter_sweep_results_table_creation_query)
+                cursor.execute(walk_forward_results_table_creation_query)
         except sqlite3.Error as e:
             logger.debug("An error occured: %s", e)
             raise
@@ -221,6 +266,145 @@ class DataLoader:
             logger.exception('DB error while fetching historical data from the database')
             raise RuntimeError('DB error while fetching from price_data table') from e
         
+    def iter_historical_data(
+        self, ticker: str, start_ts: int, end_ts: int, chunk_rows: int = 100_000
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Streams the rows of get_historical_data in time ordered chunks of at most chunk_rows rows, so that long (minute level
+        or multi-decade) histories never have to be held in memory at once
+
+        Returns: an iterator over DataFrames indexed by a UTC DatetimeIndex
+        """
+        conn = self.prod_db_connection
+        try:
+            for chunk in pd.read_sql_query(
+                sql=get_historical_data_query, con=conn, params=(ticker, start_ts, end_ts), chunksize=chunk_rows
+            ):
+                chunk['timestamp'] = pd.to_datetime(chunk['timestamp'], unit='s', utc=True)
+                yield chunk.set_index('timestamp')
+        except sqlite3.Error as e:
+            logger.exception('DB error while streaming historical data from the database')
+            raise RuntimeError('DB error while fetching from price_data table') from e
+
+    def get_price_panel(
+        self, tickers: Sequence[str], start_ts: int, end_ts: int, column: str = "close"
+    ) -> pd.DataFrame:
+        """
+        Loads one price column for many tickers with a single query and pivots it into a (T x N) panel
+
+        Returns: a Pandas DataFrame indexed by a UTC DatetimeIndex with one column per requested ticker (in the requested
+        order). Timestamps missing for a ticker are NaN and tickers without any data are all-NaN columns
+        """
+        if column not in ("open", "close", "high", "low", "volume"):
+            raise ValueError(f"Unknown price column: {column}")
+        conn = self.prod_db_connection
+        try:
+            long_dataframe = pd.read_sql_query(
+                sql=get_historical_data_for_multiple_tickers_query,
+                con=conn,
+                params=(json.dumps(list(tickers)), start_ts, end_ts),
+            )
+        except sqlite3.Error as e:
+            logger.exception('DB error while fetching the price panel from the database')
+            raise RuntimeError('DB error while fetching from price_data table') from e
+
+        if long_dataframe.empty:
+            logger.info("No data found for %s between %s and %s", list(tickers), start_ts, end_ts)
+            return pd.DataFrame(columns=list(tickers), index=pd.DatetimeIndex([], tz="UTC"), dtype=np.float64)
+
+        long_dataframe['timestamp'] = pd.to_datetime(long_dataframe['timestamp'], unit='s', utc=True)
+        price_panel = long_dataframe.pivot(index='timestamp', columns='ticker', values=column)
+        price_panel = price_panel.reindex(columns=list(tickers)).astype(np.float64)
+        price_panel.columns.name = None
+        return price_panel
+
+    def get_price_data_version(self, tickers: Sequence[str], start_ts: int, end_ts: int) -> str:
+        """
+        Summarizes the stored price data of the tickers in a date range (row count, latest timestamp and sum of closes). Any
+        insert or correction of those rows changes the summary, so it serves as the data version for derived caches
+
+        Returns - the data version string
+        """
+        cursor = self.prod_db_connection.cursor()
+        cursor.execute(get_price_data_version_query, (json.dumps(list(tickers)), start_ts, end_ts))
+        row_count, latest_timestamp, close_total = cursor.fetchone()
+        return f"{row_count}:{latest_timestamp}:{close_total!r}"
+
+    def get_cached_covariance_matrix(self, cache_key: str) -> bytes | None:
+        """
+        Looks up a serialized covariance matrix in the covariance_cache table
+
+        Returns - the stored bytes if the cache key exists, else None
+        """
+        cursor = self.prod_db_connection.cursor()
+        cursor.execute(get_covariance_cache_entry_query, (cache_key,))
+        row = cursor.fetchone()
+        return None if row is None else bytes(row[0])
+
+    def save_covariance_matrix(
+        self, cache_key: str, tickers: Sequence[str], start_ts: int, end_ts: int, data_version: str, matrix: bytes
+    ) -> None:
+        """
+        Stores a serialized covariance matrix in the covariance_cache table
+        """
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.execute(
+                    insert_or_replace_covariance_cache_entry_query,
+                    (cache_key, json.dumps(list(tickers)), start_ts, end_ts, data_version, matrix, created_at),
+                )
+        except sqlite3.Error as e:
+            logger.debug("An error occured while saving the covariance cache entry: %s", e)
+            raise
+        return
+
+    def insert_factor_data(self, factor: str, values: pd.Series) -> int:
+        """
+        Stores a custom factor series (periodic factor returns indexed by timestamp) in the factor_data table. Existing values
+        of the factor at the same timestamps are replaced
+
+        Returns - the number of rows written
+        """
+        values = values.dropna()
+        unix_timestamps = pd.to_datetime(values.index, utc=True).as_unit("s").astype("int64")
+        records = [(factor, int(timestamp), float(value)) for timestamp, value in zip(unix_timestamps, values.to_numpy(dtype=np.float64))]
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.executemany(insert_or_replace_factor_data_query, records)
+        except sqlite3.Error as e:
+            logger.debug("An error occured while saving the factor data: %s", e)
+            raise
+        logger.info('%d values of factor %s saved into factor_data table', len(records), factor)
+        return len(records)
+
+    def get_factor_panel(self, factors: Sequence[str], start_ts: int, end_ts: int) -> pd.DataFrame:
+        """
+        Loads custom factor series from the factor_data table with a single query and pivots them into a (T x K) panel
+
+        Returns: a Pandas DataFrame indexed by a UTC DatetimeIndex with one column per requested factor (in the requested order)
+        """
+        conn = self.prod_db_connection
+        try:
+            long_dataframe = pd.read_sql_query(
+                sql=get_factor_data_for_multiple_factors_query,
+                con=conn,
+                params=(json.dumps(list(factors)), start_ts, end_ts),
+            )
+        except sqlite3.Error as e:
+            logger.exception('DB error while fetching the factor panel from the database')
+            raise RuntimeError('DB error while fetching from factor_data table') from e
+
+        if long_dataframe.empty:
+            return pd.DataFrame(columns=list(factors), index=pd.DatetimeIndex([], tz="UTC"), dtype=np.float64)
+        long_dataframe['timestamp'] = pd.to_datetime(long_dataframe['timestamp'], unit='s', utc=True)
+        factor_panel = long_dataframe.pivot(index='timestamp', columns='factor', values='value')
+        factor_panel = factor_panel.reindex(columns=list(factors)).astype(np.float64)
+        factor_panel.columns.name = None
+        return factor_panel
+
     def insert_daily_data(self, ticker: str, df: pd.DataFrame) -> None:
         """
         Primary data storage method
@@ -233,7 +417,7 @@ class DataLoader:
         self.ensure_symbol_exists(ticker)
         df_to_insert = df.copy()
         ts_index = pd.to_datetime(df_to_insert.index, utc=True)
-        df_to_insert["timestamp"] = ts_index.astype('int64') // 10**9
+        df_to_insert["timestamp"] = ts_index.as_unit("s").astype("int64")
         
         df_to_insert['ticker'] = ticker
         cols = ["ticker", "timestamp", "open", "close", "high", "low", "volume"]
@@ -245,7 +429,7 @@ class DataLoader:
                 conn.execute(execute_upsert_from_staging_to_main_in_price_data_table_query)
                 conn.execute(drop_staging_table_for_cleanup_query)
 
-            logger.info("Successfully upserted %d  rows for %s", {len(df_to_insert)}, ticker)
+            logger.info("Successfully upserted %d rows for %s", len(df_to_insert), ticker)
         except sqlite3.Error as e:
             logger.error("Database insertion failed: %s", e)
             raise ValueError("Integrity error during db insertion")
@@ -326,6 +510,104 @@ class DataLoader:
             )
         return
 
+    def insert_validation_issues(
+        self, ticker: str, issues: Sequence[Tuple[Any, str, str]]
+    ) -> None:
+        """
+        Bulk variant of insert_validation_issue. Writes every (date, issue_type, description) tuple for the ticker
+        into the validation_log table in a single executemany call
+        """
+        if not issues:
+            return
+        conn = self.prod_db_connection
+        records = [(ticker, date, issue_type, description) for date, issue_type, description in issues]
+        try:
+            conn.executemany(insert_triggered_indices_in_validation_log_query, records)
+        except sqlite3.Error as e:
+            logger.debug("An error has occured: %s", e)
+            raise
+        else:
+            logger.info(
+                "%d data quality failures have been successfully inserted in the validation_log table", len(records)
+            )
+        return
+
+    def get_cached_validation_result(
+        self, cache_key: str
+    ) -> Tuple[Dict[str, int], List[Tuple[Any, str, str]]] | None:
+        """
+        Looks up a previously stored validation report in the validation_cache table
+
+        Returns - a tuple of (report dict, list of logged issues) if the cache key exists, else None
+        """
+        cursor = self.prod_db_connection.cursor()
+        cursor.execute(get_validation_cache_entry_query, (cache_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        gap_number, outlier_number, stale_data_number, issues_json = row
+        report = {
+            'gap_number': int(gap_number),
+            'outlier_number': int(outlier_number),
+            'stale_data_number': int(stale_data_number)
+        }
+        issues = [(date, issue_type, description) for date, issue_type, description in json.loads(issues_json)]
+        return report, issues
+
+    def save_validation_result(
+        self,
+        cache_key: str,
+        ticker: str,
+        rules_version: int,
+        report: Dict[str, int],
+        issues: Sequence[Tuple[Any, str, str]],
+    ) -> None:
+        """
+        Stores a validation report together with the issues it logged, so an identical validation request can be
+        answered from the validation_cache table without re-running the checks
+        """
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.execute(
+                    insert_or_replace_validation_cache_entry_query,
+                    (
+                        cache_key,
+                        ticker,
+                        rules_version,
+                        report['gap_number'],
+                        report['outlier_number'],
+                        report['stale_data_number'],
+                        json.dumps([list(issue) for issue in issues]),
+                        created_at,
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.debug("An error occured while saving the validation cache entry: %s", e)
+            raise
+        return
+
+    def get_config_value(self, key: str) -> str | None:
+        """
+        Fetches a single value from the system_config table
+
+        Returns - the stored value or None if the key does not exist
+        """
+        cursor = self.prod_db_connection.cursor()
+        cursor.execute(get_system_config_value_query, (key,))
+        row = cursor.fetchone()
+        return None if row is None else str(row[0])
+
+    def set_config_value(self, key: str, value: str, description: str | None = None) -> None:
+        """
+        Inserts or replaces a single key-value pair in the system_config table
+        """
+        conn = self.prod_db_connection
+        with conn:
+            conn.execute(insert_or_replace_system_config_value_query, (key, value, description))
+        return
+
     def insert_asset_metadata(self, ticker: str, data: Dict[str, Any]) -> None:
         """
         Used to insert or update a record in the symbols table
@@ -378,35 +660,45 @@ class DataLoader:
         cursor.execute(delete_validation_log, (ticker,))
         return
 
-    def save_analysis_results(self, results_payload: Dict[str, int]) -> None:
+    @staticmethod
+    def _analysis_result_record(payload: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Orders a results payload into the columns of insert_record_into_analysis_results_table. Values are looked up by key,
+        so the order in which the payload was built does not matter. Drawdown metrics missing from the payload are stored as NULL
+        """
+        return (
+            payload['timestamp'],
+            payload['ticker'],
+            payload['benchmark'],
+            payload['start_date'],
+            payload['end_date'],
+            payload['log_returns_alpha'],
+            payload['beta'],
+            payload['sharpe_ratio'],
+            payload['ticker_volatility'],
+            payload['benchmark_volatility'],
+            payload['correlation'],
+            payload['data_quality_score'],
+            payload.get('max_drawdown'),
+            payload.get('max_drawdown_duration'),
+            payload.get('time_to_recovery'),
+            payload.get('calmar_ratio'),
+            payload.get('ulcer_index'),
+        )
+
+    def save_analysis_results(self, results_payload: Dict[str, Any]) -> None:
         """
         Logs the Analysis results to the analysis_results table in the db
 
         Args: a results payload dict object containing the results of analysis
         """
         conn = self.prod_db_connection
-        timestamp, ticker, benchmark, start_date, end_date, alpha, beta, sharpe_ratio, ticker_volatility, benchmark_volatility, correlation, data_quality_score = results_payload.values()
-        logger.debug('The values: \n timestamp: %d, ticker: %s, benchmark: %s, start_date: %d, end_date: %d, alpha: %s, beta: %s, sharpe_ratio: %s, ticker_volatility: %s, benchmark_volatility: %s, correlation: %s, data_quality_score: %s', timestamp, ticker, benchmark, start_date, end_date, alpha, beta, sharpe_ratio, ticker_volatility, benchmark_volatility, correlation, data_quality_score)
+        record = self._analysis_result_record(results_payload)
+        logger.debug('The analysis_results record is: %s', record)
         try:
             cursor = conn.cursor()
             with conn:
-                cursor.execute(
-                insert_record_into_analysis_results_table,
-                (
-                    timestamp,
-                    ticker,
-                    benchmark,
-                    start_date,
-                    end_date,
-                    alpha,
-                    beta,
-                    sharpe_ratio,
-                    ticker_volatility,
-                    benchmark_volatility,
-                    correlation,
-                    data_quality_score,
-                ),
-            )
+                cursor.execute(insert_record_into_analysis_results_table, record)
         except sqlite3.Error as e:
             logger.debug('An error occured: %s', e)
             raise InterruptedError('Transaction Interrupted error!')
@@ -418,6 +710,244 @@ class DataLoader:
         
         return
     
+    def save_analysis_results_bulk(self, results_payloads: Sequence[Dict[str, Any]]) -> int:
+        """
+        Logs many analysis results to the analysis_results table with a single executemany call inside one transaction
+
+        Args: a sequence of results payload dicts with the same keys as the payload of save_analysis_results
+
+        Returns - the number of rows inserted
+        """
+        records = [self._analysis_result_record(payload) for payload in results_payloads]
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.executemany(insert_record_into_analysis_results_table, records)
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+        logger.info('%d results payloads successfully inserted into analysis_results table.', len(records))
+        return len(records)
+
+    def save_analysis_confidence_intervals(
+        self, analysis_key: Dict[str, Any], intervals: pd.DataFrame, method: str, confidence_level: float, resamples: int, block_length: float | None
+    ) -> int:
+        """
+        Stores the bootstrap confidence intervals of analyses next to the analysis_results table. The rows are keyed by the
+        analysis timestamp, benchmark and date range of analysis_key and by the ticker and metric of every interval
+
+        Args:
+        analysis_key - a results payload (or any dict) holding the timestamp, benchmark, start_date and end_date of the analysis
+        intervals - a bootstrap_pair_metrics report (ticker, metric, estimate, lower, upper, standard_error)
+
+        Returns - the number of rows written
+        """
+        values = intervals[['estimate', 'lower', 'upper', 'standard_error']].to_numpy(dtype=np.float64)
+        records = [
+            (
+                analysis_key['timestamp'],
+                str(ticker),
+                analysis_key['benchmark'],
+                analysis_key['start_date'],
+                analysis_key['end_date'],
+                str(metric),
+                method,
+                confidence_level,
+                resamples,
+                block_length,
+                *(None if np.isnan(value) else float(value) for value in row_values),
+            )
+            for ticker, metric, row_values in zip(intervals['ticker'], intervals['metric'], values)
+        ]
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.executemany(insert_or_replace_analysis_confidence_interval_query, records)
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+        logger.info('%d confidence intervals inserted into analysis_confidence_intervals table.', len(records))
+        return len(records)
+
+    def save_backtest_result(self, run: Dict[str, Any], equity: pd.Series, turnover: pd.Series, costs: pd.Series) -> int:
+        """
+        Stores one backtest run - its settings and summary metrics in the backtest_results table and its equity curve in the
+        backtest_equity_curves table - inside one transaction
+
+        Args:
+        run - the timestamp, strategy, parameters (dict), tickers (list), benchmark, start_date, end_date, fill, commission_bps and
+        slippage_bps of the run plus its BacktestResult.summary metrics
+        equity / turnover / costs - the per-row series of the run, indexed by a UTC DatetimeIndex
+
+        Returns - the id of the stored run
+        """
+        metric_keys = (
+            'total_return', 'annualized_return', 'annualized_volatility', 'sharpe_ratio', 'beta', 'log_returns_alpha',
+            'correlation_coefficient', 'max_drawdown', 'calmar_ratio', 'average_annual_turnover', 'total_costs',
+        )
+        record = (
+            run['timestamp'],
+            run['strategy'],
+            json.dumps(run['parameters'], sort_keys=True),
+            json.dumps(list(run['tickers'])),
+            run['benchmark'],
+            run['start_date'],
+            run['end_date'],
+            run['fill'],
+            run['commission_bps'],
+            run['slippage_bps'],
+            *(None if pd.isna(run[key]) else float(run[key]) for key in metric_keys),
+            int(run['trades']),
+        )
+        timestamps = pd.to_datetime(equity.index, utc=True).to_numpy(dtype="datetime64[s]").astype(np.int64).tolist()
+        curve = zip(timestamps, equity.to_numpy(dtype=np.float64).tolist(), turnover.to_numpy(dtype=np.float64).tolist(), costs.to_numpy(dtype=np.float64).tolist())
+
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                cursor = conn.execute(insert_record_into_backtest_results_query, record)
+                backtest_id = int(cursor.lastrowid or 0)
+                conn.executemany(insert_into_backtest_equity_curves_query, [(backtest_id, *row) for row in curve])
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+        logger.info('Backtest %d of the %s strategy saved with %d equity curve rows', backtest_id, run['strategy'], len(timestamps))
+        return backtest_id
+
+    def get_backtest_equity_curve(self, backtest_id: int) -> pd.DataFrame:
+        """
+        Fetches the stored equity curve of a backtest run
+
+        Returns - a Pandas DataFrame with the equity, turnover and costs columns, indexed by a UTC DatetimeIndex
+        """
+        equity_curve = pd.read_sql_query(sql=get_backtest_equity_curve_query, con=self.prod_db_connection, params=(backtest_id,))
+        equity_curve['timestamp'] = pd.to_datetime(equity_curve['timestamp'], unit='s', utc=True)
+        return equity_curve.set_index('timestamp')
+
+    def save_parameter_sweep_result(
+        self, sweep_id: str, parameters_key: str, parameters: Dict[str, Any], metrics: Dict[str, float], elapsed_seconds: float
+    ) -> None:
+        """
+        Stores the metrics of one evaluated parameter set of a sweep, committed on its own so that every finished evaluation
+        survives an interrupted sweep. Re-evaluating the same parameters_key replaces the row
+        """
+        record = (
+            sweep_id,
+            parameters_key,
+            json.dumps(parameters, sort_keys=True),
+            json.dumps(metrics),
+            elapsed_seconds,
+            int(datetime.now(timezone.utc).timestamp()),
+        )
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.execute(insert_or_replace_parameter_sweep_result_query, record)
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+    def get_parameter_sweep_results(self, sweep_id: str) -> Dict[str, Tuple[Dict[str, Any], Dict[str, float]]]:
+        """
+        Fetches the parameter sets of a sweep that were already evaluated
+
+        Returns - a dict mapping every parameters_key to its (parameters, metrics) pair
+        """
+        rows = self.prod_db_connection.execute(get_parameter_sweep_results_query, (sweep_id,)).fetchall()
+        return {parameters_key: (json.loads(parameters), json.loads(metrics)) for parameters_key, parameters, metrics in rows}
+
+    def save_walk_forward_results(self, walk_forward_id: str, report: pd.DataFrame, subject_column: str) -> int:
+        """
+        Persists a per-fold walk-forward report: one row per fold and subject (a ticker, or the selected parameters) with the
+        fold dates and every numeric metric column as JSON. Saving the same walk_forward_id again replaces its folds
+
+        Returns - the number of rows written
+        """
+        date_columns = ['train_start', 'train_end', 'test_start', 'test_end']
+        metric_columns = [column for column in report.columns if column not in {'fold', subject_column, *date_columns} and pd.api.types.is_numeric_dtype(report[column])]
+        dates = {column: pd.to_datetime(report[column], utc=True).to_numpy(dtype="datetime64[s]").astype(np.int64).tolist() for column in date_columns}
+        metric_values = report[metric_columns].to_numpy(dtype=np.float64)
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        records = [
+            (
+                walk_forward_id,
+                int(fold),
+                str(subject),
+                *(dates[column][row] for column in date_columns),
+                json.dumps({metric: None if np.isnan(value) else float(value) for metric, value in zip(metric_columns, metric_values[row])}),
+                created_at,
+            )
+            for row, (fold, subject) in enumerate(zip(report['fold'], report[subject_column]))
+        ]
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.executemany(insert_or_replace_walk_forward_result_query, records)
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+        logger.info('Walk-forward %s saved with %d fold rows', walk_forward_id, len(records))
+        return len(records)
+
+    def get_walk_forward_results(self, walk_forward_id: str) -> pd.DataFrame:
+        """
+        Fetches a stored walk-forward report
+
+        Returns - a Pandas DataFrame with one row per fold and subject: the UTC fold dates followed by the metrics
+        """
+        rows = self.prod_db_connection.execute(get_walk_forward_results_query, (walk_forward_id,)).fetchall()
+        folds = pd.DataFrame([row[:-1] for row in rows], columns=['fold', 'subject', 'train_start', 'train_end', 'test_start', 'test_end'])
+        for column in ('train_start', 'train_end', 'test_start', 'test_end'):
+            folds[column] = pd.to_datetime(folds[column], unit='s', utc=True)
+        metrics = pd.DataFrame([json.loads(row[-1]) for row in rows], dtype=np.float64)
+        return pd.concat([folds, metrics], axis=1)
+
+    def save_rolling_analysis_results(self, ticker: str, benchmark: str, rolling_metrics: Dict[int, pd.DataFrame]) -> int:
+        """
+        Persists rolling-window metrics next to the analysis_results table. Rows for the same ticker, benchmark, window and
+        timestamp are replaced, so re-running an analysis over an overlapping period does not create duplicates
+
+        Returns - the number of rows written
+        """
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        records = []
+        for window, metrics_df in rolling_metrics.items():
+            if metrics_df.empty:
+                continue
+            timestamps = pd.to_datetime(metrics_df.index, utc=True).to_numpy(dtype="datetime64[s]").astype(np.int64)
+            values = metrics_df[["beta", "alpha", "correlation", "ticker_volatility", "benchmark_volatility", "sharpe_ratio"]].to_numpy(dtype=np.float64)
+            for timestamp, row in zip(timestamps.tolist(), values.tolist()):
+                records.append((ticker, benchmark, int(window), timestamp, *[None if np.isnan(v) else v for v in row], created_at))
+
+        conn = self.prod_db_connection
+        try:
+            with conn:
+                conn.executemany(insert_or_replace_rolling_analysis_results_query, records)
+        except sqlite3.Error as e:
+            logger.debug('An error occured: %s', e)
+            raise InterruptedError('Transaction Interrupted error!')
+
+        logger.info('%d rolling metric rows saved for %s against %s', len(records), ticker, benchmark)
+        return len(records)
+
+    def get_rolling_analysis_results(self, ticker: str, benchmark: str, window: int, start_ts: int, end_ts: int) -> pd.DataFrame:
+        """
+        Fetches persisted rolling-window metrics for one ticker, benchmark and window length
+
+        Returns - a Pandas DataFrame indexed by a UTC DatetimeIndex (empty if nothing was stored for that period)
+        """
+        rolling_results = pd.read_sql_query(
+            sql=get_rolling_analysis_results_query,
+            con=self.prod_db_connection,
+            params=(ticker, benchmark, window, start_ts, end_ts),
+        )
+        rolling_results['timestamp'] = pd.to_datetime(rolling_results['timestamp'], unit='s', utc=True)
+        return rolling_results.set_index('timestamp')
+
     def is_db_empty(self) -> bool:
         """
         Checks whether the database is empty or not
@@ -1,24 +1,49 @@
 import pandas as pd
+import hashlib
 import logging
 import numpy as np
 from datetime import datetime, timezone
-from typing import Tuple, Dict, List, Mapping
+from typing import Any, Tuple, Dict, List, Mapping
 
 from src.data_loader.data_loader import DataLoader
 from src.quant_enums import ValidationIssueType
 
 logger = logging.getLogger("validation")
 
+# Bump this whenever a check in DataValidator changes, so that reports cached under the old rules are not reused
+VALIDATION_RULES_VERSION = 1
+
+ValidationIssue = Tuple[Any, str, str]
+
 class DataValidator:
     def __init__(self, data_loader: DataLoader):
         self.data_loader = data_loader
 
+    @staticmethod
+    def compute_cache_key(ticker: str, df: pd.DataFrame, price_columns: List[str]) -> str:
+        """
+        Builds a content hash of the validation input. The raw buffers of the timestamp index and every price column are
+        hashed together with the ticker, the column list and the rules version, so identical input always maps to the same key
+
+        Returns - the hex digest used as the key in the validation_cache table
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{ticker}|{VALIDATION_RULES_VERSION}|{','.join(price_columns)}".encode())
+        index_values = pd.DatetimeIndex(df.index).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        digest.update(np.ascontiguousarray(index_values).tobytes())
+        for col in price_columns:
+            digest.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+        return digest.hexdigest()
+
     def validate_and_clean(self, ticker: str, df: pd.DataFrame, price_columns: List[str]) -> Tuple[pd.DataFrame, Dict[str, int]]:
         """
         Orchestrates:  all checks but does not modify the underlying data (no deleting outliers).
         
         Logs: issues to the log file
 
+        Caching: the report and the logged issues are stored in the validation_cache table under a content hash of the input.
+        An identical request is answered from the cache without running the checks or rewriting the validation_log table
+
         Returns: original Dataframe with extra columns for changes in price columns listed columns and a report dict 
         showing the number of gaps, outliers and stale data records in dataset
         """
@@ -42,25 +67,42 @@ class DataValidator:
         for col in price_columns:
             df[f"{col}_returns"] = df[col].pct_change()
 
+        cache_key = self.compute_cache_key(ticker, df, price_columns)
+        log_key_name = f"validation_log_key:{ticker}"
+        cached_result = self.data_loader.get_cached_validation_result(cache_key)
+
+        if cached_result is not None:
+            cached_report, cached_issues = cached_result
+            if self.data_loader.get_config_value(log_key_name) != cache_key:
+                # The validation_log currently holds issues from some other input - restore the ones logged for this input
+                self.data_loader.delete_unresolved_validation_log(ticker)
+                self.data_loader.insert_validation_issues(ticker, cached_issues)
+                self.data_loader.set_config_value(log_key_name, cache_key, "Cache key of the input behind the current validation_log entries")
+            logger.info('Validation cache hit for %s (key: %s). Skipping the checks', ticker, cache_key)
+            return df, cached_report
+
         self.data_loader.delete_unresolved_validation_log(ticker)
 
         logger.debug('The dataframe is: \n%s', df)
+        issues: List[ValidationIssue] = []
         report = {
-            'gap_number': self._check_gaps(ticker, df),
-            'outlier_number': self._check_outliers(ticker, df, price_columns),
-            'stale_data_number': self._check_stale(ticker, df, price_columns)
+            'gap_number': self._check_gaps(ticker, df, issues),
+            'outlier_number': self._check_outliers(ticker, df, price_columns, issues),
+            'stale_data_number': self._check_stale(ticker, df, price_columns, issues)
         }
+        self.data_loader.insert_validation_issues(ticker, issues)
+        self.data_loader.save_validation_result(cache_key, ticker, VALIDATION_RULES_VERSION, report, issues)
+        self.data_loader.set_config_value(log_key_name, cache_key, "Cache key of the input behind the current validation_log entries")
         return df, report
 
-    def _check_gaps(self, ticker: str, df: pd.DataFrame) -> int:
+    def _check_gaps(self, ticker: str, df: pd.DataFrame, issues: List[ValidationIssue]) -> int:
         """
         Identifies non-sequential timestamps (compares days actually present in the df against the days that the market should have 
         been open). Its assumed, that dataframe is already sorted and indexed by time
-        Logs every gap to the log file
+        Collects every gap into the issues list, which is later written to the validation_log table
 
         Returns - the number of gaps existing in the file
         """
-        data_loader = self.data_loader
         if df.empty:
             logger.debug('Empty dataframe passed to check gaps function. So, skipping the validation check')
             raise pd.errors.EmptyDataError('Empty dataframe was supplied as a parameter')
@@ -77,11 +119,11 @@ class DataValidator:
         for day in missing_days:
             #date_string = day.isoformat()
             date_set = int(day.timestamp())
-            data_loader.insert_validation_issue(ticker, date_set, ValidationIssueType.MISSING_DAY.value, "Missing OHLCV data for this trading day")
+            issues.append((date_set, ValidationIssueType.MISSING_DAY.value, "Missing OHLCV data for this trading day"))
 
         return len(missing_days)
 
-    def _check_outliers(self, ticker: str, df: pd.DataFrame, price_columns: List[str]) -> int:
+    def _check_outliers(self, ticker: str, df: pd.DataFrame, price_columns: List[str], issues: List[ValidationIssue]) -> int:
         """
         Calculates daily percentage returns. Flags any return exceeding 5 standard deviations (5SD) of the entire series.
 
@@ -110,17 +152,12 @@ class DataValidator:
             triggered_indices = returns.index[mask]
 
             for ts in triggered_indices:
-                self.data_loader.insert_validation_issue(
-                    ticker=ticker,
-                    date=ts.isoformat(),
-                    issue_type=outlier_issue,
-                    description=f"5σ outlier detected in {returns_col}",
-                )
+                issues.append((ts.isoformat(), outlier_issue, f"5σ outlier detected in {returns_col}"))
 
             total_outliers += len(triggered_indices)
         return total_outliers
 
-    def _check_stale(self, ticker: str, df: pd.DataFrame, price_columns: List[str]) -> int:
+    def _check_stale(self, ticker: str, df: pd.DataFrame, price_columns: List[str], issues: List[ValidationIssue]) -> int:
         """
         Detects and logs if 5 consecutive closing prices are identical AND volume is 0
 
@@ -154,12 +191,7 @@ class DataValidator:
 
                 unix_epoch = int(ts.timestamp())
 
-                self.data_loader.insert_validation_issue(
-                    ticker=ticker,
-                    date=unix_epoch,
-                    issue_type=issue_type,
-                    description=f"Stale price detected in {col} (≥5 identical values)",
-                )
+                issues.append((unix_epoch, issue_type, f"Stale price detected in {col} (≥5 identical values)"))
                 stale_count += 1
         return stale_count
     
@@ -1,8 +1,11 @@
+import hashlib
+import json
+import numpy.typing as npt
 import pandas as pd
 import logging
 import requests
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 from src.data_loader.data_loader import DataLoader
 from src.circuit_breaker import CircuitBreaker
@@ -10,6 +13,26 @@ from src.data_validator import DataValidator
 from src.custom_errors import CircuitOpenStateError, EmptyRecordReturnError
 from src.adapters.api_adapter import ApiAdapter
 from src.analysis_module import AnalysisModule
+from src.modules.analytics.backtester import BacktestResult, generate_signals, run_backtest, signals_to_weights
+from src.modules.analytics.bootstrap_analyzer import DEFAULT_CONFIDENCE_LEVEL, default_block_length
+from src.modules.analytics.drawdown_analyzer import drawdown_summary
+from src.modules.analytics.factor_regression import FactorRegressionResult, regress_on_factors
+from src.modules.analytics.metrics_kernel import ANNUALIZED_RISK_FREE_RATE
+from src.modules.analytics.parameter_sweep import PricePanel, grid_parameter_sets, parameter_key, random_parameter_sets, run_parameter_sweep
+from src.modules.analytics.online_statistics import DEFAULT_CHUNK_ROWS, OnlineDrawdown, OnlineStatistics, summarize_price_stream
+from src.modules.analytics.portfolio_analyzer import PortfolioSimulation, simulate_portfolios
+from src.modules.analytics.risk_analyzer import calculate_value_at_risk
+from src.modules.analytics.walk_forward import walk_forward_folds, walk_forward_pair_metrics, walk_forward_strategy
+from src.modules.convergence import ConvergenceTarget, ConvergenceTrace
+from src.modules.option_pricer import OptionContract, PricingResult, calibrate_market, price_option
+from src.modules.path_simulator import (
+    DEFAULT_MEMORY_BUDGET_MB,
+    PathModel,
+    PathStatistics,
+    calibrate_model,
+    simulate_price_paths,
+    simulate_price_paths_until_converged
+)
 
 logger = logging.getLogger("flow")
 
@@ -65,16 +88,14 @@ class FlowController:
         return f'Gaps: {validation_report['gap_number']} \n Outliers: {validation_report['outlier_number']} \n Stale data: {validation_report['stale_data_number']} \n Validation score: {validation_score}'
 
 
-    def dispatch_analysis_request(self, ticker: str, benchmark: str | None, start: str, end: str) -> Dict[str, Any]:
+    def _load_aligned_close_prices(self, ticker: str, benchmark: str | None, start: str, end: str) -> Tuple[pd.DataFrame, str, int, int]:
         """
-        Serves the computation purpose for price data analysis. Fetches price data for both tickers -> if data exists ->
-        enters into the analysis module for computation and returns results to the terminal. In simpler terms, its job is
-        to collect data from the db, ensure it is mathematically valid for comparison and feed it to the calculator
+        Fetches the price data of the ticker and the benchmark from the db and aligns both close series on the union of their
+        timestamps (forward filling the gaps)
+
+        Returns - a tuple of (aligned dataframe with ticker_close and benchmark_close columns, normalized benchmark name,
+        start unix epoch, end unix epoch)
         """
-        # start_unix_epoch = int(pd.Timestamp(start).timestamp())
-        # end_unix_epoch = int(pd.Timestamp(end).timestamp())
-        current_timestamp = datetime.now()
-        current_unix_epoch_timestamp = int(current_timestamp.timestamp())
         start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
         end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
         ticker_dataframe = self.data_loader.get_historical_data(ticker=ticker, start_ts=start_unix_epoch, end_ts=end_unix_epoch)
@@ -114,6 +135,43 @@ class FlowController:
         if len(concatenated_df) < 2:
             raise ValueError("Insufficient aligned data to compute returns")
 
+        return concatenated_df, benchmark, start_unix_epoch, end_unix_epoch
+
+    def _save_confidence_intervals(self, analysis_key: Dict[str, Any], intervals: pd.DataFrame, observations: int, bootstrap_options: Dict[str, Any]) -> None:
+        """Persists bootstrap intervals with the options they were computed with (the default block length made explicit)"""
+        self.data_loader.save_analysis_confidence_intervals(
+            analysis_key,
+            intervals,
+            method=bootstrap_options.get('method', 'stationary'),
+            confidence_level=bootstrap_options.get('confidence_level', DEFAULT_CONFIDENCE_LEVEL),
+            resamples=bootstrap_options['resamples'],
+            block_length=bootstrap_options.get('block_length') or default_block_length(observations),
+        )
+
+    def dispatch_analysis_request(
+        self,
+        ticker: str,
+        benchmark: str | None,
+        start: str,
+        end: str,
+        bootstrap_resamples: int = 0,
+        **bootstrap_options: Any
+    ) -> Dict[str, Any]:
+        """
+        Serves the computation purpose for price data analysis. Fetches price data for both tickers -> if data exists ->
+        enters into the analysis module for computation and returns results to the terminal. In simpler terms, its job is
+        to collect data from the db, ensure it is mathematically valid for comparison and feed it to the calculator.
+
+        With bootstrap_resamples > 0 (e.g. DEFAULT_RESAMPLES), bootstrap confidence intervals of the metrics are computed too (see
+        AnalysisModule.compute_confidence_intervals for the bootstrap options), returned under 'confidence_intervals' and
+        stored in the analysis_confidence_intervals table
+        """
+        # start_unix_epoch = int(pd.Timestamp(start).timestamp())
+        # end_unix_epoch = int(pd.Timestamp(end).timestamp())
+        current_timestamp = datetime.now()
+        current_unix_epoch_timestamp = int(current_timestamp.timestamp())
+        concatenated_df, benchmark, start_unix_epoch, end_unix_epoch = self._load_aligned_close_prices(ticker, benchmark, start, end)
+
         price_columns = ["ticker_close", "benchmark_close"]
         validated_df, report = self.data_validator.validate_and_clean(
             ticker=ticker,
@@ -137,13 +195,482 @@ class FlowController:
             'ticker_volatility': metrics['ticker_annualized_volatility'],
             'benchmark_volatility': metrics['benchmark_annualized_volatility'],
             'correlation': metrics['correlation_coefficient'],
-            'data_quality_score': validation_score
+            'data_quality_score': validation_score,
+            'max_drawdown': metrics['max_drawdown'],
+            'max_drawdown_duration': metrics['max_drawdown_duration'],
+            'time_to_recovery': metrics['time_to_recovery'],
+            'calmar_ratio': metrics['calmar_ratio'],
+            'ulcer_index': metrics['ulcer_index']
         }
         
         logger.debug('The results payload is: \n%s. Saving it to analysis_results table', results_payload)
         self.data_loader.save_analysis_results(results_payload)
+
+        if bootstrap_resamples:
+            prices = validated_df[['ticker_close', 'benchmark_close']].dropna()
+            options = {**bootstrap_options, 'resamples': bootstrap_resamples}
+            intervals = self.analysis_module.compute_confidence_intervals(prices['ticker_close'].rename(ticker), prices['benchmark_close'], **options)
+            self._save_confidence_intervals(results_payload, intervals, len(prices) - 1, options)
+            results_payload['confidence_intervals'] = intervals
         return results_payload
 
+    def dispatch_batch_analysis_request(
+        self,
+        tickers: List[str],
+        benchmark: str | None,
+        start: str,
+        end: str,
+        bootstrap_resamples: int = 0,
+        **bootstrap_options: Any
+    ) -> pd.DataFrame:
+        """
+        Serves the cross-sectional analysis of many tickers against one benchmark. All series (benchmark included) are read
+        with a single query into an aligned (T x N) panel, the metrics of every ticker are computed together as matrix
+        operations and all results are written with one bulk insert into the analysis_results table. The bootstrap confidence
+        intervals of all stored tickers share the same resamples and go to the analysis_confidence_intervals table (only when
+        bootstrap_resamples > 0, they are opt-in).
+
+        The batch mode skips the per-ticker validation, so data_quality_score is stored as NULL
+
+        Returns - a dataframe of metrics with one row per ticker
+        """
+        current_unix_epoch_timestamp = int(datetime.now().timestamp())
+        start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
+        end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+
+        if not benchmark:
+            benchmark = 'Nifty50'
+        benchmark = benchmark.replace('_id.csv', '').replace('.csv', '').upper()
+
+        tickers = list(dict.fromkeys(tickers))
+        price_panel = self.data_loader.get_price_panel([*tickers, benchmark], start_unix_epoch, end_unix_epoch)
+        if price_panel[benchmark].isna().all():
+            logger.info('Data missing for benchmark: %s. Raising Lookup error', benchmark)
+            raise LookupError(f'No price data found for benchmark: {benchmark}')
+
+        # Same alignment as the single ticker path: forward fill on the union of timestamps, then require a benchmark value
+        price_panel = price_panel.ffill()
+        price_panel = price_panel[price_panel[benchmark].notna()]
+
+        batch_metrics = self.analysis_module.compute_batch_metrics(price_panel[tickers], price_panel[benchmark])
+
+        results_payloads = []
+        for ticker, row in batch_metrics.iterrows():
+            if row['sample_size'] < 2:
+                logger.info('Insufficient aligned data for ticker: %s. Skipping it', ticker)
+                continue
+            results_payloads.append({
+                'timestamp': current_unix_epoch_timestamp,
+                'ticker': ticker,
+                'benchmark': benchmark,
+                'start_date': start_unix_epoch,
+                'end_date': end_unix_epoch,
+                'log_returns_alpha': float(row['log_returns_alpha']),
+                'beta': float(row['beta']),
+                'sharpe_ratio': float(row['sharpe_ratio']),
+                'ticker_volatility': float(row['ticker_annualized_volatility']),
+                'benchmark_volatility': float(row['benchmark_annualized_volatility']),
+                'correlation': float(row['correlation_coefficient']),
+                'data_quality_score': None,
+                **drawdown_summary(row)
+            })
+
+        self.data_loader.save_analysis_results_bulk(results_payloads)
+
+        stored_tickers = [payload['ticker'] for payload in results_payloads]
+        if bootstrap_resamples and stored_tickers:
+            options = {**bootstrap_options, 'resamples': bootstrap_resamples}
+            intervals = self.analysis_module.compute_confidence_intervals(price_panel[stored_tickers], price_panel[benchmark], **options)
+            self._save_confidence_intervals(results_payloads[0], intervals, len(price_panel) - 1, options)
+        return batch_metrics
+
+    def dispatch_rolling_analysis_request(self, ticker: str, benchmark: str | None, start: str, end: str, windows: List[int], persist: bool = False) -> Dict[int, pd.DataFrame]:
+        """
+        Serves the rolling (time-varying) analysis. Loads and aligns the ticker and benchmark prices once and computes every
+        requested window length in a single pass. If persist is set, the rolling metrics are saved into the
+        rolling_analysis_results table so later requests can read them instead of recomputing
+
+        Returns - a dict mapping each window length to its rolling metrics dataframe
+        """
+        concatenated_df, benchmark, _, _ = self._load_aligned_close_prices(ticker, benchmark, start, end)
+        rolling_metrics = self.analysis_module.compute_rolling_metrics(concatenated_df, windows)
+
+        if persist:
+            self.data_loader.save_rolling_analysis_results(ticker, benchmark, rolling_metrics)
+        return rolling_metrics
+
+    def _load_complete_price_panel(self, tickers: List[str], start: str, end: str) -> pd.DataFrame:
+        """
+        Reads the close prices of every ticker with a single query into an aligned (T x N) panel, forward filled on the union of
+        timestamps and starting once every ticker has a price
+
+        Returns - the complete price panel
+        """
+        start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
+        end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+
+        tickers = [ticker.upper() for ticker in tickers]
+        price_panel = self.data_loader.get_price_panel(tickers, start_unix_epoch, end_unix_epoch)
+        missing_tickers = [ticker for ticker in tickers if price_panel[ticker].isna().all()]
+        if missing_tickers:
+            logger.info('Data missing for tickers: %s. Raising Lookup error', missing_tickers)
+            raise LookupError(f'No price data found for tickers: {missing_tickers}')
+        return price_panel.ffill().dropna()
+
+    def dispatch_online_statistics_request(
+        self, ticker: str, start: str, end: str, chunk_rows: int = DEFAULT_CHUNK_ROWS
+    ) -> Tuple[OnlineStatistics, OnlineDrawdown]:
+        """
+        Serves the constant memory statistics of a ticker's whole history: the close prices are streamed from the DB in chunks
+        of chunk_rows rows and reduced to the moments of the log returns and the drawdown of the prices
+
+        Returns - the OnlineStatistics of the daily log returns and the OnlineDrawdown of the close prices
+        """
+        start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
+        end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+        price_chunks = (chunk['close'] for chunk in self.data_loader.iter_historical_data(ticker.upper(), start_unix_epoch, end_unix_epoch, chunk_rows))
+        statistics, drawdown = summarize_price_stream(price_chunks)
+        if drawdown.count == 0:
+            logger.info('No data found for %s. Raising Lookup error', ticker)
+            raise LookupError(f'No price data found for ticker: {ticker}')
+        return statistics, drawdown
+
+    def dispatch_factor_regression_request(
+        self,
+        tickers: List[str],
+        factor_tickers: List[str],
+        custom_factors: List[str],
+        start: str,
+        end: str,
+        risk_free_rate: float | pd.Series = ANNUALIZED_RISK_FREE_RATE
+    ) -> FactorRegressionResult:
+        """
+        Serves the multi-factor regression of many tickers at once. The tickers and the factor tickers (a benchmark, sector
+        indices) are read with a single price panel query, the custom factors from the factor_data table. Factor tickers are
+        turned into excess returns like the tickers, custom factors are used as stored (excess or long-short returns)
+
+        Returns - the FactorRegressionResult of every ticker
+        """
+        if not factor_tickers and not custom_factors:
+            raise ValueError('At least one factor ticker or custom factor is needed')
+        start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
+        end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        factor_tickers = [ticker.upper() for ticker in factor_tickers]
+        price_panel = self.data_loader.get_price_panel(list(dict.fromkeys([*tickers, *factor_tickers])), start_unix_epoch, end_unix_epoch)
+        factor_panel = self.data_loader.get_factor_panel(custom_factors, start_unix_epoch, end_unix_epoch)
+        missing_factors = [factor for factor in factor_tickers if price_panel[factor].isna().all()]
+        missing_factors += [factor for factor in custom_factors if factor_panel[factor].isna().all()]
+        if missing_factors:
+            logger.info('Data missing for factors: %s. Raising Lookup error', missing_factors)
+            raise LookupError(f'No data found for factors: {missing_factors}')
+
+        returns = price_panel.ffill().pct_change(fill_method=None)
+        factor_returns = pd.concat([returns[factor_tickers], factor_panel.reindex(returns.index)], axis=1)
+        return regress_on_factors(returns[tickers], factor_returns, risk_free_rate=risk_free_rate, excess_factors=factor_tickers)
+
+    def dispatch_portfolio_simulation_request(
+        self,
+        tickers: List[str],
+        weights: npt.ArrayLike,
+        start: str,
+        end: str,
+        rebalance: str | int = 'none',
+        transaction_cost_bps: float = 0.0,
+        initial_value: float = 1.0
+    ) -> PortfolioSimulation:
+        """
+        Serves the portfolio simulation. The NAV of every portfolio (one row of weights each) is computed together over the
+        complete price panel of the tickers
+
+        Returns - the PortfolioSimulation of all the portfolios
+        """
+        price_panel = self._load_complete_price_panel(tickers, start, end)
+        return simulate_portfolios(price_panel, weights, rebalance=rebalance, transaction_cost_bps=transaction_cost_bps, initial_value=initial_value)
+
+    @staticmethod
+    def _normalize_strategy_tickers(tickers: List[str], benchmark: str | None) -> Tuple[List[str], str]:
+        """Returns - the upper case tickers without duplicates and the benchmark name (Nifty50 by default)"""
+        return list(dict.fromkeys(ticker.upper() for ticker in tickers)), (benchmark or 'Nifty50').replace('_id.csv', '').replace('.csv', '').upper()
+
+    def _load_strategy_panel(self, tickers: List[str], benchmark: str | None, start: str, end: str, with_open: bool) -> Tuple[PricePanel, str, int, int]:
+        """
+        Reads the close (and with_open, the open) prices of every ticker and the benchmark close with single panel queries.
+        Tickers may start trading later than others: their prices are NaN until then and forward filled afterwards
+
+        Returns - a tuple of (PricePanel, normalized benchmark name, start unix epoch, end unix epoch)
+        """
+        start_unix_epoch = int(pd.Timestamp(start, tz="UTC").timestamp())
+        end_unix_epoch = int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+        tickers, benchmark = self._normalize_strategy_tickers(tickers, benchmark)
+
+        close_panel = self.data_loader.get_price_panel(list(dict.fromkeys([*tickers, benchmark])), start_unix_epoch, end_unix_epoch)
+        missing_tickers = [ticker for ticker in [*tickers, benchmark] if close_panel[ticker].isna().all()]
+        if missing_tickers:
+            logger.info('Data missing for tickers: %s. Raising Lookup error', missing_tickers)
+            raise LookupError(f'No price data found for tickers: {missing_tickers}')
+        open_prices = self.data_loader.get_price_panel(tickers, start_unix_epoch, end_unix_epoch, column='open') if with_open else None
+        panel = PricePanel(close=close_panel[tickers].ffill(), benchmark_close=close_panel[benchmark], open_prices=open_prices)
+        return panel, benchmark, start_unix_epoch, end_unix_epoch
+
+    def dispatch_backtest_request(
+        self,
+        tickers: List[str],
+        benchmark: str | None,
+        start: str,
+        end: str,
+        strategy: str,
+        strategy_parameters: Dict[str, Any] | None = None,
+        rebalance: str | int = 'daily',
+        fill: str = 'close',
+        commission_bps: float = 0.0,
+        slippage_bps: float = 0.0,
+        initial_value: float = 1.0,
+        persist: bool = True
+    ) -> Tuple[BacktestResult, Dict[str, Any]]:
+        """
+        Serves the backtest of a built-in strategy. The close (and for next open fills the open) prices of every ticker and the
+        benchmark close are read with single panel queries; tickers may start trading later than others, they are only held
+        once they have a price. The run and its equity curve are stored in the backtest_results tables unless persist is False
+
+        Returns - a tuple of (BacktestResult, run record with the settings, the summary metrics and the backtest_id)
+        """
+        panel, benchmark, start_unix_epoch, end_unix_epoch = self._load_strategy_panel(tickers, benchmark, start, end, with_open=fill == 'next_open')
+        close_prices, open_prices = panel.close, panel.open_prices
+        strategy_parameters = strategy_parameters or {}
+
+        target_weights = signals_to_weights(generate_signals(close_prices, strategy, **strategy_parameters), rebalance)
+        result = run_backtest(
+            close_prices, target_weights, open_prices, fill=fill, commission_bps=commission_bps, slippage_bps=slippage_bps, initial_value=initial_value
+        )
+        run: Dict[str, Any] = {
+            'timestamp': int(datetime.now(timezone.utc).timestamp()),
+            'strategy': strategy,
+            'parameters': {**strategy_parameters, 'rebalance': rebalance},
+            'tickers': list(close_prices.columns),
+            'benchmark': benchmark,
+            'start_date': start_unix_epoch,
+            'end_date': end_unix_epoch,
+            'fill': fill,
+            'commission_bps': commission_bps,
+            'slippage_bps': slippage_bps,
+            **result.summary(panel.benchmark_close),
+        }
+        if persist:
+            run['backtest_id'] = self.data_loader.save_backtest_result(run, result.equity, result.turnover, result.commissions + result.slippage)
+        return result, run
+
+    def dispatch_parameter_sweep_request(
+        self,
+        tickers: List[str],
+        benchmark: str | None,
+        start: str,
+        end: str,
+        evaluator: str,
+        parameter_space: Dict[str, List[Any]],
+        fixed_parameters: Dict[str, Any] | None = None,
+        samples: int | None = None,
+        seed: int | None = None,
+        workers: int | None = None,
+        sweep_id: str | None = None
+    ) -> pd.DataFrame:
+        """
+        Serves a parameter sweep of a backtest or analysis. The price panel is loaded and checked once and shared with every
+        evaluation; each finished parameter set is written to the parameter_sweep_results table straight away.
+
+        The sweep id defaults to a hash of the evaluator, tickers, benchmark, dates, fixed parameters and the version of the stored
+        prices (see DataLoader.get_price_data_version), so running the same sweep again resumes it: parameter sets already stored
+        under that id are not evaluated again, unless prices were downloaded or corrected since
+
+        Args:
+        parameter_space - the values of every swept parameter, e.g. {'lookback': [20, 60, 120], 'top': [5, 10]}
+        fixed_parameters - parameters shared by every set, e.g. {'strategy': 'momentum', 'commission_bps': 5}
+        samples - random search over this many distinct combinations instead of the full grid
+
+        Returns - a dataframe with one row per parameter set: the parameters followed by the metrics
+        """
+        fixed_parameters = fixed_parameters or {}
+        swept_sets = grid_parameter_sets(parameter_space) if samples is None else random_parameter_sets(parameter_space, samples, seed)
+        parameter_sets = [{**fixed_parameters, **parameters} for parameters in swept_sets]
+        if sweep_id is None:
+            price_tickers, benchmark_name = self._normalize_strategy_tickers(tickers, benchmark)
+            data_version = self.data_loader.get_price_data_version(
+                sorted({*price_tickers, benchmark_name}),
+                int(pd.Timestamp(start, tz="UTC").timestamp()),
+                int((pd.Timestamp(end, tz="UTC") + pd.Timedelta(days=1)).timestamp())
+            )
+            sweep_definition = json.dumps(
+                [evaluator, sorted(price_tickers), benchmark_name, start, end, fixed_parameters, data_version], sort_keys=True, default=str
+            )
+            sweep_id = f'{evaluator}-{hashlib.sha256(sweep_definition.encode()).hexdigest()[:16]}'
+
+        completed = self.data_loader.get_parameter_sweep_results(sweep_id)
+        remaining_sets = [parameters for parameters in parameter_sets if parameter_key(parameters) not in completed]
+        logger.info('Sweep %s: %d of %d parameter sets already evaluated', sweep_id, len(parameter_sets) - len(remaining_sets), len(parameter_sets))
+
+        if remaining_sets:
+            with_open = any(parameters.get('fill') == 'next_open' for parameters in remaining_sets)
+            panel, _, _, _ = self._load_strategy_panel(tickers, benchmark, start, end, with_open=with_open)
+
+            def save_result(parameters: Dict[str, Any], metrics: Dict[str, float], elapsed_seconds: float) -> None:
+                self.data_loader.save_parameter_sweep_result(sweep_id, parameter_key(parameters), parameters, metrics, elapsed_seconds)
+                completed[parameter_key(parameters)] = (parameters, metrics)
+
+            run_parameter_sweep(panel, evaluator, remaining_sets, workers=workers, on_result=save_result)
+
+        rows = [{**parameters, **completed[parameter_key(parameters)][1]} for parameters in parameter_sets]
+        return pd.DataFrame(rows)
+
+    def dispatch_walk_forward_request(
+        self,
+        tickers: List[str],
+        benchmark: str | None,
+        start: str,
+        end: str,
+        evaluation: str,
+        train_size: int,
+        test_size: int,
+        step: int | None = None,
+        mode: str = 'rolling',
+        gap: int = 0,
+        parameter_space: Dict[str, List[Any]] | None = None,
+        fixed_parameters: Dict[str, Any] | None = None,
+        selection_metric: str = 'sharpe_ratio',
+        workers: int | None = None,
+        persist: bool = True
+    ) -> Tuple[pd.DataFrame, str]:
+        """
+        Serves a walk-forward evaluation over train / test folds of the price history
+
+        Description:
+        evaluation='pair_metrics' measures the ticker vs benchmark metrics of every ticker on every train and test window and
+        evaluates the train beta as a hedge on the test window. evaluation='strategy' picks the best parameter set of the
+        strategy (every grid combination of parameter_space with the fixed_parameters) on each train window by the selection
+        metric and reports its test window metrics. The report is stored in walk_forward_results unless persist is False
+
+        Args:
+        train_size / test_size / step / gap - window lengths in daily returns (see walk_forward_folds)
+
+        Returns - a tuple of (per-fold report, walk_forward_id)
+        """
+        if evaluation not in ('pair_metrics', 'strategy'):
+            raise ValueError(f'Unknown walk-forward evaluation: {evaluation}')
+        fixed_parameters = fixed_parameters or {}
+        parameter_sets = [{**fixed_parameters, **parameters} for parameters in grid_parameter_sets(parameter_space or {})]
+        with_open = evaluation == 'strategy' and any(parameters.get('fill') == 'next_open' for parameters in parameter_sets)
+        panel, benchmark, _, _ = self._load_strategy_panel(tickers, benchmark, start, end, with_open=with_open)
+        folds = walk_forward_folds(len(panel.close) - 1, train_size, test_size, step=step, mode=mode, gap=gap)
+
+        if evaluation == 'strategy':
+            report = walk_forward_strategy(panel, parameter_sets, folds, selection_metric=selection_metric, workers=workers)
+            subject_column = 'parameters'
+        else:
+            report = walk_forward_pair_metrics(panel.close, panel.benchmark_close, folds)
+            subject_column = 'ticker'
+
+        definition = json.dumps(
+            [evaluation, list(panel.close.columns), benchmark, start, end, train_size, test_size, step, mode, gap, parameter_space, fixed_parameters, selection_metric],
+            sort_keys=True, default=str
+        )
+        walk_forward_id = f'{evaluation}-{hashlib.sha256(definition.encode()).hexdigest()[:16]}'
+        if persist:
+            self.data_loader.save_walk_forward_results(walk_forward_id, report, subject_column)
+        return report, walk_forward_id
+
+    def dispatch_risk_request(
+        self,
+        tickers: List[str],
+        weights: npt.ArrayLike | None,
+        start: str,
+        end: str,
+        confidence_levels: List[float],
+        horizons: List[int],
+        methods: List[str],
+        **monte_carlo_options: Any
+    ) -> pd.DataFrame:
+        """
+        Serves the VaR / Expected Shortfall calculation of a single ticker or of weighted portfolios over the stored price history
+
+        Returns - the long risk report of calculate_value_at_risk
+        """
+        price_panel = self._load_complete_price_panel(tickers, start, end)
+        return calculate_value_at_risk(price_panel, weights, confidence_levels, horizons, methods, **monte_carlo_options)
+
+    def _calibrate_path_model(self, ticker: str, start: str, end: str, model: str) -> Tuple[PathModel, float]:
+        """
+        Calibrates a path model from the ticker's close prices between the start and end dates
+
+        Returns - a tuple of (calibrated model, last close price the paths start from)
+        """
+        close_prices = self._load_complete_price_panel([ticker], start, end).iloc[:, 0]
+        path_model = calibrate_model(close_prices.to_numpy(), model)
+        logger.info('Calibrated %s model for %s: %s', model, ticker, path_model if model != 'bootstrap' else f'{len(close_prices) - 1} returns')
+        return path_model, float(close_prices.iloc[-1])
+
+    def dispatch_path_simulation_request(
+        self,
+        ticker: str,
+        start: str,
+        end: str,
+        model: str = 'gbm',
+        steps: int = 252,
+        paths: int = 100_000,
+        seed: int | None = None,
+        workers: int | None = None,
+        memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+    ) -> PathStatistics:
+        """
+        Serves the Monte Carlo price path simulation. The model is calibrated from the ticker's close prices between the start
+        and end dates, and the paths start from the last close price
+
+        Returns - the PathStatistics of the simulated paths
+        """
+        path_model, initial_price = self._calibrate_path_model(ticker, start, end, model)
+        return simulate_price_paths(path_model, initial_price, steps=steps, paths=paths, seed=seed, workers=workers, memory_budget_mb=memory_budget_mb)
+
+    def dispatch_converged_path_simulation_request(
+        self,
+        ticker: str,
+        start: str,
+        end: str,
+        target: ConvergenceTarget,
+        model: str = 'gbm',
+        steps: int = 252,
+        seed: int | None = None,
+        workers: int | None = None,
+        memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+    ) -> Tuple[PathStatistics, ConvergenceTrace]:
+        """
+        Serves the Monte Carlo price path simulation run in batches until the mean terminal price meets the target standard
+        error or confidence interval width, calibrated like dispatch_path_simulation_request
+
+        Returns - a tuple of (PathStatistics of the simulated paths, ConvergenceTrace)
+        """
+        path_model, initial_price = self._calibrate_path_model(ticker, start, end, model)
+        return simulate_price_paths_until_converged(path_model, initial_price, target, steps=steps, seed=seed, workers=workers, memory_budget_mb=memory_budget_mb)
+
+    def dispatch_option_pricing_request(
+        self,
+        ticker: str,
+        start: str,
+        end: str,
+        contract: OptionContract,
+        paths: int = 100_000,
+        rate: float | None = None,
+        **pricing_options: Any
+    ) -> PricingResult:
+        """
+        Serves the Monte Carlo option pricing. The spot price and the volatility are calibrated from the ticker's close prices
+        between the start and end dates, the pricing options (sampler, antithetic, control_variate, ...) go to price_option
+
+        Returns - the PricingResult
+        """
+        close_prices = self._load_complete_price_panel([ticker], start, end).iloc[:, 0]
+        market = calibrate_market(close_prices.to_numpy()) if rate is None else calibrate_market(close_prices.to_numpy(), rate=rate)
+        logger.info('Calibrated market for %s option pricing: %s', ticker, market)
+        return price_option(contract, market, paths=paths, **pricing_options)
+
     def handle_download_request(self, ticker: str, start_date: str, end_date: str) -> None:
         """
         Transforms the user's command into a clean, validated and stored dataset. It is responsible for handling the
@@ -4,7 +4,7 @@ r = OrderBookRecord(
     1,
     1223,
     100,
-    3431.44,
+    343144,
     OrderBookRecordType.BID
 )
 
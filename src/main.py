@@ -5,9 +5,13 @@ from typing import Any
 
 from src.cli.parser import build_parser
 from src.cli.commands.analyze import run_analyze
+from src.cli.commands.backtest import run_backtest
 from src.cli.commands.download import run_download
+from src.cli.commands.montecarlo import run_montecarlo
 from src.cli.commands.simulate import run_simulate
+from src.cli.commands.sweep import run_sweep
 from src.cli.commands.validate import run_validation
+from src.cli.commands.walkforward import run_walk_forward
 from src.data_loader.data_loader import DataLoader
 from src.circuit_breaker import CircuitBreaker
 from src.data_validator import DataValidator
@@ -48,9 +52,13 @@ def main() -> None:
 
     dispatch = {
         "analyze": run_analyze,
+        "backtest": run_backtest,
         "download": run_download,
-        "simulate": run_simulate,
-        "validate":  run_validation
+        "montecarlo": run_montecarlo,
+        "simulation": run_simulate,
+        "sweep": run_sweep,
+        "validate":  run_validation,
+        "walkforward": run_walk_forward
     }
 
     handler: Any | None = dispatch.get(args.command)
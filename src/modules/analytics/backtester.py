@@ -0,0 +1,238 @@
+"""
+This file holds the vectorized backtesting engine. A strategy is a (T x N) matrix of target weights over an aligned price panel:
+a row with targets is an order to trade the portfolio to those weights (filled at that row's close or at the next row's open),
+a row of NaNs means no order, so the holdings drift with the prices until the next one.
+
+Between two fills the holdings are fixed share counts, so the whole equity curve follows from array operations: the value of the
+holdings of every segment on every row is one (T x N) row-wise dot product with the prices, and the values right after every fill
+are a cumulative product of the segment growth factors net of costs. There is no per-bar Python loop, which keeps multi-decade,
+multi-hundred asset backtests interactive
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.drawdown_analyzer import calculate_drawdown_metrics
+from src.modules.analytics.metrics_kernel import TRADING_DAYS_PER_YEAR, compute_cross_sectional_metrics
+from src.modules.analytics.portfolio_analyzer import get_rebalance_mask
+
+logger = logging.getLogger("analytics")
+
+FILL_MODES = ('close', 'next_open')
+STRATEGIES = ('equal_weight', 'buy_and_hold', 'sma_crossover', 'momentum')
+BACKTEST_METRICS = (
+    'total_return',
+    'annualized_return',
+    'annualized_volatility',
+    'sharpe_ratio',
+    'beta',
+    'log_returns_alpha',
+    'correlation_coefficient',
+    'max_drawdown',
+    'calmar_ratio',
+    'average_annual_turnover',
+    'total_costs',
+    'trades',
+)
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    """
+    Result of run_backtest, indexed like the price panel
+
+    equity - value of the portfolio at every close, net of costs
+    returns - daily returns of the equity (the first row is NaN)
+    positions - weights of the assets at every close (they drift between fills)
+    turnover - traded fraction of the portfolio value on every fill row (0 on the other rows)
+    commissions / slippage - costs paid on every fill row, in currency units
+    """
+    equity: pd.Series
+    returns: pd.Series
+    positions: pd.DataFrame
+    turnover: pd.Series
+    commissions: pd.Series
+    slippage: pd.Series
+
+    def summary(self, benchmark_close: pd.Series, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict[str, float]:
+        """
+        Evaluates the equity curve with the metrics used elsewhere in the toolkit: volatility, Sharpe ratio, beta, alpha and
+        correlation against the benchmark (metrics kernel conventions), the drawdown metrics, the turnover and the costs
+
+        Returns - a dict keyed by BACKTEST_METRICS
+        """
+        benchmark = benchmark_close.reindex(self.equity.index).ffill().to_numpy(dtype=np.float64)
+        pair_metrics = compute_cross_sectional_metrics(self.equity.to_numpy(dtype=np.float64)[:, None], benchmark)
+        drawdown_metrics = calculate_drawdown_metrics(self.equity.to_frame(), periods_per_year).iloc[0]
+        years = (len(self.equity) - 1) / periods_per_year
+        return {
+            'total_return': float(self.equity.iloc[-1] / self.equity.iloc[0] - 1),
+            'annualized_return': float(drawdown_metrics['annualized_return']),
+            'annualized_volatility': float(pair_metrics['ticker_annualized_volatility'][0]),
+            'sharpe_ratio': float(pair_metrics['sharpe_ratio'][0]),
+            'beta': float(pair_metrics['beta'][0]),
+            'log_returns_alpha': float(pair_metrics['log_returns_alpha'][0]),
+            'correlation_coefficient': float(pair_metrics['correlation_coefficient'][0]),
+            'max_drawdown': float(drawdown_metrics['max_drawdown']),
+            'calmar_ratio': float(drawdown_metrics['calmar_ratio']),
+            'average_annual_turnover': float(self.turnover.sum() / years) if years > 0 else float('nan'),
+            'total_costs': float(self.commissions.sum() + self.slippage.sum()),
+            'trades': float((self.turnover > 0).sum()),
+        }
+
+
+def signals_to_weights(signals: pd.DataFrame, rebalance: str | int = 'daily') -> pd.DataFrame:
+    """
+    Turns (T x N) trading signals (positive long, negative short, 0 flat) into target weights with a gross exposure of 1: every
+    row is divided by the sum of its absolute signals. Rows off the rebalance schedule (see get_rebalance_mask) and rows of NaN
+    signals become NaN rows - no order on that row
+
+    Returns - a (T x N) dataframe of target weights
+    """
+    values = signals.to_numpy(dtype=np.float64)
+    gross = np.nansum(np.abs(values), axis=1)
+    weights = np.nan_to_num(values) / np.where(gross > 0, gross, 1.0)[:, None]
+    has_order = np.isfinite(values).any(axis=1) & get_rebalance_mask(signals.index, rebalance)
+    weights[~has_order] = np.nan
+    return pd.DataFrame(weights, index=signals.index, columns=signals.columns)
+
+
+def generate_signals(close: pd.DataFrame, strategy: str, **parameters: Any) -> pd.DataFrame:
+    """
+    Builds the (T x N) signals of one of the built-in strategies from the close prices, using only the prices up to every row
+
+    Description:
+    equal_weight - long every asset with a price
+    buy_and_hold - long every asset with a price on the first row, then no more orders
+    sma_crossover - long the assets whose fast moving average (fast, 20 rows) is above the slow one (slow, 100 rows), flat otherwise
+    momentum - long the top (top, 10) assets by trailing return over lookback (lookback, 126) rows
+
+    Returns - a (T x N) dataframe of signals
+    """
+    listed = close.notna().astype(np.float64)
+    if strategy == 'equal_weight':
+        return listed
+    if strategy == 'buy_and_hold':
+        return listed.iloc[:1].reindex(close.index)
+    if strategy == 'sma_crossover':
+        fast, slow = int(parameters.get('fast', 20)), int(parameters.get('slow', 100))
+        if not 0 < fast < slow:
+            raise ValueError('The fast window must be positive and shorter than the slow window')
+        fast_average = close.rolling(fast, min_periods=fast).mean()
+        slow_average = close.rolling(slow, min_periods=slow).mean()
+        return (fast_average > slow_average).astype(np.float64)
+    if strategy == 'momentum':
+        lookback, top = int(parameters.get('lookback', 126)), int(parameters.get('top', 10))
+        if lookback < 1 or top < 1:
+            raise ValueError('The lookback and the number of top assets must be at least 1')
+        trailing_returns = close / close.shift(lookback) - 1
+        ranks = trailing_returns.rank(axis=1, ascending=False, method='first')
+        return (ranks <= top).astype(np.float64)
+    raise ValueError(f'Unknown strategy: {strategy}. Choose from {STRATEGIES}')
+
+
+def run_backtest(
+    close: pd.DataFrame,
+    target_weights: pd.DataFrame | npt.ArrayLike,
+    open_prices: pd.DataFrame | None = None,
+    fill: str = 'close',
+    commission_bps: float = 0.0,
+    slippage_bps: float = 0.0,
+    initial_value: float = 1.0
+) -> BacktestResult:
+    """
+    Simulates the equity curve of a strategy given as target weights
+
+    Description:
+    An order on row t is filled at the close of row t, or at the open of row t + 1 with fill='next_open' (the last row's orders
+    are then never filled). Targets on assets without a price at the fill are set to 0, NaNs inside an order row mean 0 and the
+    rest of the portfolio (1 - sum of the weights) is held in cash earning nothing. Negative weights are short positions.
+
+    Turnover is sum(|target - drifted weights|) and both costs are proportional to the traded value: the commission at
+    commission_bps and the slippage (the fill price moving against the order) at slippage_bps basis points
+
+    Args:
+    close - (T x N) close prices, NaN before an asset starts trading (later gaps are forward filled)
+    target_weights - (T x N) target weights on the rows with an order and NaN rows elsewhere (see signals_to_weights)
+    open_prices - (T x N) open prices, needed for fill='next_open'
+
+    Returns - the BacktestResult
+    """
+    if fill not in FILL_MODES:
+        raise ValueError(f'Unknown fill mode: {fill}. Choose from {FILL_MODES}')
+    if fill == 'next_open' and open_prices is None:
+        raise ValueError('Open prices are needed to fill orders at the next open')
+    if isinstance(target_weights, pd.DataFrame):
+        target_weights = target_weights.reindex(index=close.index, columns=close.columns)
+    weights = np.asarray(target_weights, dtype=np.float64)
+    close_matrix = close.ffill().to_numpy(dtype=np.float64)
+    if weights.shape != close_matrix.shape:
+        raise ValueError(f'The target weights {weights.shape} must have the shape of the prices {close_matrix.shape}')
+    rows = close_matrix.shape[0]
+
+    order_rows = np.flatnonzero(np.isfinite(weights).any(axis=1))
+    if fill == 'next_open':
+        assert open_prices is not None
+        order_rows = order_rows[order_rows + 1 < rows]
+        fill_rows = order_rows + 1
+        fill_prices = open_prices.reindex(index=close.index, columns=close.columns).to_numpy(dtype=np.float64)[fill_rows]
+        # An asset without an open on the fill row trades at the last known close
+        fill_prices = np.where(np.isfinite(fill_prices), fill_prices, close_matrix[order_rows])
+    else:
+        fill_rows = order_rows
+        fill_prices = close_matrix[fill_rows]
+
+    fill_weights = np.nan_to_num(weights[order_rows])
+    tradable = np.isfinite(fill_prices) & (fill_prices > 0)
+    if (fill_weights[~tradable] != 0).any():
+        logger.info('%d target weights on assets without a price were set to 0', int((fill_weights[~tradable] != 0).sum()))
+    fill_weights = np.where(tradable, fill_weights, 0.0)
+    fill_prices = np.where(tradable, fill_prices, 0.0)
+    prices = np.nan_to_num(close_matrix)
+
+    # Shares held per unit of portfolio value after every fill, and the cash left
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = np.where(tradable, fill_weights / fill_prices, 0.0)
+    cash = 1 - fill_weights.sum(axis=1)
+
+    # Growth of every segment's holdings from its fill to the next fill, and the weights they drifted to
+    growth = cash[:-1] + np.einsum('kn,kn->k', units[:-1], fill_prices[1:])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drifted_weights = units[:-1] * fill_prices[1:] / growth[:, None]
+    turnover = np.abs(fill_weights).sum(axis=1)
+    turnover[1:] = np.abs(fill_weights[1:] - drifted_weights).sum(axis=1)
+    cost_fraction = turnover * (commission_bps + slippage_bps) / 10_000
+
+    segment_factors = np.concatenate([[1.0], growth])[:len(fill_rows)] * (1 - cost_fraction)
+    value_after_fill = initial_value * np.cumprod(segment_factors)
+    value_before_fill = value_after_fill / (1 - cost_fraction)
+
+    governing_fill = np.searchsorted(fill_rows, np.arange(rows), side='right') - 1
+    invested = governing_fill >= 0
+    segment = governing_fill[invested]
+    holdings_value = cash[segment] + np.einsum('tn,tn->t', units[segment], prices[invested])
+    equity = np.full(rows, float(initial_value))
+    equity[invested] = value_after_fill[segment] * holdings_value
+    positions = np.zeros_like(prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        positions[invested] = units[segment] * prices[invested] / holdings_value[:, None]
+
+    def per_row(values: npt.NDArray[np.float64]) -> pd.Series:
+        series = np.zeros(rows)
+        series[fill_rows] = values
+        return pd.Series(series, index=close.index)
+
+    equity_series = pd.Series(equity, index=close.index, name='equity')
+    logger.info('Backtested %d assets over %d rows with %d fills at the %s', close.shape[1], rows, len(fill_rows), fill.replace('_', ' '))
+    return BacktestResult(
+        equity=equity_series,
+        returns=equity_series.pct_change(),
+        positions=pd.DataFrame(positions, index=close.index, columns=close.columns),
+        turnover=per_row(turnover),
+        commissions=per_row(value_before_fill * turnover * commission_bps / 10_000),
+        slippage=per_row(value_before_fill * turnover * slippage_bps / 10_000),
+    )
@@ -0,0 +1,208 @@
+"""
+This file is responsible for the bootstrap confidence intervals of the ticker vs benchmark metrics (beta, alpha, Sharpe ratio,
+correlation and volatilities). Daily returns are autocorrelated and volatility clusters, so whole blocks of days are resampled:
+fixed length circular blocks (moving block bootstrap) or blocks of geometric length (stationary bootstrap of Politis and Romano).
+
+The resampled days of a batch of resamples are generated as one integer index matrix and turned into a matrix of counts (how
+often every day was drawn), so the moment sums of all resamples - and of all tickers - are matrix products and every metric is
+derived with the formulas of the metrics kernel. Resamples are split into fixed shards, each drawing from its own child of one
+SeedSequence, so the intervals only depend on the seed and not on the number of workers
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.metrics_kernel import PairMomentSums, derive_metrics_from_moment_sums
+
+logger = logging.getLogger("analytics")
+
+BOOTSTRAP_METHODS = ('stationary', 'block')
+BOOTSTRAP_METRICS = (
+    'beta',
+    'log_returns_alpha',
+    'sharpe_ratio',
+    'correlation_coefficient',
+    'ticker_annualized_volatility',
+    'benchmark_annualized_volatility',
+)
+BOOTSTRAP_REPORT_COLUMNS = ['ticker', 'metric', 'estimate', 'lower', 'upper', 'standard_error']
+DEFAULT_RESAMPLES = 1000
+DEFAULT_CONFIDENCE_LEVEL = 0.95
+# Resamples per shard. Fixed, so that the shards (and their seeds) do not depend on the number of workers
+BOOTSTRAP_SHARD_RESAMPLES = 250
+
+
+def default_block_length(observations: int) -> int:
+    """Returns - the rule of thumb block length T^(1/3) for T observations"""
+    return max(1, int(round(observations ** (1 / 3))))
+
+
+def block_bootstrap_indices(rng: np.random.Generator, resamples: int, observations: int, block_length: int) -> npt.NDArray[np.int64]:
+    """
+    Draws circular moving block bootstrap samples: blocks of block_length consecutive days starting at uniform random days,
+    wrapping around the end of the sample, until every resample has `observations` days
+
+    Returns - a (resamples x observations) matrix of day indices
+    """
+    blocks = -(-observations // block_length)
+    starts = rng.integers(0, observations, size=(resamples, blocks, 1))
+    indices: npt.NDArray[np.int64] = ((starts + np.arange(block_length)) % observations).reshape(resamples, -1)[:, :observations]
+    return indices
+
+
+def stationary_bootstrap_indices(rng: np.random.Generator, resamples: int, observations: int, mean_block_length: float) -> npt.NDArray[np.int64]:
+    """
+    Draws stationary bootstrap samples: every day either continues the current block (with probability 1 - 1/mean_block_length)
+    or starts a new block at a uniform random day, so the block lengths are geometric with the given mean
+
+    Returns - a (resamples x observations) matrix of day indices
+    """
+    positions = np.arange(observations)
+    new_block = rng.random((resamples, observations)) < 1 / mean_block_length
+    new_block[:, 0] = True
+    block_start = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+    starts = rng.integers(0, observations, size=(resamples, observations))
+    indices: npt.NDArray[np.int64] = (np.take_along_axis(starts, block_start, axis=1) + positions - block_start) % observations
+    return indices
+
+
+def resample_counts(indices: npt.NDArray[np.int64], observations: int) -> npt.NDArray[np.float64]:
+    """Returns - a (resamples x observations) matrix of how many times every day appears in every resample"""
+    resamples = indices.shape[0]
+    offsets = (np.arange(resamples) * observations)[:, None]
+    counts = np.bincount((indices + offsets).ravel(), minlength=resamples * observations)
+    return counts.reshape(resamples, observations).astype(np.float64)
+
+
+def prepare_return_panel(asset_close: npt.ArrayLike, benchmark_close: npt.ArrayLike) -> Dict[str, npt.NDArray[np.float64]]:
+    """
+    Turns (T x N) asset and (T,) benchmark close prices into the masked per-day terms whose sums are the PairMomentSums: the
+    asset returns and squares, the benchmark returns and squares (repeated per asset under its mask) and the log cross products
+
+    Returns - a dict of (T - 1 x N) arrays keyed like the fields of PairMomentSums
+    """
+    asset_prices = np.asarray(asset_close, dtype=np.float64)
+    if asset_prices.ndim == 1:
+        asset_prices = asset_prices[:, None]
+    benchmark_prices = np.asarray(benchmark_close, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asset_simple = asset_prices[1:] / asset_prices[:-1] - 1
+        benchmark_simple = (benchmark_prices[1:] / benchmark_prices[:-1] - 1)[:, None]
+        asset_log = np.log1p(asset_simple)
+        benchmark_log = np.log1p(benchmark_simple)
+
+    mask = np.isfinite(asset_simple) & np.isfinite(asset_log) & np.isfinite(benchmark_simple) & np.isfinite(benchmark_log)
+    weights = mask.astype(np.float64)
+
+    def masked(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return np.where(mask, values, 0.0)
+
+    return {
+        'n': weights,
+        'asset_simple': masked(asset_simple),
+        'asset_simple_squares': masked(asset_simple ** 2),
+        'asset_log': masked(asset_log),
+        'asset_log_squares': masked(asset_log ** 2),
+        'benchmark_simple': masked(benchmark_simple * weights),
+        'benchmark_simple_squares': masked(benchmark_simple ** 2 * weights),
+        'benchmark_log': masked(benchmark_log * weights),
+        'benchmark_log_squares': masked(benchmark_log ** 2 * weights),
+        'log_cross_products': masked(asset_log * benchmark_log),
+    }
+
+
+def _bootstrap_shard(
+    seed_sequence: np.random.SeedSequence,
+    resamples: int,
+    method: str,
+    block_length: float,
+    panel: Dict[str, npt.NDArray[np.float64]]
+) -> Dict[str, npt.NDArray[np.float64]]:
+    """Evaluates the metrics of one shard of resamples. Runs in a worker process"""
+    rng = np.random.default_rng(seed_sequence)
+    observations = panel['n'].shape[0]
+    if method == 'block':
+        indices = block_bootstrap_indices(rng, resamples, observations, max(1, round(block_length)))
+    else:
+        indices = stationary_bootstrap_indices(rng, resamples, observations, block_length)
+    counts = resample_counts(indices, observations)
+    metrics = derive_metrics_from_moment_sums(PairMomentSums(**{name: counts @ terms for name, terms in panel.items()}))
+    return {metric: metrics[metric] for metric in BOOTSTRAP_METRICS}
+
+
+def bootstrap_pair_metrics(
+    asset_close: pd.DataFrame | pd.Series,
+    benchmark_close: pd.Series,
+    method: str = 'stationary',
+    resamples: int = DEFAULT_RESAMPLES,
+    block_length: float | None = None,
+    confidence_level: float = DEFAULT_CONFIDENCE_LEVEL,
+    seed: int | None = None,
+    workers: int | None = 1
+) -> pd.DataFrame:
+    """
+    Calculates percentile bootstrap confidence intervals of the ticker vs benchmark metrics for one or many tickers
+
+    Description:
+    All tickers share the same resampled days, so the moment sums of a shard of resamples are (shard x T) @ (T x N) matrix
+    products. The shards run on a process pool when workers > 1. Missing prices are masked per ticker like in
+    compute_cross_sectional_metrics
+
+    Args:
+    asset_close - (T x N) close prices, one column per ticker (or a single series), aligned with the benchmark
+    method - 'stationary' (geometric block lengths with mean block_length) or 'block' (fixed length circular blocks)
+    block_length - the (mean) block length in days (at least 1, rounded for fixed blocks), T^(1/3) by default
+    workers - number of worker processes, None for every core
+
+    Returns:
+    A long dataframe with one row per ticker and metric: the point estimate, the lower and upper bounds of the interval and the
+    bootstrap standard error (see BOOTSTRAP_REPORT_COLUMNS)
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f'Unknown bootstrap method: {method}. Choose from {BOOTSTRAP_METHODS}')
+    if resamples < 2 or not 0 < confidence_level < 1:
+        raise ValueError('At least 2 resamples and a confidence level in (0, 1) are needed')
+
+    frame = asset_close.to_frame(name=asset_close.name or 'ticker') if isinstance(asset_close, pd.Series) else asset_close
+    panel = prepare_return_panel(frame.to_numpy(dtype=np.float64), benchmark_close.to_numpy(dtype=np.float64))
+    observations = panel['n'].shape[0]
+    if observations < 2:
+        raise ValueError('At least 3 aligned prices are needed to bootstrap the metrics')
+    if block_length is None:
+        block_length = default_block_length(observations)
+    elif not block_length >= 1:
+        raise ValueError(f'The block length must be at least 1 day, got {block_length}')
+
+    shard_sizes = [min(BOOTSTRAP_SHARD_RESAMPLES, resamples - start) for start in range(0, resamples, BOOTSTRAP_SHARD_RESAMPLES)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(shard_sizes))
+    task_arguments = [(sequence, size, method, block_length, panel) for sequence, size in zip(seed_sequences, shard_sizes)]
+    workers = min(workers or os.cpu_count() or 1, len(shard_sizes))
+    logger.info('Bootstrapping %d tickers with %d %s resamples in %d shards on %d workers', frame.shape[1], resamples, method, len(shard_sizes), workers)
+    shards: List[Dict[str, npt.NDArray[np.float64]]]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(executor.map(_bootstrap_shard, *zip(*task_arguments)))
+    else:
+        shards = [_bootstrap_shard(*arguments) for arguments in task_arguments]
+
+    point_estimates = derive_metrics_from_moment_sums(PairMomentSums(**{name: terms.sum(axis=0) for name, terms in panel.items()}))
+    tail = (1 - confidence_level) / 2
+    rows: List[Tuple[Any, ...]] = []
+    for metric in BOOTSTRAP_METRICS:
+        replicates = np.concatenate([shard[metric] for shard in shards])
+        with np.errstate(invalid='ignore'):
+            finite = np.isfinite(replicates).sum(axis=0) > 1
+            lower, upper = np.nanquantile(np.where(finite, replicates, 0.0), [tail, 1 - tail], axis=0)
+            standard_error = np.nanstd(np.where(finite, replicates, 0.0), axis=0, ddof=1)
+        for column, ticker in enumerate(frame.columns):
+            if finite[column]:
+                rows.append((ticker, metric, point_estimates[metric][column], lower[column], upper[column], standard_error[column]))
+            else:
+                rows.append((ticker, metric, point_estimates[metric][column], np.nan, np.nan, np.nan))
+    return pd.DataFrame(rows, columns=BOOTSTRAP_REPORT_COLUMNS)
+
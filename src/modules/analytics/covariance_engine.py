@@ -0,0 +1,306 @@
+"""
+This file is responsible for the covariance and correlation matrices of a whole ticker universe. The matrices are built block by
+block from pairwise-complete observations, with optional EWMA weighting and Ledoit-Wolf shrinkage
+"""
+import hashlib
+import io
+import logging
+from typing import List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.data_loader.data_loader import DataLoader
+
+logger = logging.getLogger("analytics")
+
+DEFAULT_BLOCK_SIZE = 256
+
+
+def ewma_weights(observations: int, halflife: float | None) -> npt.NDArray[np.float64]:
+    """
+    Builds the observation weights. Without a halflife every observation gets a weight of 1, otherwise the weight decays by
+    half every halflife observations going back from the most recent one
+
+    Returns - a (T,) array of weights
+    """
+    if halflife is None:
+        return np.ones(observations, dtype=np.float64)
+    if halflife <= 0:
+        raise ValueError('The EWMA halflife must be positive')
+    decay = 0.5 ** (1.0 / halflife)
+    weights: npt.NDArray[np.float64] = decay ** np.arange(observations - 1, -1, -1, dtype=np.float64)
+    return weights
+
+
+def _pairwise_moments(
+    returns_matrix: npt.NDArray[np.float64],
+    weights: npt.NDArray[np.float64],
+    block_size: int
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Fills the pairwise-complete covariance and correlation matrices one (block_size x block_size) block of columns at a time.
+    For a pair of column blocks, the weighted pair counts, pair sums, sums of squares and cross-products are all matrix products
+    of the zero-filled returns and their masks, so the intermediate memory is O(T x block_size) no matter how large N gets
+
+    Returns - a tuple of (covariance matrix, correlation matrix)
+    """
+    observations, assets = returns_matrix.shape
+    mask = np.isfinite(returns_matrix)
+    filled = np.where(mask, returns_matrix, 0.0)
+    squared = filled ** 2
+    mask_float = mask.astype(np.float64)
+
+    covariance = np.full((assets, assets), np.nan, dtype=np.float64)
+    correlation = np.full((assets, assets), np.nan, dtype=np.float64)
+    for i_start in range(0, assets, block_size):
+        i_block = slice(i_start, min(i_start + block_size, assets))
+        weighted_mask_i = weights[:, None] * mask_float[:, i_block]
+        weighted_values_i = weights[:, None] * filled[:, i_block]
+        weighted_squares_i = weights[:, None] * squared[:, i_block]
+        squared_weighted_mask_i = weights[:, None] * weighted_mask_i
+
+        for j_start in range(i_start, assets, block_size):
+            j_block = slice(j_start, min(j_start + block_size, assets))
+            pair_weight = weighted_mask_i.T @ mask_float[:, j_block]
+            pair_squared_weight = squared_weighted_mask_i.T @ mask_float[:, j_block]
+            sum_i = weighted_values_i.T @ mask_float[:, j_block]
+            sum_j = weighted_mask_i.T @ filled[:, j_block]
+            squares_i = weighted_squares_i.T @ mask_float[:, j_block]
+            squares_j = weighted_mask_i.T @ squared[:, j_block]
+            cross_product = weighted_values_i.T @ filled[:, j_block]
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                denominator = pair_weight - pair_squared_weight / pair_weight
+                covariance_block = (cross_product - sum_i * sum_j / pair_weight) / denominator
+                variance_i = (squares_i - sum_i ** 2 / pair_weight) / denominator
+                variance_j = (squares_j - sum_j ** 2 / pair_weight) / denominator
+                correlation_block = np.clip(covariance_block / np.sqrt(variance_i * variance_j), -1.0, 1.0)
+
+            invalid = (pair_weight <= 0) | ~(denominator > 0)
+            covariance_block[invalid] = np.nan
+            correlation_block[invalid | ~np.isfinite(correlation_block)] = np.nan
+
+            covariance[i_block, j_block] = covariance_block
+            covariance[j_block, i_block] = covariance_block.T
+            correlation[i_block, j_block] = correlation_block
+            correlation[j_block, i_block] = correlation_block.T
+
+    diagonal = np.diag(covariance)
+    np.fill_diagonal(correlation, np.where(diagonal > 0, 1.0, np.nan))
+    return covariance, correlation
+
+
+def compute_covariance_and_correlation(
+    returns: npt.ArrayLike,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    ewma_halflife: float | None = None,
+    shrinkage: str | None = None
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float]:
+    """
+    Calculates the covariance and correlation matrices of a (T x N) returns matrix using pairwise-complete observations
+
+    Description:
+    Every entry (i, j) only uses the rows where both column i and column j are finite, with the means and variances of that
+    common sample (the pandas DataFrame.cov / DataFrame.corr convention). With EWMA weights the estimate is the
+    reliability-weighted unbiased covariance, which reduces to the usual ddof = 1 estimate for equal weights.
+
+    Ledoit-Wolf shrinkage pulls the covariance matrix towards a scaled identity and the correlation matrix is then derived
+    from the shrunk covariance. The optimal intensity is estimated from the mean-centered returns with missing values set
+    to 0, which is exact for complete data
+
+    Args:
+    returns - (T x N) returns, NaN where missing
+    block_size - number of columns per block
+    ewma_halflife - optional halflife (in observations) for exponentially decaying weights
+    shrinkage - None or 'ledoit_wolf'
+
+    Returns:
+    A tuple of (N x N covariance matrix, N x N correlation matrix, applied shrinkage intensity). Pairs with fewer than 2
+    common observations are NaN
+    """
+    returns_matrix = np.asarray(returns, dtype=np.float64)
+    if returns_matrix.ndim != 2:
+        raise ValueError('returns must be a (T x N) matrix')
+    if shrinkage not in (None, 'ledoit_wolf'):
+        raise ValueError(f'Unknown shrinkage method: {shrinkage}')
+
+    observations, assets = returns_matrix.shape
+    weights = ewma_weights(observations, ewma_halflife)
+    covariance, correlation = _pairwise_moments(returns_matrix, weights, block_size)
+
+    applied_shrinkage = 0.0
+    if shrinkage == 'ledoit_wolf':
+        covariance, applied_shrinkage = _ledoit_wolf_shrink(covariance, returns_matrix, weights, block_size)
+        correlation = covariance_to_correlation(covariance)
+
+    logger.debug('Covariance matrix of %d assets from %d observations (shrinkage %.4f)', assets, observations, applied_shrinkage)
+    return covariance, correlation, applied_shrinkage
+
+
+def compute_covariance_matrix(
+    returns: npt.ArrayLike,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    ewma_halflife: float | None = None,
+    shrinkage: str | None = None
+) -> Tuple[npt.NDArray[np.float64], float]:
+    """
+    Calculates the pairwise-complete covariance matrix of a (T x N) returns matrix (see compute_covariance_and_correlation)
+
+    Returns - a tuple of (N x N covariance matrix, applied shrinkage intensity)
+    """
+    covariance, _, applied_shrinkage = compute_covariance_and_correlation(returns, block_size, ewma_halflife, shrinkage)
+    return covariance, applied_shrinkage
+
+
+def _ledoit_wolf_shrink(
+    covariance: npt.NDArray[np.float64],
+    returns_matrix: npt.NDArray[np.float64],
+    weights: npt.NDArray[np.float64],
+    block_size: int
+) -> Tuple[npt.NDArray[np.float64], float]:
+    """
+    Shrinks the covariance matrix towards mu * I (mu being the average variance) with the Ledoit-Wolf (2004) intensity
+
+    Returns - a tuple of (shrunk covariance matrix, shrinkage intensity)
+    """
+    observations, assets = returns_matrix.shape
+    mask = np.isfinite(returns_matrix)
+    filled = np.where(mask, returns_matrix, 0.0)
+    # Rescaling the rows by sqrt(weight) turns the weighted estimator into the plain one the Ledoit-Wolf formula expects
+    row_scale = np.sqrt(weights * observations / weights.sum())
+    column_sums = (weights[:, None] * filled).sum(axis=0)
+    column_weights = (weights[:, None] * mask).sum(axis=0)
+    column_means = np.divide(column_sums, column_weights, out=np.zeros(assets), where=column_weights > 0)
+    centered = np.where(mask, filled - column_means, 0.0) * row_scale[:, None]
+
+    # Frobenius norm of the biased sample covariance, accumulated block by block
+    squared_norm = 0.0
+    for i_start in range(0, assets, block_size):
+        i_block = slice(i_start, min(i_start + block_size, assets))
+        block_product = centered[:, i_block].T @ centered / observations
+        squared_norm += float((block_product ** 2).sum())
+
+    row_squared_norms = (centered ** 2).sum(axis=1)
+    pi_hat = (float((row_squared_norms ** 2).sum()) / observations - squared_norm) / observations
+
+    finite_covariance = np.nan_to_num(covariance, nan=0.0)
+    mu = float(np.trace(finite_covariance)) / assets
+    target_distance = float(((finite_covariance - mu * np.eye(assets)) ** 2).sum())
+    if target_distance <= 0:
+        return covariance, 0.0
+
+    intensity = float(np.clip(pi_hat / target_distance, 0.0, 1.0))
+    shrunk = (1 - intensity) * covariance
+    shrunk[np.diag_indices(assets)] += intensity * mu
+    return shrunk, intensity
+
+
+def covariance_to_correlation(covariance: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    Converts a covariance matrix into a correlation matrix
+
+    Returns - the (N x N) correlation matrix, NaN where a variance is missing or 0
+    """
+    standard_deviations = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.outer(standard_deviations, standard_deviations)
+    correlation[~np.isfinite(correlation)] = np.nan
+    np.fill_diagonal(correlation, np.where(standard_deviations > 0, 1.0, np.nan))
+    clipped_correlation: npt.NDArray[np.float64] = np.clip(correlation, -1.0, 1.0)
+    return clipped_correlation
+
+
+class CovarianceEngine:
+    """
+    Serves covariance and correlation matrices of the daily log returns of a ticker universe loaded from the price_data table.
+    Matrices are cached in the covariance_cache table per ticker list, date range, estimator settings and data version, so a
+    request over unchanged data is answered without recomputing
+    """
+
+    def __init__(self, data_loader: DataLoader, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self.data_loader = data_loader
+        self.block_size = block_size
+
+    def get_matrices(
+        self,
+        tickers: List[str],
+        start_ts: int,
+        end_ts: int,
+        ewma_halflife: float | None = None,
+        shrinkage: str | None = None
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetches the covariance and correlation matrices of the tickers' daily log returns between the two unix epochs
+
+        Returns - a tuple of (covariance, correlation) dataframes, each (N x N) and labelled by ticker on both axes
+        """
+        tickers = list(dict.fromkeys(tickers))
+        data_version = self.data_loader.get_price_data_version(tickers, start_ts, end_ts)
+        cache_key = self._cache_key(tickers, start_ts, end_ts, ewma_halflife, shrinkage, data_version)
+
+        cached_matrices = self.data_loader.get_cached_covariance_matrix(cache_key)
+        if cached_matrices is not None:
+            logger.info('Covariance cache hit for %d tickers (key: %s)', len(tickers), cache_key)
+            covariance, correlation = _deserialize_matrices(cached_matrices)
+        else:
+            price_panel = self.data_loader.get_price_panel(tickers, start_ts, end_ts)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_returns = np.diff(np.log(price_panel.to_numpy(dtype=np.float64)), axis=0)
+            covariance, correlation, intensity = compute_covariance_and_correlation(log_returns, self.block_size, ewma_halflife, shrinkage)
+            logger.info('Covariance matrix computed for %d tickers (shrinkage intensity: %s)', len(tickers), intensity)
+            self.data_loader.save_covariance_matrix(cache_key, tickers, start_ts, end_ts, data_version, _serialize_matrices(covariance, correlation))
+
+        return (
+            pd.DataFrame(covariance, index=tickers, columns=tickers),
+            pd.DataFrame(correlation, index=tickers, columns=tickers),
+        )
+
+    def get_covariance_matrix(
+        self,
+        tickers: List[str],
+        start_ts: int,
+        end_ts: int,
+        ewma_halflife: float | None = None,
+        shrinkage: str | None = None
+    ) -> pd.DataFrame:
+        """Returns - the (N x N) covariance matrix of the tickers' daily log returns"""
+        return self.get_matrices(tickers, start_ts, end_ts, ewma_halflife, shrinkage)[0]
+
+    def get_correlation_matrix(
+        self,
+        tickers: List[str],
+        start_ts: int,
+        end_ts: int,
+        ewma_halflife: float | None = None,
+        shrinkage: str | None = None
+    ) -> pd.DataFrame:
+        """Returns - the (N x N) correlation matrix of the tickers' daily log returns"""
+        return self.get_matrices(tickers, start_ts, end_ts, ewma_halflife, shrinkage)[1]
+
+    @staticmethod
+    def _cache_key(
+        tickers: List[str],
+        start_ts: int,
+        end_ts: int,
+        ewma_halflife: float | None,
+        shrinkage: str | None,
+        data_version: str
+    ) -> str:
+        """Hashes everything that determines the matrix into the key of the covariance_cache table"""
+        key_source = f"{','.join(tickers)}|{start_ts}|{end_ts}|{ewma_halflife}|{shrinkage}|{data_version}"
+        return hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+
+
+def _serialize_matrices(covariance: npt.NDArray[np.float64], correlation: npt.NDArray[np.float64]) -> bytes:
+    """Stores both matrices in the .npz format so they can be saved as a single BLOB"""
+    buffer = io.BytesIO()
+    np.savez(buffer, covariance=covariance, correlation=correlation)
+    return buffer.getvalue()
+
+
+def _deserialize_matrices(blob: bytes) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Reads back the (covariance, correlation) matrices saved by _serialize_matrices"""
+    matrices = np.load(io.BytesIO(blob), allow_pickle=False)
+    return matrices['covariance'], matrices['correlation']
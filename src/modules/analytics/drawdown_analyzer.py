@@ -0,0 +1,165 @@
+"""
+This file is responsible for the drawdown (path-dependent risk) analytics of single tickers, portfolio NAVs and whole
+universes. Every metric comes from a few running scans over the (T x N) price matrix - the running peak, the index of the last
+peak and the index of the next recovery - so screening thousands of tickers needs no per-ticker Python loop
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.metrics_kernel import TRADING_DAYS_PER_YEAR
+
+logger = logging.getLogger("analytics")
+
+DRAWDOWN_METRICS = (
+    'max_drawdown',
+    'peak_date',
+    'trough_date',
+    'recovery_date',
+    'max_drawdown_duration',
+    'time_to_recovery',
+    'longest_drawdown_duration',
+    'current_drawdown',
+    'annualized_return',
+    'calmar_ratio',
+    'ulcer_index',
+)
+# The drawdown metrics persisted next to the other metrics in the analysis_results table
+ANALYSIS_RESULTS_DRAWDOWN_METRICS = ('max_drawdown', 'max_drawdown_duration', 'time_to_recovery', 'calmar_ratio', 'ulcer_index')
+
+
+@dataclass(frozen=True)
+class DrawdownScan:
+    """
+    Running scans of a (T x N) price matrix
+
+    underwater - price / running peak - 1, zero at new highs and NaN before the first price of a column
+    last_peak - row index of the latest running peak at or before every row
+    next_recovery - row index of the first row at or after every row that is back at the running peak (T when it never is)
+    """
+    underwater: npt.NDArray[np.float64]
+    last_peak: npt.NDArray[np.int64]
+    next_recovery: npt.NDArray[np.int64]
+
+
+def scan_drawdowns(prices: npt.ArrayLike) -> DrawdownScan:
+    """
+    Runs the running-max scans over the columns of a (T x N) price matrix (a (T,) series is treated as one column). NaNs
+    before the first price of a column are skipped, later gaps should be forward filled by the caller
+
+    Returns - the DrawdownScan of the prices
+    """
+    values = np.asarray(prices, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    rows = np.arange(values.shape[0])[:, None]
+
+    running_peak = np.fmax.accumulate(values, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        underwater = values / running_peak - 1
+    at_peak = underwater >= 0
+    last_peak = np.maximum.accumulate(np.where(at_peak, rows, 0), axis=0)
+    next_recovery = np.minimum.accumulate(np.where(at_peak, rows, values.shape[0])[::-1], axis=0)[::-1]
+    return DrawdownScan(underwater=underwater, last_peak=last_peak, next_recovery=next_recovery)
+
+
+def calculate_underwater_curve(prices: pd.DataFrame | pd.Series) -> pd.DataFrame:
+    """
+    Calculates the underwater curve (the drawdown from the running peak, as a non-positive fraction) of every column
+
+    Returns - a dataframe shaped like the prices
+    """
+    frame = prices.to_frame() if isinstance(prices, pd.Series) else prices
+    return pd.DataFrame(scan_drawdowns(frame.to_numpy(dtype=np.float64)).underwater, index=frame.index, columns=frame.columns)
+
+
+def calculate_drawdown_metrics(prices: pd.DataFrame | pd.Series, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> pd.DataFrame:
+    """
+    Calculates the drawdown metrics of every column of a price (or NAV) panel
+
+    Description:
+    max_drawdown - the deepest fall from a running peak, as a positive fraction
+    peak_date / trough_date / recovery_date - the dates of the peak, the trough and the recovery of the maximum drawdown
+    (NaT recovery when the price never got back to the peak)
+    max_drawdown_duration - periods from the peak of the maximum drawdown to its recovery (or to the last row)
+    time_to_recovery - periods from the trough of the maximum drawdown to its recovery (NaN when not recovered)
+    longest_drawdown_duration - the longest stretch of periods spent below a running peak
+    annualized_return / calmar_ratio - the compound annual growth rate and its ratio to the maximum drawdown
+    ulcer_index - the root mean square of the drawdowns
+
+    Returns - a dataframe with one row per column of the prices and one column per metric (see DRAWDOWN_METRICS)
+    """
+    frame = prices.to_frame() if isinstance(prices, pd.Series) else prices
+    values = frame.to_numpy(dtype=np.float64)
+    rows, columns = values.shape
+    scan = scan_drawdowns(values)
+    column_index = np.arange(columns)
+
+    observed = ~np.isnan(scan.underwater)
+    observations = observed.sum(axis=0)
+    has_data = observations > 0
+    first_row = np.where(has_data, observed.argmax(axis=0), 0)
+    last_row = np.where(has_data, rows - 1 - observed[::-1].argmax(axis=0), 0)
+
+    drawdowns = np.where(observed, 0.0 - scan.underwater, 0.0)
+    trough = drawdowns.argmax(axis=0)
+    max_drawdown = drawdowns[trough, column_index]
+    peak = scan.last_peak[trough, column_index]
+    recovery = scan.next_recovery[trough, column_index]
+    in_drawdown = max_drawdown > 0
+    recovered = (recovery < rows) & in_drawdown
+
+    below_peak_stretch = np.where(observed & (drawdowns > 0), np.arange(rows)[:, None] - scan.last_peak, 0)
+    first_price = values[first_row, column_index]
+    last_price = values[last_row, column_index]
+    years = (last_row - first_row) / periods_per_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annualized_return = np.where(years > 0, (last_price / first_price) ** (1 / np.where(years > 0, years, 1)) - 1, np.nan)
+        calmar_ratio = np.where(max_drawdown > 0, annualized_return / max_drawdown, np.nan)
+        ulcer_index = np.sqrt((drawdowns ** 2).sum(axis=0) / observations)
+
+    dates = frame.index
+    metrics = pd.DataFrame(
+        {
+            'max_drawdown': max_drawdown,
+            'peak_date': pd.Series(dates[peak]).where(in_drawdown).to_numpy(),
+            'trough_date': pd.Series(dates[trough]).where(in_drawdown).to_numpy(),
+            'recovery_date': pd.Series(dates[np.minimum(recovery, rows - 1)]).where(recovered).to_numpy(),
+            'max_drawdown_duration': np.where(in_drawdown, np.where(recovered, recovery, last_row) - peak, 0),
+            'time_to_recovery': np.where(recovered, recovery - trough, np.nan),
+            'longest_drawdown_duration': below_peak_stretch.max(axis=0, initial=0),
+            'current_drawdown': drawdowns[last_row, column_index],
+            'annualized_return': annualized_return,
+            'calmar_ratio': calmar_ratio,
+            'ulcer_index': ulcer_index,
+        },
+        index=frame.columns
+    )
+    # Columns without a single price have no drawdown to report
+    if not has_data.all():
+        metrics.loc[~has_data, :] = np.nan
+    logger.debug('Drawdown metrics computed for %d series over %d periods', columns, rows)
+    return metrics
+
+
+def drawdown_summary(metrics_row: pd.Series) -> Dict[str, float | int | None]:
+    """
+    Picks the drawdown metrics stored in the analysis_results table from one row of calculate_drawdown_metrics, with missing
+    values as None and durations as whole periods
+
+    Returns - a dict with the max_drawdown, max_drawdown_duration, time_to_recovery, calmar_ratio and ulcer_index
+    """
+    summary: Dict[str, float | int | None] = {}
+    for key in ANALYSIS_RESULTS_DRAWDOWN_METRICS:
+        value = metrics_row[key]
+        if pd.isna(value):
+            summary[key] = None
+        elif key in ('max_drawdown_duration', 'time_to_recovery'):
+            summary[key] = int(value)
+        else:
+            summary[key] = float(value)
+    return summary
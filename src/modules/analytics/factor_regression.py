@@ -0,0 +1,179 @@
+"""
+This file holds the batched multi-factor regression engine. Every ticker's excess returns are regressed on the same K factors
+(a market benchmark, sector indices or custom factor series):
+
+    r_i - rf = alpha_i + beta_i1 * f_1 + ... + beta_iK * f_K + e_i
+
+Instead of one least-squares solve per ticker, the factor matrix X = [1, F] is QR factorized once and all tickers are solved
+together: the coefficients are R^-1 Q^T Y for the whole (T x N) return matrix Y, and the standard errors come from the shared
+(X^T X)^-1 = R^-1 R^-T. Tickers with gaps are grouped by their pattern of missing rows, with one factorization per pattern
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.metrics_kernel import ANNUALIZED_RISK_FREE_RATE, TRADING_DAYS_PER_YEAR
+
+logger = logging.getLogger("analytics")
+
+FACTOR_REGRESSION_COLUMNS = ('alpha', 'alpha_t_stat', 'r_squared', 'adjusted_r_squared', 'residual_volatility', 'observations')
+
+
+@dataclass(frozen=True)
+class FactorRegressionResult:
+    """
+    Regression output of N tickers on K factors
+
+    alpha - annualized intercepts, one per ticker
+    betas / beta_t_stats / beta_standard_errors - (N x K) factor loadings, their t-statistics and standard errors
+    alpha_t_stat - t-statistics of the intercepts
+    r_squared / adjusted_r_squared - share of the excess return variance explained by the factors
+    residual_volatility - annualized standard deviation of the residuals (the idiosyncratic risk)
+    observations - number of periods used per ticker
+    """
+    alpha: pd.Series
+    alpha_t_stat: pd.Series
+    betas: pd.DataFrame
+    beta_t_stats: pd.DataFrame
+    beta_standard_errors: pd.DataFrame
+    r_squared: pd.Series
+    adjusted_r_squared: pd.Series
+    residual_volatility: pd.Series
+    observations: pd.Series
+
+    def summary(self) -> pd.DataFrame:
+        """Returns - one row per ticker with the alpha statistics, the fit statistics, the betas and their t-statistics"""
+        summary = pd.DataFrame({name: getattr(self, name) for name in FACTOR_REGRESSION_COLUMNS})
+        return summary.join(self.betas.add_prefix('beta_')).join(self.beta_t_stats.add_prefix('t_stat_'))
+
+
+def daily_risk_free_rates(index: pd.Index, risk_free_rate: float | pd.Series, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> npt.NDArray[np.float64]:
+    """
+    Converts an annualized risk-free rate - a constant or a series of annual rates over time - into per-period rates on the
+    given index (a time varying rate is forward filled onto the index)
+
+    Returns - a (T,) array of per-period risk-free rates
+    """
+    if isinstance(risk_free_rate, pd.Series):
+        annual_rates = risk_free_rate.reindex(risk_free_rate.index.union(index)).ffill().reindex(index).to_numpy(dtype=np.float64)
+        if np.isnan(annual_rates).any():
+            raise ValueError('The risk-free rate series must start on or before the first return date')
+    else:
+        annual_rates = np.full(len(index), float(risk_free_rate))
+    rates: npt.NDArray[np.float64] = (1 + annual_rates) ** (1 / periods_per_year) - 1
+    return rates
+
+
+def _solve_shared_design(
+    design: npt.NDArray[np.float64],
+    targets: npt.NDArray[np.float64]
+) -> Dict[str, npt.NDArray[np.float64]]:
+    """
+    Solves the least-squares problems of all target columns against one (T x P) design matrix with a single QR factorization
+
+    Returns - the (P x N) coefficients and standard errors, and the (N,) residual and total sums of squares
+    """
+    observations, parameters = design.shape
+    q, r = np.linalg.qr(design)
+    projections = q.T @ targets
+    coefficients = np.linalg.solve(r, projections)
+    residuals = targets - q @ projections
+    residual_sum_of_squares = np.einsum('tn,tn->n', residuals, residuals)
+
+    r_inverse = np.linalg.solve(r, np.eye(parameters))
+    unscaled_variances = np.einsum('pk,pk->p', r_inverse, r_inverse)
+    degrees_of_freedom = observations - parameters
+    residual_variance = residual_sum_of_squares / degrees_of_freedom if degrees_of_freedom > 0 else np.full(targets.shape[1], np.nan)
+    standard_errors = np.sqrt(np.outer(unscaled_variances, residual_variance))
+
+    centered = targets - targets.mean(axis=0)
+    return {
+        'coefficients': coefficients,
+        'standard_errors': standard_errors,
+        'residual_sum_of_squares': residual_sum_of_squares,
+        'total_sum_of_squares': np.einsum('tn,tn->n', centered, centered),
+    }
+
+
+def regress_on_factors(
+    asset_returns: pd.DataFrame,
+    factor_returns: pd.DataFrame,
+    risk_free_rate: float | pd.Series = ANNUALIZED_RISK_FREE_RATE,
+    excess_factors: Sequence[str] | None = None,
+    periods_per_year: int = TRADING_DAYS_PER_YEAR
+) -> FactorRegressionResult:
+    """
+    Regresses the excess returns of every ticker on the factors
+
+    Description:
+    Periods where any factor is missing are dropped for everyone. The remaining tickers are grouped by the periods they have
+    data for (usually all of them, or a later listing date), and every group is solved with one QR factorization of its
+    factor rows. Tickers with fewer observations than parameters get NaN results
+
+    Args:
+    asset_returns - (T x N) periodic returns, one column per ticker
+    factor_returns - (T x K) periodic factor returns on the same index
+    risk_free_rate - annualized risk-free rate, a constant or a time series of annual rates
+    excess_factors - factors that are returns of traded assets (e.g. a market index) and are turned into excess returns like
+    the tickers. Defaults to every factor; pass [] when the factors are already excess or long-short returns
+
+    Returns - the FactorRegressionResult of all tickers
+    """
+    factor_returns = factor_returns.reindex(asset_returns.index)
+    complete_factor_rows = factor_returns.notna().all(axis=1).to_numpy()
+    index = asset_returns.index[complete_factor_rows]
+    risk_free = daily_risk_free_rates(index, risk_free_rate, periods_per_year)
+
+    factors = factor_returns.to_numpy(dtype=np.float64)[complete_factor_rows]
+    excess_factors = list(factor_returns.columns) if excess_factors is None else list(excess_factors)
+    unknown_factors = [factor for factor in excess_factors if factor not in factor_returns.columns]
+    if unknown_factors:
+        raise ValueError(f'Unknown excess factors: {unknown_factors}')
+    excess_columns = factor_returns.columns.get_indexer(pd.Index(excess_factors))
+    factors[:, excess_columns] -= risk_free[:, None]
+    excess_returns = asset_returns.to_numpy(dtype=np.float64)[complete_factor_rows] - risk_free[:, None]
+
+    tickers, factor_names = asset_returns.columns, factor_returns.columns
+    parameters = len(factor_names) + 1
+    coefficients = np.full((parameters, len(tickers)), np.nan)
+    standard_errors = np.full((parameters, len(tickers)), np.nan)
+    residual_sum_of_squares = np.full(len(tickers), np.nan)
+    total_sum_of_squares = np.full(len(tickers), np.nan)
+
+    available = np.isfinite(excess_returns)
+    observations = available.sum(axis=0)
+    patterns, pattern_of_ticker = np.unique(np.packbits(available, axis=0), axis=1, return_inverse=True)
+    for pattern in range(patterns.shape[1]):
+        columns = np.flatnonzero(pattern_of_ticker.ravel() == pattern)
+        rows = available[:, columns[0]]
+        if rows.sum() <= parameters:
+            continue
+        design = np.column_stack([np.ones(rows.sum()), factors[rows]])
+        solution = _solve_shared_design(design, excess_returns[np.ix_(rows, columns)])
+        coefficients[:, columns] = solution['coefficients']
+        standard_errors[:, columns] = solution['standard_errors']
+        residual_sum_of_squares[columns] = solution['residual_sum_of_squares']
+        total_sum_of_squares[columns] = solution['total_sum_of_squares']
+    logger.debug('Regressed %d tickers on %d factors with %d factorizations', len(tickers), len(factor_names), patterns.shape[1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stats = coefficients / standard_errors
+        r_squared = 1 - residual_sum_of_squares / total_sum_of_squares
+        adjusted_r_squared = 1 - (1 - r_squared) * (observations - 1) / (observations - parameters)
+        residual_volatility = np.sqrt(residual_sum_of_squares / (observations - parameters) * periods_per_year)
+
+    return FactorRegressionResult(
+        alpha=pd.Series(coefficients[0] * periods_per_year, index=tickers),
+        alpha_t_stat=pd.Series(t_stats[0], index=tickers),
+        betas=pd.DataFrame(coefficients[1:].T, index=tickers, columns=factor_names),
+        beta_t_stats=pd.DataFrame(t_stats[1:].T, index=tickers, columns=factor_names),
+        beta_standard_errors=pd.DataFrame(standard_errors[1:].T, index=tickers, columns=factor_names),
+        r_squared=pd.Series(r_squared, index=tickers),
+        adjusted_r_squared=pd.Series(adjusted_r_squared, index=tickers),
+        residual_volatility=pd.Series(residual_volatility, index=tickers),
+        observations=pd.Series(observations, index=tickers),
+    )
@@ -0,0 +1,225 @@
+"""
+This file holds the fused metrics kernel. Instead of every metric rescanning the ticker and benchmark columns, the return series
+are stacked once and reduced to their sufficient statistics (count, sums and the matrix of cross-products). Every metric of
+AnalysisModule.compute_metrics is then derived from those statistics
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import numpy as np
+import numpy.typing as npt
+
+logger = logging.getLogger("analytics")
+
+TRADING_DAYS_PER_YEAR = 252
+ANNUALIZED_RISK_FREE_RATE = 0.05
+DAILY_RISK_FREE_RATE = (1 + ANNUALIZED_RISK_FREE_RATE) ** (1 / TRADING_DAYS_PER_YEAR) - 1
+
+# Row order of the stacked return series
+TICKER_SIMPLE, BENCHMARK_SIMPLE, TICKER_LOG, BENCHMARK_LOG = range(4)
+
+
+@dataclass(frozen=True)
+class ReturnStatistics:
+    """
+    Sufficient statistics of the stacked return series (ticker simple, benchmark simple, ticker log, benchmark log)
+
+    n - number of observations used
+    sums - the sum of every series, shape (4,)
+    cross_products - the sum of products between every pair of series, shape (4, 4). The diagonal holds the sums of squares
+    """
+    n: int
+    sums: npt.NDArray[np.float64]
+    cross_products: npt.NDArray[np.float64]
+
+    def mean(self, series: int) -> float:
+        """Returns the sample mean of a single series"""
+        return float(self.sums[series] / self.n)
+
+    def covariance(self, first: int, second: int) -> float:
+        """Returns the sample covariance (ddof = 1) between two series"""
+        if self.n < 2:
+            raise ValueError('At least 2 observations are needed to calculate a sample covariance')
+        centered_cross_product = self.cross_products[first, second] - self.sums[first] * self.sums[second] / self.n
+        return float(centered_cross_product / (self.n - 1))
+
+    def variance(self, series: int) -> float:
+        """Returns the sample variance (ddof = 1) of a single series"""
+        return max(self.covariance(series, series), 0.0)
+
+
+def stack_return_series(ticker_close: npt.ArrayLike, benchmark_close: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """
+    Builds the simple and log returns of both close price arrays in one vectorized pass
+
+    Returns - a (4, T - 1) array ordered as TICKER_SIMPLE, BENCHMARK_SIMPLE, TICKER_LOG, BENCHMARK_LOG
+    """
+    prices = np.vstack([np.asarray(ticker_close, dtype=np.float64), np.asarray(benchmark_close, dtype=np.float64)])
+    if prices.shape[1] < 2:
+        raise ValueError('At least 2 closing prices are needed to compute returns')
+
+    simple_returns = prices[:, 1:] / prices[:, :-1] - 1
+    return np.vstack([simple_returns, np.log1p(simple_returns)])
+
+
+def summarize_return_series(return_series: npt.NDArray[np.float64]) -> ReturnStatistics:
+    """
+    Reduces the stacked return series to their sufficient statistics. Observations where any of the series is not finite are
+    dropped, so every statistic is computed over the same sample
+
+    Returns - the ReturnStatistics of the stacked series
+    """
+    complete_observations = np.isfinite(return_series).all(axis=0)
+    observations = return_series[:, complete_observations]
+    return ReturnStatistics(
+        n=int(observations.shape[1]),
+        sums=observations.sum(axis=1),
+        cross_products=observations @ observations.T,
+    )
+
+
+def compute_return_statistics(ticker_close: npt.ArrayLike, benchmark_close: npt.ArrayLike) -> ReturnStatistics:
+    """Computes the sufficient statistics straight from the two close price arrays"""
+    return summarize_return_series(stack_return_series(ticker_close, benchmark_close))
+
+
+def derive_pair_metrics(stats: ReturnStatistics) -> Dict[str, Any]:
+    """
+    Derives every ticker vs benchmark metric from the sufficient statistics. Volatility uses the simple returns, while beta,
+    alpha, Sharpe ratio and correlation use the log returns - the same conventions as the functions in returns_analyzer
+
+    Returns - a dict with the cumulative returns, annualized volatilities, beta, log returns alpha, Sharpe ratio and correlation
+    """
+    benchmark_log_variance = stats.variance(BENCHMARK_LOG)
+    if benchmark_log_variance == 0:
+        raise ZeroDivisionError('Benchmark variance is 0. Please calculate again!')
+
+    ticker_log_variance = stats.variance(TICKER_LOG)
+    log_covariance = stats.covariance(TICKER_LOG, BENCHMARK_LOG)
+    beta = log_covariance / benchmark_log_variance
+
+    ticker_log_mean = stats.mean(TICKER_LOG)
+    log_returns_alpha = (ticker_log_mean - beta * stats.mean(BENCHMARK_LOG)) * TRADING_DAYS_PER_YEAR
+    sharpe_ratio = (ticker_log_mean - DAILY_RISK_FREE_RATE) / np.sqrt(ticker_log_variance) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    correlation = log_covariance / np.sqrt(ticker_log_variance * benchmark_log_variance)
+
+    metrics = {
+        # The sum of log returns telescopes to log(last / first), so the cumulative return needs no extra scan of the prices
+        'cummulative_returns': (float(np.expm1(stats.sums[TICKER_LOG])), float(np.expm1(stats.sums[BENCHMARK_LOG]))),
+        'ticker_annualized_volatility': float(np.sqrt(stats.variance(TICKER_SIMPLE) * TRADING_DAYS_PER_YEAR)),
+        'benchmark_annualized_volatility': float(np.sqrt(stats.variance(BENCHMARK_SIMPLE) * TRADING_DAYS_PER_YEAR)),
+        'beta': float(beta),
+        'log_returns_alpha': float(log_returns_alpha),
+        'sharpe_ratio': float(sharpe_ratio),
+        'correlation_coefficient': float(correlation),
+        'sample_size': stats.n
+    }
+    logger.debug('The metrics derived from %d observations are: %s', stats.n, metrics)
+    return metrics
+
+
+def compute_cross_sectional_metrics(asset_close: npt.ArrayLike, benchmark_close: npt.ArrayLike) -> Dict[str, npt.NDArray[Any]]:
+    """
+    Computes the ticker vs benchmark metrics for N assets at once with matrix algebra
+
+    Description:
+    The (T x N) close matrix is turned into simple and log return matrices, and every sufficient statistic is a column
+    reduction or a matrix-vector product against the benchmark returns. Missing values are masked per column: an observation
+    counts for an asset only when both that asset's return and the benchmark return are finite, so the benchmark moments are
+    also computed per column over the matching sample
+
+    Args:
+    asset_close - (T x N) close prices, one column per asset, aligned on the benchmark timestamps (NaN where missing)
+    benchmark_close - (T,) close prices of the benchmark
+
+    Returns:
+    A dict of (N,) arrays with the same keys as derive_pair_metrics (the cumulative returns split into ticker and benchmark
+    columns). Assets with fewer than 2 usable observations or a constant benchmark sample get NaN metrics
+    """
+    asset_prices = np.asarray(asset_close, dtype=np.float64)
+    benchmark_prices = np.asarray(benchmark_close, dtype=np.float64)
+    if asset_prices.ndim != 2 or asset_prices.shape[0] != benchmark_prices.shape[0]:
+        raise ValueError('asset_close must be a (T x N) matrix aligned with the (T,) benchmark_close')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asset_simple = asset_prices[1:] / asset_prices[:-1] - 1
+        benchmark_simple = benchmark_prices[1:] / benchmark_prices[:-1] - 1
+        asset_log = np.log1p(asset_simple)
+        benchmark_log = np.log1p(benchmark_simple)
+
+    mask = np.isfinite(asset_simple) & np.isfinite(asset_log) & (np.isfinite(benchmark_simple) & np.isfinite(benchmark_log))[:, None]
+    weights = mask.astype(np.float64)
+    asset_simple = np.where(mask, asset_simple, 0.0)
+    asset_log = np.where(mask, asset_log, 0.0)
+    benchmark_simple = np.nan_to_num(benchmark_simple, nan=0.0, posinf=0.0, neginf=0.0)
+    benchmark_log = np.nan_to_num(benchmark_log, nan=0.0, posinf=0.0, neginf=0.0)
+
+    moments = PairMomentSums(
+        n=weights.sum(axis=0),
+        asset_simple=asset_simple.sum(axis=0),
+        asset_simple_squares=(asset_simple ** 2).sum(axis=0),
+        asset_log=asset_log.sum(axis=0),
+        asset_log_squares=(asset_log ** 2).sum(axis=0),
+        benchmark_simple=weights.T @ benchmark_simple,
+        benchmark_simple_squares=weights.T @ benchmark_simple ** 2,
+        benchmark_log=weights.T @ benchmark_log,
+        benchmark_log_squares=weights.T @ benchmark_log ** 2,
+        log_cross_products=asset_log.T @ benchmark_log,
+    )
+    return derive_metrics_from_moment_sums(moments)
+
+
+@dataclass(frozen=True)
+class PairMomentSums:
+    """
+    Masked sums of the asset and benchmark returns, their squares and the asset x benchmark log cross products. Every field
+    has the same shape - (N,) for one sample of N assets, (B x N) for B resampled samples - and the sums of an asset only run
+    over the observations where both its return and the benchmark return exist
+    """
+    n: npt.NDArray[np.float64]
+    asset_simple: npt.NDArray[np.float64]
+    asset_simple_squares: npt.NDArray[np.float64]
+    asset_log: npt.NDArray[np.float64]
+    asset_log_squares: npt.NDArray[np.float64]
+    benchmark_simple: npt.NDArray[np.float64]
+    benchmark_simple_squares: npt.NDArray[np.float64]
+    benchmark_log: npt.NDArray[np.float64]
+    benchmark_log_squares: npt.NDArray[np.float64]
+    log_cross_products: npt.NDArray[np.float64]
+
+
+def derive_metrics_from_moment_sums(moments: PairMomentSums) -> Dict[str, npt.NDArray[Any]]:
+    """
+    Derives the ticker vs benchmark metrics element-wise from masked moment sums, with the conventions of derive_pair_metrics
+
+    Returns - a dict of arrays shaped like the moment sums, NaN where fewer than 2 observations are available
+    """
+    n = moments.n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ddof_n = np.where(n > 1, n - 1, np.nan)
+        var_asset_simple = (moments.asset_simple_squares - moments.asset_simple ** 2 / n) / ddof_n
+        var_asset_log = (moments.asset_log_squares - moments.asset_log ** 2 / n) / ddof_n
+        var_benchmark_simple = (moments.benchmark_simple_squares - moments.benchmark_simple ** 2 / n) / ddof_n
+        var_benchmark_log = (moments.benchmark_log_squares - moments.benchmark_log ** 2 / n) / ddof_n
+        log_covariance = (moments.log_cross_products - moments.asset_log * moments.benchmark_log / n) / ddof_n
+
+        var_benchmark_log = np.where(var_benchmark_log > 0, var_benchmark_log, np.nan)
+        beta = log_covariance / var_benchmark_log
+        asset_log_mean = moments.asset_log / n
+        metrics: Dict[str, npt.NDArray[Any]] = {
+            'ticker_cummulative_return': np.expm1(moments.asset_log),
+            'benchmark_cummulative_return': np.expm1(moments.benchmark_log),
+            'ticker_annualized_volatility': np.sqrt(np.maximum(var_asset_simple, 0.0) * TRADING_DAYS_PER_YEAR),
+            'benchmark_annualized_volatility': np.sqrt(np.maximum(var_benchmark_simple, 0.0) * TRADING_DAYS_PER_YEAR),
+            'beta': beta,
+            'log_returns_alpha': (asset_log_mean - beta * moments.benchmark_log / n) * TRADING_DAYS_PER_YEAR,
+            'sharpe_ratio': (asset_log_mean - DAILY_RISK_FREE_RATE) / np.sqrt(var_asset_log) * np.sqrt(TRADING_DAYS_PER_YEAR),
+            'correlation_coefficient': log_covariance / np.sqrt(var_asset_log * var_benchmark_log),
+            'sample_size': n.astype(np.int64),
+        }
+
+    for key, values in metrics.items():
+        if key != 'sample_size':
+            metrics[key] = np.where((n > 1) & np.isfinite(values), values, np.nan)
+    return metrics
@@ -0,0 +1,331 @@
+"""
+This file holds the online (streaming) statistics layer. Histories are consumed chunk by chunk - from the price_data table or
+from CSV files - and reduced to accumulators whose memory does not grow with the length of the history.
+
+OnlineStatistics keeps the count, mean, co-moment matrix, third and fourth central moments, minimum and maximum of every
+column. Chunks are reduced with numpy and folded in with the pairwise update of Chan et al. (extended to the higher moments by
+Pebay), so two accumulators over disjoint shards merge exactly, in any order.
+
+OnlineDrawdown tracks the drawdown of a price series. It needs the shards in time order and keeps, besides the running peak
+and the maximum drawdown, the few (peak, trough) records needed to merge a later shard exactly.
+"""
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+logger = logging.getLogger("analytics")
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def _as_chunk_matrix(chunk: pd.DataFrame | pd.Series | npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Turns a frame, series or array chunk into a 2D float matrix with one column per series"""
+    values = chunk.to_numpy(dtype=np.float64) if isinstance(chunk, (pd.DataFrame, pd.Series)) else np.asarray(chunk, dtype=np.float64)
+    return values if values.ndim == 2 else values.reshape(-1, 1)
+
+
+@dataclass
+class OnlineStatistics:
+    """
+    Streaming moments of one or more columns. Rows holding a NaN in any column are skipped, so the co-moments of all columns
+    are computed over the same observations
+
+    count - number of observations
+    mean - column means, shape (k,)
+    comoment - sum of the products of the centered observations, shape (k, k). The diagonal is the M2 of every column
+    third_moment / fourth_moment - sums of the centered observations to the power 3 and 4, shape (k,)
+    """
+    columns: int
+    count: int = 0
+    mean: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    comoment: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros((0, 0)))
+    third_moment: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    fourth_moment: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    minimum: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    maximum: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+
+    def __post_init__(self) -> None:
+        if self.count == 0:
+            self.mean = np.zeros(self.columns)
+            self.comoment = np.zeros((self.columns, self.columns))
+            self.third_moment = np.zeros(self.columns)
+            self.fourth_moment = np.zeros(self.columns)
+            self.minimum = np.full(self.columns, np.inf)
+            self.maximum = np.full(self.columns, -np.inf)
+
+    @classmethod
+    def from_chunk(cls, chunk: pd.DataFrame | pd.Series | npt.ArrayLike) -> 'OnlineStatistics':
+        """Reduces a single (rows x k) chunk into a new accumulator"""
+        values = _as_chunk_matrix(chunk)
+        values = values[~np.isnan(values).any(axis=1)]
+        statistics = cls(values.shape[1])
+        if len(values) == 0:
+            return statistics
+        mean = values.mean(axis=0)
+        centered = values - mean
+        squared = centered * centered
+        statistics.count = len(values)
+        statistics.mean = mean
+        statistics.comoment = centered.T @ centered
+        statistics.third_moment = (squared * centered).sum(axis=0)
+        statistics.fourth_moment = (squared * squared).sum(axis=0)
+        statistics.minimum = values.min(axis=0)
+        statistics.maximum = values.max(axis=0)
+        return statistics
+
+    def update(self, chunk: pd.DataFrame | pd.Series | npt.ArrayLike) -> None:
+        """Folds a (rows x k) chunk of observations into the accumulator"""
+        self.merge(OnlineStatistics.from_chunk(chunk))
+
+    def merge(self, other: 'OnlineStatistics') -> None:
+        """Adds the observations summarized by another accumulator over the same columns"""
+        if other.columns != self.columns:
+            raise ValueError(f'Cannot merge statistics over {other.columns} columns into statistics over {self.columns} columns')
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.comoment = other.count, other.mean.copy(), other.comoment.copy()
+            self.third_moment, self.fourth_moment = other.third_moment.copy(), other.fourth_moment.copy()
+            self.minimum, self.maximum = other.minimum.copy(), other.maximum.copy()
+            return
+
+        n_a, n_b = float(self.count), float(other.count)
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        m2_a, m2_b = np.diag(self.comoment), np.diag(other.comoment)
+
+        fourth = (
+            self.fourth_moment + other.fourth_moment
+            + delta ** 4 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b) / n ** 3
+            + 6 * delta ** 2 * (n_a * n_a * m2_b + n_b * n_b * m2_a) / n ** 2
+            + 4 * delta * (n_a * other.third_moment - n_b * self.third_moment) / n
+        )
+        third = (
+            self.third_moment + other.third_moment
+            + delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2
+            + 3 * delta * (n_a * m2_b - n_b * m2_a) / n
+        )
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * n_a * n_b / n
+        self.third_moment, self.fourth_moment = third, fourth
+        self.mean = self.mean + delta * n_b / n
+        self.count = int(n)
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+
+    def variance(self, ddof: int = 1) -> npt.NDArray[np.float64]:
+        """Returns - the variance of every column"""
+        if self.count <= ddof:
+            return np.full(self.columns, np.nan)
+        variance: npt.NDArray[np.float64] = np.maximum(np.diag(self.comoment), 0.0) / (self.count - ddof)
+        return variance
+
+    def std(self, ddof: int = 1) -> npt.NDArray[np.float64]:
+        """Returns - the standard deviation of every column"""
+        return np.sqrt(self.variance(ddof))
+
+    def covariance(self, ddof: int = 1) -> npt.NDArray[np.float64]:
+        """Returns - the (k x k) covariance matrix"""
+        if self.count <= ddof:
+            return np.full((self.columns, self.columns), np.nan)
+        covariance: npt.NDArray[np.float64] = self.comoment / (self.count - ddof)
+        return covariance
+
+    def correlation(self) -> npt.NDArray[np.float64]:
+        """Returns - the (k x k) correlation matrix"""
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation: npt.NDArray[np.float64] = self.comoment / np.outer(scale, scale)
+        return correlation
+
+    def skewness(self) -> npt.NDArray[np.float64]:
+        """Returns - the (biased, population) skewness of every column"""
+        m2 = np.diag(self.comoment)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            skewness: npt.NDArray[np.float64] = np.sqrt(self.count) * self.third_moment / m2 ** 1.5
+        return skewness
+
+    def kurtosis(self) -> npt.NDArray[np.float64]:
+        """Returns - the (biased, population) excess kurtosis of every column"""
+        m2 = np.diag(self.comoment)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            kurtosis: npt.NDArray[np.float64] = self.count * self.fourth_moment / (m2 * m2) - 3.0
+        return kurtosis
+
+
+@dataclass
+class OnlineDrawdown:
+    """
+    Streaming drawdown of a price (or wealth) series. Shards must be added in time order
+
+    records - one (peak, trough) pair per new high of the series that is followed by a new lowest trough: the lowest price seen
+    between that high and the next one. A later shard, entering with the peak of the earlier ones, needs the lowest price of
+    its prefix that stays below that peak - which the records give exactly. Records whose trough is not lower than the trough
+    of an earlier record are dropped, so only a handful are kept
+    """
+    count: int = 0
+    peak: float = -np.inf
+    last: float = np.nan
+    maximum_drawdown: float = 0.0
+    records: List[Tuple[float, float]] = field(default_factory=list)
+
+    @classmethod
+    def from_chunk(cls, prices: pd.Series | npt.ArrayLike) -> 'OnlineDrawdown':
+        """Reduces a chunk of prices into a new accumulator"""
+        values = _as_chunk_matrix(prices)[:, 0]
+        values = values[~np.isnan(values)]
+        drawdown = cls()
+        if len(values) == 0:
+            return drawdown
+
+        running_peak = np.maximum.accumulate(values)
+        new_high = np.flatnonzero(np.r_[True, running_peak[1:] > running_peak[:-1]])
+        segment_troughs = np.minimum.reduceat(values, new_high)
+        lowest_so_far = np.inf
+        for peak, trough in zip(values[new_high], segment_troughs):
+            if trough < lowest_so_far:
+                drawdown.records.append((float(peak), float(trough)))
+                lowest_so_far = trough
+
+        drawdown.count = len(values)
+        drawdown.peak = float(running_peak[-1])
+        drawdown.last = float(values[-1])
+        drawdown.maximum_drawdown = float((1 - values / running_peak).max())
+        return drawdown
+
+    def update(self, prices: pd.Series | npt.ArrayLike) -> None:
+        """Folds the next chunk of prices into the accumulator"""
+        self.merge(OnlineDrawdown.from_chunk(prices))
+
+    def merge(self, later: 'OnlineDrawdown') -> None:
+        """Appends the accumulator of the shard that directly follows this one"""
+        if later.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.peak, self.last = later.count, later.peak, later.last
+            self.maximum_drawdown, self.records = later.maximum_drawdown, list(later.records)
+            return
+
+        # Lowest price of the later shard before it makes a new high above the current peak
+        entering_trough = min((trough for peak, trough in later.records if peak <= self.peak), default=np.inf)
+        self.maximum_drawdown = max(self.maximum_drawdown, later.maximum_drawdown, 1 - entering_trough / self.peak)
+
+        # The prefix of the later shard extends the trough of the current peak
+        lowest_so_far = min(trough for _, trough in self.records)
+        if entering_trough < lowest_so_far:
+            self.records.append((self.peak, float(entering_trough)))
+            lowest_so_far = entering_trough
+        for peak, trough in later.records:
+            if peak <= self.peak:
+                continue
+            if trough < lowest_so_far:
+                self.records.append((peak, trough))
+                lowest_so_far = trough
+        self.peak = max(self.peak, later.peak)
+        self.count += later.count
+        self.last = later.last
+
+    @property
+    def current_drawdown(self) -> float:
+        """The drawdown of the last price from the running peak"""
+        return float(1 - self.last / self.peak) if self.count else 0.0
+
+
+def iter_csv_chunks(file_path: str, columns: Sequence[str], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Reads the given columns of a CSV file chunk by chunk, so that only chunk_rows rows are held in memory at a time
+
+    Returns - an iterator over the chunks
+    """
+    for chunk in pd.read_csv(file_path, usecols=list(columns), chunksize=chunk_rows):
+        yield chunk[list(columns)]
+
+
+def iter_log_returns(price_chunks: Iterable[pd.DataFrame | pd.Series]) -> Iterator[pd.DataFrame]:
+    """
+    Turns chunks of prices into chunks of log returns. The last prices of a chunk are carried into the next one, so the
+    returns across chunk boundaries are not lost
+
+    Returns - an iterator over the chunks of log returns
+    """
+    previous: pd.DataFrame | None = None
+    for chunk in price_chunks:
+        frame = chunk.to_frame() if isinstance(chunk, pd.Series) else chunk
+        if frame.empty:
+            continue
+        joined = frame if previous is None else pd.concat([previous, frame])
+        log_returns = joined.astype(np.float64).apply(np.log).diff().iloc[1:]
+        previous = frame.iloc[-1:]
+        if not log_returns.empty:
+            yield log_returns
+
+
+def summarize_price_stream(price_chunks: Iterable[pd.Series]) -> Tuple[OnlineStatistics, OnlineDrawdown]:
+    """
+    Single pass over time ordered chunks of a close price series: the log returns feed the moment accumulator and the prices
+    the drawdown accumulator
+
+    Returns - the OnlineStatistics of the log returns and the OnlineDrawdown of the prices
+    """
+    statistics, drawdown = OnlineStatistics(1), OnlineDrawdown()
+    previous_price = np.nan
+    for chunk in price_chunks:
+        prices = _as_chunk_matrix(chunk)[:, 0]
+        prices = prices[~np.isnan(prices)]
+        if len(prices) == 0:
+            continue
+        statistics.update(np.diff(np.log(np.r_[previous_price, prices])))
+        drawdown.update(prices)
+        previous_price = prices[-1]
+    return statistics, drawdown
+
+
+def _reduce_chunk(chunk: npt.NDArray[np.float64]) -> OnlineStatistics:
+    """Pool worker reducing one shard"""
+    return OnlineStatistics.from_chunk(chunk)
+
+
+def accumulate_statistics(
+    chunks: Iterable[pd.DataFrame | pd.Series | npt.ArrayLike],
+    workers: int | None = 1,
+    max_pending: int | None = None
+) -> OnlineStatistics:
+    """
+    Reduces a stream of chunks into one OnlineStatistics. With more than one worker the chunks are reduced on a process pool
+    and merged as they arrive; at most max_pending chunks (twice the workers by default) are in flight, which bounds the
+    memory. The merge is exact, so the result matches the single worker run up to floating point rounding
+
+    Returns - the merged OnlineStatistics
+    """
+    workers = workers or 1
+    statistics: OnlineStatistics | None = None
+
+    def fold(partial: OnlineStatistics) -> None:
+        nonlocal statistics
+        if statistics is None:
+            statistics = partial
+        else:
+            statistics.merge(partial)
+
+    if workers == 1:
+        for chunk in chunks:
+            fold(OnlineStatistics.from_chunk(chunk))
+    else:
+        pending: Deque[Future[OnlineStatistics]] = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in chunks:
+                pending.append(executor.submit(_reduce_chunk, _as_chunk_matrix(chunk)))
+                if len(pending) >= (max_pending or 2 * workers):
+                    fold(pending.popleft().result())
+            while pending:
+                fold(pending.popleft().result())
+
+    if statistics is None:
+        raise ValueError('No chunks to accumulate statistics from')
+    logger.debug('Accumulated online statistics over %d observations', statistics.count)
+    return statistics
@@ -0,0 +1,292 @@
+"""
+This file is responsible for the parameter sweeps (sensitivity studies) of the backtests and analyses: grid search over every
+combination of the parameter values or random search over a sample of them.
+
+The aligned price panel is loaded and validated once and copied into a multiprocessing.shared_memory block. Every worker of
+the process pool attaches to that block when it starts and wraps it into NumPy arrays and DataFrames without copying, so the
+parameter sets only carry a small dict each. Results are handed to a callback as they complete (the FlowController streams
+them into the parameter_sweep_results table), which is what makes an interrupted sweep resumable
+"""
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.backtester import BacktestResult, generate_signals, run_backtest, signals_to_weights
+from src.modules.analytics.rolling_analyzer import calculate_rolling_metrics
+
+logger = logging.getLogger("analytics")
+
+SWEEP_EVALUATORS = ('backtest', 'rolling_metrics')
+# Parameter sets submitted to the pool per worker at a time, so results stream back while the rest is queued
+PENDING_TASKS_PER_WORKER = 4
+
+ParameterSet = Dict[str, Any]
+ResultCallback = Callable[[ParameterSet, Dict[str, float], float], None]
+
+
+@dataclass(frozen=True)
+class PricePanel:
+    """
+    Aligned prices shared by every evaluation of a sweep
+
+    close - (T x N) close prices of the tickers
+    benchmark_close - (T,) close prices of the benchmark
+    open_prices - (T x N) open prices, only needed for backtests filled at the next open
+    """
+    close: pd.DataFrame
+    benchmark_close: pd.Series
+    open_prices: pd.DataFrame | None = None
+
+
+@dataclass(frozen=True)
+class SharedPanelDescriptor:
+    """
+    The picklable description of a PricePanel held in shared memory: the block name, the array layout and the labels. Only the
+    labels are pickled (once per worker), the prices stay in the block
+    """
+    name: str
+    rows: int
+    tickers: Tuple[str, ...]
+    index: pd.Index
+    has_open: bool
+
+
+class SharedPricePanel:
+    """
+    Copies a PricePanel into one shared memory block laid out as [close (T x N), benchmark (T,), open (T x N)] float64 arrays.
+    Use it as a context manager, so the block is released even when the sweep fails
+    """
+    def __init__(self, panel: PricePanel) -> None:
+        rows, columns = panel.close.shape
+        has_open = panel.open_prices is not None
+        size = 8 * rows * (columns * (2 if has_open else 1) + 1)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 8))
+        self.descriptor = SharedPanelDescriptor(
+            name=self.memory.name,
+            rows=rows,
+            tickers=tuple(str(ticker) for ticker in panel.close.columns),
+            index=panel.close.index,
+            has_open=has_open,
+        )
+        close, benchmark, open_prices = _panel_arrays(self.memory, self.descriptor)
+        close[:] = panel.close.to_numpy(dtype=np.float64)
+        benchmark[:] = panel.benchmark_close.reindex(panel.close.index).to_numpy(dtype=np.float64)
+        if open_prices is not None and panel.open_prices is not None:
+            open_prices[:] = panel.open_prices.reindex(index=panel.close.index, columns=panel.close.columns).to_numpy(dtype=np.float64)
+
+    def __enter__(self) -> 'SharedPricePanel':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _panel_arrays(
+    memory: shared_memory.SharedMemory, descriptor: SharedPanelDescriptor
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64] | None]:
+    """Returns - the close, benchmark and open arrays viewing the shared memory block (no copies)"""
+    rows, columns = descriptor.rows, len(descriptor.tickers)
+    buffer = memory.buf
+    close: npt.NDArray[np.float64] = np.ndarray((rows, columns), dtype=np.float64, buffer=buffer)
+    benchmark: npt.NDArray[np.float64] = np.ndarray((rows,), dtype=np.float64, buffer=buffer, offset=8 * rows * columns)
+    if not descriptor.has_open:
+        return close, benchmark, None
+    open_prices: npt.NDArray[np.float64] = np.ndarray((rows, columns), dtype=np.float64, buffer=buffer, offset=8 * rows * (columns + 1))
+    return close, benchmark, open_prices
+
+
+def attach_price_panel(descriptor: SharedPanelDescriptor) -> Tuple[shared_memory.SharedMemory, PricePanel]:
+    """
+    Attaches to a SharedPricePanel from another process. The returned SharedMemory handle must be kept alive as long as the
+    panel is used
+
+    Returns - a tuple of (SharedMemory handle, PricePanel whose frames view the shared block)
+    """
+    # The creating process owns (and unlinks) the block, so the workers must not register it with the resource tracker
+    memory = shared_memory.SharedMemory(name=descriptor.name, **({'track': False} if sys.version_info >= (3, 13) else {}))
+    close, benchmark, open_prices = _panel_arrays(memory, descriptor)
+    index, columns = descriptor.index, list(descriptor.tickers)
+    panel = PricePanel(
+        close=pd.DataFrame(close, index=index, columns=columns, copy=False),
+        benchmark_close=pd.Series(benchmark, index=index, copy=False),
+        open_prices=None if open_prices is None else pd.DataFrame(open_prices, index=index, columns=columns, copy=False),
+    )
+    return memory, panel
+
+
+def backtest_parameter_set(panel: PricePanel, parameters: ParameterSet) -> BacktestResult:
+    """
+    Backtests one parameter set over the whole panel: strategy (default equal_weight) and its parameters, rebalance, fill,
+    commission_bps and slippage_bps
+
+    Returns - the BacktestResult
+    """
+    parameters = dict(parameters)
+    rebalance = parameters.pop('rebalance', 'daily')
+    fill = parameters.pop('fill', 'close')
+    commission_bps = float(parameters.pop('commission_bps', 0.0))
+    slippage_bps = float(parameters.pop('slippage_bps', 0.0))
+    strategy = parameters.pop('strategy', 'equal_weight')
+    target_weights = signals_to_weights(generate_signals(panel.close, strategy, **parameters), rebalance)
+    return run_backtest(panel.close, target_weights, panel.open_prices, fill=fill, commission_bps=commission_bps, slippage_bps=slippage_bps)
+
+
+def evaluate_backtest(panel: PricePanel, parameters: ParameterSet) -> Dict[str, float]:
+    """Returns - the BacktestResult.summary metrics of one parameter set (see backtest_parameter_set)"""
+    return backtest_parameter_set(panel, parameters).summary(panel.benchmark_close)
+
+
+def evaluate_rolling_metrics(panel: PricePanel, parameters: ParameterSet) -> Dict[str, float]:
+    """
+    Computes the rolling metrics of every ticker against the benchmark over one window length (the window parameter) and
+    summarizes how stable they are
+
+    Returns - the cross-ticker averages of the mean and standard deviation of the rolling beta, Sharpe ratio and correlation
+    """
+    window = int(parameters['window'])
+    benchmark = panel.benchmark_close.to_numpy(dtype=np.float64)
+    summaries = []
+    for ticker in panel.close.columns:
+        metrics = calculate_rolling_metrics(panel.close[ticker].to_numpy(dtype=np.float64), benchmark, [window])[window]
+        summaries.append(metrics[['beta', 'sharpe_ratio', 'correlation']].agg(['mean', 'std']).to_numpy().ravel())
+    averages = np.nanmean(np.vstack(summaries), axis=0) if summaries else np.full(6, np.nan)
+    names = ['mean_beta', 'mean_sharpe_ratio', 'mean_correlation', 'beta_std', 'sharpe_ratio_std', 'correlation_std']
+    return {name: float(value) for name, value in zip(names, averages)}
+
+
+EVALUATORS: Dict[str, Callable[[PricePanel, ParameterSet], Dict[str, float]]] = {
+    'backtest': evaluate_backtest,
+    'rolling_metrics': evaluate_rolling_metrics,
+}
+
+# The panel a worker process attached to in its initializer
+_worker_state: Dict[str, Any] = {}
+
+
+def _initialize_worker(descriptor: SharedPanelDescriptor) -> None:
+    """Attaches the worker process to the shared panel once, for all the items it evaluates"""
+    _worker_state['memory'], _worker_state['panel'] = attach_price_panel(descriptor)
+
+
+def _apply_in_worker(function: Callable[[PricePanel, Any], Any], item: Any) -> Tuple[Any, float]:
+    """Applies the function to the worker's shared panel and one item. Returns the result and the elapsed seconds"""
+    started_at = time.perf_counter()
+    result = function(_worker_state['panel'], item)
+    return result, time.perf_counter() - started_at
+
+
+def map_shared_panel(
+    panel: PricePanel,
+    function: Callable[[PricePanel, Any], Any],
+    items: Sequence[Any],
+    workers: int | None = None,
+    on_result: Callable[[int, Any, float], None] | None = None
+) -> List[Any]:
+    """
+    Applies function(panel, item) to every item
+
+    Description:
+    With workers > 1 the panel is placed in shared memory and a process pool works on zero-copy views of it, so the function
+    must be defined at module level. At most PENDING_TASKS_PER_WORKER items per worker are in flight, and on_result is called
+    in the parent process with (item position, result, elapsed seconds) as each one completes - in completion order
+
+    Args:
+    workers - number of worker processes, None for every core
+
+    Returns - the results in the order of the items
+    """
+    results: List[Any] = [None] * len(items)
+
+    def record(position: int, result: Any, elapsed: float) -> None:
+        results[position] = result
+        if on_result is not None:
+            on_result(position, result, elapsed)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(items), 1))
+    if workers == 1:
+        for position, item in enumerate(items):
+            started_at = time.perf_counter()
+            record(position, function(panel, item), time.perf_counter() - started_at)
+        return results
+
+    with SharedPricePanel(panel) as shared_panel, ProcessPoolExecutor(
+        max_workers=workers, initializer=_initialize_worker, initargs=(shared_panel.descriptor,)
+    ) as executor:
+        queued = iter(enumerate(items))
+        pending: Dict[Future[Tuple[Any, float]], int] = {}
+        for position, item in itertools.islice(queued, workers * PENDING_TASKS_PER_WORKER):
+            pending[executor.submit(_apply_in_worker, function, item)] = position
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(pending.pop(future), *future.result())
+                for position, item in itertools.islice(queued, 1):
+                    pending[executor.submit(_apply_in_worker, function, item)] = position
+    return results
+
+
+def parameter_key(parameters: ParameterSet) -> str:
+    """Returns - a canonical text form of a parameter set (sorted keys), used to recognise sets that were already evaluated"""
+    return ','.join(f'{name}={parameters[name]}' for name in sorted(parameters))
+
+
+def grid_parameter_sets(space: Mapping[str, Sequence[Any]]) -> List[ParameterSet]:
+    """Returns - every combination of the parameter values, in the order of the space"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_parameter_sets(space: Mapping[str, Sequence[Any]], samples: int, seed: int | None = None) -> List[ParameterSet]:
+    """
+    Draws distinct combinations of the parameter values uniformly at random, without building the whole grid: flat grid
+    positions are sampled without replacement and decoded digit by digit
+
+    Returns - min(samples, grid size) parameter sets
+    """
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    total = int(np.prod(sizes, dtype=np.float64))
+    positions = np.random.default_rng(seed).choice(total, size=min(samples, total), replace=False)
+    coordinates = np.unravel_index(positions, sizes) if names else ()
+    return [{name: space[name][int(coordinates[axis][draw])] for axis, name in enumerate(names)} for draw in range(len(positions))]
+
+
+def run_parameter_sweep(
+    panel: PricePanel,
+    evaluator: str,
+    parameter_sets: Sequence[ParameterSet],
+    workers: int | None = None,
+    on_result: ResultCallback | None = None
+) -> pd.DataFrame:
+    """
+    Evaluates every parameter set against the same price panel, on a process pool sharing the panel when workers > 1 (see
+    map_shared_panel). on_result is called in the parent process with (parameters, metrics, elapsed seconds) as each set
+    completes - in completion order, not submission order
+
+    Args:
+    evaluator - one of SWEEP_EVALUATORS
+    workers - number of worker processes, None for every core
+
+    Returns - a dataframe with one row per parameter set (in submission order): the parameters followed by the metrics
+    """
+    if evaluator not in EVALUATORS:
+        raise ValueError(f'Unknown sweep evaluator: {evaluator}. Choose from {SWEEP_EVALUATORS}')
+
+    def record(position: int, metrics: Dict[str, float], elapsed: float) -> None:
+        if on_result is not None:
+            on_result(parameter_sets[position], metrics, elapsed)
+
+    logger.info('Sweeping %d %s parameter sets over a %s panel', len(parameter_sets), evaluator, panel.close.shape)
+    results = map_shared_panel(panel, EVALUATORS[evaluator], parameter_sets, workers=workers, on_result=record)
+    return pd.concat([pd.DataFrame(list(parameter_sets)), pd.DataFrame(results)], axis=1) if parameter_sets else pd.DataFrame()
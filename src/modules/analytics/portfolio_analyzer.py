@@ -1,4 +1,9 @@
 import logging
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -6,35 +11,210 @@ from src.modules.analytics.returns_analyzer import calculate_daily_portfolio_ret
 
 logger = logging.getLogger("analytics")
 
+REBALANCE_FREQUENCIES = ('none', 'daily', 'weekly', 'monthly', 'quarterly')
+
+# Caps the (rebalance dates x portfolios x assets) temporaries used for the turnover calculation
+TURNOVER_CHUNK_ELEMENTS = 2_000_000
+
+
+@dataclass(frozen=True)
+class PortfolioSimulation:
+    """
+    Result of simulate_portfolios. Every frame is indexed like the price panel with one column per portfolio
+
+    nav - net asset value after transaction costs
+    returns - daily returns of the nav (the first row is NaN)
+    turnover - traded fraction of the portfolio value on every rebalance date (0 on the other dates)
+    transaction_costs - costs paid on every rebalance date, in currency units
+    """
+    nav: pd.DataFrame
+    returns: pd.DataFrame
+    turnover: pd.DataFrame
+    transaction_costs: pd.DataFrame
+
+
+def get_rebalance_mask(index: pd.Index, rebalance: str | int) -> npt.NDArray[np.bool_]:
+    """
+    Marks the rows on which the portfolios are traded back to their target weights. The first row is always marked, since
+    that is when the portfolios are bought
+
+    Args:
+    index - the index of the price panel (a DatetimeIndex is needed for the calendar frequencies)
+    rebalance - one of REBALANCE_FREQUENCIES, or an integer k to rebalance every k rows. 'weekly', 'monthly' and 'quarterly'
+    rebalance on the first row of every new calendar period
+
+    Returns - a boolean array with one entry per row
+    """
+    rows = len(index)
+    if isinstance(rebalance, int):
+        if rebalance < 1:
+            raise ValueError('The rebalance interval must be at least 1 row')
+        return np.asarray(np.arange(rows) % rebalance == 0)
+    if rebalance not in REBALANCE_FREQUENCIES:
+        raise ValueError(f'Unknown rebalance frequency: {rebalance}. Choose from {REBALANCE_FREQUENCIES} or an integer')
+
+    if rebalance == 'none':
+        mask = np.zeros(rows, dtype=bool)
+    elif rebalance == 'daily':
+        mask = np.ones(rows, dtype=bool)
+    else:
+        if not isinstance(index, pd.DatetimeIndex):
+            raise TypeError(f'Calendar rebalancing needs a DatetimeIndex, got {type(index).__name__}')
+        iso_calendar = index.isocalendar()
+        if rebalance == 'weekly':
+            period_keys = (iso_calendar['year'] * 100 + iso_calendar['week']).to_numpy()
+        elif rebalance == 'monthly':
+            period_keys = np.asarray(index.year * 12 + index.month)
+        else:
+            period_keys = np.asarray(index.year * 4 + index.quarter)
+        mask = np.concatenate([[True], period_keys[1:] != period_keys[:-1]])
+
+    if rows:
+        mask[0] = True
+    return mask
+
+
+def simulate_portfolios(
+    prices: pd.DataFrame,
+    weights: npt.ArrayLike,
+    rebalance: str | int = 'none',
+    transaction_cost_bps: float = 0.0,
+    initial_value: float = 1.0,
+    portfolio_names: Sequence[str] | None = None
+) -> PortfolioSimulation:
+    """
+    Simulates the NAV of one or many portfolios over an aligned (T x N) price panel
+
+    Description:
+    Between two rebalance dates the holdings are fixed (buy-and-hold drift), so the value of every portfolio is its value
+    after the last rebalance times (prices / prices on that rebalance date) @ weights. All portfolios and all dates are
+    evaluated together: the growth of every holding period is one (T x N) @ (N x P) matrix product and the values after
+    each rebalance follow from a cumulative product over the rebalance dates - there is no per-bar loop.
+
+    On a rebalance date the drifted weights are traded back to the targets. Turnover is sum(|target - drifted|) and the
+    cost is turnover * transaction_cost_bps / 10,000 of the portfolio value. The initial purchase on the first row is charged
+    the same way (turnover = sum(|weights|))
+
+    Args:
+    prices - (T x N) close prices without missing values, one column per asset
+    weights - (N,) target weights of a single portfolio or (P x N) target weights of P portfolios
+    rebalance - 'none' (buy-and-hold), 'daily', 'weekly', 'monthly', 'quarterly' or an integer number of rows
+    transaction_cost_bps - proportional trading cost (commission plus spread) in basis points of the traded value
+    initial_value - starting capital of every portfolio
+    portfolio_names - optional column names for the P portfolios
+
+    Returns:
+    A PortfolioSimulation with the nav, returns, turnover and transaction costs of every portfolio
+    """
+    price_matrix = prices.to_numpy(dtype=np.float64)
+    if price_matrix.ndim != 2 or len(price_matrix) < 1:
+        raise ValueError('prices must be a non-empty (T x N) panel')
+    if not np.isfinite(price_matrix).all() or (price_matrix <= 0).any():
+        raise ValueError('prices must be positive and free of missing values. Align and forward fill the panel first')
+
+    weight_matrix = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    if weight_matrix.shape[1] != price_matrix.shape[1]:
+        raise ValueError(f'Expected {price_matrix.shape[1]} weights per portfolio, got {weight_matrix.shape[1]}')
+
+    rows = price_matrix.shape[0]
+    portfolios = weight_matrix.shape[0]
+    names = list(portfolio_names) if portfolio_names is not None else [f'portfolio_{i}' for i in range(portfolios)]
+    cost_rate = transaction_cost_bps / 10_000
+
+    rebalance_mask = get_rebalance_mask(prices.index, rebalance)
+    row_numbers = np.arange(rows)
+    # Row of the last rebalance at or before every row - the holdings of that row are set on that date
+    segment_start = np.maximum.accumulate(np.where(rebalance_mask, row_numbers, 0))
+    governing_start = segment_start[:-1]
+
+    relative_prices = price_matrix[1:] / price_matrix[governing_start]
+    growth = relative_prices @ weight_matrix.T
+
+    turnover = np.zeros((rows, portfolios), dtype=np.float64)
+    turnover[0] = np.abs(weight_matrix).sum(axis=1)
+    rebalance_rows = np.flatnonzero(rebalance_mask[1:]) + 1
+    absolute_weights = np.abs(weight_matrix)
+    chunk_rows = max(1, TURNOVER_CHUNK_ELEMENTS // max(1, weight_matrix.size))
+    for chunk_start in range(0, len(rebalance_rows), chunk_rows):
+        chunk = rebalance_rows[chunk_start:chunk_start + chunk_rows]
+        drift = relative_prices[chunk - 1][:, None, :] / growth[chunk - 1][:, :, None]
+        turnover[chunk] = (absolute_weights[None, :, :] * np.abs(1 - drift)).sum(axis=2)
+
+    cost_fraction = turnover * cost_rate
+    # Value right after trading on every rebalance date: compounded holding period growth net of costs
+    value_after_rebalance = np.zeros((rows, portfolios), dtype=np.float64)
+    value_after_rebalance[0] = initial_value * (1 - cost_fraction[0])
+    if len(rebalance_rows):
+        period_factors = growth[rebalance_rows - 1] * (1 - cost_fraction[rebalance_rows])
+        value_after_rebalance[rebalance_rows] = value_after_rebalance[0] * np.cumprod(period_factors, axis=0)
+
+    nav = np.empty((rows, portfolios), dtype=np.float64)
+    nav[0] = value_after_rebalance[0]
+    nav[1:] = value_after_rebalance[governing_start] * growth
+    nav[rebalance_rows] = value_after_rebalance[rebalance_rows]
 
-def calculate_portfolio_returns(df_prices: pd.DataFrame) -> pd.Series: 
+    transaction_costs = cost_fraction.copy()
+    transaction_costs[0] *= initial_value
+    transaction_costs[rebalance_rows] *= value_after_rebalance[rebalance_rows] / (1 - cost_fraction[rebalance_rows])
+
+    nav_frame = pd.DataFrame(nav, index=prices.index, columns=names)
+    logger.info('Simulated %d portfolios over %d rows with rebalance=%s and %.1f bps costs', portfolios, rows, rebalance, transaction_cost_bps)
+    return PortfolioSimulation(
+        nav=nav_frame,
+        returns=nav_frame.pct_change(),
+        turnover=pd.DataFrame(turnover, index=prices.index, columns=names),
+        transaction_costs=pd.DataFrame(transaction_costs, index=prices.index, columns=names),
+    )
+
+
+def holdings_to_weights(prices: pd.DataFrame, holdings: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """
+    Converts share counts into the portfolio weights on the first row of the price panel
+
+    Returns - a (P x N) array of weights (or (1 x N) for a single portfolio)
+    """
+    holdings_matrix = np.atleast_2d(np.asarray(holdings, dtype=np.float64))
+    position_values = holdings_matrix * prices.iloc[0].to_numpy(dtype=np.float64)
+    portfolio_values = position_values.sum(axis=1, keepdims=True)
+    if (portfolio_values == 0).any():
+        raise ValueError('Every portfolio must have a non-zero initial value')
+    weights: npt.NDArray[np.float64] = position_values / portfolio_values
+    return weights
+
+
+def calculate_portfolio_returns(df_prices: pd.DataFrame, weights: npt.ArrayLike | None = None, rebalance: str | int = 'daily') -> pd.Series:
     """
     Used to calculate the portfolio returns - for all stocks contained in the portfolio
 
     Args:
     df_prices (pandas DataFrame) - A pandas dataframe where the index is a Datetimeindex and each column represents a single asset
     with each value in the column representing the daily closing price for that asset on that date
+    weights - optional target weights of the assets. Defaults to an equally weighted portfolio
+    rebalance - the rebalancing schedule (see simulate_portfolios). Defaults to daily rebalancing
 
     Returns:
     A Pandas series representing the daily return of the portfolio with a datetimeindex
     """
-    daily_returns_dataframe: pd.Series = calculate_daily_portfolio_returns(df_test)
-    print(type(daily_returns_dataframe))
-    return daily_returns_dataframe
+    if weights is None:
+        return calculate_daily_portfolio_returns(df_prices)
+
+    simulation = simulate_portfolios(df_prices, weights, rebalance=rebalance)
+    daily_returns: pd.Series = simulation.returns.iloc[:, 0].dropna()
+    return daily_returns
 
 def plot_cumulative_returns(df_prices: pd.DataFrame) -> None:
     """
     Used to plot the cumulative returns of the entire portfolio vs individual stocks in the portfolio over a period of time
 
-    Args: 
+    Args:
     df_prices(Pandas dataframe) - Stores the data about daily closing prices of stocks as list and stock symbols as columns
 
     Returns:
     A line chart plotting the individual asset returns against the average portfolio returns over a period of time. The line chart is shown
-    in the terminal and also gets saved inside the plots/ directory as a png image for any future reference. 
+    in the terminal and also gets saved inside the plots/ directory as a png image for any future reference.
     """
     dataframe_individual_asset_returns = df_prices.pct_change()
-    portfolio_returns = calculate_portfolio_returns(df_prices=df_test)
+    portfolio_returns = calculate_portfolio_returns(df_prices=df_prices)
 
     cumulative_returns_for_each_asset = (1 + dataframe_individual_asset_returns).cumprod()
     cumulative_returns_for_portfolio = (1 + portfolio_returns).cumprod()
@@ -44,7 +224,7 @@ def plot_cumulative_returns(df_prices: pd.DataFrame) -> None:
 
     cumulative_returns_for_each_asset.plot(ax=plt.gca(), linewidth=1.5, alpha=0.7)
     cumulative_returns_for_portfolio.plot(ax=plt.gca(), linewidth=3, color='black', label='Equally weighted portfolio')
-    
+
     plt.xlabel(xlabel='Date')
     plt.ylabel(ylabel='Cumulative Return: Growth of INR 1')
     plt.legend()
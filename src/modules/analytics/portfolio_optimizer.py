@@ -0,0 +1,377 @@
+"""
+This file is responsible for mean-variance portfolio optimization: minimum variance, maximum Sharpe ratio and target return
+portfolios under long-only or box constraints, and the efficient frontier.
+
+Every problem is reduced to  minimize 1/2 w'Σw - t μ'w  subject to sum(w) = 1 and lower <= w <= upper, where t >= 0 is the
+risk tolerance (t = 0 is the minimum variance portfolio). It is solved with an accelerated projected gradient method that works
+on a (K x N) batch of weight vectors at once, so K frontier points cost K matrix-vector products per iteration instead of K
+separate solver runs. The eigendecomposition of the covariance matrix is computed once per optimizer and supplies the step size
+"""
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.data_loader.data_loader import DataLoader
+from src.modules.analytics.covariance_engine import CovarianceEngine
+from src.modules.analytics.metrics_kernel import ANNUALIZED_RISK_FREE_RATE, TRADING_DAYS_PER_YEAR
+
+logger = logging.getLogger("analytics")
+
+DEFAULT_TOLERANCE = 1e-10
+DEFAULT_MAX_ITERATIONS = 20_000
+# Maximum number of risk tolerance search steps used to hit a target return
+TARGET_SEARCH_STEPS = 60
+RETURN_TOLERANCE = 1e-9
+SHARPE_GRID_POINTS = 16
+
+
+@dataclass(frozen=True)
+class OptimizationResult:
+    """
+    A single optimized portfolio
+
+    weights - the portfolio weights indexed by ticker
+    expected_return, volatility - annualized, in the units of the optimizer inputs
+    sharpe_ratio - (expected_return - risk_free_rate) / volatility
+    converged - False if the solver stopped at its iteration limit
+    """
+    weights: pd.Series
+    expected_return: float
+    volatility: float
+    sharpe_ratio: float
+    converged: bool
+
+
+@dataclass(frozen=True)
+class EfficientFrontier:
+    """
+    points - one row per frontier portfolio with the expected_return, volatility and sharpe_ratio columns
+    weights - one row per frontier portfolio with one column per ticker
+    """
+    points: pd.DataFrame
+    weights: pd.DataFrame
+
+
+def project_onto_capped_simplex(
+    values: npt.NDArray[np.float64],
+    lower: npt.NDArray[np.float64],
+    upper: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """
+    Exact Euclidean projection of every row of values onto {w : sum(w) = 1, lower <= w <= upper}
+
+    The projection is clip(v - τ, lower, upper) where the shift τ makes the row sum to 1. The clipped sum is piecewise linear and
+    non-increasing in τ with breakpoints at v - upper and v - lower, so sorting the breakpoints of every row gives the sum at each
+    of them with one cumulative sum, and τ is interpolated inside the segment where the sum crosses 1
+
+    Returns - the projected (K x N) array
+    """
+    rows, assets = values.shape
+    breakpoints = np.concatenate([values - upper, values - lower], axis=1)
+    # Crossing v - upper frees an asset from its upper bound (slope -1), crossing v - lower pins it to its lower bound (slope +1)
+    slope_changes = np.concatenate([np.full((rows, assets), -1.0), np.full((rows, assets), 1.0)], axis=1)
+    order = np.argsort(breakpoints, axis=1, kind='stable')
+    breakpoints = np.take_along_axis(breakpoints, order, axis=1)
+    slopes = np.cumsum(np.take_along_axis(slope_changes, order, axis=1), axis=1)
+
+    sums = np.empty_like(breakpoints)
+    sums[:, 0] = upper.sum()
+    np.cumsum(slopes[:, :-1] * np.diff(breakpoints, axis=1), axis=1, out=sums[:, 1:])
+    sums[:, 1:] += sums[:, :1]
+
+    # Last breakpoint whose sum is still >= 1, the shift lies between it and the next one
+    segment = np.clip((sums >= 1).sum(axis=1) - 1, 0, 2 * assets - 1)
+    row_index = np.arange(rows)
+    segment_slope = slopes[row_index, segment]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(segment_slope < 0, (1 - sums[row_index, segment]) / segment_slope, 0.0)
+    shift = breakpoints[row_index, segment] + offset
+    projected: npt.NDArray[np.float64] = np.clip(values - shift[:, None], lower, upper)
+    return projected
+
+
+class PortfolioOptimizer:
+    """
+    Mean-variance optimizer over a fixed universe. The covariance factorization, the bounds and the minimum variance solution are kept on
+    the instance, so repeated solves (a frontier, a target return search, a daily re-optimization) reuse them
+    """
+
+    def __init__(
+        self,
+        expected_returns: pd.Series,
+        covariance: pd.DataFrame,
+        lower_bound: float | npt.ArrayLike = 0.0,
+        upper_bound: float | npt.ArrayLike = 1.0,
+        risk_free_rate: float = ANNUALIZED_RISK_FREE_RATE
+    ) -> None:
+        """
+        Args:
+        expected_returns - (N,) annualized expected returns indexed by ticker
+        covariance - (N x N) annualized covariance matrix with the same tickers
+        lower_bound, upper_bound - scalar or per-ticker weight bounds. The defaults are long-only and fully invested
+        risk_free_rate - annualized rate used for the Sharpe ratio
+        """
+        self.tickers: List[str] = list(expected_returns.index)
+        self.expected_returns = expected_returns.to_numpy(dtype=np.float64)
+        self.covariance = covariance.loc[self.tickers, self.tickers].to_numpy(dtype=np.float64)
+        if not (np.isfinite(self.expected_returns).all() and np.isfinite(self.covariance).all()):
+            raise ValueError('Expected returns and covariance must be finite. Drop the tickers without enough price history')
+
+        assets = len(self.tickers)
+        self.lower_bound = np.broadcast_to(np.asarray(lower_bound, dtype=np.float64), (assets,)).copy()
+        self.upper_bound = np.broadcast_to(np.asarray(upper_bound, dtype=np.float64), (assets,)).copy()
+        if (self.lower_bound > self.upper_bound).any() or self.lower_bound.sum() > 1 or self.upper_bound.sum() < 1:
+            raise ValueError('The weight bounds admit no fully invested portfolio')
+        self.risk_free_rate = risk_free_rate
+
+        # Cached factorization of the (symmetrized) covariance matrix. Its largest eigenvalue is the Lipschitz constant of the gradient
+        self.covariance = (self.covariance + self.covariance.T) / 2
+        self.eigenvalues, self.eigenvectors = np.linalg.eigh(self.covariance)
+        self.lipschitz_constant = max(float(self.eigenvalues[-1]), 1e-12)
+        logger.debug('Optimizer for %d assets, covariance eigenvalues in [%.3e, %.3e]', assets, self.eigenvalues[0], self.eigenvalues[-1])
+
+        self._minimum_variance_weights: npt.NDArray[np.float64] | None = None
+
+    @classmethod
+    def from_price_history(
+        cls,
+        data_loader: DataLoader,
+        tickers: List[str],
+        start_ts: int,
+        end_ts: int,
+        shrinkage: str | None = 'ledoit_wolf',
+        ewma_halflife: float | None = None,
+        lower_bound: float | npt.ArrayLike = 0.0,
+        upper_bound: float | npt.ArrayLike = 1.0
+    ) -> 'PortfolioOptimizer':
+        """
+        Builds the optimizer from the price_data table: the expected returns are the annualized mean daily log returns and the
+        covariance comes from the (cached) CovarianceEngine, annualized with TRADING_DAYS_PER_YEAR
+
+        Returns - a PortfolioOptimizer over the given tickers
+        """
+        price_panel = data_loader.get_price_panel(tickers, start_ts, end_ts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_prices = pd.DataFrame(np.log(price_panel.to_numpy(dtype=np.float64)), index=price_panel.index, columns=price_panel.columns)
+        expected_returns = log_prices.diff().mean() * TRADING_DAYS_PER_YEAR
+
+        covariance, _ = CovarianceEngine(data_loader).get_matrices(tickers, start_ts, end_ts, ewma_halflife=ewma_halflife, shrinkage=shrinkage)
+        return cls(expected_returns, covariance * TRADING_DAYS_PER_YEAR, lower_bound=lower_bound, upper_bound=upper_bound)
+
+    def _solve_batch(
+        self,
+        risk_tolerances: npt.NDArray[np.float64],
+        initial_weights: npt.NDArray[np.float64] | None = None,
+        tolerance: float = DEFAULT_TOLERANCE,
+        max_iterations: int = DEFAULT_MAX_ITERATIONS
+    ) -> Tuple[npt.NDArray[np.float64], bool]:
+        """
+        Solves  minimize 1/2 w'Σw - t μ'w  for every risk tolerance t at once with FISTA and adaptive restarts
+
+        Args:
+        risk_tolerances - (K,) risk tolerances
+        initial_weights - (K x N) warm start. Defaults to the projection of the equally weighted portfolio
+
+        Returns - the (K x N) solutions and whether every row converged
+        """
+        batch = len(risk_tolerances)
+        assets = len(self.tickers)
+        if initial_weights is None:
+            initial_weights = np.full((batch, assets), 1 / assets)
+        weights = project_onto_capped_simplex(np.array(initial_weights, dtype=np.float64), self.lower_bound, self.upper_bound)
+
+        step = 1 / self.lipschitz_constant
+        linear_term = risk_tolerances[:, None] * self.expected_returns[None, :]
+        extrapolated = weights.copy()
+        momentum = np.ones(batch)
+
+        for iteration in range(1, max_iterations + 1):
+            gradient = extrapolated @ self.covariance - linear_term
+            next_weights = project_onto_capped_simplex(extrapolated - step * gradient, self.lower_bound, self.upper_bound)
+            change = next_weights - weights
+
+            next_momentum = (1 + np.sqrt(1 + 4 * momentum ** 2)) / 2
+            # Restart the momentum of the rows where the extrapolation moved uphill
+            restart = ((extrapolated - next_weights) * change).sum(axis=1) > 0
+            next_momentum[restart] = 1.0
+            extrapolated = next_weights + (((momentum - 1) / next_momentum) * ~restart)[:, None] * change
+            momentum = next_momentum
+            weights = next_weights
+
+            if np.abs(change).max() <= tolerance:
+                logger.debug('Batch of %d portfolios converged in %d iterations', batch, iteration)
+                return weights, True
+
+        logger.warning('Batch of %d portfolios did not converge in %d iterations', batch, max_iterations)
+        return weights, False
+
+    def _portfolio_statistics(self, weights: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Returns - the expected returns, volatilities and Sharpe ratios of a (K x N) batch of portfolios"""
+        expected_return = weights @ self.expected_returns
+        volatility = np.sqrt(np.maximum(np.einsum('ki,ij,kj->k', weights, self.covariance, weights), 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe_ratio = (expected_return - self.risk_free_rate) / volatility
+        return expected_return, volatility, sharpe_ratio
+
+    def _result(self, weights: npt.NDArray[np.float64], converged: bool) -> OptimizationResult:
+        """Wraps a single (N,) solution into an OptimizationResult"""
+        expected_return, volatility, sharpe_ratio = self._portfolio_statistics(weights[None, :])
+        return OptimizationResult(
+            weights=pd.Series(weights, index=self.tickers),
+            expected_return=float(expected_return[0]),
+            volatility=float(volatility[0]),
+            sharpe_ratio=float(sharpe_ratio[0]),
+            converged=converged
+        )
+
+    def _maximum_return_weights(self) -> npt.NDArray[np.float64]:
+        """The feasible portfolio with the highest expected return: every asset at its lower bound, then fill the best assets up"""
+        weights = self.lower_bound.copy()
+        remaining = 1 - weights.sum()
+        for asset in np.argsort(-self.expected_returns):
+            allocation = min(self.upper_bound[asset] - weights[asset], remaining)
+            weights[asset] += allocation
+            remaining -= allocation
+            if remaining <= 0:
+                break
+        return weights
+
+    def _minimum_variance_solution(self) -> npt.NDArray[np.float64]:
+        """The minimum variance weights, solved once and reused as the warm start of every other problem"""
+        if self._minimum_variance_weights is None:
+            solution, _ = self._solve_batch(np.zeros(1))
+            self._minimum_variance_weights = solution[0]
+        return self._minimum_variance_weights
+
+    def _risk_tolerance_ceiling(self, target_returns: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """
+        Doubles the risk tolerance of every target until the solution reaches the target return
+
+        Returns - the upper risk tolerances and the (K x N) solutions at them
+        """
+        batch = len(target_returns)
+        ceiling = np.full(batch, self.lipschitz_constant / max(float(np.ptp(self.expected_returns)), 1e-12))
+        solutions = np.tile(self._minimum_variance_solution(), (batch, 1))
+        for _ in range(TARGET_SEARCH_STEPS):
+            solutions, _ = self._solve_batch(ceiling, solutions)
+            short = solutions @ self.expected_returns < target_returns - RETURN_TOLERANCE
+            if not short.any():
+                break
+            ceiling = np.where(short, ceiling * 2, ceiling)
+        return ceiling, solutions
+
+    def _solve_for_target_returns(self, target_returns: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], bool]:
+        """
+        Finds the efficient portfolio of every target return by searching the risk tolerance of all targets at once.
+
+        The efficient weights are piecewise linear in the risk tolerance, so the achieved return is too and a regula falsi
+        search (with the Illinois modification) lands on the target in a few steps. Every step is warm started from the
+        solutions of the previous one
+
+        Returns - the (K x N) solutions and whether every solve converged
+        """
+        minimum_return = float(self._minimum_variance_solution() @ self.expected_returns)
+        maximum_return = float(self._maximum_return_weights() @ self.expected_returns)
+        if (target_returns > maximum_return + RETURN_TOLERANCE).any():
+            raise ValueError(f'Target returns above the maximum attainable return of {maximum_return:.6f}')
+        targets = np.clip(target_returns, minimum_return, maximum_return)
+
+        tolerance_high, solutions = self._risk_tolerance_ceiling(targets)
+        tolerance_low = np.zeros(len(targets))
+        excess_high = solutions @ self.expected_returns - targets
+        excess_low = np.full(len(targets), minimum_return) - targets
+        last_side = np.zeros(len(targets), dtype=np.int8)
+        all_converged = True
+
+        for _ in range(TARGET_SEARCH_STEPS):
+            if np.minimum(np.abs(excess_low), np.abs(excess_high)).max() <= RETURN_TOLERANCE:
+                break
+            denominator = excess_high - excess_low
+            with np.errstate(divide='ignore', invalid='ignore'):
+                candidate = tolerance_low - excess_low * (tolerance_high - tolerance_low) / denominator
+            candidate = np.where(denominator > 0, candidate, (tolerance_low + tolerance_high) / 2)
+
+            solutions, converged = self._solve_batch(candidate, solutions)
+            all_converged &= converged
+            excess = solutions @ self.expected_returns - targets
+            below = excess < 0
+
+            # Illinois step: halve the stale end of the bracket when the same side moves twice in a row
+            excess_high = np.where(below & (last_side == -1), excess_high / 2, excess_high)
+            excess_low = np.where(~below & (last_side == 1), excess_low / 2, excess_low)
+            tolerance_low = np.where(below, candidate, tolerance_low)
+            excess_low = np.where(below, excess, excess_low)
+            tolerance_high = np.where(below, tolerance_high, candidate)
+            excess_high = np.where(below, excess_high, excess)
+            last_side = np.where(below, -1, 1).astype(np.int8)
+
+        # Targets at the bottom of the frontier are the minimum variance portfolio itself
+        at_minimum = targets <= minimum_return + RETURN_TOLERANCE
+        solutions[at_minimum] = self._minimum_variance_solution()
+        return solutions, all_converged
+
+    def minimum_variance(self) -> OptimizationResult:
+        """Returns - the minimum variance portfolio"""
+        solution, converged = self._solve_batch(np.zeros(1), self._minimum_variance_solution()[None, :])
+        return self._result(solution[0], converged)
+
+    def target_return(self, target: float) -> OptimizationResult:
+        """
+        Returns - the minimum variance portfolio with the given annualized expected return. Targets below the return of the
+        minimum variance portfolio give the minimum variance portfolio itself
+        """
+        solutions, converged = self._solve_for_target_returns(np.array([target], dtype=np.float64))
+        return self._result(solutions[0], converged)
+
+    def maximum_sharpe(self, tolerance: float = 1e-6) -> OptimizationResult:
+        """
+        Finds the tangency portfolio. The Sharpe ratio is unimodal along the efficient frontier, so it is bracketed with a
+        batched grid search over the risk tolerance: every round solves SHARPE_GRID_POINTS portfolios together (warm started
+        from the best portfolio so far) and zooms into the grid cells around the best one
+
+        Returns - the maximum Sharpe ratio portfolio
+        """
+        maximum_return = float(self._maximum_return_weights() @ self.expected_returns)
+        ceiling, _ = self._risk_tolerance_ceiling(np.array([maximum_return]))
+        low, high = 0.0, float(ceiling[0])
+        best_weights = self._minimum_variance_solution()
+        best_tolerance = 0.0
+        converged = True
+
+        while high - low > tolerance * max(1.0, high):
+            grid = np.linspace(low, high, SHARPE_GRID_POINTS)
+            solutions, grid_converged = self._solve_batch(grid, np.tile(best_weights, (SHARPE_GRID_POINTS, 1)))
+            converged &= grid_converged
+            sharpe_ratios = np.nan_to_num(self._portfolio_statistics(solutions)[2], nan=-np.inf)
+            best = int(np.argmax(sharpe_ratios))
+            best_tolerance, best_weights = float(grid[best]), solutions[best]
+            low, high = float(grid[max(best - 1, 0)]), float(grid[min(best + 1, SHARPE_GRID_POINTS - 1)])
+
+        logger.debug('Maximum Sharpe portfolio found at risk tolerance %.6e', best_tolerance)
+        return self._result(best_weights, converged)
+
+    def efficient_frontier(self, points: int = 50) -> EfficientFrontier:
+        """
+        Traces the efficient frontier between the minimum variance and the maximum return portfolios. The target returns are
+        evenly spaced and all points are solved together as one batch
+
+        Returns - an EfficientFrontier with the statistics and the weights of every point
+        """
+        if points < 2:
+            raise ValueError('The efficient frontier needs at least 2 points')
+        minimum_return = float(self._minimum_variance_solution() @ self.expected_returns)
+        maximum_return = float(self._maximum_return_weights() @ self.expected_returns)
+        targets = np.linspace(minimum_return, maximum_return, points)
+
+        solutions, converged = self._solve_for_target_returns(targets)
+        if not converged:
+            logger.warning('Some efficient frontier points did not converge')
+        expected_return, volatility, sharpe_ratio = self._portfolio_statistics(solutions)
+
+        frontier_points = pd.DataFrame({'expected_return': expected_return, 'volatility': volatility, 'sharpe_ratio': sharpe_ratio})
+        logger.info('Efficient frontier of %d points traced for %d assets', points, len(self.tickers))
+        return EfficientFrontier(points=frontier_points, weights=pd.DataFrame(solutions, columns=self.tickers))
@@ -3,13 +3,36 @@ This file is responsible for analysing the stock value and calculating the daily
 """
 import logging
 from collections.abc import Generator
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
 import pandas as pd
 import numpy as np
 
+from src.modules.analytics.online_statistics import OnlineStatistics
+
 logger = logging.getLogger("analytics")
 
+# Either a whole dataframe or an iterator over its chunks (see online_statistics)
+FrameOrChunks = pd.DataFrame | Iterable[pd.DataFrame]
+
+def _stream_column_statistics(chunks: Iterable[pd.DataFrame], columns: Sequence[str], jointly: bool = False) -> List[OnlineStatistics]:
+    """
+    Reduces the given columns of a stream of chunks to online statistics in constant memory. Every column gets its own
+    accumulator (skipping only its own NaNs) unless jointly is set, in which case a single accumulator over the rows without
+    any NaN is returned
+    """
+    statistics = [OnlineStatistics(len(columns))] if jointly else [OnlineStatistics(1) for _ in columns]
+    for chunk in chunks:
+        missing = [c for c in columns if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Invalid input chunk: missing required columns {missing}")
+        if jointly:
+            statistics[0].update(chunk[list(columns)])
+        else:
+            for column_statistics, column in zip(statistics, columns):
+                column_statistics.update(chunk[column])
+    return statistics
+
 def get_stock_name() -> str:
     stock_name = input('Enter the stock name: ')
     return stock_name
@@ -97,15 +120,20 @@ def calculate_cummulative_returns(df: pd.DataFrame) -> Tuple[np.float64, np.floa
     logger.info('The ticker cummulative return is: %s and the benchmark cummulative return is: %s', ticker_cummulative_return, benchmark_cummulative_return)
     return (ticker_cummulative_return, benchmark_cummulative_return)
 
-def calculate_annualized_volatility(df: pd.DataFrame, ticker_returns_col:str = 'ticker_close_returns', benchmark_returns_col:str = 'benchmark_close_returns') -> Tuple[np.float64, np.float64]:
+def calculate_annualized_volatility(df: FrameOrChunks, ticker_returns_col:str = 'ticker_close_returns', benchmark_returns_col:str = 'benchmark_close_returns') -> Tuple[np.float64, np.float64]:
     """
-    Calculates the Standard Deviation of the ticker's daily returns and returns its annualized value
+    Calculates the Standard Deviation of the ticker's daily returns and returns its annualized value. The input can also be
+    an iterator over chunks of the dataframe, which is then reduced in constant memory
     """
     REQUIRED_COLUMNS = (
         ticker_returns_col,
         benchmark_returns_col,
     )
 
+    if not isinstance(df, pd.DataFrame):
+        ticker_statistics, benchmark_statistics = _stream_column_statistics(df, REQUIRED_COLUMNS)
+        return (ticker_statistics.std()[0] * np.float64(252 ** 0.5), benchmark_statistics.std()[0] * np.float64(252 ** 0.5))
+
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(
@@ -122,10 +150,17 @@ def calculate_annualized_volatility(df: pd.DataFrame, ticker_returns_col:str = '
     logger.info('The benchmark annualized volatility: %s', benchmark_annualized_volatility)
     return (ticker_annualized_volatility, benchmark_annualized_volatility)
 
-def calculate_covariance(df: pd.DataFrame) -> float:
+def calculate_covariance(df: FrameOrChunks) -> float:
     """
-    Calculates the sample covariance between the ticker and benchmark from the given dataframe    
+    Calculates the sample covariance between the ticker and benchmark from the given dataframe, or from an iterator over
+    its chunks in constant memory
     """
+    if not isinstance(df, pd.DataFrame):
+        statistics = _stream_column_statistics(df, ('ticker_close_log_return', 'benchmark_close_log_return'), jointly=True)[0]
+        streamed_covariance = float(statistics.covariance()[0, 1])
+        logger.info('The sample covariance is: %s', streamed_covariance)
+        return streamed_covariance
+
     df = df.dropna()
     ticker_log_returns_series = df['ticker_close_log_return'].to_numpy(dtype=float)
     benchmark_log_returns_series = df['benchmark_close_log_return'].to_numpy(dtype=float)
@@ -158,7 +193,7 @@ def calculate_beta(df: pd.DataFrame) -> float:
 
     return beta_value
 
-def calculate_log_return_alpha(df: pd.DataFrame) -> float:
+def calculate_log_return_alpha(df: pd.DataFrame, annualized_risk_free_rate: float = 0.05) -> float:
     """
     Calculates the Alpha (Log Returns alpha). It implies the excess log performance of a stock, adjusted against its risk.
 
@@ -172,12 +207,12 @@ def calculate_log_return_alpha(df: pd.DataFrame) -> float:
     Alpha can be misleading if the Beta or annualized risk-free rate are wrong (using a default 5% rate here)
     To compare against a common benchmark - Use a 3-month treasury bill for risk-free calculation
     Jensen's Alpha is the intercept in the CAPM regression 
+    For several factors or many tickers at once, use factor_regression.regress_on_factors
     """
     average_ticker_daily_log_return = df['ticker_close_log_return'].mean()
     average_benchmark_daily_log_return = df['benchmark_close_log_return'].mean()
 
     beta = calculate_beta(df)
-    annualized_risk_free_rate = 0.05
     daily_risk_free_rate = (1 + annualized_risk_free_rate) ** (1/252) - 1
 
     logger.info('The Daily risk free rate: %s', daily_risk_free_rate)
@@ -192,19 +227,25 @@ def calculate_log_return_alpha(df: pd.DataFrame) -> float:
     logger.info('The annualized log alpha is: %s', annualized_log_alpha)
     return annualized_log_alpha
 
-def calculate_sharp_ratio(df: pd.DataFrame) -> float:
+def calculate_sharp_ratio(df: FrameOrChunks, annualized_risk_free_rate: float = 0.05) -> float:
     """
     Calculates the Sharpe Ratio (or Risk Adjusted Return) of a ticker against a benchmark. It helps the user in understanding if 
-    the returns are due to smart investing or just taking excessive risk
+    the returns are due to smart investing or just taking excessive risk. The input can also be an iterator over chunks of the
+    dataframe, which is then reduced in constant memory
 
     Returns -  the Annualized Sharpe Ratio
     """
-    average_ticker_daily_log_return: float = df['ticker_close_log_return'].mean()
-    annualized_risk_free_rate: float = 0.05
+    daily_volatility: float
+    if isinstance(df, pd.DataFrame):
+        average_ticker_daily_log_return: float = df['ticker_close_log_return'].mean()
+        daily_volatility = df['ticker_close_log_return'].std()
+    else:
+        statistics = _stream_column_statistics(df, ('ticker_close_log_return',))[0]
+        average_ticker_daily_log_return = float(statistics.mean[0])
+        daily_volatility = float(statistics.std()[0])
     daily_risk_free_rate: float = (1 + annualized_risk_free_rate) ** (1/252) - 1
 
     excess_return = average_ticker_daily_log_return - daily_risk_free_rate
-    daily_volatility: float = df['ticker_close_log_return'].std()
     daily_sharpe_ratio = excess_return / daily_volatility
     annualized_sharpe_ratio: float = daily_sharpe_ratio * (252 ** 0.5)
 
@@ -237,24 +278,23 @@ def calculate_correlation_coefficient(df: pd.DataFrame) -> float:
     
 def calculate_daily_portfolio_returns(validated_df: pd.DataFrame) -> pd.Series:
     """
-    Calculates the daily portfolio total from the input data frame's closing prices and returns their daily percentage change
-    
-    For simplicity, we'll assume that the user holds a single stock of each company. Variable quantities of particular stock and 
-    its calculation will be added later 
+    Calculates the daily returns of an equally weighted portfolio, rebalanced to equal weights every day, from the input data
+    frame's closing prices. The portfolio return of a day is the average of the individual asset returns of that day.
+    Custom weights, holdings and other rebalance schedules are handled by portfolio_analyzer.simulate_portfolios
 
     Args: 
-    df_test (pandas Dataframe) - storing the name of the stocks as columns and their closing values as row values
+    validated_df (pandas Dataframe) - storing the name of the stocks as columns and their closing values as row values
 
     Returns:
-    Daily percentage change of the portfolio's total valuation across a time period
+    Daily return of the portfolio across a time period
     """
     
     df_returns = validated_df.pct_change()
 
-    daily_average_returns = df_returns.dropna().mean(axis=1)
+    daily_average_returns: pd.Series = df_returns.dropna().mean(axis=1)
 
-    print(f'daily_average_returns is: {daily_average_returns}')
-    return daily_average_returns.pct_change()
+    logger.debug('daily_average_returns is: %s', daily_average_returns)
+    return daily_average_returns
 
 def build_price_frame(close_series: pd.Series) -> pd.DataFrame:
     """
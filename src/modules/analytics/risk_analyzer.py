@@ -0,0 +1,301 @@
+"""
+This file is responsible for the Value-at-Risk (VaR) and Expected Shortfall (ES) of single tickers and weighted portfolios.
+
+Three families of methods are supported and every one of them evaluates all the confidence levels and horizons of a request in
+a single call:
+- historical: the empirical distribution of the overlapping h-day portfolio returns
+- parametric: a normal or a Cornish-Fisher (skewness and kurtosis adjusted) quantile of the daily portfolio log returns,
+  scaled to the horizon under the i.i.d. assumption
+- monte_carlo: simulated daily asset log returns compounded over the horizon, generated in memory-bounded batches across a
+  process pool
+
+Losses are reported as positive fractions of the portfolio value, so a 0.05 VaR means a 5% loss
+"""
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+logger = logging.getLogger("analytics")
+
+RISK_METHODS = ('historical', 'normal', 'cornish_fisher', 'monte_carlo')
+RISK_REPORT_COLUMNS = ['portfolio', 'method', 'confidence_level', 'horizon', 'value_at_risk', 'expected_shortfall']
+DEFAULT_SIMULATIONS = 100_000
+DEFAULT_MEMORY_BUDGET_MB = 64
+# Number of tail quantiles averaged to get the Cornish-Fisher expected shortfall
+CORNISH_FISHER_TAIL_POINTS = 2_000
+
+STANDARD_NORMAL = NormalDist()
+
+
+def tail_losses(losses: npt.NDArray[np.float64], confidence_levels: Sequence[float]) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Empirical VaR and ES of every row of a loss matrix for all confidence levels, using one partition-based selection.
+
+    The VaR at level α is the k-th smallest loss with k = ceil(α * n) - 1. np.partition places every requested k at its sorted
+    position with the larger losses after it, so the ES (the mean of the losses at or beyond the VaR) is the mean of the tail
+    slice - no full sort is needed
+
+    Args:
+    losses - (..., n) losses, the last axis holding the scenarios or observations
+    confidence_levels - the confidence levels, each in (0, 1)
+
+    Returns - the VaR and ES arrays of shape (..., len(confidence_levels))
+    """
+    observations = losses.shape[-1]
+    if observations == 0:
+        raise ValueError('At least 1 loss observation is needed to estimate VaR')
+    ranks = [min(observations - 1, max(0, math.ceil(level * observations) - 1)) for level in confidence_levels]
+    partitioned = np.partition(losses, sorted(set(ranks)), axis=-1)
+
+    value_at_risk = np.stack([partitioned[..., rank] for rank in ranks], axis=-1)
+    expected_shortfall = np.stack([partitioned[..., rank:].mean(axis=-1) for rank in ranks], axis=-1)
+    return value_at_risk, expected_shortfall
+
+
+def horizon_returns(prices: npt.NDArray[np.float64], weights: npt.NDArray[np.float64], horizon: int) -> npt.NDArray[np.float64]:
+    """
+    Overlapping h-day buy-and-hold returns of every portfolio: the growth of each asset over the window weighted by the
+    portfolio weights at the start of the window
+
+    Returns - a (P x (T - h)) array of portfolio returns
+    """
+    growth = prices[horizon:] / prices[:-horizon] - 1
+    portfolio_returns: npt.NDArray[np.float64] = weights @ growth.T
+    return portfolio_returns
+
+
+def cornish_fisher_quantile(z: npt.NDArray[np.float64] | float, skewness: float, excess_kurtosis: float) -> npt.NDArray[np.float64]:
+    """Adjusts standard normal quantiles for the skewness and excess kurtosis of the distribution"""
+    z = np.asarray(z, dtype=np.float64)
+    adjusted: npt.NDArray[np.float64] = (
+        z
+        + (z ** 2 - 1) * skewness / 6
+        + (z ** 3 - 3 * z) * excess_kurtosis / 24
+        - (2 * z ** 3 - 5 * z) * skewness ** 2 / 36
+    )
+    return adjusted
+
+
+def parametric_tail_losses(
+    daily_log_returns: npt.NDArray[np.float64],
+    confidence_levels: Sequence[float],
+    horizons: Sequence[int],
+    method: str
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    VaR and ES of one portfolio from the moments of its daily log returns. The h-day log return has mean h * μ, volatility
+    σ * sqrt(h), skewness S / sqrt(h) and excess kurtosis K / h. Quantiles of the log return are turned into simple return
+    losses, 1 - exp(q).
+
+    The normal ES uses the closed form E[exp(X) | X <= q] of a normal X, the Cornish-Fisher ES averages the adjusted quantile
+    over CORNISH_FISHER_TAIL_POINTS evenly spaced tail probabilities
+
+    Returns - the VaR and ES arrays of shape (len(horizons), len(confidence_levels))
+    """
+    returns = daily_log_returns[np.isfinite(daily_log_returns)]
+    if len(returns) < 3:
+        raise ValueError('At least 3 daily returns are needed for the parametric VaR')
+    mean = float(returns.mean())
+    volatility = float(returns.std(ddof=1))
+    centered = returns - mean
+    population_std = float(np.sqrt((centered ** 2).mean()))
+    skewness = float((centered ** 3).mean() / population_std ** 3) if population_std > 0 else 0.0
+    excess_kurtosis = float((centered ** 4).mean() / population_std ** 4 - 3) if population_std > 0 else 0.0
+
+    value_at_risk = np.empty((len(horizons), len(confidence_levels)))
+    expected_shortfall = np.empty_like(value_at_risk)
+    for i, horizon in enumerate(horizons):
+        horizon_mean = mean * horizon
+        horizon_volatility = volatility * math.sqrt(horizon)
+        for j, level in enumerate(confidence_levels):
+            tail_probability = 1 - level
+            z = STANDARD_NORMAL.inv_cdf(tail_probability)
+            if method == 'normal':
+                quantile = horizon_mean + horizon_volatility * z
+                # E[exp(X) | X <= q] = exp(μ + σ²/2) * Φ(z - σ) / Φ(z) for X ~ N(μ, σ²)
+                tail_growth = math.exp(horizon_mean + horizon_volatility ** 2 / 2) * STANDARD_NORMAL.cdf(z - horizon_volatility) / tail_probability
+            else:
+                horizon_skewness = skewness / math.sqrt(horizon)
+                horizon_kurtosis = excess_kurtosis / horizon
+                quantile = horizon_mean + horizon_volatility * float(cornish_fisher_quantile(z, horizon_skewness, horizon_kurtosis))
+                tail_probabilities = (np.arange(CORNISH_FISHER_TAIL_POINTS) + 0.5) / CORNISH_FISHER_TAIL_POINTS * tail_probability
+                tail_z = np.array([STANDARD_NORMAL.inv_cdf(float(p)) for p in tail_probabilities])
+                tail_quantiles = horizon_mean + horizon_volatility * cornish_fisher_quantile(tail_z, horizon_skewness, horizon_kurtosis)
+                tail_growth = float(np.exp(tail_quantiles).mean())
+            value_at_risk[i, j] = -math.expm1(quantile)
+            expected_shortfall[i, j] = 1 - tail_growth
+    return value_at_risk, expected_shortfall
+
+
+def _simulate_portfolio_losses(
+    seed_sequence: np.random.SeedSequence,
+    scenarios: int,
+    mean: npt.NDArray[np.float64],
+    covariance_root: npt.NDArray[np.float64],
+    weights: npt.NDArray[np.float64],
+    horizons: Sequence[int],
+    degrees_of_freedom: float | None
+) -> npt.NDArray[np.float64]:
+    """
+    Worker of the Monte Carlo VaR. Simulates one batch of daily asset log returns up to the longest horizon, compounds them
+    and returns the buy-and-hold portfolio losses at every horizon
+
+    Returns - a (P x H x scenarios) array of losses
+    """
+    rng = np.random.default_rng(seed_sequence)
+    max_horizon = max(horizons)
+    shocks = rng.standard_normal((scenarios, max_horizon, len(mean)))
+    if degrees_of_freedom is not None:
+        # Student-t shocks scaled to unit variance: a normal divided by sqrt(chi-square / dof)
+        mixing = rng.chisquare(degrees_of_freedom, (scenarios, max_horizon, 1)) / degrees_of_freedom
+        shocks *= np.sqrt((degrees_of_freedom - 2) / degrees_of_freedom / mixing)
+    cumulative_log_returns = np.cumsum(shocks @ covariance_root.T + mean, axis=1)
+
+    horizon_index = np.asarray(horizons) - 1
+    asset_growth = np.expm1(cumulative_log_returns[:, horizon_index, :])
+    losses: npt.NDArray[np.float64] = -np.einsum('pn,shn->phs', weights, asset_growth)
+    return losses
+
+
+def monte_carlo_tail_losses(
+    daily_log_returns: npt.NDArray[np.float64],
+    weights: npt.NDArray[np.float64],
+    confidence_levels: Sequence[float],
+    horizons: Sequence[int],
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: int | None = None,
+    workers: int | None = None,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    degrees_of_freedom: float | None = None
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Monte Carlo VaR and ES of every portfolio. Daily asset log returns are drawn from a multivariate normal (or Student-t when
+    degrees_of_freedom is set) fitted to the history, and the portfolio value is compounded over every horizon.
+
+    The scenarios are split into batches sized so that the simulated (batch x horizon x assets) returns fit in
+    memory_budget_mb. Every batch draws from its own child of one SeedSequence, so the results only depend on the seed and
+    not on the number of workers. The batches run on a process pool when workers > 1
+
+    Args:
+    daily_log_returns - (T x N) daily log returns of the assets
+    weights - (P x N) portfolio weights
+
+    Returns - the VaR and ES arrays of shape (P, len(horizons), len(confidence_levels))
+    """
+    complete_rows = np.isfinite(daily_log_returns).all(axis=1)
+    history = daily_log_returns[complete_rows]
+    if len(history) < 2:
+        raise ValueError('At least 2 complete daily returns are needed for the Monte Carlo VaR')
+    if degrees_of_freedom is not None and degrees_of_freedom <= 2:
+        raise ValueError('The Student-t degrees of freedom must be above 2 for a finite variance')
+
+    mean = history.mean(axis=0)
+    covariance = np.atleast_2d(np.cov(history, rowvar=False))
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    covariance_root = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0.0))
+
+    assets = history.shape[1]
+    # The shocks, the correlated returns and their cumulative sum are alive at the same time
+    bytes_per_scenario = 3 * 8 * max(horizons) * assets
+    batch_size = max(1, min(simulations, int(memory_budget_mb * 2 ** 20 // bytes_per_scenario)))
+    batch_sizes = [min(batch_size, simulations - start) for start in range(0, simulations, batch_size)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    task_arguments = [(sequence, size, mean, covariance_root, weights, horizons, degrees_of_freedom) for sequence, size in zip(seed_sequences, batch_sizes)]
+
+    workers = min(workers or os.cpu_count() or 1, len(batch_sizes))
+    logger.info('Simulating %d scenarios in %d batches of up to %d on %d workers', simulations, len(batch_sizes), batch_size, workers)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = list(executor.map(_simulate_portfolio_losses, *zip(*task_arguments)))
+    else:
+        batches = [_simulate_portfolio_losses(*arguments) for arguments in task_arguments]
+
+    return tail_losses(np.concatenate(batches, axis=-1), confidence_levels)
+
+
+def calculate_value_at_risk(
+    prices: pd.DataFrame,
+    weights: npt.ArrayLike | None = None,
+    confidence_levels: Sequence[float] = (0.95, 0.99),
+    horizons: Sequence[int] = (1, 10),
+    methods: Sequence[str] = RISK_METHODS,
+    portfolio_names: Sequence[str] | None = None,
+    **monte_carlo_options: Any
+) -> pd.DataFrame:
+    """
+    Calculates the VaR and ES of one or many portfolios for every method, confidence level and horizon in one call
+
+    Description:
+    The historical method uses the overlapping h-day buy-and-hold returns of the price history. The parametric methods fit
+    the daily portfolio log returns (daily rebalanced to the weights). The Monte Carlo method simulates the assets jointly, see
+    monte_carlo_tail_losses for its options (simulations, seed, workers, memory_budget_mb, degrees_of_freedom)
+
+    Args:
+    prices - (T x N) close prices without missing values, one column per asset
+    weights - (N,) weights of a single portfolio or (P x N) weights of P portfolios. Defaults to an equally weighted portfolio
+    (the ticker itself when there is a single column)
+    confidence_levels - the confidence levels, each in (0, 1)
+    horizons - the holding periods in trading days
+    methods - a subset of RISK_METHODS
+
+    Returns:
+    A long dataframe with the RISK_REPORT_COLUMNS columns, one row per portfolio, method, confidence level and horizon
+    """
+    unknown_methods = set(methods) - set(RISK_METHODS)
+    if unknown_methods:
+        raise ValueError(f'Unknown VaR methods: {sorted(unknown_methods)}. Choose from {RISK_METHODS}')
+    if not all(0 < level < 1 for level in confidence_levels):
+        raise ValueError('Confidence levels must be between 0 and 1')
+    if not horizons or min(horizons) < 1:
+        raise ValueError('Horizons must be positive numbers of trading days')
+
+    price_matrix = prices.to_numpy(dtype=np.float64)
+    if not np.isfinite(price_matrix).all() or (price_matrix <= 0).any():
+        raise ValueError('prices must be positive and free of missing values. Align and forward fill the panel first')
+    if len(price_matrix) <= max(horizons):
+        raise ValueError(f'{len(price_matrix)} prices are not enough for a {max(horizons)} day horizon')
+
+    assets = price_matrix.shape[1]
+    weight_matrix = np.atleast_2d(np.asarray(weights if weights is not None else np.full(assets, 1 / assets), dtype=np.float64))
+    if weight_matrix.shape[1] != assets:
+        raise ValueError(f'Expected {assets} weights per portfolio, got {weight_matrix.shape[1]}')
+    names = list(portfolio_names) if portfolio_names is not None else [f'portfolio_{i}' for i in range(len(weight_matrix))]
+
+    results: Dict[str, Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]] = {}
+    if 'historical' in methods:
+        historical = [tail_losses(-horizon_returns(price_matrix, weight_matrix, horizon), confidence_levels) for horizon in horizons]
+        results['historical'] = (np.stack([var for var, _ in historical], axis=1), np.stack([es for _, es in historical], axis=1))
+
+    asset_log_returns = np.diff(np.log(price_matrix), axis=0)
+    portfolio_log_returns = np.log1p(np.expm1(asset_log_returns) @ weight_matrix.T)
+    for method in ('normal', 'cornish_fisher'):
+        if method in methods:
+            parametric = [parametric_tail_losses(portfolio_log_returns[:, p], confidence_levels, horizons, method) for p in range(len(weight_matrix))]
+            results[method] = (np.stack([var for var, _ in parametric]), np.stack([es for _, es in parametric]))
+
+    if 'monte_carlo' in methods:
+        results['monte_carlo'] = monte_carlo_tail_losses(asset_log_returns, weight_matrix, confidence_levels, horizons, **monte_carlo_options)
+
+    rows: List[Dict[str, Any]] = []
+    for method, (value_at_risk, expected_shortfall) in results.items():
+        for p, name in enumerate(names):
+            for i, horizon in enumerate(horizons):
+                for j, level in enumerate(confidence_levels):
+                    rows.append({
+                        'portfolio': name,
+                        'method': method,
+                        'confidence_level': level,
+                        'horizon': horizon,
+                        'value_at_risk': float(value_at_risk[p, i, j]),
+                        'expected_shortfall': float(expected_shortfall[p, i, j]),
+                    })
+
+    logger.info('VaR computed for %d portfolios with methods %s', len(names), list(results))
+    return pd.DataFrame(rows, columns=RISK_REPORT_COLUMNS)
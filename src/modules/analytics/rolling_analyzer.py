@@ -0,0 +1,123 @@
+"""
+This file is responsible for the rolling-window (time-varying) metrics of a ticker against a benchmark: rolling beta, alpha,
+correlation, volatility and Sharpe ratio
+"""
+import logging
+from typing import Dict, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.metrics_kernel import (
+    BENCHMARK_LOG,
+    BENCHMARK_SIMPLE,
+    DAILY_RISK_FREE_RATE,
+    TICKER_LOG,
+    TICKER_SIMPLE,
+    TRADING_DAYS_PER_YEAR,
+    stack_return_series
+)
+
+logger = logging.getLogger("analytics")
+
+ROLLING_METRIC_COLUMNS = [
+    'beta',
+    'alpha',
+    'correlation',
+    'ticker_volatility',
+    'benchmark_volatility',
+    'sharpe_ratio',
+]
+
+
+def _prefix_sums(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Cumulative sums along the last axis with a leading 0, so that a window sum is a difference of 2 entries"""
+    prefix = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,), dtype=np.float64)
+    np.cumsum(values, axis=-1, out=prefix[..., 1:])
+    return prefix
+
+
+def calculate_rolling_metrics(
+    ticker_close: npt.ArrayLike,
+    benchmark_close: npt.ArrayLike,
+    windows: Sequence[int],
+    index: pd.Index | None = None
+) -> Dict[int, pd.DataFrame]:
+    """
+    Calculates rolling beta, alpha, correlation, volatility and Sharpe ratio for every window length in a single call
+
+    Description:
+    The windowed sums of the returns, their squares and the ticker-benchmark cross-product are built from prefix sums, so each
+    window length costs O(n) regardless of its size - nothing is recomputed per window. For numerical stability the return
+    series are centered on their full-sample mean before accumulation. Variances and covariances are shift-invariant, so this
+    avoids the catastrophic cancellation in sum(x^2) - sum(x)^2 / n without changing the results
+
+    Args:
+    ticker_close - the close prices of the ticker
+    benchmark_close - the close prices of the benchmark, aligned with the ticker
+    windows - the window lengths (in trading days) to compute
+    index - optional index of the close prices. The result rows are labelled with the last timestamp of every window
+
+    Returns:
+    A dict mapping every window length to a dataframe with the columns in ROLLING_METRIC_COLUMNS. Windows containing
+    non-finite returns or zero variance produce NaN rows
+    """
+    return_series = stack_return_series(ticker_close, benchmark_close)
+    total_returns = return_series.shape[1]
+
+    finite = np.isfinite(return_series).all(axis=0)
+    centers = return_series[:, finite].mean(axis=1) if finite.any() else np.zeros(return_series.shape[0])
+    centered = np.where(finite, return_series - centers[:, None], 0.0)
+
+    first_moments = _prefix_sums(centered)
+    second_moments = _prefix_sums(np.vstack([
+        centered[TICKER_SIMPLE] ** 2,
+        centered[BENCHMARK_SIMPLE] ** 2,
+        centered[TICKER_LOG] ** 2,
+        centered[BENCHMARK_LOG] ** 2,
+        centered[TICKER_LOG] * centered[BENCHMARK_LOG],
+    ]))
+    finite_counts = _prefix_sums(finite.astype(np.float64))
+
+    return_index = index[1:] if index is not None else pd.RangeIndex(1, total_returns + 1)
+    rolling_metrics: Dict[int, pd.DataFrame] = {}
+
+    for window in windows:
+        if window < 2:
+            raise ValueError(f'Window length must be at least 2, got {window}')
+        if window > total_returns:
+            logger.info('Window of %d is longer than the %d available returns. Skipping it', window, total_returns)
+            rolling_metrics[window] = pd.DataFrame(columns=ROLLING_METRIC_COLUMNS, dtype=np.float64)
+            continue
+
+        s1 = first_moments[:, window:] - first_moments[:, :-window]
+        s2 = second_moments[:, window:] - second_moments[:, :-window]
+        complete_window = (finite_counts[window:] - finite_counts[:-window]) == window
+
+        ticker_simple_var = (s2[0] - s1[TICKER_SIMPLE] ** 2 / window) / (window - 1)
+        benchmark_simple_var = (s2[1] - s1[BENCHMARK_SIMPLE] ** 2 / window) / (window - 1)
+        ticker_log_var = (s2[2] - s1[TICKER_LOG] ** 2 / window) / (window - 1)
+        benchmark_log_var = (s2[3] - s1[BENCHMARK_LOG] ** 2 / window) / (window - 1)
+        log_covariance = (s2[4] - s1[TICKER_LOG] * s1[BENCHMARK_LOG] / window) / (window - 1)
+
+        ticker_log_mean = s1[TICKER_LOG] / window + centers[TICKER_LOG]
+        benchmark_log_mean = s1[BENCHMARK_LOG] / window + centers[BENCHMARK_LOG]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = log_covariance / benchmark_log_var
+            metrics = np.vstack([
+                beta,
+                (ticker_log_mean - beta * benchmark_log_mean) * TRADING_DAYS_PER_YEAR,
+                log_covariance / np.sqrt(ticker_log_var * benchmark_log_var),
+                np.sqrt(np.maximum(ticker_simple_var, 0.0) * TRADING_DAYS_PER_YEAR),
+                np.sqrt(np.maximum(benchmark_simple_var, 0.0) * TRADING_DAYS_PER_YEAR),
+                (ticker_log_mean - DAILY_RISK_FREE_RATE) / np.sqrt(ticker_log_var) * np.sqrt(TRADING_DAYS_PER_YEAR),
+            ])
+
+        metrics[:, ~complete_window] = np.nan
+        metrics[~np.isfinite(metrics)] = np.nan
+        rolling_metrics[window] = pd.DataFrame(metrics.T, index=return_index[window - 1:], columns=ROLLING_METRIC_COLUMNS)
+
+    logger.debug('Rolling metrics computed for windows: %s', list(rolling_metrics))
+    return rolling_metrics
@@ -0,0 +1,199 @@
+"""
+This file holds the walk-forward evaluation pipeline: the history is split into consecutive train / test folds (a rolling train
+window of fixed length, or an expanding one that always starts at the beginning), every model is fitted on the train window and
+evaluated on the test window that follows it.
+
+A naive implementation recomputes every window from its raw returns, which is O(folds x history). Here the per-day terms of the
+metrics (the returns, their squares and the cross products with the benchmark) are prefix summed once, so the moment sums of any
+window are the difference of two prefix rows and the metrics of all folds and tickers follow at once from the same formulas as
+returns_analyzer and the metrics kernel
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.bootstrap_analyzer import prepare_return_panel
+from src.modules.analytics.metrics_kernel import TRADING_DAYS_PER_YEAR, PairMomentSums, derive_metrics_from_moment_sums
+from src.modules.analytics.parameter_sweep import ParameterSet, PricePanel, backtest_parameter_set, map_shared_panel, parameter_key
+
+logger = logging.getLogger("analytics")
+
+WINDOW_MODES = ('rolling', 'expanding')
+SELECTION_METRICS = ('sharpe_ratio', 'log_returns_alpha', 'ticker_cummulative_return')
+WALK_FORWARD_PAIR_METRICS = ('beta', 'log_returns_alpha', 'sharpe_ratio', 'ticker_annualized_volatility', 'correlation_coefficient')
+
+
+@dataclass(frozen=True)
+class WalkForwardFolds:
+    """
+    Return rows of every fold: return row i is the return from price row i to price row i + 1. Each array has one entry per fold
+    and the windows are half open, [train_start, train_end) and [test_start, test_end)
+    """
+    train_start: npt.NDArray[np.int64]
+    train_end: npt.NDArray[np.int64]
+    test_start: npt.NDArray[np.int64]
+    test_end: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.train_start)
+
+    def labels(self, index: pd.Index) -> pd.DataFrame:
+        """Returns - one row per fold with the first and last dates of its train and test windows, for a price index"""
+        return pd.DataFrame({
+            'fold': np.arange(len(self)),
+            'train_start': index[self.train_start + 1],
+            'train_end': index[self.train_end],
+            'test_start': index[self.test_start + 1],
+            'test_end': index[self.test_end],
+        })
+
+
+def walk_forward_folds(observations: int, train_size: int, test_size: int, step: int | None = None, mode: str = 'rolling', gap: int = 0) -> WalkForwardFolds:
+    """
+    Splits `observations` returns into walk-forward folds
+
+    Args:
+    train_size - returns in the (first) train window
+    test_size - returns in every test window
+    step - returns between the starts of consecutive test windows, test_size by default (non overlapping test windows)
+    mode - 'rolling' keeps the train window at train_size returns, 'expanding' starts every train window at the first return
+    gap - returns skipped between a train window and its test window (an embargo against leaking overlapping information)
+
+    Returns - the WalkForwardFolds, as many as fit in the history
+    """
+    if mode not in WINDOW_MODES:
+        raise ValueError(f'Unknown window mode: {mode}. Choose from {WINDOW_MODES}')
+    step = step or test_size
+    if train_size < 2 or test_size < 2 or step < 1 or gap < 0:
+        raise ValueError('Train and test windows need at least 2 returns, the step at least 1 and the gap cannot be negative')
+    train_end = np.arange(train_size, observations - gap - test_size + 1, step, dtype=np.int64)
+    if not len(train_end):
+        raise ValueError(f'{observations} returns are too few for a {train_size} return train and a {test_size} return test window')
+    train_start = train_end - train_size if mode == 'rolling' else np.zeros_like(train_end)
+    return WalkForwardFolds(train_start=train_start, train_end=train_end, test_start=train_end + gap, test_end=train_end + gap + test_size)
+
+
+class WindowStatistics:
+    """
+    Prefix sums of the per-day moment terms of N assets against a benchmark. The moment sums - and so the metrics - of any window
+    of returns cost two row lookups, whatever its length, so consecutive folds share all the work done on their common history
+    """
+    def __init__(self, asset_close: npt.ArrayLike, benchmark_close: npt.ArrayLike) -> None:
+        terms = prepare_return_panel(asset_close, benchmark_close)
+        self.observations = terms['n'].shape[0]
+        self.prefix_sums: Dict[str, npt.NDArray[np.float64]] = {}
+        for name, values in terms.items():
+            prefix = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=np.float64)
+            np.cumsum(values, axis=0, out=prefix[1:])
+            self.prefix_sums[name] = prefix
+
+    def moment_sums(self, starts: npt.ArrayLike, ends: npt.ArrayLike) -> PairMomentSums:
+        """Returns - the (F x N) moment sums of the F return windows [starts, ends)"""
+        start_rows, end_rows = np.asarray(starts), np.asarray(ends)
+        return PairMomentSums(**{name: prefix[end_rows] - prefix[start_rows] for name, prefix in self.prefix_sums.items()})
+
+    def metrics(self, starts: npt.ArrayLike, ends: npt.ArrayLike) -> Dict[str, npt.NDArray[Any]]:
+        """Returns - the metrics kernel metrics of the F windows, as (F x N) arrays"""
+        return derive_metrics_from_moment_sums(self.moment_sums(starts, ends))
+
+
+def hedged_returns(moments: PairMomentSums, beta: npt.NDArray[np.float64]) -> Dict[str, npt.NDArray[np.float64]]:
+    """
+    Evaluates the beta hedge r - beta * r_benchmark (log returns) over windows, with betas fitted elsewhere
+
+    Returns - the annualized mean and volatility of the hedged returns, shaped like the moment sums
+    """
+    n = moments.n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ddof_n = np.where(n > 1, n - 1, np.nan)
+        asset_variance = (moments.asset_log_squares - moments.asset_log ** 2 / n) / ddof_n
+        benchmark_variance = (moments.benchmark_log_squares - moments.benchmark_log ** 2 / n) / ddof_n
+        covariance = (moments.log_cross_products - moments.asset_log * moments.benchmark_log / n) / ddof_n
+        hedged_variance = np.maximum(asset_variance - 2 * beta * covariance + beta ** 2 * benchmark_variance, 0.0)
+        return {
+            'hedged_return': (moments.asset_log - beta * moments.benchmark_log) / n * TRADING_DAYS_PER_YEAR,
+            'hedged_volatility': np.sqrt(hedged_variance * TRADING_DAYS_PER_YEAR),
+        }
+
+
+def walk_forward_pair_metrics(asset_close: pd.DataFrame, benchmark_close: pd.Series, folds: WalkForwardFolds) -> pd.DataFrame:
+    """
+    Walk-forward evaluation of the ticker vs benchmark metrics: beta, alpha, Sharpe ratio, volatility and correlation are
+    measured on every train and every test window, and the beta fitted on the train window is evaluated as a hedge on the test
+    window (its out-of-sample hedged return and volatility)
+
+    Returns - one row per fold and ticker with the fold dates, the train_ and test_ metrics and the hedge evaluation
+    """
+    statistics = WindowStatistics(asset_close.to_numpy(dtype=np.float64), benchmark_close.to_numpy(dtype=np.float64))
+    train = statistics.metrics(folds.train_start, folds.train_end)
+    test_moments = statistics.moment_sums(folds.test_start, folds.test_end)
+    test = derive_metrics_from_moment_sums(test_moments)
+    hedge = hedged_returns(test_moments, train['beta'])
+
+    columns: Dict[str, npt.NDArray[Any]] = {}
+    for metric in WALK_FORWARD_PAIR_METRICS:
+        columns[f'train_{metric}'] = train[metric].ravel()
+        columns[f'test_{metric}'] = test[metric].ravel()
+    columns.update({name: values.ravel() for name, values in hedge.items()})
+
+    labels = folds.labels(asset_close.index)
+    tickers = asset_close.columns
+    report = labels.loc[labels.index.repeat(len(tickers))].reset_index(drop=True)
+    report.insert(1, 'ticker', np.tile(np.asarray(tickers, dtype=object), len(folds)))
+    logger.debug('Walk-forward pair metrics of %d tickers over %d folds', len(tickers), len(folds))
+    return pd.concat([report, pd.DataFrame(columns)], axis=1)
+
+
+def _strategy_equity(panel: PricePanel, parameters: ParameterSet) -> npt.NDArray[np.float64]:
+    """Returns - the equity curve of one parameter set over the whole panel. Runs in a worker process"""
+    return backtest_parameter_set(panel, parameters).equity.to_numpy(dtype=np.float64)
+
+
+def walk_forward_strategy(
+    panel: PricePanel,
+    parameter_sets: Sequence[ParameterSet],
+    folds: WalkForwardFolds,
+    selection_metric: str = 'sharpe_ratio',
+    workers: int | None = 1
+) -> pd.DataFrame:
+    """
+    Walk-forward optimization of a strategy: on every train window the parameter set with the best selection metric is picked,
+    and that choice is evaluated on the following test window
+
+    Description:
+    The built-in strategies only use prices up to every row, so each parameter set is backtested once over the whole history
+    (in parallel over the shared panel) and the fold windows are read from the prefix sums of the resulting (T x P) equity
+    curves. Windows cut from the continuous backtest do not pay the trades of entering the position on their first day
+
+    Returns - one row per fold with the fold dates, the selected parameters, their train metric and their test metrics
+    """
+    if selection_metric not in SELECTION_METRICS:
+        raise ValueError(f'Unknown selection metric: {selection_metric}. Choose from {SELECTION_METRICS}')
+    if not parameter_sets:
+        raise ValueError('At least one parameter set is needed')
+    equity_curves = np.column_stack(map_shared_panel(panel, _strategy_equity, parameter_sets, workers=workers))
+    statistics = WindowStatistics(equity_curves, panel.benchmark_close.ffill().to_numpy(dtype=np.float64))
+
+    train_scores = statistics.metrics(folds.train_start, folds.train_end)[selection_metric]
+    selected = np.nanargmax(np.where(np.isnan(train_scores), -np.inf, train_scores), axis=1)
+    test = statistics.metrics(folds.test_start, folds.test_end)
+    fold_rows = np.arange(len(folds))
+
+    report = folds.labels(panel.close.index)
+    report['parameters'] = [parameter_key(parameter_sets[position]) for position in selected]
+    report[f'train_{selection_metric}'] = train_scores[fold_rows, selected]
+    for metric in ('ticker_cummulative_return', *WALK_FORWARD_PAIR_METRICS):
+        report[f'test_{metric}'] = test[metric][fold_rows, selected]
+    report['test_rank'] = (test[selection_metric] > test[selection_metric][fold_rows, selected][:, None]).sum(axis=1) + 1
+    logger.info('Walk-forward optimization of %d parameter sets over %d folds', len(parameter_sets), len(folds))
+    return report
+
+
+def walk_forward_summary(report: pd.DataFrame) -> Dict[str, float]:
+    """Returns - the mean of every numeric test_ column of a walk-forward report, the out-of-sample averages"""
+    test_columns: List[str] = [column for column in report.columns if column.startswith('test_') and pd.api.types.is_numeric_dtype(report[column])]
+    return {column: float(report[column].mean()) for column in test_columns}
@@ -0,0 +1,165 @@
+"""
+This file is responsible for the convergence-controlled runs of the simulators. Instead of a fixed number of samples, the user
+gives a target standard error or confidence interval width of the estimate and the simulation runs in batches until it is met.
+
+The simulators already reduce their samples to streaming accumulators (EventStatistics, PathStatistics, dice counts), so every
+batch is merged into the running accumulator and the estimate and its standard error are read from it after every batch. The
+size of the next batch is projected from the current standard error - it shrinks like 1 / sqrt(samples) - and at most doubles
+the samples so far, so the run overshoots the target by little without paying for many tiny batches. Every batch draws from its
+own child of one SeedSequence, so a run is reproducible for a seed
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+logger = logging.getLogger("analytics")
+
+DEFAULT_INITIAL_BATCH = 10_000
+# The smallest first batch of a run started from the command line, where it defaults to the size of a fixed run (e.g. 10 rolls)
+MIN_INITIAL_BATCH = 1_000
+DEFAULT_MAX_SAMPLES = 1_000_000_000
+# The projected number of samples is inflated by this factor, the standard error itself being an estimate
+BATCH_SAFETY_FACTOR = 1.1
+CONVERGENCE_TRACE_COLUMNS = ['batch', 'samples', 'estimate', 'standard_error', 'interval_width', 'elapsed_seconds']
+# What the target applies to in a distribution table: the mean outcome, or every probability of the table
+CONVERGENCE_MEASURES = ('mean', 'table')
+
+
+@dataclass(frozen=True)
+class ConvergenceTarget:
+    """
+    When to stop a simulation: once the standard error is at most standard_error, or once the width of the two-sided
+    confidence_level interval (2 z SE) is at most interval_width. Whichever is given - or both - must hold. The run stops at
+    max_samples even if the target is not met
+    """
+    standard_error: float | None = None
+    interval_width: float | None = None
+    confidence_level: float = 0.95
+    initial_batch: int = DEFAULT_INITIAL_BATCH
+    max_samples: int = DEFAULT_MAX_SAMPLES
+
+    def __post_init__(self) -> None:
+        if self.standard_error is None and self.interval_width is None:
+            raise ValueError('A convergence target needs a standard error or a confidence interval width')
+        if (self.standard_error is not None and self.standard_error <= 0) or (self.interval_width is not None and self.interval_width <= 0):
+            raise ValueError('The target standard error and interval width must be positive')
+        if not 0 < self.confidence_level < 1 or self.initial_batch < 2 or self.max_samples < self.initial_batch:
+            raise ValueError('The confidence level must be in (0, 1) and the first batch needs 2 to max_samples samples')
+
+    @property
+    def z_score(self) -> float:
+        """Returns - the standard normal quantile of the two-sided confidence interval"""
+        return NormalDist().inv_cdf((1 + self.confidence_level) / 2)
+
+    def required_standard_error(self) -> float:
+        """Returns - the largest standard error meeting the target"""
+        candidates = [self.standard_error or math.inf]
+        if self.interval_width is not None:
+            candidates.append(self.interval_width / (2 * self.z_score))
+        return min(candidates)
+
+    def next_batch(self, samples: int, standard_error: float) -> int:
+        """Returns - the size of the next batch, projected from the current standard error and capped by max_samples"""
+        if not math.isfinite(standard_error):
+            projected = 2 * samples
+        else:
+            projected = math.ceil(samples * (standard_error / self.required_standard_error()) ** 2 * BATCH_SAFETY_FACTOR)
+        return int(min(max(projected - samples, self.initial_batch), samples, self.max_samples - samples))
+
+
+@dataclass(frozen=True)
+class ConvergenceTrace:
+    """
+    Result of run_until_converged
+
+    trace - one row per batch: the samples so far, the estimate, its standard error, the confidence interval width and the
+    elapsed time (see CONVERGENCE_TRACE_COLUMNS)
+    converged - False when max_samples was reached before the target
+    """
+    trace: pd.DataFrame
+    converged: bool
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns - the final estimate with its standard error, the samples and batches used and whether the target was met"""
+        last = self.trace.iloc[-1]
+        return {
+            'estimate': float(last['estimate']),
+            'standard_error': float(last['standard_error']),
+            'interval_width': float(last['interval_width']),
+            'samples': int(last['samples']),
+            'batches': len(self.trace),
+            'elapsed_seconds': float(last['elapsed_seconds']),
+            'converged': self.converged,
+        }
+
+
+def histogram_estimate(outcomes: npt.ArrayLike, counts: npt.ArrayLike, measure: str = 'mean') -> Tuple[float, float]:
+    """
+    Reads an estimate and its standard error from a histogram of simulated outcomes
+
+    Description:
+    mean - the mean outcome, with the standard error sqrt(variance / samples)
+    table - the probability of the outcome whose estimate is the least precise, with its binomial standard error
+    sqrt(p (1 - p) / samples): the whole table meets a target once that probability does
+
+    Returns - a tuple of (estimate, standard error)
+    """
+    if measure not in CONVERGENCE_MEASURES:
+        raise ValueError(f'Unknown convergence measure: {measure}. Choose from {CONVERGENCE_MEASURES}')
+    values = np.asarray(outcomes, dtype=np.float64)
+    frequencies = np.asarray(counts, dtype=np.float64)
+    samples = frequencies.sum()
+    if samples < 2:
+        return math.nan, math.inf
+    if measure == 'table':
+        probabilities = frequencies / samples
+        standard_errors = np.sqrt(probabilities * (1 - probabilities) / samples)
+        widest = int(np.argmax(standard_errors))
+        return float(probabilities[widest]), float(standard_errors[widest])
+    mean = float(values @ frequencies / samples)
+    variance = float((values - mean) ** 2 @ frequencies / (samples - 1))
+    return mean, math.sqrt(variance / samples)
+
+
+def run_until_converged(
+    simulate_batch: Callable[[int, np.random.SeedSequence], None],
+    measure: Callable[[], Tuple[float, float]],
+    target: ConvergenceTarget,
+    seed: int | None = None
+) -> ConvergenceTrace:
+    """
+    Runs a simulation batch by batch until its estimate meets the target
+
+    Args:
+    simulate_batch - simulates `samples` samples from the given SeedSequence and merges them into the running accumulator
+    measure - reads the running (estimate, standard error) from the accumulator
+    target - the ConvergenceTarget
+
+    Returns - the ConvergenceTrace. The simulated samples stay in the caller's accumulator
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    required_standard_error = target.required_standard_error()
+    started_at = time.perf_counter()
+    rows: List[Tuple[int, int, float, float, float, float]] = []
+    samples, batch = 0, target.initial_batch
+    converged = False
+    while batch > 0:
+        simulate_batch(batch, seed_sequence.spawn(1)[0])
+        samples += batch
+        estimate, standard_error = measure()
+        rows.append((len(rows) + 1, samples, estimate, standard_error, 2 * target.z_score * standard_error, time.perf_counter() - started_at))
+        logger.debug('Batch %d: %d samples, estimate %s, standard error %s', len(rows), samples, estimate, standard_error)
+        converged = standard_error <= required_standard_error
+        if converged:
+            break
+        batch = target.next_batch(samples, standard_error)
+
+    logger.info('Simulation %s after %d samples in %d batches', 'converged' if converged else 'stopped at the sample cap', samples, len(rows))
+    return ConvergenceTrace(trace=pd.DataFrame(rows, columns=CONVERGENCE_TRACE_COLUMNS), converged=converged)
@@ -0,0 +1,167 @@
+"""
+This file is responsible for the exact distributions of sums of independent discrete random variables: the PMF of the sum of
+two integer valued variables is the convolution of their PMFs, so the sum of n dice is the n-th convolution power of one die.
+
+Convolutions are computed with the real FFT (O(m log m) for m outcomes) and the n-th power with exponentiation by squaring,
+which needs O(log n) convolutions instead of n - 1. The exact answers of many-dice problems take milliseconds, and they measure
+how far a Monte Carlo simulation of the same experiment is from the truth
+"""
+import logging
+import math
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.modules.event_simulator import EventDistribution, Stage, experiment_bounds
+
+logger = logging.getLogger("analytics")
+
+# Below this many output outcomes a direct convolution is faster (and exact to the last bit)
+FFT_CONVOLUTION_THRESHOLD = 256
+
+
+@dataclass(frozen=True)
+class ExactDistribution:
+    """The exact PMF of an integer valued variable: probabilities[i] is the probability of the outcome offset + i"""
+    offset: int
+    probabilities: npt.NDArray[np.float64]
+
+    @property
+    def outcomes(self) -> npt.NDArray[np.int64]:
+        """Returns - the outcome of every probability"""
+        return self.offset + np.arange(len(self.probabilities), dtype=np.int64)
+
+    def moments(self) -> Tuple[float, float]:
+        """Returns - the mean and variance of the distribution"""
+        mean = float(self.probabilities @ self.outcomes)
+        return mean, float(self.probabilities @ (self.outcomes - mean) ** 2)
+
+    def as_dict(self) -> Dict[int, float]:
+        """Returns - a dict mapping every outcome to its probability"""
+        return dict(zip(self.outcomes.tolist(), self.probabilities.tolist()))
+
+
+def convolve_pmfs(first: npt.ArrayLike, second: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """
+    Returns - the PMF of the sum of two independent integer valued variables given by their PMFs from their smallest outcome,
+    through a real FFT for large supports. The round-off of the FFT (about 1e-16 of the largest probability) is clipped at 0
+    """
+    left, right = np.asarray(first, dtype=np.float64), np.asarray(second, dtype=np.float64)
+    size = len(left) + len(right) - 1
+    if size <= FFT_CONVOLUTION_THRESHOLD:
+        return np.convolve(left, right)
+    fft_size = 1 << (size - 1).bit_length()
+    convolution = np.fft.irfft(np.fft.rfft(left, fft_size) * np.fft.rfft(right, fft_size), fft_size)[:size]
+    return np.maximum(convolution, 0.0)
+
+
+def pmf_power(probabilities: npt.ArrayLike, power: int) -> npt.NDArray[np.float64]:
+    """Returns - the PMF of the sum of `power` independent copies of a variable, by exponentiation by squaring"""
+    if power < 0:
+        raise ValueError('The number of summed variables cannot be negative')
+    result = np.ones(1)
+    base = np.asarray(probabilities, dtype=np.float64)
+    while power:
+        if power & 1:
+            result = convolve_pmfs(result, base)
+        power >>= 1
+        if power:
+            base = convolve_pmfs(base, base)
+    return result
+
+
+def exact_distribution(distribution: EventDistribution) -> ExactDistribution:
+    """Returns - the ExactDistribution of an integer valued EventDistribution (point masses on integers)"""
+    if not distribution.is_integer:
+        raise ValueError('Exact distributions need point masses on integer values')
+    values = distribution.lows.astype(np.int64)
+    offset = int(values.min())
+    probabilities = np.bincount(values - offset, weights=distribution.probabilities)
+    return ExactDistribution(offset, probabilities)
+
+
+def exact_sum_distribution(distribution: EventDistribution | ExactDistribution, count: int) -> ExactDistribution:
+    """Returns - the ExactDistribution of the sum of `count` independent draws of an integer valued distribution"""
+    base = distribution if isinstance(distribution, ExactDistribution) else exact_distribution(distribution)
+    return ExactDistribution(base.offset * count, pmf_power(base.probabilities, count))
+
+
+def exact_dice_sum_distribution(dice_number: int, sides_per_dice: int) -> ExactDistribution:
+    """Returns - the ExactDistribution of the sum of dice_number fair dice with faces 1 ... sides_per_dice"""
+    if dice_number < 1 or sides_per_dice < 1:
+        raise ValueError('There should at least be 1 dice with at least 1 side')
+    return exact_sum_distribution(ExactDistribution(1, np.full(sides_per_dice, 1 / sides_per_dice)), dice_number)
+
+
+def exact_experiment_distribution(stages: Sequence[Stage]) -> ExactDistribution:
+    """
+    Returns - the exact distribution of the outcome of an integer valued experiment (see event_simulator). A stage drawing as
+    many values as the previous outcome is the mixture over that outcome k of the k-th convolution power, built up one
+    convolution per possible k
+    """
+    experiment_bounds(stages)
+    previous = ExactDistribution(0, np.ones(1))
+    for stage in stages:
+        base = exact_distribution(stage.distribution)
+        if stage.draws is not None:
+            previous = exact_sum_distribution(base, stage.draws)
+            continue
+        counts = previous.outcomes
+        smallest, largest = int(counts[0]), int(counts[-1])
+        highest_value = base.offset + len(base.probabilities) - 1
+        # The k-th power covers k * offset ... k * highest_value
+        mixture_offset = min(smallest * base.offset, largest * base.offset)
+        mixture = np.zeros(max(smallest * highest_value, largest * highest_value) - mixture_offset + 1)
+        power = np.ones(1)
+        for draws in range(largest + 1):
+            if draws >= smallest:
+                start = draws * base.offset - mixture_offset
+                mixture[start:start + len(power)] += previous.probabilities[draws - smallest] * power
+            if draws < largest:
+                power = convolve_pmfs(power, base.probabilities)
+        previous = ExactDistribution(mixture_offset, mixture)
+    return previous
+
+
+def simulation_error_report(exact: ExactDistribution, outcomes: npt.ArrayLike, counts: npt.ArrayLike) -> Dict[str, float]:
+    """
+    Compares a simulated histogram of integer outcomes with the exact distribution
+
+    Returns:
+    total_variation_distance - half the sum of the absolute probability errors
+    max_absolute_error - the largest absolute probability error
+    max_z_score - the largest probability error in binomial standard errors sqrt(p (1 - p) / trials)
+    mean_error / variance_error - the simulated minus the exact mean and variance
+    """
+    outcome_floats = np.asarray(outcomes, dtype=np.float64)
+    if (outcome_floats != np.round(outcome_floats)).any():
+        raise ValueError('The simulated outcomes must be integers, a binned histogram cannot be compared with the exact distribution')
+    outcome_values = outcome_floats.astype(np.int64)
+    frequencies = np.asarray(counts, dtype=np.float64)
+    trials = frequencies.sum()
+    if trials <= 0:
+        raise ValueError('The simulated histogram is empty')
+    positions = outcome_values - exact.offset
+    if (positions < 0).any() or (positions >= len(exact.probabilities)).any():
+        raise ValueError('The simulated outcomes fall outside of the exact distribution')
+    empirical = np.bincount(positions, weights=frequencies, minlength=len(exact.probabilities)) / trials
+    errors = empirical - exact.probabilities
+    with np.errstate(divide='ignore', invalid='ignore'):
+        standard_errors = np.sqrt(exact.probabilities * (1 - exact.probabilities) / trials)
+        z_scores = np.where(standard_errors > 0, np.abs(errors) / standard_errors, 0.0)
+    exact_mean, exact_variance = exact.moments()
+    simulated_mean = float(empirical @ exact.outcomes)
+    simulated_variance = float(empirical @ (exact.outcomes - simulated_mean) ** 2)
+    return {
+        'trials': float(trials),
+        'total_variation_distance': float(np.abs(errors).sum() / 2),
+        'max_absolute_error': float(np.abs(errors).max()),
+        'max_z_score': float(z_scores.max()),
+        'mean_error': simulated_mean - exact_mean,
+        'variance_error': simulated_variance - exact_variance,
+        'expected_max_standard_error': float(standard_errors.max()),
+        'exact_mean': exact_mean,
+        'exact_std': math.sqrt(exact_variance),
+    }
@@ -0,0 +1,479 @@
+"""
+This file is responsible for the general event simulations: coin tosses, dice and user supplied distributions, alone or chained
+into multi-stage experiments.
+
+A distribution is a mixture of point masses (a PMF) and uniform intervals (a piecewise constant PDF). Its components are drawn
+with Vose's alias method, which costs one uniform integer and one uniform float per draw whatever the number of components.
+An experiment is a list of stages: every stage draws a fixed number of values - or as many as the outcome of the previous stage,
+e.g. roll a die, then toss that many coins - and its outcome is the sum of its draws. The outcome of the experiment is the
+outcome of its last stage.
+
+Trials are simulated in chunks, each drawing from its own child of one SeedSequence and sampling at most chunk_size values at
+once, and every chunk is reduced to an EventStatistics accumulator (moments and a histogram) as soon as it is simulated. The
+chunks run on a process pool and their accumulators are merged in order, so the result depends on the seed and the chunk size
+but not on the number of workers
+"""
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.convergence import ConvergenceTarget, ConvergenceTrace, histogram_estimate, run_until_converged
+from src.modules.probability import DEFAULT_CHUNK_ROLLS, get_roll_chunk_sizes
+
+logger = logging.getLogger("analytics")
+
+# Experiments with integer outcomes are counted exactly when their support holds at most this many values, binned otherwise
+MAX_INTEGER_OUTCOMES = 1_000_000
+EVENT_HISTOGRAM_BINS = 1_000
+
+
+@dataclass(frozen=True)
+class EventDistribution:
+    """
+    A mixture of components: component i is uniform on [lows[i], highs[i]] (a point mass when they are equal) and is drawn with
+    probability probabilities[i]. alias_probabilities / aliases are the alias table of the component probabilities
+    """
+    lows: npt.NDArray[np.float64]
+    highs: npt.NDArray[np.float64]
+    probabilities: npt.NDArray[np.float64]
+    alias_probabilities: npt.NDArray[np.float64]
+    aliases: npt.NDArray[np.int64]
+
+    @property
+    def is_discrete(self) -> bool:
+        """Returns - True when every component is a point mass"""
+        return bool((self.lows == self.highs).all())
+
+    @property
+    def is_integer(self) -> bool:
+        """Returns - True when every component is a point mass on an integer"""
+        return self.is_discrete and bool((self.lows == np.round(self.lows)).all())
+
+    def bounds(self) -> Tuple[float, float]:
+        """Returns - the smallest and the largest value that can be drawn"""
+        support = self.probabilities > 0
+        return float(self.lows[support].min()), float(self.highs[support].max())
+
+    def moments(self) -> Tuple[float, float]:
+        """Returns - the exact mean and variance of a draw"""
+        centers = (self.lows + self.highs) / 2
+        mean = float(self.probabilities @ centers)
+        variance = float(self.probabilities @ ((centers - mean) ** 2 + (self.highs - self.lows) ** 2 / 12))
+        return mean, variance
+
+    def sample(self, rng: np.random.Generator, size: int) -> npt.NDArray[np.float64]:
+        """Returns - `size` independent draws, picking the components in O(1) each with the alias table"""
+        columns = rng.integers(0, len(self.probabilities), size=size)
+        components = np.where(rng.random(size) < self.alias_probabilities[columns], columns, self.aliases[columns])
+        values: npt.NDArray[np.float64] = self.lows[components]
+        if not self.is_discrete:
+            values = values + (self.highs[components] - values) * rng.random(size)
+        return values
+
+
+def build_alias_table(probabilities: npt.ArrayLike) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.int64]]:
+    """
+    Builds the alias table of Vose's method: column i is kept with probability alias_probabilities[i] and replaced by
+    aliases[i] otherwise, so picking a uniform column and then one of its two entries draws i with probability probabilities[i]
+
+    Returns - a tuple of (alias_probabilities, aliases)
+    """
+    scaled = np.asarray(probabilities, dtype=np.float64) * len(np.asarray(probabilities))
+    alias_probabilities = np.ones(len(scaled))
+    aliases = np.arange(len(scaled), dtype=np.int64)
+    small = [int(column) for column in np.flatnonzero(scaled < 1)]
+    large = [int(column) for column in np.flatnonzero(scaled >= 1)]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias_probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] += scaled[less] - 1
+        (small if scaled[more] < 1 else large).append(more)
+    return alias_probabilities, aliases
+
+
+def make_event_distribution(lows: npt.ArrayLike, highs: npt.ArrayLike | None = None, weights: npt.ArrayLike | None = None) -> EventDistribution:
+    """
+    Builds an EventDistribution. The weights are normalized to probabilities (equal weights by default) and highs default to
+    the lows, which makes every component a point mass
+
+    Returns - the EventDistribution
+    """
+    low_values = np.atleast_1d(np.asarray(lows, dtype=np.float64))
+    high_values = low_values.copy() if highs is None else np.atleast_1d(np.asarray(highs, dtype=np.float64))
+    weight_values = np.ones(len(low_values)) if weights is None else np.atleast_1d(np.asarray(weights, dtype=np.float64))
+    if not len(low_values) or not low_values.shape == high_values.shape == weight_values.shape:
+        raise ValueError('A distribution needs at least one component and as many highs and weights as lows')
+    if not (np.isfinite(low_values).all() and np.isfinite(high_values).all() and (high_values >= low_values).all()):
+        raise ValueError('Every component needs finite bounds with low <= high')
+    if (weight_values < 0).any() or not weight_values.sum() > 0:
+        raise ValueError('The weights cannot be negative and must not all be 0')
+    probabilities = weight_values / weight_values.sum()
+    alias_probabilities, aliases = build_alias_table(probabilities)
+    return EventDistribution(low_values, high_values, probabilities, alias_probabilities, aliases)
+
+
+def coin_distribution(heads_probability: float = 0.5) -> EventDistribution:
+    """Returns - a coin toss counting heads: 1 with heads_probability, 0 otherwise"""
+    if not 0 <= heads_probability <= 1:
+        raise ValueError('The probability of heads must be between 0 and 1')
+    return make_event_distribution([0, 1], weights=[1 - heads_probability, heads_probability])
+
+
+def dice_distribution(sides: int = 6) -> EventDistribution:
+    """Returns - a fair die with faces 1 ... sides"""
+    if sides < 1:
+        raise ValueError('A die needs at least 1 side')
+    return make_event_distribution(np.arange(1, sides + 1))
+
+
+def parse_distribution_spec(tokens: Sequence[str]) -> EventDistribution:
+    """
+    Parses a distribution given as components: value=weight for a point mass (a PMF entry) and low:high=weight for a uniform
+    interval (a piece of a piecewise constant PDF), e.g. ['1=0.2', '2=0.3', '5=0.5'] or ['0:1=3', '1:4=1']. The weights do not
+    need to add up to 1
+
+    Returns - the EventDistribution
+    """
+    lows: List[float] = []
+    highs: List[float] = []
+    weights: List[float] = []
+    for token in tokens:
+        outcome, separator, weight = token.partition('=')
+        low, _, high = outcome.partition(':')
+        if not separator or not low:
+            raise ValueError(f'Distribution components must look like value=weight or low:high=weight, got: {token}')
+        try:
+            lows.append(float(low))
+            highs.append(float(high or low))
+            weights.append(float(weight))
+        except ValueError:
+            raise ValueError(f'Distribution components must be numbers, got: {token}') from None
+    return make_event_distribution(lows, highs, weights)
+
+
+def load_distribution_spec(path: str | Path) -> EventDistribution:
+    """
+    Reads a distribution spec file: components as in parse_distribution_spec separated by whitespace or new lines, or CSV lines
+    of value,weight or low,high,weight. Empty lines and # comments are skipped
+
+    Returns - the EventDistribution
+    """
+    tokens: List[str] = []
+    for line in Path(path).read_text().splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        fields = [value.strip() for value in line.split(',')]
+        if len(fields) == 2:
+            tokens.append(f'{fields[0]}={fields[1]}')
+        elif len(fields) == 3:
+            tokens.append(f'{fields[0]}:{fields[1]}={fields[2]}')
+        else:
+            tokens.extend(line.split())
+    if not tokens:
+        raise ValueError(f'No distribution components found in {path}')
+    return parse_distribution_spec(tokens)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One stage of an experiment: draws values from distribution and adds them up. draws is the number of draws, None for as many
+    as the outcome of the previous stage
+    """
+    distribution: EventDistribution
+    draws: int | None = 1
+
+
+def parse_stage_spec(spec: str, custom: EventDistribution | None = None) -> Stage:
+    """
+    Parses a stage given as <draws>x<distribution>: draws is a count or 'prev' (the outcome of the previous stage) and the
+    distribution is coin, dice<sides> (e.g. dice6) or custom (the distribution given separately), e.g. 2xdice6 or prevxcoin
+
+    Returns - the Stage
+    """
+    draws, separator, name = spec.partition('x')
+    if not separator or not draws or not name:
+        raise ValueError(f'Stages must look like <draws>x<distribution>, e.g. 2xdice6 or prevxcoin, got: {spec}')
+    if name == 'coin':
+        distribution = coin_distribution()
+    elif name.startswith('dice') and name[4:].isdigit():
+        distribution = dice_distribution(int(name[4:]))
+    elif name == 'custom':
+        if custom is None:
+            raise ValueError('A custom stage needs a distribution spec')
+        distribution = custom
+    else:
+        raise ValueError(f'Unknown stage distribution: {name}. Choose from coin, dice<sides> or custom')
+    if draws == 'prev':
+        return Stage(distribution, None)
+    if not draws.isdigit():
+        raise ValueError(f'The draws of a stage must be a count or prev, got: {draws}')
+    return Stage(distribution, int(draws))
+
+
+def experiment_bounds(stages: Sequence[Stage]) -> Tuple[float, float, bool]:
+    """
+    Checks that an experiment is well defined - a stage drawing as many values as the previous outcome needs that outcome to
+    be a non-negative integer - and bounds its outcome
+
+    Returns - a tuple of (smallest outcome, largest outcome, True when every outcome is an integer)
+    """
+    if not stages:
+        raise ValueError('An experiment needs at least one stage')
+    lowest = highest = 0.0
+    integer = True
+    for position, stage in enumerate(stages):
+        if stage.draws is None:
+            if position == 0 or not integer or lowest < 0:
+                raise ValueError('A stage can only draw as many values as the non-negative integer outcome of a previous stage')
+            draw_range = (lowest, highest)
+        elif stage.draws < 0:
+            raise ValueError('The draws of a stage cannot be negative')
+        else:
+            draw_range = (float(stage.draws), float(stage.draws))
+        low, high = stage.distribution.bounds()
+        lowest = min(draw_range[0] * low, draw_range[1] * low)
+        highest = max(draw_range[0] * high, draw_range[1] * high)
+        integer = stage.distribution.is_integer
+    return lowest, highest, integer
+
+
+def sum_draws(rng: np.random.Generator, distribution: EventDistribution, draws: npt.NDArray[np.int64], chunk_size: int) -> npt.NDArray[np.float64]:
+    """
+    Sums draws[i] values of distribution for every trial i, sampling at most chunk_size values at once: the draws of all trials
+    are numbered one after the other and every block of chunk_size of them is added to the trials it belongs to with np.bincount
+
+    Returns - the (trials,) sums
+    """
+    outcomes = np.zeros(len(draws))
+    ends = np.cumsum(draws)
+    total = int(ends[-1]) if len(ends) else 0
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        owners = np.searchsorted(ends, np.arange(start, stop), side='right')
+        first = int(owners[0])
+        outcomes[first:owners[-1] + 1] += np.bincount(owners - first, weights=distribution.sample(rng, stop - start))
+    return outcomes
+
+
+def simulate_stage_outcomes(rng: np.random.Generator, stages: Sequence[Stage], trials: int, chunk_size: int = DEFAULT_CHUNK_ROLLS) -> npt.NDArray[np.float64]:
+    """
+    Simulates `trials` independent runs of an experiment. The draws of every stage are sampled for blocks of trials holding at
+    most chunk_size values and summed per trial (see sum_draws when the number of draws varies from trial to trial or one trial
+    alone draws more than chunk_size values), so the memory used does not grow with the number of draws. When a discrete stage
+    draws more values per trial than it has components, only how often every component comes up matters: those counts are one
+    multinomial draw per trial, whatever the number of draws
+
+    Returns - the (trials,) outcomes of the last stage
+    """
+    outcomes = np.zeros(trials)
+    for stage in stages:
+        distribution = stage.distribution
+        draws = np.rint(outcomes).astype(np.int64) if stage.draws is None else np.full(trials, stage.draws, dtype=np.int64)
+        components = len(distribution.probabilities)
+        if distribution.is_discrete and components <= draws.mean():
+            block = max(1, chunk_size // components)
+            outcomes = np.concatenate([
+                rng.multinomial(draws[start:start + block], distribution.probabilities) @ distribution.lows for start in range(0, trials, block)
+            ])
+        elif stage.draws is not None and 0 < stage.draws <= chunk_size:
+            block = chunk_size // stage.draws
+            outcomes = np.concatenate([
+                distribution.sample(rng, size * stage.draws).reshape(size, stage.draws).sum(axis=1)
+                for size in (min(block, trials - start) for start in range(0, trials, block))
+            ])
+        else:
+            outcomes = sum_draws(rng, distribution, draws, chunk_size)
+    return outcomes
+
+
+@dataclass
+class EventStatistics:
+    """
+    Streaming summary of simulated outcomes. Two accumulators over disjoint trials are combined with merge, using Chan's
+    parallel update for the mean and variance
+
+    histogram_edges - equal width bins of the outcomes; for integer outcomes every bin holds one integer at its center
+    """
+    histogram_edges: npt.NDArray[np.float64]
+    integer_outcomes: bool = False
+    trials: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    histogram: npt.NDArray[np.int64] = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def update(self, outcomes: npt.NDArray[np.float64]) -> None:
+        """Reduces a chunk of outcomes into the accumulator"""
+        chunk = EventStatistics(self.histogram_edges, self.integer_outcomes)
+        chunk.trials = len(outcomes)
+        chunk.mean = float(outcomes.mean())
+        chunk.m2 = float(((outcomes - chunk.mean) ** 2).sum())
+        chunk.minimum = float(outcomes.min())
+        chunk.maximum = float(outcomes.max())
+        bin_count = len(self.histogram_edges) - 1
+        width = (self.histogram_edges[-1] - self.histogram_edges[0]) / bin_count
+        bins = np.clip(((outcomes - self.histogram_edges[0]) / width).astype(np.int64), 0, bin_count - 1)
+        chunk.histogram = np.bincount(bins, minlength=bin_count).astype(np.int64)
+        self.merge(chunk)
+
+    def merge(self, other: 'EventStatistics') -> None:
+        """Adds the trials summarized by another accumulator"""
+        if other.trials == 0:
+            return
+        if self.trials == 0:
+            self.histogram = np.zeros_like(other.histogram)
+        total = self.trials + other.trials
+        delta = other.mean - self.mean
+        self.mean += delta * other.trials / total
+        self.m2 += other.m2 + delta ** 2 * self.trials * other.trials / total
+        self.trials = total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.histogram += other.histogram
+
+    @property
+    def variance(self) -> float:
+        """Returns - the sample variance of the outcomes"""
+        return self.m2 / (self.trials - 1) if self.trials > 1 else 0.0
+
+    def distribution_table(self) -> pd.DataFrame:
+        """
+        Returns - the outcome (the integer, or the bin center), frequency and probability of every histogram bin with at
+        least one trial
+        """
+        centers = (self.histogram_edges[:-1] + self.histogram_edges[1:]) / 2
+        seen = self.histogram > 0
+        table = pd.DataFrame({
+            'outcome': np.rint(centers[seen]).astype(np.int64) if self.integer_outcomes else centers[seen],
+            'frequency': self.histogram[seen],
+            'probability': self.histogram[seen] / max(self.trials, 1),
+        })
+        return table
+
+    def summary(self) -> Dict[str, float]:
+        """Returns - the summary statistics of the outcomes"""
+        return {
+            'trials': float(self.trials),
+            'mean': self.mean,
+            'variance': self.variance,
+            'std': math.sqrt(self.variance),
+            'standard_error': math.sqrt(self.variance / self.trials) if self.trials else math.nan,
+            'min': self.minimum,
+            'max': self.maximum,
+        }
+
+
+def experiment_histogram_edges(stages: Sequence[Stage]) -> Tuple[npt.NDArray[np.float64], bool]:
+    """
+    Returns - the histogram edges of the outcomes of an experiment (one bin per integer when the outcomes are integers spanning
+    at most MAX_INTEGER_OUTCOMES values, EVENT_HISTOGRAM_BINS equal bins otherwise) and whether the bins are integers
+    """
+    lowest, highest, integer = experiment_bounds(stages)
+    if integer and highest - lowest < MAX_INTEGER_OUTCOMES:
+        return np.arange(lowest - 0.5, highest + 1.0), True
+    span = max(highest - lowest, 1e-12)
+    return np.linspace(lowest, lowest + span * (1 + 1e-9), EVENT_HISTOGRAM_BINS + 1), False
+
+
+def _simulate_chunk_statistics(
+    stages: Sequence[Stage],
+    trials: int,
+    seed_sequence: np.random.SeedSequence,
+    histogram_edges: npt.NDArray[np.float64],
+    integer_outcomes: bool,
+    chunk_size: int
+) -> EventStatistics:
+    """Worker task: simulates one chunk of trials and returns its EventStatistics"""
+    statistics = EventStatistics(histogram_edges, integer_outcomes)
+    statistics.update(simulate_stage_outcomes(np.random.default_rng(seed_sequence), stages, trials, chunk_size))
+    return statistics
+
+
+def simulate_experiment(
+    stages: Sequence[Stage],
+    trials: int,
+    chunk_size: int = DEFAULT_CHUNK_ROLLS,
+    seed: int | np.random.SeedSequence | None = None,
+    workers: int | None = 1,
+    on_chunk: Callable[[EventStatistics], None] | None = None
+) -> EventStatistics:
+    """
+    Simulates an experiment and reduces the outcomes on the fly
+
+    Description:
+    The trials are split in chunks of chunk_size, each with its own child of SeedSequence(seed), and no stage samples more than
+    chunk_size values at once, so the memory used is bounded whatever the number of draws. The chunks are simulated and
+    reduced on a process pool when workers > 1 (None for every core) and merged in order; after every merged chunk on_chunk
+    gets the running EventStatistics, which streams the histogram of long experiments
+
+    Args:
+    stages - the stages of the experiment (see Stage and parse_stage_spec)
+    trials - the number of runs of the experiment
+
+    Returns - the EventStatistics of all trials
+    """
+    histogram_edges, integer_outcomes = experiment_histogram_edges(stages)
+    chunk_sizes = get_roll_chunk_sizes(trials, chunk_size)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seed_sequences = root.spawn(len(chunk_sizes))
+    statistics = EventStatistics(histogram_edges, integer_outcomes)
+
+    workers = min(workers or os.cpu_count() or 1, len(chunk_sizes))
+    logger.info('Simulating %d trials of a %d stage experiment in %d chunks on %d workers', trials, len(stages), len(chunk_sizes), workers)
+    task_arguments = [(stages, size, sequence, histogram_edges, integer_outcomes, chunk_size) for sequence, size in zip(seed_sequences, chunk_sizes)]
+
+    def merge(chunk_statistics: EventStatistics) -> None:
+        statistics.merge(chunk_statistics)
+        if on_chunk is not None:
+            on_chunk(statistics)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_statistics in executor.map(_simulate_chunk_statistics, *zip(*task_arguments)):
+                merge(chunk_statistics)
+    else:
+        for arguments in task_arguments:
+            merge(_simulate_chunk_statistics(*arguments))
+    return statistics
+
+
+def simulate_experiment_until_converged(
+    stages: Sequence[Stage],
+    target: ConvergenceTarget,
+    measure: str = 'mean',
+    chunk_size: int = DEFAULT_CHUNK_ROLLS,
+    seed: int | None = None,
+    workers: int | None = 1
+) -> Tuple[EventStatistics, ConvergenceTrace]:
+    """
+    Simulates an experiment in batches until its mean outcome (measure='mean') or its distribution table (measure='table')
+    meets the target. Every batch runs like simulate_experiment and is merged into one EventStatistics
+
+    Returns - a tuple of (EventStatistics of all trials, ConvergenceTrace)
+    """
+    histogram_edges, integer_outcomes = experiment_histogram_edges(stages)
+    statistics = EventStatistics(histogram_edges, integer_outcomes)
+    centers = (histogram_edges[:-1] + histogram_edges[1:]) / 2
+
+    def simulate_batch(trials: int, seed_sequence: np.random.SeedSequence) -> None:
+        statistics.merge(simulate_experiment(stages, trials, chunk_size=chunk_size, seed=seed_sequence, workers=workers))
+
+    def measure_statistics() -> Tuple[float, float]:
+        if measure == 'mean':
+            return statistics.mean, statistics.summary()['standard_error']
+        return histogram_estimate(centers, statistics.histogram, measure)
+
+    trace = run_until_converged(simulate_batch, measure_statistics, target, seed=seed)
+    return statistics, trace
@@ -0,0 +1,372 @@
+"""
+This file is responsible for the Monte Carlo pricing of European, arithmetic Asian and barrier options under risk-neutral
+Geometric Brownian Motion, with the volatility and the spot price calibrated from the price_data table.
+
+Variance reduction options (all combinable):
+- antithetic variates: every normal vector z is paired with -z
+- control variates: a payoff with a closed form price is simulated on the same paths - the discounted terminal price for
+  European options, the geometric average Asian option for arithmetic Asian options and the vanilla Black-Scholes option for
+  barrier options. The optimal coefficient is estimated from the paths
+- quasi-random sampling: Sobol or Halton points (randomized per replicate) turned into normals, optionally assembled with
+  a Brownian bridge so that the best distributed coordinates drive the largest scale moves
+
+Paths are simulated in batches that fit a memory budget and only per-sample sums are kept
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from src.modules.analytics.metrics_kernel import ANNUALIZED_RISK_FREE_RATE, TRADING_DAYS_PER_YEAR
+from src.modules.quasi_random import SOBOL_BITS, brownian_bridge, halton_points, inverse_normal_cdf, sobol_points
+
+logger = logging.getLogger("analytics")
+
+OPTION_KINDS = ('european', 'asian', 'barrier')
+OPTION_TYPES = ('call', 'put')
+BARRIER_TYPES = ('up-and-out', 'down-and-out', 'up-and-in', 'down-and-in')
+SAMPLERS = ('pseudo', 'sobol', 'halton')
+DEFAULT_MEMORY_BUDGET_MB = 64
+# Independent randomizations of a quasi-random point set, used for the standard error
+DEFAULT_REPLICATES = 16
+
+STANDARD_NORMAL = NormalDist()
+
+
+@dataclass(frozen=True)
+class OptionContract:
+    """
+    kind - one of OPTION_KINDS
+    option_type - 'call' or 'put'
+    strike - the strike price
+    maturity - time to expiry in years
+    monitoring_steps - number of equally spaced monitoring dates (averaging dates for Asian options, barrier checks for
+    barrier options). European options only need 1
+    barrier, barrier_type - the barrier level and one of BARRIER_TYPES (barrier options only)
+    """
+    kind: str
+    option_type: str
+    strike: float
+    maturity: float
+    monitoring_steps: int = 1
+    barrier: float | None = None
+    barrier_type: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.kind not in OPTION_KINDS or self.option_type not in OPTION_TYPES:
+            raise ValueError(f'Unsupported option: {self.kind} {self.option_type}')
+        if self.maturity <= 0 or self.strike <= 0 or self.monitoring_steps < 1:
+            raise ValueError('Strike, maturity and monitoring_steps must be positive')
+        if self.kind == 'barrier' and (self.barrier is None or self.barrier_type not in BARRIER_TYPES):
+            raise ValueError(f'Barrier options need a barrier level and a barrier_type from {BARRIER_TYPES}')
+
+
+@dataclass(frozen=True)
+class MarketParameters:
+    """Spot price, annualized volatility, continuously compounded risk-free rate and dividend yield"""
+    spot: float
+    volatility: float
+    rate: float = ANNUALIZED_RISK_FREE_RATE
+    dividend_yield: float = 0.0
+
+
+@dataclass(frozen=True)
+class PricingResult:
+    """A Monte Carlo price with its standard error, the number of simulated paths and the wall time"""
+    price: float
+    standard_error: float
+    paths: int
+    elapsed_seconds: float
+    control_coefficient: float
+
+
+def calibrate_market(close_prices: npt.ArrayLike, rate: float = ANNUALIZED_RISK_FREE_RATE, dividend_yield: float = 0.0) -> MarketParameters:
+    """
+    Calibrates the market parameters from daily close prices: the spot is the last close and the volatility the annualized
+    standard deviation of the daily log returns
+
+    Returns - the MarketParameters
+    """
+    prices = np.asarray(close_prices, dtype=np.float64)
+    prices = prices[np.isfinite(prices)]
+    if len(prices) < 3:
+        raise ValueError('At least 3 close prices are needed to calibrate the volatility')
+    volatility = float(np.diff(np.log(prices)).std(ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR))
+    return MarketParameters(spot=float(prices[-1]), volatility=volatility, rate=rate, dividend_yield=dividend_yield)
+
+
+def black_scholes_price(market: MarketParameters, strike: float, maturity: float, option_type: str) -> float:
+    """Returns - the Black-Scholes price of a European call or put"""
+    volatility_term = market.volatility * math.sqrt(maturity)
+    forward = market.spot * math.exp((market.rate - market.dividend_yield) * maturity)
+    return _lognormal_option_price(math.log(forward) - volatility_term ** 2 / 2, volatility_term, strike, maturity, market.rate, option_type)
+
+
+def geometric_asian_price(market: MarketParameters, strike: float, maturity: float, monitoring_steps: int, option_type: str) -> float:
+    """
+    Returns - the closed form price of a geometric average Asian option over monitoring_steps equally spaced dates. The log of
+    the geometric average is normal with the mean and variance below
+    """
+    n = monitoring_steps
+    log_mean = math.log(market.spot) + (market.rate - market.dividend_yield - market.volatility ** 2 / 2) * maturity * (n + 1) / (2 * n)
+    log_std = market.volatility * math.sqrt(maturity * (n + 1) * (2 * n + 1) / (6 * n * n))
+    return _lognormal_option_price(log_mean, log_std, strike, maturity, market.rate, option_type)
+
+
+def _lognormal_option_price(log_mean: float, log_std: float, strike: float, maturity: float, rate: float, option_type: str) -> float:
+    """Discounted expected payoff of a call or put on a lognormal underlying with log mean and log standard deviation"""
+    discount = math.exp(-rate * maturity)
+    expected_underlying = math.exp(log_mean + log_std ** 2 / 2)
+    if log_std <= 0:
+        intrinsic = expected_underlying - strike if option_type == 'call' else strike - expected_underlying
+        return discount * max(intrinsic, 0.0)
+    d1 = (log_mean - math.log(strike) + log_std ** 2) / log_std
+    d2 = d1 - log_std
+    if option_type == 'call':
+        return discount * (expected_underlying * STANDARD_NORMAL.cdf(d1) - strike * STANDARD_NORMAL.cdf(d2))
+    return discount * (strike * STANDARD_NORMAL.cdf(-d2) - expected_underlying * STANDARD_NORMAL.cdf(-d1))
+
+
+def _vanilla_payoff(prices: npt.NDArray[np.float64], strike: float, option_type: str) -> npt.NDArray[np.float64]:
+    """Call or put payoff of an array of prices"""
+    payoff: npt.NDArray[np.float64] = np.maximum(prices - strike, 0.0) if option_type == 'call' else np.maximum(strike - prices, 0.0)
+    return payoff
+
+
+def _payoffs_and_controls(
+    contract: OptionContract,
+    market: MarketParameters,
+    log_prices: npt.NDArray[np.float64]
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Discounted option payoffs and control variate values of a (paths x monitoring_steps) batch of log prices
+
+    Returns - the payoffs and the controls, one per path
+    """
+    discount = math.exp(-market.rate * contract.maturity)
+    terminal = np.exp(log_prices[:, -1])
+
+    if contract.kind == 'european':
+        return discount * _vanilla_payoff(terminal, contract.strike, contract.option_type), discount * terminal
+
+    if contract.kind == 'asian':
+        arithmetic_average = np.exp(log_prices).mean(axis=1)
+        geometric_average = np.exp(log_prices.mean(axis=1))
+        return (
+            discount * _vanilla_payoff(arithmetic_average, contract.strike, contract.option_type),
+            discount * _vanilla_payoff(geometric_average, contract.strike, contract.option_type),
+        )
+
+    assert contract.barrier is not None and contract.barrier_type is not None
+    log_barrier = math.log(contract.barrier)
+    if contract.barrier_type.startswith('up'):
+        crossed = log_prices.max(axis=1) >= log_barrier
+    else:
+        crossed = log_prices.min(axis=1) <= log_barrier
+    alive = ~crossed if contract.barrier_type.endswith('out') else crossed
+    vanilla = discount * _vanilla_payoff(terminal, contract.strike, contract.option_type)
+    return np.where(alive, vanilla, 0.0), vanilla
+
+
+def _control_mean(contract: OptionContract, market: MarketParameters) -> float:
+    """Closed form expectation of the control variate of a contract"""
+    if contract.kind == 'european':
+        return market.spot * math.exp(-market.dividend_yield * contract.maturity)
+    if contract.kind == 'asian':
+        return geometric_asian_price(market, contract.strike, contract.maturity, contract.monitoring_steps, contract.option_type)
+    return black_scholes_price(market, contract.strike, contract.maturity, contract.option_type)
+
+
+def _log_price_paths(
+    normals: npt.NDArray[np.float64],
+    contract: OptionContract,
+    market: MarketParameters,
+    use_brownian_bridge: bool
+) -> npt.NDArray[np.float64]:
+    """Turns (paths x steps) standard normals into log prices at the monitoring dates"""
+    steps = contract.monitoring_steps
+    times = np.arange(1, steps + 1) * contract.maturity / steps
+    if use_brownian_bridge:
+        brownian = brownian_bridge(normals) * math.sqrt(contract.maturity)
+    else:
+        brownian = np.cumsum(normals, axis=1) * math.sqrt(contract.maturity / steps)
+    drift = (market.rate - market.dividend_yield - market.volatility ** 2 / 2) * times
+    log_prices: npt.NDArray[np.float64] = math.log(market.spot) + drift + market.volatility * brownian
+    return log_prices
+
+
+class _SampleAccumulator:
+    """
+    Collects the payoff and control means of every independent sample unit (a path, an antithetic pair or a quasi-random
+    replicate) and the path level sums needed for the control variate coefficient
+    """
+
+    def __init__(self) -> None:
+        self.unit_payoffs: List[npt.NDArray[np.float64]] = []
+        self.unit_controls: List[npt.NDArray[np.float64]] = []
+        self.paths = 0
+        self.sums = np.zeros(5)
+
+    def add_paths(self, payoffs: npt.NDArray[np.float64], controls: npt.NDArray[np.float64]) -> None:
+        """Adds the path level sums of a batch"""
+        self.paths += len(payoffs)
+        self.sums += [payoffs.sum(), controls.sum(), (payoffs * controls).sum(), (controls * controls).sum(), (payoffs * payoffs).sum()]
+
+    def add_units(self, payoffs: npt.NDArray[np.float64], controls: npt.NDArray[np.float64]) -> None:
+        """Adds the means of complete sample units"""
+        self.unit_payoffs.append(np.atleast_1d(payoffs))
+        self.unit_controls.append(np.atleast_1d(controls))
+
+    def estimate(self, control_mean: float | None) -> Tuple[float, float, float]:
+        """Returns - the price, its standard error and the control coefficient"""
+        payoffs = np.concatenate(self.unit_payoffs)
+        coefficient = 0.0
+        if control_mean is not None:
+            n = self.paths
+            sum_payoff, sum_control, sum_cross, sum_control_squares, _ = self.sums
+            control_variance = sum_control_squares - sum_control ** 2 / n
+            if control_variance > 0:
+                coefficient = float((sum_cross - sum_payoff * sum_control / n) / control_variance)
+            payoffs = payoffs - coefficient * (np.concatenate(self.unit_controls) - control_mean)
+        standard_error = float(payoffs.std(ddof=1) / math.sqrt(len(payoffs))) if len(payoffs) > 1 else math.nan
+        return float(payoffs.mean()), standard_error, coefficient
+
+
+def price_option(
+    contract: OptionContract,
+    market: MarketParameters,
+    paths: int = 100_000,
+    sampler: str = 'pseudo',
+    antithetic: bool = False,
+    control_variate: bool = False,
+    use_brownian_bridge: bool = False,
+    replicates: int = DEFAULT_REPLICATES,
+    seed: int | None = None,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+) -> PricingResult:
+    """
+    Prices an option by Monte Carlo simulation
+
+    Description:
+    With the pseudo-random sampler every path (or antithetic pair) is an independent sample. The quasi-random samplers split
+    the paths into `replicates` independently randomized point sets (a random digital shift for Sobol, a random rotation for
+    Halton) and every replicate mean is one sample, which gives a valid standard error for the otherwise deterministic points.
+    The control variate coefficient is estimated from all paths and applied to every sample
+
+    Args:
+    paths - total number of simulated paths (antithetic pairs count as 2)
+    sampler - one of SAMPLERS
+    use_brownian_bridge - build the paths with a Brownian bridge (most useful with the quasi-random samplers)
+    replicates - number of randomized replicates of the quasi-random samplers
+
+    Returns - a PricingResult
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError(f'Unknown sampler: {sampler}. Choose from {SAMPLERS}')
+    started_at = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    steps = contract.monitoring_steps
+    copies = 2 if antithetic else 1
+    batch_draws = max(1, int(memory_budget_mb * 2 ** 20 // (4 * 8 * steps * copies)))
+
+    def simulate(normals: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Payoffs and controls per draw, the antithetic pair already averaged"""
+        if antithetic:
+            normals = np.concatenate([normals, -normals])
+        payoffs, controls = _payoffs_and_controls(contract, market, _log_price_paths(normals, contract, market, use_brownian_bridge))
+        accumulator.add_paths(payoffs, controls)
+        if antithetic:
+            half = len(payoffs) // 2
+            return (payoffs[:half] + payoffs[half:]) / 2, (controls[:half] + controls[half:]) / 2
+        return payoffs, controls
+
+    accumulator = _SampleAccumulator()
+    if sampler == 'pseudo':
+        draws = max(1, paths // copies)
+        for start in range(0, draws, batch_draws):
+            payoffs, controls = simulate(rng.standard_normal((min(batch_draws, draws - start), steps)))
+            accumulator.add_units(payoffs, controls)
+    else:
+        if replicates < 2:
+            raise ValueError('Quasi-random pricing needs at least 2 replicates for a standard error')
+        draws = max(1, paths // (copies * replicates))
+        for _ in range(replicates):
+            if sampler == 'sobol':
+                shift = rng.integers(0, 2 ** SOBOL_BITS, steps, dtype=np.uint64)
+            else:
+                rotation = rng.random(steps)
+            payoff_sum = control_sum = 0.0
+            for start in range(0, draws, batch_draws):
+                count = min(batch_draws, draws - start)
+                points = sobol_points(start, count, steps, shift) if sampler == 'sobol' else halton_points(start, count, steps, rotation)
+                payoffs, controls = simulate(inverse_normal_cdf(points))
+                payoff_sum += float(payoffs.sum())
+                control_sum += float(controls.sum())
+            accumulator.add_units(np.array(payoff_sum / draws), np.array(control_sum / draws))
+
+    price, standard_error, coefficient = accumulator.estimate(_control_mean(contract, market) if control_variate else None)
+    elapsed = time.perf_counter() - started_at
+    logger.debug('Priced %s %s with %d paths (%s): %.6f +/- %.6f in %.3fs', contract.kind, contract.option_type, accumulator.paths, sampler, price, standard_error, elapsed)
+    return PricingResult(price=price, standard_error=standard_error, paths=accumulator.paths, elapsed_seconds=elapsed, control_coefficient=coefficient)
+
+
+def convergence_report(
+    contract: OptionContract,
+    market: MarketParameters,
+    path_counts: Sequence[int] = (10_000, 100_000),
+    configurations: Sequence[Dict[str, Any]] | None = None,
+    seed: int | None = None
+) -> pd.DataFrame:
+    """
+    Prices the same contract with several variance reduction configurations and path counts to compare their standard error
+    against the wall time
+
+    Args:
+    configurations - keyword arguments of price_option per configuration (sampler, antithetic, control_variate,
+    use_brownian_bridge). Defaults to plain, antithetic, control variate and Sobol with a Brownian bridge; the plain one ({}) is
+    required as the baseline of the speedups
+
+    Returns:
+    A dataframe with one row per configuration and path count: price, standard error, wall time, efficiency (1 / (SE^2 x time))
+    and the speedup of that efficiency over the plain Monte Carlo run with the same requested number of paths
+    """
+    if configurations is None:
+        configurations = [
+            {},
+            {'antithetic': True},
+            {'control_variate': True},
+            {'antithetic': True, 'control_variate': True},
+            {'sampler': 'sobol', 'use_brownian_bridge': True},
+            {'sampler': 'sobol', 'use_brownian_bridge': True, 'control_variate': True},
+        ]
+
+    names = [', '.join(f'{key}={value}' for key, value in configuration.items()) or 'plain' for configuration in configurations]
+    if 'plain' not in names:
+        raise ValueError('The configurations need the plain one ({}), the baseline of the speedups')
+
+    rows: List[Dict[str, Any]] = []
+    for paths in path_counts:
+        for name, configuration in zip(names, configurations):
+            result = price_option(contract, market, paths=paths, seed=seed, **configuration)
+            rows.append({
+                'requested_paths': paths,
+                'configuration': name,
+                'paths': result.paths,
+                'price': result.price,
+                'standard_error': result.standard_error,
+                'elapsed_seconds': result.elapsed_seconds,
+                'efficiency': 1 / (result.standard_error ** 2 * result.elapsed_seconds) if result.standard_error > 0 else math.inf,
+            })
+
+    report = pd.DataFrame(rows)
+    # Variance reduced runs may round the number of paths, so the plain run is matched on the requested count
+    plain_efficiency = report.loc[report['configuration'] == 'plain', ['requested_paths', 'efficiency']].drop_duplicates('requested_paths')
+    report = report.merge(plain_efficiency, on='requested_paths', how='left', suffixes=('', '_plain'))
+    report['speedup'] = report['efficiency'] / report.pop('efficiency_plain')
+    return report.drop(columns='requested_paths')
@@ -0,0 +1,359 @@
+"""
+This file is responsible for the Monte Carlo stock price path simulations. Three models of the daily log returns are supported,
+all calibrated from the close prices stored in price_data:
+- gbm: Geometric Brownian Motion, normal daily log returns
+- merton: Merton jump-diffusion, a normal diffusion plus compound Poisson normal jumps
+- bootstrap: daily log returns resampled (with replacement) from the price history
+
+Paths are generated as (steps x paths) arrays in chunks that fit a memory budget. Every chunk draws from its own child of one
+SeedSequence and is reduced to a PathStatistics accumulator as soon as it is simulated, so runs of millions of paths only ever
+hold one chunk per worker in memory. The chunks run on a process pool and their accumulators are merged
+"""
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.modules.convergence import ConvergenceTarget, ConvergenceTrace, run_until_converged
+
+logger = logging.getLogger("analytics")
+
+PATH_MODELS = ('gbm', 'merton', 'bootstrap')
+DEFAULT_MEMORY_BUDGET_MB = 64
+# The increments, their cumulative sum and the prices of a chunk are alive at the same time
+BYTES_PER_PATH_STEP = 3 * 8
+# Terminal log returns beyond this many model standard deviations fall into the first or last histogram bin
+HISTOGRAM_SPAN_STDS = 8.0
+HISTOGRAM_BINS = 4_096
+# Daily log returns further than this many robust standard deviations from the median are treated as jumps
+JUMP_THRESHOLD_STDS = 3.0
+
+
+@dataclass(frozen=True)
+class GBMModel:
+    """Normal daily log returns with the given mean (drift) and standard deviation (volatility)"""
+    drift: float
+    volatility: float
+
+    def sample_log_returns(self, rng: np.random.Generator, steps: int, paths: int) -> npt.NDArray[np.float64]:
+        """Returns - a (steps x paths) array of daily log returns"""
+        log_returns: npt.NDArray[np.float64] = self.drift + self.volatility * rng.standard_normal((steps, paths))
+        return log_returns
+
+    def daily_moments(self) -> Tuple[float, float]:
+        """Returns - the mean and the standard deviation of a daily log return"""
+        return self.drift, self.volatility
+
+
+@dataclass(frozen=True)
+class MertonJumpModel:
+    """
+    A normal diffusion plus jumps arriving at jump_intensity per day, every jump being a normal log return with mean jump_mean
+    and standard deviation jump_volatility
+    """
+    drift: float
+    volatility: float
+    jump_intensity: float
+    jump_mean: float
+    jump_volatility: float
+
+    def sample_log_returns(self, rng: np.random.Generator, steps: int, paths: int) -> npt.NDArray[np.float64]:
+        """Returns - a (steps x paths) array of daily log returns"""
+        log_returns: npt.NDArray[np.float64] = self.drift + self.volatility * rng.standard_normal((steps, paths))
+        jumps = rng.poisson(self.jump_intensity, (steps, paths))
+        # The sum of k normal jumps is normal with mean k * jump_mean and standard deviation sqrt(k) * jump_volatility
+        log_returns += jumps * self.jump_mean + np.sqrt(jumps) * self.jump_volatility * rng.standard_normal((steps, paths))
+        return log_returns
+
+    def daily_moments(self) -> Tuple[float, float]:
+        """Returns - the mean and the standard deviation of a daily log return"""
+        mean = self.drift + self.jump_intensity * self.jump_mean
+        variance = self.volatility ** 2 + self.jump_intensity * (self.jump_mean ** 2 + self.jump_volatility ** 2)
+        return mean, math.sqrt(variance)
+
+
+@dataclass(frozen=True)
+class BootstrapModel:
+    """Daily log returns drawn with replacement from the historical log returns"""
+    historical_log_returns: npt.NDArray[np.float64]
+
+    def sample_log_returns(self, rng: np.random.Generator, steps: int, paths: int) -> npt.NDArray[np.float64]:
+        """Returns - a (steps x paths) array of daily log returns"""
+        return self.historical_log_returns[rng.integers(0, len(self.historical_log_returns), (steps, paths))]
+
+    def daily_moments(self) -> Tuple[float, float]:
+        """Returns - the mean and the standard deviation of a daily log return"""
+        return float(self.historical_log_returns.mean()), float(self.historical_log_returns.std())
+
+
+PathModel = GBMModel | MertonJumpModel | BootstrapModel
+
+
+def calibrate_model(close_prices: npt.ArrayLike, model: str) -> PathModel:
+    """
+    Calibrates a path model from the daily close prices
+
+    The merton calibration flags the log returns further than JUMP_THRESHOLD_STDS robust standard deviations (1.4826 * MAD) from
+    the median as jumps. The jump intensity is their frequency, the jump size moments come from the flagged returns in excess of
+    the diffusion drift and the diffusion moments from the remaining returns
+
+    Returns - the calibrated model
+    """
+    prices = np.asarray(close_prices, dtype=np.float64)
+    prices = prices[np.isfinite(prices)]
+    log_returns = np.diff(np.log(prices))
+    if len(log_returns) < 2:
+        raise ValueError('At least 3 close prices are needed to calibrate a path model')
+
+    if model == 'gbm':
+        return GBMModel(drift=float(log_returns.mean()), volatility=float(log_returns.std(ddof=1)))
+    if model == 'bootstrap':
+        return BootstrapModel(historical_log_returns=log_returns)
+    if model != 'merton':
+        raise ValueError(f'Unknown path model: {model}. Choose from {PATH_MODELS}')
+
+    median = float(np.median(log_returns))
+    robust_std = 1.4826 * float(np.median(np.abs(log_returns - median)))
+    is_jump = np.abs(log_returns - median) > JUMP_THRESHOLD_STDS * robust_std if robust_std > 0 else np.zeros(len(log_returns), dtype=bool)
+    diffusion_returns = log_returns[~is_jump]
+    drift = float(diffusion_returns.mean())
+    volatility = float(diffusion_returns.std(ddof=1)) if len(diffusion_returns) > 1 else 0.0
+
+    jump_sizes = log_returns[is_jump] - drift
+    logger.info('Merton calibration flagged %d jumps in %d daily returns', len(jump_sizes), len(log_returns))
+    return MertonJumpModel(
+        drift=drift,
+        volatility=volatility,
+        jump_intensity=len(jump_sizes) / len(log_returns),
+        jump_mean=float(jump_sizes.mean()) if len(jump_sizes) else 0.0,
+        jump_volatility=float(jump_sizes.std(ddof=1)) if len(jump_sizes) > 1 else 0.0,
+    )
+
+
+@dataclass
+class PathStatistics:
+    """
+    Streaming summary of simulated price paths. Two accumulators over disjoint paths are combined with merge, using Chan's
+    parallel update for the terminal price mean and variance
+
+    step_sums / step_sums_of_squares - per step sums over the paths, giving the mean path and its standard deviation band
+    terminal_histogram - counts of the terminal log returns over histogram_edges, used for the terminal price quantiles
+    """
+    initial_price: float
+    histogram_edges: npt.NDArray[np.float64]
+    paths: int = 0
+    terminal_mean: float = 0.0
+    terminal_m2: float = 0.0
+    terminal_min: float = math.inf
+    terminal_max: float = -math.inf
+    paths_below_initial: int = 0
+    maximum_drawdown_sum: float = 0.0
+    step_sums: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    step_sums_of_squares: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+    terminal_histogram: npt.NDArray[np.int64] = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def update(self, prices: npt.NDArray[np.float64]) -> None:
+        """Reduces a (steps x paths) chunk of prices into the accumulator"""
+        terminal = prices[-1]
+        chunk = PathStatistics(self.initial_price, self.histogram_edges)
+        chunk.paths = prices.shape[1]
+        chunk.terminal_mean = float(terminal.mean())
+        chunk.terminal_m2 = float(((terminal - chunk.terminal_mean) ** 2).sum())
+        chunk.terminal_min = float(terminal.min())
+        chunk.terminal_max = float(terminal.max())
+        chunk.paths_below_initial = int((terminal < self.initial_price).sum())
+        running_peak = np.maximum(np.maximum.accumulate(prices, axis=0), self.initial_price)
+        chunk.maximum_drawdown_sum = float((1 - prices / running_peak).max(axis=0).sum())
+        chunk.step_sums = prices.sum(axis=1)
+        chunk.step_sums_of_squares = np.einsum('sp,sp->s', prices, prices)
+        bins = np.clip(np.searchsorted(self.histogram_edges, np.log(terminal / self.initial_price), side='right') - 1, 0, len(self.histogram_edges) - 2)
+        chunk.terminal_histogram = np.bincount(bins, minlength=len(self.histogram_edges) - 1).astype(np.int64)
+        self.merge(chunk)
+
+    def merge(self, other: 'PathStatistics') -> None:
+        """Adds the paths summarized by another accumulator"""
+        if other.paths == 0:
+            return
+        if self.paths == 0:
+            self.step_sums = np.zeros_like(other.step_sums)
+            self.step_sums_of_squares = np.zeros_like(other.step_sums_of_squares)
+            self.terminal_histogram = np.zeros_like(other.terminal_histogram)
+
+        total = self.paths + other.paths
+        delta = other.terminal_mean - self.terminal_mean
+        self.terminal_mean += delta * other.paths / total
+        self.terminal_m2 += other.terminal_m2 + delta ** 2 * self.paths * other.paths / total
+        self.paths = total
+        self.terminal_min = min(self.terminal_min, other.terminal_min)
+        self.terminal_max = max(self.terminal_max, other.terminal_max)
+        self.paths_below_initial += other.paths_below_initial
+        self.maximum_drawdown_sum += other.maximum_drawdown_sum
+        self.step_sums += other.step_sums
+        self.step_sums_of_squares += other.step_sums_of_squares
+        self.terminal_histogram += other.terminal_histogram
+
+    def terminal_quantiles(self, levels: Sequence[float]) -> List[float]:
+        """Returns - the terminal price quantiles, interpolated linearly inside the histogram bins"""
+        cumulative = np.concatenate([[0], np.cumsum(self.terminal_histogram)]) / self.paths
+        log_quantiles = np.interp(levels, cumulative, self.histogram_edges)
+        return [float(value) for value in self.initial_price * np.exp(log_quantiles)]
+
+    def mean_path(self) -> npt.NDArray[np.float64]:
+        """Returns - the mean price at every step"""
+        mean: npt.NDArray[np.float64] = self.step_sums / self.paths
+        return mean
+
+    def step_std(self) -> npt.NDArray[np.float64]:
+        """Returns - the standard deviation of the price across the paths at every step"""
+        variance = (self.step_sums_of_squares - self.step_sums ** 2 / self.paths) / max(self.paths - 1, 1)
+        std: npt.NDArray[np.float64] = np.sqrt(np.maximum(variance, 0.0))
+        return std
+
+    def summary(self, quantile_levels: Sequence[float] = (0.01, 0.05, 0.5, 0.95, 0.99)) -> Dict[str, Any]:
+        """Returns - the summary statistics of the terminal prices and of the paths"""
+        summary: Dict[str, Any] = {
+            'paths': self.paths,
+            'initial_price': self.initial_price,
+            'terminal_mean': self.terminal_mean,
+            'terminal_std': math.sqrt(self.terminal_m2 / (self.paths - 1)) if self.paths > 1 else 0.0,
+            'terminal_min': self.terminal_min,
+            'terminal_max': self.terminal_max,
+            'probability_of_loss': self.paths_below_initial / self.paths,
+            'expected_maximum_drawdown': self.maximum_drawdown_sum / self.paths,
+        }
+        for level, value in zip(quantile_levels, self.terminal_quantiles(quantile_levels)):
+            summary[f'terminal_q{level * 100:g}'] = value
+        return summary
+
+
+def get_chunk_sizes(steps: int, paths: int, memory_budget_mb: float) -> List[int]:
+    """Returns - the number of paths of every chunk, each (steps x chunk) simulation fitting the memory budget"""
+    chunk_size = max(1, min(paths, int(memory_budget_mb * 2 ** 20 // (BYTES_PER_PATH_STEP * steps))))
+    return [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+
+
+def _simulate_chunk_prices(model: PathModel, initial_price: float, steps: int, paths: int, seed_sequence: np.random.SeedSequence) -> npt.NDArray[np.float64]:
+    """Simulates one (steps x paths) chunk of prices, the initial price excluded"""
+    log_returns = model.sample_log_returns(np.random.default_rng(seed_sequence), steps, paths)
+    np.cumsum(log_returns, axis=0, out=log_returns)
+    np.exp(log_returns, out=log_returns)
+    log_returns *= initial_price
+    return log_returns
+
+
+def _simulate_chunk_statistics(
+    model: PathModel,
+    initial_price: float,
+    steps: int,
+    paths: int,
+    seed_sequence: np.random.SeedSequence,
+    histogram_edges: npt.NDArray[np.float64]
+) -> PathStatistics:
+    """Worker task: simulates one chunk and returns its PathStatistics"""
+    statistics = PathStatistics(initial_price, histogram_edges)
+    statistics.update(_simulate_chunk_prices(model, initial_price, steps, paths, seed_sequence))
+    return statistics
+
+
+def generate_price_paths(
+    model: PathModel,
+    initial_price: float,
+    steps: int,
+    paths: int,
+    seed: int | None = None,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+) -> Iterator[npt.NDArray[np.float64]]:
+    """
+    Yields the simulated prices chunk by chunk as (steps x chunk) arrays, the initial price excluded. The chunks are the same
+    ones simulate_price_paths reduces, so both produce identical paths for the same seed and memory budget
+    """
+    chunk_sizes = get_chunk_sizes(steps, paths, memory_budget_mb)
+    for seed_sequence, size in zip(np.random.SeedSequence(seed).spawn(len(chunk_sizes)), chunk_sizes):
+        yield _simulate_chunk_prices(model, initial_price, steps, size, seed_sequence)
+
+
+def simulate_price_paths(
+    model: PathModel,
+    initial_price: float,
+    steps: int = 252,
+    paths: int = 100_000,
+    seed: int | np.random.SeedSequence | None = None,
+    workers: int | None = None,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+) -> PathStatistics:
+    """
+    Simulates price paths and reduces them on the fly
+
+    Description:
+    The paths are split in the chunks of get_chunk_sizes. Each chunk gets its own child of SeedSequence(seed), so the result
+    depends on the seed and the memory budget but not on the number of workers. The chunks are simulated and reduced on a
+    process pool when workers > 1 (defaults to every core), and the chunk accumulators are merged in order
+
+    Args:
+    model - a calibrated model (see calibrate_model)
+    initial_price - the price the paths start from
+    steps - number of daily steps of every path
+    paths - number of paths
+    memory_budget_mb - upper bound of the memory used by one chunk of one worker
+
+    Returns - the PathStatistics of all paths
+    """
+    if steps < 1 or paths < 1:
+        raise ValueError('steps and paths must be positive')
+    chunk_sizes = get_chunk_sizes(steps, paths, memory_budget_mb)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seed_sequences = root.spawn(len(chunk_sizes))
+
+    mean, volatility = model.daily_moments()
+    span = HISTOGRAM_SPAN_STDS * max(volatility, 1e-12) * math.sqrt(steps)
+    histogram_edges = np.linspace(mean * steps - span, mean * steps + span, HISTOGRAM_BINS + 1)
+    statistics = PathStatistics(initial_price, histogram_edges)
+
+    workers = min(workers or os.cpu_count() or 1, len(chunk_sizes))
+    logger.info('Simulating %d paths of %d steps in %d chunks of up to %d paths on %d workers', paths, steps, len(chunk_sizes), chunk_sizes[0], workers)
+    task_arguments = [(model, initial_price, steps, size, sequence, histogram_edges) for sequence, size in zip(seed_sequences, chunk_sizes)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_statistics in executor.map(_simulate_chunk_statistics, *zip(*task_arguments)):
+                statistics.merge(chunk_statistics)
+    else:
+        for arguments in task_arguments:
+            statistics.merge(_simulate_chunk_statistics(*arguments))
+    return statistics
+
+
+def simulate_price_paths_until_converged(
+    model: PathModel,
+    initial_price: float,
+    target: ConvergenceTarget,
+    steps: int = 252,
+    seed: int | None = None,
+    workers: int | None = None,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB
+) -> Tuple[PathStatistics, ConvergenceTrace]:
+    """
+    Simulates price paths in batches until the mean terminal price meets the target (see convergence.run_until_converged).
+    Every batch runs like simulate_price_paths and is merged into one PathStatistics
+
+    Returns - a tuple of (PathStatistics of all paths, ConvergenceTrace)
+    """
+    statistics: List[PathStatistics] = []
+
+    def simulate_batch(paths: int, seed_sequence: np.random.SeedSequence) -> None:
+        batch = simulate_price_paths(model, initial_price, steps=steps, paths=paths, seed=seed_sequence, workers=workers, memory_budget_mb=memory_budget_mb)
+        if statistics:
+            statistics[0].merge(batch)
+        else:
+            statistics.append(batch)
+
+    def measure() -> Tuple[float, float]:
+        running = statistics[0]
+        return running.terminal_mean, math.sqrt(running.terminal_m2 / (running.paths - 1) / running.paths) if running.paths > 1 else math.inf
+
+    trace = run_until_converged(simulate_batch, measure, target, seed=seed)
+    return statistics[0], trace
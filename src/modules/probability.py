@@ -1,22 +1,39 @@
 import logging
-import random
 import math
 
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+import numpy.typing as npt
+
+from src.modules.convergence import ConvergenceTarget, ConvergenceTrace, histogram_estimate, run_until_converged
+
+logger = logging.getLogger("analytics")
+
+DEFAULT_CHUNK_ROLLS = 1_000_000
+# Up to this many equally likely dice combinations, a roll of all the dice is one integer draw mapped to its sum
+MAX_COMBINATION_TABLE_SIZE = 2 ** 16
+
 @dataclass
 class Frequency:
     connt: int
     probability: float = 0.0
 
-def display_distribution_table(frequency_storage_dict: Dict[int, List[float]], multi_dice: bool = False) -> None:
+def display_distribution_table(
+    frequency_storage_dict: Dict[int, List[float]], multi_dice: bool = False, exact_probabilities: Dict[int, float] | None = None
+) -> None:
     """
-    Displays the distribution table with different table on the terminal
+    Displays the distribution table with different table on the terminal. With exact_probabilities (see distribution_solver),
+    the exact probability and the simulation error of every sum are shown next to the simulated ones
     """
     print('\n Distribution table:  \n')
     for key, (frequency, probability) in frequency_storage_dict.items():
-        print(f'Number / sum: {key}, Frequency: {frequency}, Probability: {probability}')
+        if exact_probabilities is None:
+            print(f'Number / sum: {key}, Frequency: {frequency}, Probability: {probability}')
+            continue
+        exact_probability = exact_probabilities.get(key, 0.0)
+        print(f'Number / sum: {key}, Frequency: {frequency}, Probability: {probability}, Exact probability: {exact_probability:.10f}, Error: {probability - exact_probability:+.2e}')
     if multi_dice:
         expected_value = calculate_expected_value_in_multi_dice_roll(frequency_storage_dict)
         print(f'\n The expected value is: {expected_value}')
@@ -24,7 +41,112 @@ def display_distribution_table(frequency_storage_dict: Dict[int, List[float]], m
         print(f'\n The standard deviation from the distribution table is: {math.sqrt(calculate_variance_of_data(frequency_storage_dict))}')
     return
 
-def display_multiple_dice_simulation_parameters(dice_number: int = 2, sides_per_dice: int = 6, total_rolls: int = 1000) -> Dict[int, List[float]]:
+def get_roll_chunk_sizes(total_rolls: int, chunk_size: int = DEFAULT_CHUNK_ROLLS) -> List[int]:
+    """Returns - the number of rolls of every chunk"""
+    if total_rolls <= 0 or chunk_size <= 0:
+        raise ValueError('The number of rolls and the chunk size must be positive')
+    return [min(chunk_size, total_rolls - start) for start in range(0, total_rolls, chunk_size)]
+
+def roll_dice_sum_counts(rng: np.random.Generator, dice_number: int, sides_per_dice: int, rolls: int) -> npt.NDArray[np.int64]:
+    """
+    Rolls dice_number dice `rolls` times and counts the sums
+
+    Description:
+    When there are at most MAX_COMBINATION_TABLE_SIZE combinations of faces, every roll of all the dice is a single uniform
+    integer below sides^dice: the combinations are counted with np.bincount and their counts are added up per sum with a
+    lookup table of the sum of every combination. Otherwise the dice are drawn one at a time and added up in place
+
+    Returns - the counts of the sums dice_number ... dice_number * sides_per_dice, in that order
+    """
+    outcomes = dice_number * (sides_per_dice - 1) + 1
+    combinations = sides_per_dice ** dice_number
+    if combinations <= MAX_COMBINATION_TABLE_SIZE:
+        faces = np.indices((sides_per_dice,) * dice_number).reshape(dice_number, -1)
+        combination_sums = faces.sum(axis=0)
+        combination_counts = np.bincount(rng.integers(0, combinations, size=rolls), minlength=combinations)
+        return np.bincount(combination_sums, weights=combination_counts, minlength=outcomes).astype(np.int64)
+
+    totals = rng.integers(0, sides_per_dice, size=rolls, dtype=np.int32)
+    for _ in range(dice_number - 1):
+        totals += rng.integers(0, sides_per_dice, size=rolls, dtype=np.int32)
+    return np.bincount(totals, minlength=outcomes).astype(np.int64)
+
+def simulate_dice_sum_counts(
+    dice_number: int,
+    sides_per_dice: int,
+    total_rolls: int,
+    chunk_size: int = DEFAULT_CHUNK_ROLLS,
+    seed: int | np.random.SeedSequence | None = None
+) -> npt.NDArray[np.int64]:
+    """
+    Simulates total_rolls rolls of dice_number dice in chunks of chunk_size rolls, so the memory used does not grow with the
+    number of rolls. Every chunk draws from its own child of SeedSequence(seed), so a run is reproducible for a seed and a
+    chunk size
+
+    Returns - the counts of the sums dice_number ... dice_number * sides_per_dice, in that order
+    """
+    if dice_number < 1 or sides_per_dice < 1:
+        raise ValueError('There should at least be 1 dice with at least 1 side')
+    chunk_sizes = get_roll_chunk_sizes(total_rolls, chunk_size)
+    counts = np.zeros(dice_number * (sides_per_dice - 1) + 1, dtype=np.int64)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    for seed_sequence, rolls in zip(root.spawn(len(chunk_sizes)), chunk_sizes):
+        counts += roll_dice_sum_counts(np.random.default_rng(seed_sequence), dice_number, sides_per_dice, rolls)
+    logger.info('Simulated %d rolls of %d dice with %d sides in %d chunks', total_rolls, dice_number, sides_per_dice, len(chunk_sizes))
+    return counts
+
+def validate_dice_parameters(dice_number: int, sides_per_dice: int) -> None:
+    """Checks the dice of a simulation: 1 to 4 dice with 1 to 10 sides each"""
+    if not (1 <= dice_number <= 4):
+        raise ValueError("dice_number must be between 1 and 4.")
+
+    if not (1 <= sides_per_dice <= 10):
+        raise ValueError("sides_per_dice must be between 1 and 10.")
+
+def simulate_dice_until_converged(
+    dice_number: int,
+    sides_per_dice: int,
+    target: ConvergenceTarget,
+    measure: str = 'table',
+    chunk_size: int = DEFAULT_CHUNK_ROLLS,
+    seed: int | None = None
+) -> Tuple[npt.NDArray[np.int64], ConvergenceTrace]:
+    """
+    Rolls the dice in batches until the distribution table (measure='table') or the mean sum (measure='mean') meets the
+    target (see convergence.run_until_converged and histogram_estimate)
+
+    Returns - a tuple of (counts of the sums dice_number ... dice_number * sides_per_dice, ConvergenceTrace)
+    """
+    validate_dice_parameters(dice_number, sides_per_dice)
+    outcomes = np.arange(dice_number, dice_number * sides_per_dice + 1)
+    counts = np.zeros(len(outcomes), dtype=np.int64)
+
+    def simulate_batch(rolls: int, seed_sequence: np.random.SeedSequence) -> None:
+        counts[:] += simulate_dice_sum_counts(dice_number, sides_per_dice, rolls, chunk_size=chunk_size, seed=seed_sequence)
+
+    trace = run_until_converged(simulate_batch, lambda: histogram_estimate(outcomes, counts, measure), target, seed=seed)
+    return counts, trace
+
+def histogram_moments(values: npt.ArrayLike, counts: npt.ArrayLike) -> Tuple[float, float]:
+    """
+    Returns - the mean and the (population) variance of a distribution given as outcome values and their counts or probabilities
+    """
+    outcomes = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(counts, dtype=np.float64)
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError('Distribution table data not available!')
+    mean = float(outcomes @ weights / total)
+    variance = float((outcomes - mean) ** 2 @ weights / total)
+    return mean, variance
+
+def display_multiple_dice_simulation_parameters(
+    dice_number: int = 2,
+    sides_per_dice: int = 6,
+    total_rolls: int = 1000,
+    chunk_size: int = DEFAULT_CHUNK_ROLLS,
+    seed: int | None = None
+) -> Dict[int, List[float]]:
 
     """
     Simulates the probability of multiple dice rolls and displays the distribution of sums with summary stats
@@ -33,6 +155,8 @@ def display_multiple_dice_simulation_parameters(dice_number: int = 2, sides_per_
     dice_number(int): number of dice used in the simulation
     sides_per_dice(int): number of sides that each die has
     total_rolls(int): the total number of tries in this simulation
+    chunk_size(int): the number of rolls simulated at once (see simulate_dice_sum_counts)
+    seed(int): seed of the random generator, for reproducible runs
 
     Returns: 
     The distribution of sums of all dice rolls with their summary statistics
@@ -51,33 +175,20 @@ def display_multiple_dice_simulation_parameters(dice_number: int = 2, sides_per_
     if total_rolls <= 0: 
         raise ValueError('There should at least be 1 dice roll in the simulation')
     
-    if not (1 <= dice_number <= 4):
-        raise ValueError("dice_number must be between 1 and 4.")
-    
-    if not (1 <= sides_per_dice <= 10):
-        raise ValueError("sides_per_dice must be between 1 and 10.")
-    
-    total_sum_possible: range = range(dice_number, dice_number * sides_per_dice + 1)
+    validate_dice_parameters(dice_number, sides_per_dice)
+
+    counts = simulate_dice_sum_counts(dice_number, sides_per_dice, total_rolls, chunk_size=chunk_size, seed=seed)
+    return build_frequency_table(counts, dice_number)
 
+def build_frequency_table(counts: npt.NDArray[np.int64], smallest_sum: int) -> Dict[int, List[float]]:
+    """
+    Returns the distribution table of simulated counts of the sums smallest_sum, smallest_sum + 1, ...
+    """
+    total_rolls = int(counts.sum())
     # Dict: sum_value → [count, probability]
     frequency_storage_dict: Dict[int, List[float]] = {
-        outcome: [0.0, 0.0] for outcome in total_sum_possible
+        smallest_sum + offset: [float(count), count / total_rolls] for offset, count in enumerate(counts.tolist())
     }
-
-    # to run simulation
-    for _ in range(total_rolls):
-        dice_values = [random.randint(1, sides_per_dice) for _ in range(dice_number)]
-        total_value = sum(dice_values)
-
-        # Incrementing count
-        frequency_storage_dict[total_value][0] += 1.0
-
-    # Calculating probabilities
-    for sum_value, pair in frequency_storage_dict.items():
-        count = pair[0]  # first element is count
-        if count == 0:
-            continue
-        pair[1] = count / total_rolls
     return frequency_storage_dict
 
 def calculate_expected_value_in_multi_dice_roll(frequency_storage_dict: Dict[int, List[float]]) -> float:
@@ -97,24 +208,12 @@ def calculate_expected_value_in_multi_dice_roll(frequency_storage_dict: Dict[int
         
 def calculate_variance_of_data(frequency_storage_dict: Dict[int, List[float]]) -> float:
     """
-    Returns the variance of data points in the given dataset and return it 
+    Returns the variance of the distribution table: the probability weighted squared deviations from its expected value
     """
 
-    total_data_points: int = len(frequency_storage_dict)
-    data_points: List[int] = list(frequency_storage_dict.keys())
-    probability_values: List[List[float]] = list(frequency_storage_dict.values())
-    data_point_difference_from_mean: List[float] = [0] * len(data_points)
-
-    data_points_sum = 0
-
-    for data in data_points:
-        data_points_sum += data
-
-    mean_of_data_points: float = data_points_sum / total_data_points
-
-    for index, data in enumerate(data_points):
-        data_point_difference_from_mean[index] = ((data - mean_of_data_points) ** 2) * probability_values[index][1]
-
-    variance: float = sum(data_point_difference_from_mean)
+    if not frequency_storage_dict:
+        raise ValueError('Distribution table data not available!')
 
-    return variance
\ No newline at end of file
+    probabilities = [probability for _, probability in frequency_storage_dict.values()]
+    _, variance = histogram_moments(list(frequency_storage_dict.keys()), probabilities)
+    return variance
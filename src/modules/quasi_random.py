@@ -0,0 +1,256 @@
+"""
+This file holds the quasi-random (low discrepancy) building blocks of the Monte Carlo pricers: Sobol and Halton point sets,
+a vectorized inverse normal CDF and the Brownian bridge construction of Brownian paths.
+
+Sobol points use the primitive polynomials over GF(2) in increasing degree, found by an order test, and odd initial direction
+numbers m_k < 2^k drawn from a fixed-seed generator - every dimension is a valid Sobol sequence and the construction is
+deterministic. Randomization (a digital shift for Sobol, a Cranley-Patterson rotation for Halton) is applied per replicate, so
+independent replicates give an honest standard error
+"""
+import math
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+SOBOL_BITS = 32
+SOBOL_SCALE = 2.0 ** -SOBOL_BITS
+# Seed of the generator drawing the initial Sobol direction numbers
+SOBOL_DIRECTION_SEED = 20_240_101
+
+# Coefficients of Acklam's rational approximation of the inverse normal CDF (relative error below 1.2e-9)
+_ACKLAM_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_ACKLAM_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01, -1.328068155288572e+01)
+_ACKLAM_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_ACKLAM_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+_ACKLAM_TAIL = 0.02425
+
+
+def inverse_normal_cdf(probabilities: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Vectorized inverse of the standard normal CDF for probabilities in (0, 1)"""
+    p = np.asarray(probabilities, dtype=np.float64)
+    result = np.empty_like(p)
+
+    central = (p >= _ACKLAM_TAIL) & (p <= 1 - _ACKLAM_TAIL)
+    q = p[central] - 0.5
+    r = q * q
+    a, b = _ACKLAM_A, _ACKLAM_B
+    result[central] = (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * q / (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1)
+
+    c, d = _ACKLAM_C, _ACKLAM_D
+    tails = ~central
+    tail_p = np.minimum(p[tails], 1 - p[tails])
+    s = np.sqrt(-2 * np.log(tail_p))
+    tail_values = (((((c[0] * s + c[1]) * s + c[2]) * s + c[3]) * s + c[4]) * s + c[5]) / ((((d[0] * s + d[1]) * s + d[2]) * s + d[3]) * s + 1)
+    result[tails] = np.where(p[tails] < 0.5, tail_values, -tail_values)
+    return result
+
+
+def _polynomial_mod_power(exponent: int, modulus: int) -> int:
+    """Computes x^exponent modulo a polynomial over GF(2), both encoded as bit masks"""
+    degree = modulus.bit_length() - 1
+    result, base = 1, 2
+    while exponent:
+        if exponent & 1:
+            result = _polynomial_mod_multiply(result, base, modulus, degree)
+        base = _polynomial_mod_multiply(base, base, modulus, degree)
+        exponent >>= 1
+    return result
+
+
+def _polynomial_mod_multiply(first: int, second: int, modulus: int, degree: int) -> int:
+    """Multiplies two polynomials over GF(2) modulo a polynomial of the given degree"""
+    product = 0
+    while second:
+        if second & 1:
+            product ^= first
+        second >>= 1
+        first <<= 1
+        if first >> degree & 1:
+            first ^= modulus
+    return product
+
+
+def _prime_factors(value: int) -> List[int]:
+    """Returns - the distinct prime factors of value"""
+    factors = []
+    divisor = 2
+    while divisor * divisor <= value:
+        if value % divisor == 0:
+            factors.append(divisor)
+            while value % divisor == 0:
+                value //= divisor
+        divisor += 1
+    if value > 1:
+        factors.append(value)
+    return factors
+
+
+@lru_cache(maxsize=None)
+def primitive_polynomials(count: int) -> Tuple[Tuple[int, int], ...]:
+    """
+    Finds the first count primitive polynomials over GF(2) by increasing degree. A polynomial of degree s is primitive when x
+    has multiplicative order 2^s - 1 modulo it
+
+    Returns - (degree, a) pairs where the bits of a are the inner coefficients a_1 ... a_{s-1} (a_1 most significant)
+    """
+    polynomials: List[Tuple[int, int]] = []
+    degree = 1
+    while len(polynomials) < count:
+        order = 2 ** degree - 1
+        cofactors = [order // factor for factor in _prime_factors(order)]
+        for inner in range(2 ** max(degree - 1, 0)):
+            modulus = (1 << degree) | (inner << 1) | 1
+            if _polynomial_mod_power(order, modulus) == 1 and all(_polynomial_mod_power(cofactor, modulus) != 1 for cofactor in cofactors):
+                polynomials.append((degree, inner))
+                if len(polynomials) == count:
+                    break
+        degree += 1
+    return tuple(polynomials)
+
+
+@lru_cache(maxsize=None)
+def sobol_direction_numbers(dimensions: int) -> npt.NDArray[np.uint64]:
+    """
+    Builds the Sobol direction numbers v_k = m_k * 2^(32 - k) of every dimension. The first dimension is the van der Corput
+    sequence, every other one follows the recurrence of its primitive polynomial
+
+    Returns - a read-only (dimensions x SOBOL_BITS) array
+    """
+    rng = np.random.default_rng(SOBOL_DIRECTION_SEED)
+    directions = np.zeros((dimensions, SOBOL_BITS), dtype=np.uint64)
+    directions[0] = [1 << (SOBOL_BITS - k) for k in range(1, SOBOL_BITS + 1)]
+
+    for dimension, (degree, inner) in enumerate(primitive_polynomials(dimensions - 1), start=1):
+        m = [0] * (SOBOL_BITS + 1)
+        for k in range(1, degree + 1):
+            m[k] = int(rng.integers(0, 2 ** (k - 1))) * 2 + 1
+        for k in range(degree + 1, SOBOL_BITS + 1):
+            value = m[k - degree] ^ (m[k - degree] << degree)
+            for i in range(1, degree):
+                if inner >> (degree - 1 - i) & 1:
+                    value ^= m[k - i] << i
+            m[k] = value
+        directions[dimension] = [m[k] << (SOBOL_BITS - k) for k in range(1, SOBOL_BITS + 1)]
+
+    directions.setflags(write=False)
+    return directions
+
+
+def sobol_points(start: int, count: int, dimensions: int, digital_shift: npt.NDArray[np.uint64] | None = None) -> npt.NDArray[np.float64]:
+    """
+    Generates the Sobol points with indices start ... start + count - 1. The first point comes from its Gray code, every next
+    one differs from the previous by one direction number (Antonov-Saleev), so the block is a cumulative XOR - one vectorized pass
+
+    Args:
+    digital_shift - optional (dimensions,) random 32-bit integers XOR-ed into every point
+
+    Returns - a (count x dimensions) array of points in (0, 1)
+    """
+    directions = sobol_direction_numbers(dimensions)
+    gray_code = start ^ (start >> 1)
+    first_point = np.zeros(dimensions, dtype=np.uint64)
+    for bit in range(SOBOL_BITS):
+        if gray_code >> bit & 1:
+            first_point ^= directions[:, bit]
+
+    indices = np.arange(start, start + count - 1, dtype=np.uint64)
+    # The point after index i flips the direction number of the lowest zero bit of i, i.e. the lowest set bit of i + 1
+    lowest_set_bit = (indices + 1) & (~(indices + 1) + np.uint64(1))
+    flipped_bit = np.log2(lowest_set_bit.astype(np.float64)).astype(np.int64)
+
+    integers = np.empty((count, dimensions), dtype=np.uint64)
+    integers[0] = first_point
+    integers[1:] = directions[:, flipped_bit].T
+    np.bitwise_xor.accumulate(integers, axis=0, out=integers)
+    if digital_shift is not None:
+        integers ^= digital_shift
+    points: npt.NDArray[np.float64] = (integers.astype(np.float64) + 0.5) * SOBOL_SCALE
+    return points
+
+
+@lru_cache(maxsize=None)
+def first_primes(count: int) -> Tuple[int, ...]:
+    """Returns - the first count prime numbers"""
+    limit = max(16, int(count * (math.log(count + 1) + math.log(math.log(count + 2)) + 2)))
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for number in range(2, int(limit ** 0.5) + 1):
+        if sieve[number]:
+            sieve[number * number::number] = False
+    return tuple(int(prime) for prime in np.flatnonzero(sieve)[:count])
+
+
+def halton_points(start: int, count: int, dimensions: int, rotation: npt.NDArray[np.float64] | None = None) -> npt.NDArray[np.float64]:
+    """
+    Generates the Halton points with indices start + 1 ... start + count: the radical inverse of the index in the first
+    `dimensions` prime bases
+
+    Args:
+    rotation - optional (dimensions,) uniform shifts added modulo 1 (Cranley-Patterson rotation)
+
+    Returns - a (count x dimensions) array of points in (0, 1)
+    """
+    indices = np.arange(start + 1, start + count + 1, dtype=np.int64)
+    points = np.empty((count, dimensions), dtype=np.float64)
+    for dimension, base in enumerate(first_primes(dimensions)):
+        remaining = indices.copy()
+        value = np.zeros(count)
+        scale = 1.0 / base
+        while remaining.any():
+            value += (remaining % base) * scale
+            remaining //= base
+            scale /= base
+        points[:, dimension] = value
+    if rotation is not None:
+        points = (points + rotation) % 1.0
+        # Keep the points away from 0, where the inverse normal CDF diverges
+        np.clip(points, SOBOL_SCALE, 1 - SOBOL_SCALE, out=points)
+    return points
+
+
+@lru_cache(maxsize=None)
+def brownian_bridge_schedule(steps: int) -> Tuple[Tuple[int, int, int, float, float, float], ...]:
+    """
+    Builds the order in which a Brownian bridge fills a path of `steps` equally spaced times: the terminal value first, then
+    the midpoints of the known intervals breadth first
+
+    Returns - (target, left, right, left_weight, right_weight, std) per step, left = -1 standing for W(0) = 0
+    """
+    times = np.arange(1, steps + 1, dtype=np.float64) / steps
+    schedule: List[Tuple[int, int, int, float, float, float]] = [(steps - 1, -1, -1, 0.0, 0.0, 1.0)]
+    intervals = [(-1, steps - 1)]
+    while intervals:
+        next_intervals = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            middle = (left + right) // 2
+            left_time = times[left] if left >= 0 else 0.0
+            span = times[right] - left_time
+            right_weight = (times[middle] - left_time) / span
+            std = math.sqrt((times[middle] - left_time) * (times[right] - times[middle]) / span)
+            schedule.append((middle, left, right, 1 - right_weight, right_weight, std))
+            next_intervals.extend([(left, middle), (middle, right)])
+        intervals = next_intervals
+    return tuple(schedule)
+
+
+def brownian_bridge(normals: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    Turns (paths x steps) standard normals into standard Brownian motion values at the times 1/steps ... 1 with the Brownian
+    bridge construction. The first normal sets the terminal value, so the first (best distributed) quasi-random coordinates
+    drive the largest scale moves of the path
+
+    Returns - a (paths x steps) array of W(t_k) over a unit horizon
+    """
+    steps = normals.shape[1]
+    paths = np.zeros_like(normals)
+    for column, (target, left, right, left_weight, right_weight, std) in enumerate(brownian_bridge_schedule(steps)):
+        if left == -1 and right == -1:
+            paths[:, target] = normals[:, column]
+            continue
+        left_values = paths[:, left] if left >= 0 else 0.0
+        paths[:, target] = left_weight * left_values + right_weight * paths[:, right] + std * normals[:, column]
+    return paths
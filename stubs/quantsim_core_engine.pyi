@@ -2,13 +2,257 @@
 Core engine for Quantsim project - for Limit Order Book implementation
 """
 from __future__ import annotations
+import numpy
+import numpy.typing
 import typing
-__all__: list[str] = ['ASK', 'BID', 'OrderBookRecord', 'OrderBookRecordType', 'quantsim_fn_python_name_add']
+__all__: list[str] = ['ASK', 'BID', 'BatchAction', 'EVENT_DTYPE', 'EventLog', 'EventLogWriter', 'FILL_DTYPE', 'Fill', 'IOC', 'LIMIT', 'MARKET', 'MarketEventType', 'OrderBook', 'OrderBookRecord', 'ORDER_DTYPE', 'OrderBookRecordType', 'OrderType', 'convertCsvToEventLog', 'quantsim_fn_python_name_add', 'replayEventLog']
+class BatchAction:
+    """
+    The type field of a batch row
+    
+    Members:
+    
+      LIMIT
+    
+      MARKET
+    
+      IOC
+    
+      CANCEL
+    
+      MODIFY
+    """
+    CANCEL: typing.ClassVar[BatchAction]  # value = <BatchAction.CANCEL: 3>
+    IOC: typing.ClassVar[BatchAction]  # value = <BatchAction.IOC: 2>
+    LIMIT: typing.ClassVar[BatchAction]  # value = <BatchAction.LIMIT: 0>
+    MARKET: typing.ClassVar[BatchAction]  # value = <BatchAction.MARKET: 1>
+    MODIFY: typing.ClassVar[BatchAction]  # value = <BatchAction.MODIFY: 4>
+    __members__: typing.ClassVar[dict[str, BatchAction]]  # value = {'LIMIT': <BatchAction.LIMIT: 0>, 'MARKET': <BatchAction.MARKET: 1>, 'IOC': <BatchAction.IOC: 2>, 'CANCEL': <BatchAction.CANCEL: 3>, 'MODIFY': <BatchAction.MODIFY: 4>}
+    def __eq__(self, other: typing.Any) -> bool:
+        ...
+    def __getstate__(self) -> int:
+        ...
+    def __hash__(self) -> int:
+        ...
+    def __index__(self) -> int:
+        ...
+    def __init__(self, value: typing.SupportsInt) -> None:
+        ...
+    def __int__(self) -> int:
+        ...
+    def __ne__(self, other: typing.Any) -> bool:
+        ...
+    def __repr__(self) -> str:
+        ...
+    def __setstate__(self, state: typing.SupportsInt) -> None:
+        ...
+    def __str__(self) -> str:
+        ...
+    @property
+    def name(self) -> str:
+        ...
+    @property
+    def value(self) -> int:
+        ...
+class EventLog:
+    """
+    A read-only memory mapping of a binary event log
+    """
+    def __init__(self, path: str) -> None:
+        ...
+    def events(self) -> numpy.typing.NDArray[numpy.void]:
+        """
+        A read-only EVENT_DTYPE view of the mapped records, no copy is made
+        """
+    @property
+    def eventCount(self) -> int:
+        ...
+    @property
+    def tickSize(self) -> float:
+        ...
+class EventLogWriter:
+    """
+    Writes EVENT_DTYPE records to a new binary event log
+    """
+    def __enter__(self) -> EventLogWriter:
+        ...
+    def __exit__(self, arg0: typing.Any, arg1: typing.Any, arg2: typing.Any) -> None:
+        ...
+    def __init__(self, path: str, tickSize: typing.SupportsFloat) -> None:
+        ...
+    def close(self) -> None:
+        """
+        Writes the event count to the header and closes the file
+        """
+    def discard(self) -> None:
+        """
+        Closes the file without its header, the unfinished log cannot be opened
+        """
+    def write(self, events: numpy.typing.NDArray[numpy.void]) -> None:
+        ...
+    @property
+    def eventCount(self) -> int:
+        ...
+class Fill:
+    """
+    An execution between an incoming (taker) and a resting (maker) order at the maker's price in ticks
+    """
+    def __repr__(self) -> str:
+        ...
+    @property
+    def makerId(self) -> int:
+        ...
+    @property
+    def price(self) -> int:
+        ...
+    @property
+    def takerId(self) -> int:
+        ...
+    @property
+    def takerSide(self) -> OrderBookRecordType:
+        ...
+    @property
+    def time(self) -> int:
+        ...
+    @property
+    def volume(self) -> int:
+        ...
+class MarketEventType:
+    """
+    The type field of an event log record
+    
+    Members:
+    
+      ADD
+    
+      CANCEL
+    
+      EXECUTE
+    
+      REPLACE
+    """
+    ADD: typing.ClassVar[MarketEventType]  # value = <MarketEventType.ADD: 0>
+    CANCEL: typing.ClassVar[MarketEventType]  # value = <MarketEventType.CANCEL: 1>
+    EXECUTE: typing.ClassVar[MarketEventType]  # value = <MarketEventType.EXECUTE: 2>
+    REPLACE: typing.ClassVar[MarketEventType]  # value = <MarketEventType.REPLACE: 3>
+    __members__: typing.ClassVar[dict[str, MarketEventType]]  # value = {'ADD': <MarketEventType.ADD: 0>, 'CANCEL': <MarketEventType.CANCEL: 1>, 'EXECUTE': <MarketEventType.EXECUTE: 2>, 'REPLACE': <MarketEventType.REPLACE: 3>}
+    def __eq__(self, other: typing.Any) -> bool:
+        ...
+    def __getstate__(self) -> int:
+        ...
+    def __hash__(self) -> int:
+        ...
+    def __index__(self) -> int:
+        ...
+    def __init__(self, value: typing.SupportsInt) -> None:
+        ...
+    def __int__(self) -> int:
+        ...
+    def __ne__(self, other: typing.Any) -> bool:
+        ...
+    def __repr__(self) -> str:
+        ...
+    def __setstate__(self, state: typing.SupportsInt) -> None:
+        ...
+    def __str__(self) -> str:
+        ...
+    @property
+    def name(self) -> str:
+        ...
+    @property
+    def value(self) -> int:
+        ...
+class OrderBook:
+    """
+    Price-time priority limit order book and matching engine. Prices are integer ticks of tickSize. Every call locks the book, so it can be shared between threads
+    """
+    def __init__(self, tickSize: typing.SupportsFloat = 0.01, expectedOrders: typing.SupportsInt = 0) -> None:
+        """
+        expectedOrders preallocates the order pool and id index
+        """
+    def addLimitOrder(self, id: typing.SupportsInt, time: typing.SupportsInt, side: OrderBookRecordType, volume: typing.SupportsInt, price: typing.SupportsInt) -> list[Fill]:
+        """
+        Matches a limit order and rests what is left of it on the book
+        """
+    def bestAsk(self) -> int | None:
+        ...
+    def bestBid(self) -> int | None:
+        ...
+    def cancelOrder(self, id: typing.SupportsInt) -> bool:
+        """
+        Removes a resting order, False if there is none with this id
+        """
+    def depth(self, side: OrderBookRecordType, levels: typing.SupportsInt) -> list[tuple[int, int]]:
+        """
+        The (price, volume) of the best price levels of a side
+        """
+    def getOrder(self, id: typing.SupportsInt) -> OrderBookRecord:
+        ...
+    def hasOrder(self, id: typing.SupportsInt) -> bool:
+        ...
+    def levelCount(self, side: OrderBookRecordType) -> int:
+        ...
+    def modifyOrder(self, id: typing.SupportsInt, time: typing.SupportsInt, volume: typing.SupportsInt, price: typing.SupportsInt) -> list[Fill]:
+        """
+        Changes a resting order. A volume reduction at the same price keeps the time priority, anything else re-enters the book
+        """
+    def orderCount(self) -> int:
+        ...
+    def pendingFillCount(self) -> int:
+        """
+        Fills of the last batch still waiting for an output array
+        """
+    def poolCapacity(self) -> int:
+        """
+        Order slots allocated by the pool, free ones included
+        """
+    def submitBatch(self, orders: numpy.typing.NDArray[numpy.void], fills: numpy.typing.NDArray[numpy.void]) -> tuple[int, int, int]:
+        """
+        Processes an ORDER_DTYPE array without the GIL, holding the book's lock for the whole call, and writes its fills to a preallocated FILL_DTYPE array. When the fills array is full, processing stops after the row that filled it and the fills that did not fit are written first by the next call. Returns (rows processed, fills written, rows rejected)
+        """
+    def submitIocOrder(self, id: typing.SupportsInt, time: typing.SupportsInt, side: OrderBookRecordType, volume: typing.SupportsInt, price: typing.SupportsInt) -> list[Fill]:
+        """
+        Matches an order up to its limit price, what is left of it is dropped
+        """
+    def submitMarketOrder(self, id: typing.SupportsInt, time: typing.SupportsInt, side: OrderBookRecordType, volume: typing.SupportsInt) -> list[Fill]:
+        """
+        Matches an order at any price, what is left of it is dropped
+        """
+    def submitOrder(self, id: typing.SupportsInt, time: typing.SupportsInt, type: OrderType, side: OrderBookRecordType, volume: typing.SupportsInt, price: typing.SupportsInt) -> list[Fill]:
+        """
+        Submits a limit, market or IOC order and returns its fills
+        """
+    def toPrice(self, ticks: typing.SupportsInt) -> float:
+        ...
+    def toTicks(self, price: typing.SupportsFloat) -> int:
+        """
+        The nearest number of ticks of a price
+        """
+    def volumeAtPrice(self, side: OrderBookRecordType, price: typing.SupportsInt) -> int:
+        ...
+    @property
+    def tickSize(self) -> float:
+        ...
 class OrderBookRecord:
-    def __init__(self, arg0: typing.SupportsInt, arg1: typing.SupportsInt, arg2: typing.SupportsInt, arg3: typing.SupportsFloat, arg4: OrderBookRecordType) -> None:
+    def __init__(self, arg0: typing.SupportsInt, arg1: typing.SupportsInt, arg2: typing.SupportsInt, arg3: typing.SupportsInt, arg4: OrderBookRecordType) -> None:
         ...
     def displayContents(self) -> None:
         ...
+    @property
+    def id(self) -> int:
+        ...
+    @property
+    def price(self) -> int:
+        ...
+    @property
+    def recordType(self) -> OrderBookRecordType:
+        ...
+    @property
+    def time(self) -> int:
+        ...
+    @property
+    def volume(self) -> int:
+        ...
 class OrderBookRecordType:
     """
     Members:
@@ -46,9 +290,63 @@ class OrderBookRecordType:
     @property
     def value(self) -> int:
         ...
+class OrderType:
+    """
+    Members:
+    
+      LIMIT
+    
+      MARKET
+    
+      IOC
+    """
+    IOC: typing.ClassVar[OrderType]  # value = <OrderType.IOC: 2>
+    LIMIT: typing.ClassVar[OrderType]  # value = <OrderType.LIMIT: 0>
+    MARKET: typing.ClassVar[OrderType]  # value = <OrderType.MARKET: 1>
+    __members__: typing.ClassVar[dict[str, OrderType]]  # value = {'LIMIT': <OrderType.LIMIT: 0>, 'MARKET': <OrderType.MARKET: 1>, 'IOC': <OrderType.IOC: 2>}
+    def __eq__(self, other: typing.Any) -> bool:
+        ...
+    def __getstate__(self) -> int:
+        ...
+    def __hash__(self) -> int:
+        ...
+    def __index__(self) -> int:
+        ...
+    def __init__(self, value: typing.SupportsInt) -> None:
+        ...
+    def __int__(self) -> int:
+        ...
+    def __ne__(self, other: typing.Any) -> bool:
+        ...
+    def __repr__(self) -> str:
+        ...
+    def __setstate__(self, state: typing.SupportsInt) -> None:
+        ...
+    def __str__(self) -> str:
+        ...
+    @property
+    def name(self) -> str:
+        ...
+    @property
+    def value(self) -> int:
+        ...
+def convertCsvToEventLog(csvPath: str, logPath: str, tickSize: typing.SupportsFloat) -> int:
+    """
+    Streams a CSV file of ts, type, side, id, price, qty (and optionally new_id) columns into a binary event log. Returns the events written
+    """
 def quantsim_fn_python_name_add(arg0: typing.SupportsInt, arg1: typing.SupportsInt) -> int:
     """
     A function that adds 2 numbers
     """
+def replayEventLog(book: OrderBook, log: EventLog, depthLevels: typing.SupportsInt = 5, everyEvents: typing.SupportsInt = 0, everyTime: typing.SupportsInt = 0, first: typing.SupportsInt = 0, count: typing.SupportsInt = 18446744073709551615) -> dict[str, typing.Any]:
+    """
+    Drives the book with the events of the log without the GIL, holding the book's lock for the whole replay. A book snapshot of depthLevels levels per side is taken after every everyEvents events and / or every everyTime units of the event timestamps. Returns the replay statistics and the snapshot arrays event_index, time, bid_price, bid_volume, ask_price and ask_volume (snapshots x depthLevels)
+    """
 ASK: OrderBookRecordType  # value = <OrderBookRecordType.ASK: 1>
 BID: OrderBookRecordType  # value = <OrderBookRecordType.BID: 0>
+EVENT_DTYPE: numpy.dtype[numpy.void]  # value = dtype({'names': ['ts', 'id', 'price', 'qty', 'new_id', 'type', 'side'], 'formats': ['<i8', '<i8', '<i8', '<i8', '<i8', 'i1', 'i1'], 'offsets': [0, 8, 16, 24, 32, 40, 41], 'itemsize': 48})
+FILL_DTYPE: numpy.dtype[numpy.void]  # value = dtype({'names': ['taker', 'maker', 'price', 'qty', 'ts', 'side'], 'formats': ['<i8', '<i8', '<i8', '<i8', '<i8', 'i1'], 'offsets': [0, 8, 16, 24, 32, 40], 'itemsize': 48})
+IOC: OrderType  # value = <OrderType.IOC: 2>
+LIMIT: OrderType  # value = <OrderType.LIMIT: 0>
+MARKET: OrderType  # value = <OrderType.MARKET: 1>
+ORDER_DTYPE: numpy.dtype[numpy.void]  # value = dtype({'names': ['type', 'side', 'price', 'qty', 'id', 'ts'], 'formats': ['i1', 'i1', '<i8', '<i8', '<i8', '<i8'], 'offsets': [0, 1, 8, 16, 24, 32], 'itemsize': 40})
@@ -0,0 +1,1021 @@
+import logging
+import sqlite3
+from statistics import NormalDist
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis_module import AnalysisModule
+from src.cli.commands.sweep import parse_parameter_values
+from src.cli.parser import build_parser
+from src.circuit_breaker import CircuitBreaker
+from src.data_loader.data_loader import DataLoader
+from src.data_validator import DataValidator
+from src.flow_controller import FlowController
+from src.modules.analytics.metrics_kernel import (
+    compute_cross_sectional_metrics,
+    compute_return_statistics,
+    derive_pair_metrics
+)
+from src.modules.analytics import covariance_engine
+from src.modules.analytics.backtester import generate_signals, run_backtest, signals_to_weights
+from src.modules.analytics.bootstrap_analyzer import (
+    block_bootstrap_indices,
+    bootstrap_pair_metrics,
+    resample_counts,
+    stationary_bootstrap_indices
+)
+from src.modules.analytics.covariance_engine import (
+    CovarianceEngine,
+    compute_covariance_and_correlation,
+    compute_covariance_matrix,
+    covariance_to_correlation
+)
+from src.modules.analytics import parameter_sweep
+from src.modules.analytics.parameter_sweep import (
+    PricePanel,
+    SharedPricePanel,
+    attach_price_panel,
+    backtest_parameter_set,
+    grid_parameter_sets,
+    random_parameter_sets,
+    run_parameter_sweep
+)
+from src.modules.analytics.drawdown_analyzer import calculate_drawdown_metrics, calculate_underwater_curve
+from src.modules.analytics.factor_regression import regress_on_factors
+from src.modules.analytics.online_statistics import (
+    OnlineDrawdown,
+    OnlineStatistics,
+    accumulate_statistics,
+    iter_csv_chunks,
+    iter_log_returns
+)
+from src.modules.analytics.portfolio_analyzer import (
+    calculate_portfolio_returns,
+    get_rebalance_mask,
+    holdings_to_weights,
+    simulate_portfolios
+)
+from src.modules.analytics.portfolio_optimizer import PortfolioOptimizer
+from src.modules.analytics.risk_analyzer import calculate_value_at_risk, parametric_tail_losses, tail_losses
+from src.modules.analytics.rolling_analyzer import calculate_rolling_metrics
+from src.modules.analytics.walk_forward import WindowStatistics, walk_forward_folds, walk_forward_pair_metrics, walk_forward_strategy
+from src.modules.analytics.returns_analyzer import (
+    calculate_beta,
+    calculate_daily_portfolio_returns,
+    calculate_correlation_coefficient,
+    calculate_log_return_alpha,
+    calculate_annualized_volatility,
+    calculate_covariance,
+    calculate_log_returns,
+    calculate_sharp_ratio
+)
+
+logger = logging.getLogger("analytics")
+
+
+def make_aligned_close_frame(periods: int = 120, seed: int = 42) -> pd.DataFrame:
+    """Correlated ticker and benchmark close prices on a business-day UTC index"""
+    rng = np.random.default_rng(seed)
+    benchmark_returns = rng.normal(0.0004, 0.01, periods)
+    ticker_returns = 0.0002 + 1.3 * benchmark_returns + rng.normal(0, 0.008, periods)
+    index = pd.date_range(start='2024-01-01', periods=periods, freq='B', tz='UTC')
+    return pd.DataFrame(
+        {
+            'ticker_close': 250 * np.cumprod(1 + ticker_returns),
+            'benchmark_close': 18000 * np.cumprod(1 + benchmark_returns),
+        },
+        index=index
+    )
+
+
+class TestMetricsKernel:
+    """Testing the fused sufficient-statistics kernel against the returns_analyzer functions"""
+
+    def test_kernel_matches_returns_analyzer(self) -> None:
+        df = make_aligned_close_frame()
+        metrics = derive_pair_metrics(compute_return_statistics(df['ticker_close'], df['benchmark_close']))
+
+        reference = df.copy()
+        calculate_log_returns(reference)
+        reference = reference.dropna()
+
+        assert metrics['sample_size'] == len(df) - 1
+        assert metrics['beta'] == pytest.approx(calculate_beta(reference))
+        assert metrics['log_returns_alpha'] == pytest.approx(calculate_log_return_alpha(reference))
+        assert metrics['sharpe_ratio'] == pytest.approx(calculate_sharp_ratio(reference))
+        assert metrics['correlation_coefficient'] == pytest.approx(calculate_correlation_coefficient(reference))
+
+        simple_returns = df.pct_change()
+        assert metrics['ticker_annualized_volatility'] == pytest.approx(simple_returns['ticker_close'].std() * 252 ** 0.5)
+        assert metrics['cummulative_returns'][0] == pytest.approx(df['ticker_close'].iloc[-1] / df['ticker_close'].iloc[0] - 1)
+
+    def test_compute_metrics_does_not_mutate_input(self) -> None:
+        df = make_aligned_close_frame()
+        columns_before = list(df.columns)
+        analysis_module = AnalysisModule(DataLoader(sqlite3.connect(':memory:')))
+        metrics = analysis_module.compute_metrics(df)
+
+        assert list(df.columns) == columns_before
+        assert list(metrics['log_returns'].columns) == ['ticker_close_log_return', 'benchmark_close_log_return']
+        assert len(metrics['log_returns']) == len(df) - 1
+
+    def test_constant_benchmark_raises(self) -> None:
+        with pytest.raises(ZeroDivisionError):
+            derive_pair_metrics(compute_return_statistics([100.0, 101.0, 99.0, 102.0], [50.0, 50.0, 50.0, 50.0]))
+
+
+class TestRollingMetrics:
+    """Testing the O(n) rolling-window metrics against a direct per-window computation"""
+
+    def test_rolling_metrics_match_full_window_metrics(self) -> None:
+        df = make_aligned_close_frame(periods=150)
+        rolling = calculate_rolling_metrics(df['ticker_close'], df['benchmark_close'], windows=[20, 60], index=df.index)
+
+        assert set(rolling) == {20, 60}
+        for window, metrics_df in rolling.items():
+            assert len(metrics_df) == len(df) - window
+            for position in (0, len(metrics_df) // 2, len(metrics_df) - 1):
+                prices = df.iloc[position:position + window + 1]
+                expected = derive_pair_metrics(compute_return_statistics(prices['ticker_close'], prices['benchmark_close']))
+                row = metrics_df.iloc[position]
+
+                assert metrics_df.index[position] == prices.index[-1]
+                assert row['beta'] == pytest.approx(expected['beta'])
+                assert row['alpha'] == pytest.approx(expected['log_returns_alpha'])
+                assert row['correlation'] == pytest.approx(expected['correlation_coefficient'])
+                assert row['ticker_volatility'] == pytest.approx(expected['ticker_annualized_volatility'])
+                assert row['sharpe_ratio'] == pytest.approx(expected['sharpe_ratio'])
+
+    def test_rolling_metrics_round_trip_through_db(self) -> None:
+        df = make_aligned_close_frame(periods=80)
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        rolling = AnalysisModule(data_loader).compute_rolling_metrics(df, windows=[30])
+
+        assert data_loader.save_rolling_analysis_results('TCS', 'NIFTY50', rolling) == len(rolling[30])
+        assert data_loader.save_rolling_analysis_results('TCS', 'NIFTY50', rolling) == len(rolling[30])
+
+        stored = data_loader.get_rolling_analysis_results('TCS', 'NIFTY50', 30, 0, 2**40)
+        assert len(stored) == len(rolling[30])
+        np.testing.assert_allclose(stored['beta'].to_numpy(), rolling[30]['beta'].to_numpy())
+
+
+def as_ohlcv(close: pd.Series) -> pd.DataFrame:
+    """Wraps a close price series into the OHLCV layout expected by DataLoader.insert_daily_data"""
+    return pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume': 1000}, index=close.index)
+
+
+def make_flow_controller(data_loader: DataLoader) -> FlowController:
+    """A FlowController wired to the given DataLoader"""
+    return FlowController(data_loader, CircuitBreaker(data_loader), DataValidator(data_loader), AnalysisModule(data_loader))
+
+
+class TestBatchAnalysis:
+    """Testing the cross-sectional N tickers vs one benchmark analysis"""
+
+    def test_cross_sectional_metrics_match_pair_kernel(self) -> None:
+        frames = [make_aligned_close_frame(seed=seed) for seed in (1, 2, 3)]
+        benchmark_close = frames[0]['benchmark_close'].to_numpy()
+        asset_close = np.column_stack([frame['ticker_close'].to_numpy() for frame in frames])
+        asset_close[:15, 2] = np.nan
+        asset_close[60, 1] = np.nan
+
+        batch = compute_cross_sectional_metrics(asset_close, benchmark_close)
+
+        for column in range(asset_close.shape[1]):
+            stack = np.vstack([asset_close[:, column], benchmark_close])
+            expected = derive_pair_metrics(compute_return_statistics(stack[0], stack[1]))
+            assert batch['sample_size'][column] == expected['sample_size']
+            for key in ('beta', 'log_returns_alpha', 'sharpe_ratio', 'correlation_coefficient', 'ticker_annualized_volatility', 'benchmark_annualized_volatility'):
+                assert batch[key][column] == pytest.approx(expected[key])
+
+    def test_batch_request_bulk_inserts_results(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        df = make_aligned_close_frame(periods=40)
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(df['benchmark_close']))
+        data_loader.insert_daily_data('TCS', as_ohlcv(df['ticker_close']))
+        data_loader.insert_daily_data('ITC', as_ohlcv(make_aligned_close_frame(periods=40, seed=9)['ticker_close']))
+
+        batch_metrics = make_flow_controller(data_loader).dispatch_batch_analysis_request(['TCS', 'ITC', 'UNKNOWN'], 'NIFTY50', '2024-01-01', '2024-03-31')
+        single = derive_pair_metrics(compute_return_statistics(df['ticker_close'], df['benchmark_close']))
+
+        assert list(batch_metrics.index) == ['TCS', 'ITC', 'UNKNOWN']
+        assert batch_metrics.loc['TCS', 'beta'] == pytest.approx(single['beta'])
+        assert batch_metrics.loc['UNKNOWN', 'sample_size'] == 0
+
+        stored = data_loader.prod_db_connection.execute('SELECT ticker, beta FROM analysis_results ORDER BY ticker').fetchall()
+        assert [ticker for ticker, _ in stored] == ['ITC', 'TCS']
+
+
+def make_returns_matrix(observations: int = 200, assets: int = 7, seed: int = 5) -> np.ndarray:
+    """Correlated daily returns driven by one common factor"""
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0, 0.01, (observations, 1))
+    return np.asarray(factor * rng.uniform(0.5, 1.5, assets) + rng.normal(0, 0.01, (observations, assets)))
+
+
+class TestCovarianceEngine:
+    """Testing the blockwise pairwise-complete covariance engine"""
+
+    def test_complete_data_matches_numpy(self) -> None:
+        returns = make_returns_matrix()
+        covariance, intensity = compute_covariance_matrix(returns, block_size=3)
+
+        np.testing.assert_allclose(covariance, np.cov(returns, rowvar=False))
+        assert intensity == 0.0
+
+    def test_pairwise_complete_matches_pandas(self) -> None:
+        returns = make_returns_matrix()
+        returns[:30, 1] = np.nan
+        returns[100:140, 4] = np.nan
+
+        covariance, correlation, _ = compute_covariance_and_correlation(returns, block_size=2)
+        np.testing.assert_allclose(covariance, pd.DataFrame(returns).cov().to_numpy())
+        np.testing.assert_allclose(correlation, pd.DataFrame(returns).corr().to_numpy())
+
+        complete_covariance, _ = compute_covariance_matrix(make_returns_matrix())
+        np.testing.assert_allclose(covariance_to_correlation(complete_covariance), np.corrcoef(make_returns_matrix(), rowvar=False))
+
+    def test_ewma_matches_weighted_numpy(self) -> None:
+        returns = make_returns_matrix()
+        covariance, _ = compute_covariance_matrix(returns, ewma_halflife=30)
+        weights = 0.5 ** (np.arange(len(returns) - 1, -1, -1) / 30)
+
+        np.testing.assert_allclose(covariance, np.cov(returns, rowvar=False, aweights=weights))
+
+    def test_ledoit_wolf_shrinks_towards_scaled_identity(self) -> None:
+        returns = make_returns_matrix(observations=30, assets=20)
+        sample, _ = compute_covariance_matrix(returns)
+        shrunk, intensity = compute_covariance_matrix(returns, block_size=8, shrinkage='ledoit_wolf')
+
+        assert 0 < intensity < 1
+        off_diagonal = ~np.eye(20, dtype=bool)
+        np.testing.assert_allclose(shrunk[off_diagonal], (1 - intensity) * sample[off_diagonal])
+        assert np.linalg.cond(shrunk) < np.linalg.cond(sample)
+
+    def test_engine_caches_per_data_version(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        for seed, ticker in enumerate(['TCS', 'ITC', 'RELIANCE']):
+            data_loader.insert_daily_data(ticker, as_ohlcv(make_aligned_close_frame(periods=60, seed=seed)['ticker_close']))
+
+        engine = CovarianceEngine(data_loader)
+        first = engine.get_covariance_matrix(['TCS', 'ITC', 'RELIANCE'], 0, 2**40)
+        computations: list[int] = []
+        original = covariance_engine.compute_covariance_and_correlation
+
+        def counting_compute(*args: Any) -> Any:
+            computations.append(1)
+            return original(*args)
+
+        monkeypatch.setattr(covariance_engine, 'compute_covariance_and_correlation', counting_compute)
+
+        cached = engine.get_covariance_matrix(['TCS', 'ITC', 'RELIANCE'], 0, 2**40)
+        pd.testing.assert_frame_equal(first, cached)
+        assert computations == []
+
+        data_loader.insert_daily_data('TCS', as_ohlcv(make_aligned_close_frame(periods=61, seed=0)['ticker_close']))
+        engine.get_covariance_matrix(['TCS', 'ITC', 'RELIANCE'], 0, 2**40)
+        assert computations == [1]
+
+
+def make_price_panel(periods: int = 90, assets: int = 4, seed: int = 11) -> pd.DataFrame:
+    """Positive close prices of several assets on a business-day UTC index"""
+    returns = make_returns_matrix(observations=periods, assets=assets, seed=seed)
+    index = pd.date_range(start='2024-01-01', periods=periods, freq='B', tz='UTC')
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=index, columns=[f'A{i}' for i in range(assets)])
+
+
+def simulate_portfolio_loop(prices: pd.DataFrame, weights: np.ndarray, rebalance_rows: set[int], cost_rate: float) -> np.ndarray:
+    """Bar-by-bar reference simulation of a single portfolio"""
+    price_matrix = prices.to_numpy()
+    value = 1.0 - cost_rate * np.abs(weights).sum()
+    units = value * weights / price_matrix[0]
+    nav = [value]
+    for row in range(1, len(price_matrix)):
+        value = float(units @ price_matrix[row])
+        if row in rebalance_rows:
+            drifted = units * price_matrix[row] / value
+            value *= 1 - cost_rate * np.abs(weights - drifted).sum()
+            units = value * weights / price_matrix[row]
+        nav.append(value)
+    return np.asarray(nav)
+
+
+class TestPortfolioSimulation:
+    """Testing the vectorized multi-portfolio NAV engine"""
+
+    def test_matches_bar_by_bar_loop(self) -> None:
+        prices = make_price_panel()
+        weights = np.array([[0.4, 0.3, 0.2, 0.1], [0.25, 0.25, 0.25, 0.25], [0.7, 0.5, -0.1, -0.1]])
+        simulation = simulate_portfolios(prices, weights, rebalance='monthly', transaction_cost_bps=25)
+
+        month_starts = set(np.flatnonzero(get_rebalance_mask(prices.index, 'monthly'))[1:].tolist())
+        assert month_starts == {i for i in range(1, len(prices)) if prices.index[i].month != prices.index[i - 1].month}
+        for portfolio in range(len(weights)):
+            expected = simulate_portfolio_loop(prices, weights[portfolio], month_starts, 25 / 10_000)
+            np.testing.assert_allclose(simulation.nav.iloc[:, portfolio].to_numpy(), expected, rtol=1e-12)
+
+        assert simulation.turnover.iloc[0, 0] == pytest.approx(1.0)
+        assert (simulation.transaction_costs.iloc[1:].to_numpy()[simulation.turnover.iloc[1:].to_numpy() == 0] == 0).all()
+
+    def test_buy_and_hold_tracks_holdings_value(self) -> None:
+        prices = make_price_panel()
+        holdings = np.array([10, 0, 5, 3])
+        initial_value = float(prices.iloc[0].to_numpy() @ holdings)
+        simulation = simulate_portfolios(prices, holdings_to_weights(prices, holdings), initial_value=initial_value)
+
+        np.testing.assert_allclose(simulation.nav.iloc[:, 0].to_numpy(), prices.to_numpy() @ holdings)
+        assert (simulation.turnover.iloc[1:].to_numpy() == 0).all()
+
+    def test_daily_equal_weight_matches_average_returns(self) -> None:
+        prices = make_price_panel()
+        returns = calculate_portfolio_returns(prices, weights=np.full(4, 0.25), rebalance='daily')
+
+        pd.testing.assert_series_equal(returns, calculate_daily_portfolio_returns(prices), check_names=False)
+        assert returns.iloc[0] == pytest.approx(prices.pct_change().iloc[1].mean())
+
+    def test_portfolio_request_reads_the_price_panel(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        prices = make_price_panel(periods=30, assets=2)
+        data_loader.insert_daily_data('TCS', as_ohlcv(prices['A0']))
+        data_loader.insert_daily_data('ITC', as_ohlcv(prices['A1'].iloc[3:]))
+
+        simulation = make_flow_controller(data_loader).dispatch_portfolio_simulation_request(['TCS', 'ITC'], [[0.5, 0.5], [1.0, 0.0]], '2024-01-01', '2024-03-31')
+
+        assert len(simulation.nav) == 27
+        assert simulation.nav.iloc[-1, 1] == pytest.approx(prices['A0'].iloc[-1] / prices['A0'].iloc[3])
+        with pytest.raises(LookupError):
+            make_flow_controller(data_loader).dispatch_portfolio_simulation_request(['TCS', 'UNKNOWN'], [0.5, 0.5], '2024-01-01', '2024-03-31')
+
+
+def make_optimizer_inputs(assets: int = 8, seed: int = 0) -> tuple[pd.Series, pd.DataFrame]:
+    """Annualized expected returns and a well conditioned covariance matrix"""
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(size=(assets, assets))
+    tickers = [f'T{i}' for i in range(assets)]
+    covariance = (loadings @ loadings.T / assets + np.eye(assets)) * 0.04
+    return pd.Series(rng.uniform(0.02, 0.2, assets), index=tickers), pd.DataFrame(covariance, index=tickers, columns=tickers)
+
+
+class TestPortfolioOptimizer:
+    """Testing the batched mean-variance optimizer"""
+
+    def test_loose_bounds_match_closed_form_solutions(self) -> None:
+        expected_returns, covariance = make_optimizer_inputs()
+        optimizer = PortfolioOptimizer(expected_returns, covariance, lower_bound=-5, upper_bound=5)
+        inverse = np.linalg.inv(covariance.to_numpy())
+        mu = expected_returns.to_numpy()
+        ones = np.ones(len(mu))
+
+        minimum_variance = inverse @ ones / (ones @ inverse @ ones)
+        np.testing.assert_allclose(optimizer.minimum_variance().weights.to_numpy(), minimum_variance, atol=1e-8)
+
+        tangency = inverse @ (mu - optimizer.risk_free_rate)
+        np.testing.assert_allclose(optimizer.maximum_sharpe().weights.to_numpy(), tangency / tangency.sum(), atol=1e-6)
+
+        # Two-fund solution of the equality constrained problem
+        a, b, c = ones @ inverse @ ones, ones @ inverse @ mu, mu @ inverse @ mu
+        target = 0.15
+        lagrange = np.linalg.solve(np.array([[c, b], [b, a]]), np.array([target, 1.0]))
+        expected = inverse @ (lagrange[0] * mu + lagrange[1] * ones)
+        result = optimizer.target_return(target)
+        assert result.expected_return == pytest.approx(target, abs=1e-8)
+        np.testing.assert_allclose(result.weights.to_numpy(), expected, atol=1e-6)
+
+    def test_long_only_solutions_satisfy_kkt_conditions(self) -> None:
+        expected_returns, covariance = make_optimizer_inputs(assets=12, seed=3)
+        optimizer = PortfolioOptimizer(expected_returns, covariance, upper_bound=0.3)
+        weights = optimizer.minimum_variance().weights.to_numpy()
+
+        assert weights.sum() == pytest.approx(1.0)
+        assert (weights >= 0).all() and (weights <= 0.3 + 1e-12).all()
+        marginal_risk = covariance.to_numpy() @ weights
+        free = (weights > 1e-8) & (weights < 0.3 - 1e-8)
+        level = marginal_risk[free].mean()
+        np.testing.assert_allclose(marginal_risk[free], level, rtol=1e-6)
+        assert (marginal_risk[weights <= 1e-8] >= level - 1e-8).all()
+        assert (marginal_risk[weights >= 0.3 - 1e-8] <= level + 1e-8).all()
+
+    def test_efficient_frontier_is_monotone_and_contains_the_tangency(self) -> None:
+        expected_returns, covariance = make_optimizer_inputs()
+        optimizer = PortfolioOptimizer(expected_returns, covariance)
+        frontier = optimizer.efficient_frontier(points=25)
+
+        assert (np.diff(frontier.points['expected_return']) > 0).all()
+        assert (np.diff(frontier.points['volatility']) > -1e-10).all()
+        np.testing.assert_allclose(frontier.weights.sum(axis=1), 1.0)
+        assert frontier.points['volatility'].iloc[0] == pytest.approx(optimizer.minimum_variance().volatility)
+        assert optimizer.maximum_sharpe().sharpe_ratio >= frontier.points['sharpe_ratio'].max() - 1e-9
+        with pytest.raises(ValueError):
+            optimizer.target_return(1.0)
+
+    def test_optimizer_from_price_history(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        prices = make_price_panel(periods=120, assets=3)
+        for column in prices.columns:
+            data_loader.insert_daily_data(column, as_ohlcv(prices[column]))
+        start_ts, end_ts = int(prices.index[0].timestamp()), int(prices.index[-1].timestamp())
+
+        optimizer = PortfolioOptimizer.from_price_history(data_loader, list(prices.columns), start_ts, end_ts, shrinkage=None)
+        log_returns = prices.apply(np.log).diff().dropna()
+
+        np.testing.assert_allclose(optimizer.expected_returns, log_returns.mean() * 252)
+        np.testing.assert_allclose(optimizer.covariance, log_returns.cov() * 252)
+
+
+class TestRiskAnalyzer:
+    """Testing the historical, parametric and Monte Carlo VaR / ES engine"""
+
+    def test_partition_tail_losses_match_sorted_losses(self) -> None:
+        losses = np.random.default_rng(1).standard_t(4, size=(3, 1001))
+        value_at_risk, expected_shortfall = tail_losses(losses, [0.9, 0.95, 0.99])
+
+        ordered = np.sort(losses, axis=1)
+        for j, level in enumerate([0.9, 0.95, 0.99]):
+            rank = int(np.ceil(level * 1001)) - 1
+            np.testing.assert_allclose(value_at_risk[:, j], ordered[:, rank])
+            np.testing.assert_allclose(expected_shortfall[:, j], ordered[:, rank:].mean(axis=1))
+
+    def test_historical_single_ticker_matches_daily_returns(self) -> None:
+        prices = make_price_panel(periods=250, assets=1)
+        report = calculate_value_at_risk(prices, confidence_levels=[0.95], horizons=[1, 5], methods=['historical'])
+
+        losses = np.sort(-prices['A0'].pct_change().dropna().to_numpy())
+        rank = int(np.ceil(0.95 * len(losses))) - 1
+        one_day = report[report['horizon'] == 1].iloc[0]
+        assert one_day['value_at_risk'] == pytest.approx(losses[rank])
+        assert one_day['expected_shortfall'] == pytest.approx(losses[rank:].mean())
+        assert len(report) == 2
+
+    def test_parametric_methods_agree_on_normal_returns(self) -> None:
+        rng = np.random.default_rng(2)
+        log_returns = rng.normal(0.0003, 0.012, 200_000)
+        normal_var, normal_es = parametric_tail_losses(log_returns, [0.95, 0.99], [1, 10], 'normal')
+        cornish_fisher_var, cornish_fisher_es = parametric_tail_losses(log_returns, [0.95, 0.99], [1, 10], 'cornish_fisher')
+
+        z = NormalDist().inv_cdf(0.01)
+        assert normal_var[0, 1] == pytest.approx(-np.expm1(log_returns.mean() + log_returns.std(ddof=1) * z))
+        assert (normal_es > normal_var).all()
+        np.testing.assert_allclose(cornish_fisher_var, normal_var, rtol=2e-2)
+        np.testing.assert_allclose(cornish_fisher_es, normal_es, rtol=2e-2)
+
+    def test_monte_carlo_is_reproducible_across_worker_counts(self) -> None:
+        prices = make_price_panel(periods=250, assets=3)
+        single = calculate_value_at_risk(prices, methods=['monte_carlo', 'normal'], simulations=20_000, seed=7, memory_budget_mb=0.5, workers=1)
+        pooled = calculate_value_at_risk(prices, methods=['monte_carlo', 'normal'], simulations=20_000, seed=7, memory_budget_mb=0.5, workers=2)
+
+        pd.testing.assert_frame_equal(single, pooled)
+        monte_carlo = single[single['method'] == 'monte_carlo']['value_at_risk'].to_numpy()
+        normal = single[single['method'] == 'normal']['value_at_risk'].to_numpy()
+        np.testing.assert_allclose(monte_carlo, normal, rtol=0.1)
+
+    def test_risk_request_reads_the_price_panel(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        prices = make_price_panel(periods=60, assets=2)
+        data_loader.insert_daily_data('TCS', as_ohlcv(prices['A0']))
+        data_loader.insert_daily_data('ITC', as_ohlcv(prices['A1']))
+
+        report = make_flow_controller(data_loader).dispatch_risk_request(['TCS', 'ITC'], [0.6, 0.4], '2024-01-01', '2024-03-31', [0.95, 0.99], [1], ['historical', 'normal'])
+
+        assert len(report) == 4
+        assert (report['expected_shortfall'] >= report['value_at_risk']).all()
+
+
+class TestOnlineStatistics:
+    """Testing the streaming moment and drawdown accumulators"""
+
+    def test_chunked_and_merged_moments_match_the_full_sample(self) -> None:
+        values = np.random.default_rng(3).standard_t(5, size=(5003, 3)) * 0.01 + 0.0005
+        streamed = OnlineStatistics(3)
+        for chunk in np.array_split(values, 41):
+            streamed.update(chunk)
+        shards = [OnlineStatistics.from_chunk(chunk) for chunk in np.array_split(values, 7)]
+        merged = shards.pop()
+        for shard in shards:
+            merged.merge(shard)
+
+        centered = values - values.mean(axis=0)
+        m2 = (centered ** 2).mean(axis=0)
+        for statistics in (streamed, merged):
+            assert statistics.count == 5003
+            np.testing.assert_allclose(statistics.mean, values.mean(axis=0))
+            np.testing.assert_allclose(statistics.covariance(), np.cov(values, rowvar=False))
+            np.testing.assert_allclose(statistics.skewness(), (centered ** 3).mean(axis=0) / m2 ** 1.5)
+            np.testing.assert_allclose(statistics.kurtosis(), (centered ** 4).mean(axis=0) / m2 ** 2 - 3)
+            np.testing.assert_array_equal(statistics.minimum, values.min(axis=0))
+            np.testing.assert_array_equal(statistics.maximum, values.max(axis=0))
+
+        pooled = accumulate_statistics(np.array_split(values, 9), workers=2)
+        np.testing.assert_allclose(pooled.comoment, streamed.comoment)
+
+    def test_drawdown_merges_exactly_across_shards(self) -> None:
+        rng = np.random.default_rng(9)
+        for _ in range(50):
+            prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, 300)))
+            running_peak = np.maximum.accumulate(prices)
+            cuts = np.sort(rng.choice(np.arange(1, 300), size=6, replace=False))
+            shards = [OnlineDrawdown.from_chunk(chunk) for chunk in np.split(prices, cuts)]
+            left, right = shards[:3], shards[3:]
+            for shards_half in (left, right):
+                for shard in shards_half[1:]:
+                    shards_half[0].merge(shard)
+            left[0].merge(right[0])
+
+            assert left[0].maximum_drawdown == pytest.approx((1 - prices / running_peak).max())
+            assert left[0].current_drawdown == pytest.approx(1 - prices[-1] / running_peak[-1])
+
+    def test_returns_analyzer_accepts_chunk_iterators(self, tmp_path: Any) -> None:
+        close_frame = make_aligned_close_frame(periods=300)
+        csv_path = tmp_path / 'prices.csv'
+        close_frame.to_csv(csv_path, index=False)
+        log_returns = calculate_log_returns(close_frame.copy())
+
+        def chunks() -> Any:
+            return iter_log_returns(iter_csv_chunks(str(csv_path), ['ticker_close', 'benchmark_close'], chunk_rows=32))
+
+        renamed = (chunk.add_suffix('_log_return') for chunk in chunks())
+        assert calculate_covariance(renamed) == pytest.approx(calculate_covariance(log_returns))
+        assert calculate_sharp_ratio(chunk.add_suffix('_log_return') for chunk in chunks()) == pytest.approx(calculate_sharp_ratio(log_returns))
+        volatility = calculate_annualized_volatility(
+            (chunk.add_suffix('_log_return') for chunk in chunks()), 'ticker_close_log_return', 'benchmark_close_log_return'
+        )
+        expected = calculate_annualized_volatility(log_returns, 'ticker_close_log_return', 'benchmark_close_log_return')
+        assert volatility == pytest.approx(expected)
+
+    def test_online_statistics_request_streams_the_db(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        close = make_aligned_close_frame(periods=250)['ticker_close']
+        data_loader.insert_daily_data('RELIANCE', as_ohlcv(close))
+
+        statistics, drawdown = make_flow_controller(data_loader).dispatch_online_statistics_request('RELIANCE', '2024-01-01', '2025-12-31', chunk_rows=16)
+
+        log_returns = np.diff(np.log(close.to_numpy()))
+        assert statistics.count == 249
+        assert statistics.mean[0] == pytest.approx(log_returns.mean())
+        assert statistics.std()[0] == pytest.approx(log_returns.std(ddof=1))
+        assert drawdown.maximum_drawdown == pytest.approx((1 - close / close.cummax()).max())
+        with pytest.raises(LookupError):
+            make_flow_controller(data_loader).dispatch_online_statistics_request('UNKNOWN', '2024-01-01', '2025-12-31')
+
+
+def loop_drawdown_metrics(prices: np.ndarray) -> dict[str, float]:
+    """Reference drawdown metrics of one price series with a plain Python loop"""
+    peak, peak_index, longest, stretch = prices[0], 0, 0, 0
+    worst = (0.0, 0, 0)
+    underwater = []
+    for index, price in enumerate(prices):
+        if price >= peak:
+            peak, peak_index, stretch = price, index, 0
+        else:
+            stretch += 1
+        longest = max(longest, stretch)
+        underwater.append(1 - price / peak)
+        if 1 - price / peak > worst[0]:
+            worst = (1 - price / peak, peak_index, index)
+    recovery = next((index for index in range(worst[2], len(prices)) if underwater[index] == 0), None)
+    return {
+        'max_drawdown': worst[0],
+        'max_drawdown_duration': (recovery if recovery is not None else len(prices) - 1) - worst[1],
+        'time_to_recovery': np.nan if recovery is None else recovery - worst[2],
+        'longest_drawdown_duration': longest,
+        'ulcer_index': float(np.sqrt(np.mean(np.square(underwater)))),
+    }
+
+
+class TestDrawdownAnalyzer:
+    """Testing the vectorized drawdown analytics"""
+
+    def test_vectorized_scan_matches_the_loop(self) -> None:
+        prices = make_price_panel(periods=400, assets=6, seed=2)
+        prices.iloc[:25, 1] = np.nan
+        metrics = calculate_drawdown_metrics(prices)
+
+        for column in prices.columns:
+            expected = loop_drawdown_metrics(prices[column].dropna().to_numpy())
+            for key, value in expected.items():
+                assert metrics.loc[column, key] == pytest.approx(value, nan_ok=True)
+        years = 399 / 252
+        assert metrics.loc['A0', 'calmar_ratio'] == pytest.approx(((prices['A0'].iloc[-1] / prices['A0'].iloc[0]) ** (1 / years) - 1) / metrics.loc['A0', 'max_drawdown'])
+        np.testing.assert_allclose(calculate_underwater_curve(prices['A0']).iloc[:, 0], prices['A0'] / prices['A0'].cummax() - 1)
+
+    def test_recovered_and_monotonic_series(self) -> None:
+        index = pd.date_range(start='2024-01-01', periods=7, freq='B', tz='UTC')
+        prices = pd.DataFrame({'dip': [100, 110, 99, 88, 105, 110, 120], 'up': [1, 2, 3, 4, 5, 6, 7]}, index=index, dtype=float)
+        metrics = calculate_drawdown_metrics(prices)
+
+        assert metrics.loc['dip', 'max_drawdown'] == pytest.approx(0.2)
+        assert metrics.loc['dip', 'peak_date'] == index[1]
+        assert metrics.loc['dip', 'trough_date'] == index[3]
+        assert metrics.loc['dip', 'recovery_date'] == index[5]
+        assert metrics.loc['dip', 'max_drawdown_duration'] == 4
+        assert metrics.loc['dip', 'time_to_recovery'] == 2
+        assert metrics.loc['up', 'max_drawdown'] == 0
+        assert pd.isna(metrics.loc['up', 'calmar_ratio'])
+
+    def test_analysis_results_store_drawdowns_and_old_tables_are_migrated(self) -> None:
+        connection = sqlite3.connect(':memory:')
+        connection.execute('CREATE TABLE analysis_results (id INTEGER PRIMARY KEY, timestamp INTEGER NOT NULL, ticker TEXT NOT NULL, benchmark TEXT NOT NULL, start_date INT, end_date INT, alpha REAL, beta REAL, sharpe_ratio REAL, ticker_volatility REAL, benchmark_volatility REAL, correlation REAL, data_quality_score REAL)')
+        data_loader = DataLoader(connection)
+        df = make_aligned_close_frame(periods=80)
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(df['benchmark_close']))
+        data_loader.insert_daily_data('TCS', as_ohlcv(df['ticker_close']))
+
+        results = make_flow_controller(data_loader).dispatch_analysis_request('TCS', 'NIFTY50', '2024-01-01', '2024-06-30')
+        make_flow_controller(data_loader).dispatch_batch_analysis_request(['TCS'], 'NIFTY50', '2024-01-01', '2024-06-30')
+
+        expected = calculate_drawdown_metrics(df['ticker_close'])
+        assert results['max_drawdown'] == pytest.approx(expected['max_drawdown'].iloc[0])
+        stored = connection.execute('SELECT max_drawdown, max_drawdown_duration, ulcer_index FROM analysis_results').fetchall()
+        assert len(stored) == 2
+        for max_drawdown, duration, ulcer_index in stored:
+            assert max_drawdown == pytest.approx(expected['max_drawdown'].iloc[0])
+            assert duration == expected['max_drawdown_duration'].iloc[0]
+            assert ulcer_index == pytest.approx(expected['ulcer_index'].iloc[0])
+
+
+def make_factor_returns(periods: int = 300, tickers: int = 12, seed: int = 4) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Ticker returns generated from two factors with known loadings"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start='2023-01-02', periods=periods, freq='B', tz='UTC')
+    factors = pd.DataFrame(rng.normal(0.0004, 0.01, (periods, 2)), index=index, columns=['MARKET', 'VALUE'])
+    loadings = rng.normal([1.0, 0.3], 0.2, (tickers, 2))
+    returns = factors.to_numpy() @ loadings.T + rng.normal(0.0001, 0.008, (periods, tickers))
+    return pd.DataFrame(returns, index=index, columns=[f'T{i}' for i in range(tickers)]), factors
+
+
+class TestFactorRegression:
+    """Testing the batched multi-factor OLS engine"""
+
+    def test_shared_qr_matches_per_ticker_least_squares(self) -> None:
+        returns, factors = make_factor_returns()
+        returns.iloc[:40, 3] = np.nan
+        returns.iloc[100, 7] = np.nan
+        result = regress_on_factors(returns, factors, risk_free_rate=0.03, excess_factors=['MARKET'])
+
+        daily_risk_free = 1.03 ** (1 / 252) - 1
+        excess_factors = factors.assign(MARKET=factors['MARKET'] - daily_risk_free)
+        for ticker in returns.columns:
+            target = returns[ticker].dropna() - daily_risk_free
+            design = np.column_stack([np.ones(len(target)), excess_factors.loc[target.index]])
+            coefficients = np.linalg.lstsq(design, target, rcond=None)[0]
+            residuals = target - design @ coefficients
+            standard_errors = np.sqrt(np.diag(np.linalg.inv(design.T @ design)) * (residuals @ residuals) / (len(target) - 3))
+
+            np.testing.assert_allclose(result.betas.loc[ticker], coefficients[1:])
+            np.testing.assert_allclose(result.beta_t_stats.loc[ticker], coefficients[1:] / standard_errors[1:])
+            assert result.alpha[ticker] == pytest.approx(coefficients[0] * 252)
+            assert result.alpha_t_stat[ticker] == pytest.approx(coefficients[0] / standard_errors[0])
+            assert result.r_squared[ticker] == pytest.approx(1 - residuals @ residuals / ((target - target.mean()) ** 2).sum())
+            assert result.observations[ticker] == len(target)
+
+    def test_time_varying_risk_free_rate_and_short_histories(self) -> None:
+        returns, factors = make_factor_returns(periods=60, tickers=3)
+        returns.iloc[:58, 2] = np.nan
+        rates = pd.Series([0.02, 0.06], index=[returns.index[0], returns.index[30]])
+        result = regress_on_factors(returns, factors, risk_free_rate=rates)
+
+        constant = regress_on_factors(returns, factors, risk_free_rate=0.0)
+        assert not np.allclose(result.betas.loc['T0'], constant.betas.loc['T0'])
+        assert result.summary().loc['T2'].drop('observations').isna().all()
+        with pytest.raises(ValueError):
+            regress_on_factors(returns, factors, risk_free_rate=pd.Series([0.02], index=[returns.index[5]]))
+
+    def test_factor_regression_request_with_custom_factors(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        returns, factors = make_factor_returns(periods=120, tickers=3)
+        for name, column in [*returns.items(), ('NIFTY50', factors['MARKET'])]:
+            data_loader.insert_daily_data(str(name), as_ohlcv(100 * (1 + column).cumprod()))
+        assert data_loader.insert_factor_data('VALUE', factors['VALUE']) == 120
+
+        args = build_parser().parse_args(['analyze', '-tickers', 'T0', 'T1', 'T2', '-factors', 'NIFTY50', '-customfactors', 'VALUE', '-riskfree', '0.0'])
+        result = make_flow_controller(data_loader).dispatch_factor_regression_request(
+            args.tickers, args.factors, args.customFactors, '2023-01-01', '2023-12-31', risk_free_rate=args.riskFreeRate
+        )
+        expected = regress_on_factors(returns.iloc[1:], factors.iloc[1:], risk_free_rate=0.0)
+
+        np.testing.assert_allclose(result.betas.to_numpy(), expected.betas.to_numpy())
+        assert list(result.betas.columns) == ['NIFTY50', 'VALUE']
+        with pytest.raises(LookupError):
+            make_flow_controller(data_loader).dispatch_factor_regression_request(['T0'], [], ['MISSING'], '2023-01-01', '2023-12-31')
+
+
+class TestBootstrapAnalyzer:
+    """Testing the block and stationary bootstrap confidence intervals"""
+
+    def test_index_generators_draw_blocks(self) -> None:
+        rng = np.random.default_rng(0)
+        blocks = block_bootstrap_indices(rng, 50, 103, 10)
+        assert blocks.shape == (50, 103)
+        assert np.all(np.diff(blocks[:, :10], axis=1) % 103 == 1)
+
+        stationary = stationary_bootstrap_indices(rng, 400, 500, 8.0)
+        continues = np.diff(stationary, axis=1) % 500 == 1
+        assert stationary.shape == (400, 500)
+        assert 1 / (1 - continues.mean()) == pytest.approx(8.0, rel=0.1)
+        np.testing.assert_array_equal(resample_counts(stationary, 500).sum(axis=1), 500)
+
+    def test_intervals_match_kernel_and_ignore_workers(self) -> None:
+        frames = [make_aligned_close_frame(periods=250, seed=seed) for seed in (1, 2)]
+        asset_close = pd.DataFrame({'TCS': frames[0]['ticker_close'], 'ITC': frames[1]['ticker_close']})
+        asset_close.iloc[:20, 1] = np.nan
+        benchmark_close = frames[0]['benchmark_close']
+
+        serial = bootstrap_pair_metrics(asset_close, benchmark_close, resamples=600, seed=7)
+        parallel = bootstrap_pair_metrics(asset_close, benchmark_close, resamples=600, seed=7, workers=2)
+        pd.testing.assert_frame_equal(serial, parallel)
+
+        estimates = serial.set_index(['ticker', 'metric'])
+        expected = derive_pair_metrics(compute_return_statistics(asset_close['TCS'], benchmark_close))
+        assert estimates.loc[('TCS', 'beta'), 'estimate'] == pytest.approx(expected['beta'])
+        assert (estimates['lower'] <= estimates['estimate']).all() and (estimates['estimate'] <= estimates['upper']).all()
+        assert (estimates.xs('beta', level='metric')['standard_error'] > 0).all()
+
+        narrow = bootstrap_pair_metrics(asset_close, benchmark_close, method='block', resamples=600, confidence_level=0.5, seed=7)
+        wide = bootstrap_pair_metrics(asset_close, benchmark_close, method='block', resamples=600, confidence_level=0.99, seed=7)
+        assert ((wide['upper'] - wide['lower']) > (narrow['upper'] - narrow['lower'])).all()
+        with pytest.raises(ValueError):
+            bootstrap_pair_metrics(asset_close, benchmark_close, method='jackknife')
+
+    def test_block_length_is_validated_and_rounded(self) -> None:
+        df = make_aligned_close_frame(periods=120, seed=3)
+        asset_close, benchmark_close = df['ticker_close'].rename('TCS'), df['benchmark_close']
+        for method, block_length in (('block', 0.5), ('stationary', -2.0), ('stationary', 0.0)):
+            with pytest.raises(ValueError):
+                bootstrap_pair_metrics(asset_close, benchmark_close, method=method, resamples=50, block_length=block_length, seed=1)
+        rounded = bootstrap_pair_metrics(asset_close, benchmark_close, method='block', resamples=200, block_length=2.6, seed=1)
+        whole = bootstrap_pair_metrics(asset_close, benchmark_close, method='block', resamples=200, block_length=3, seed=1)
+        truncated = bootstrap_pair_metrics(asset_close, benchmark_close, method='block', resamples=200, block_length=2, seed=1)
+        pd.testing.assert_frame_equal(rounded, whole)
+        assert not rounded.equals(truncated)
+
+    def test_analysis_request_persists_intervals(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        df = make_aligned_close_frame(periods=80)
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(df['benchmark_close']))
+        data_loader.insert_daily_data('TCS', as_ohlcv(df['ticker_close']))
+
+        plain = make_flow_controller(data_loader).dispatch_analysis_request('TCS', 'NIFTY50', '2024-01-01', '2024-06-30')
+        assert 'confidence_intervals' not in plain and build_parser().parse_args(['analyze', '-ticker', 'TCS']).bootstrapResamples == 0
+        assert data_loader.prod_db_connection.execute('SELECT COUNT(*) FROM analysis_confidence_intervals').fetchone() == (0,)
+
+        args = build_parser().parse_args(['analyze', '-ticker', 'TCS', '-bootstrap', '200', '-bootmethod', 'block', '-seed', '3'])
+        results = make_flow_controller(data_loader).dispatch_analysis_request(
+            'TCS', 'NIFTY50', '2024-01-01', '2024-06-30', bootstrap_resamples=args.bootstrapResamples, method=args.bootstrapMethod, seed=args.seed
+        )
+
+        stored = data_loader.prod_db_connection.execute(
+            'SELECT metric, method, resamples, block_length, estimate FROM analysis_confidence_intervals WHERE ticker = ?', ('TCS',)
+        ).fetchall()
+        assert len(stored) == len(results['confidence_intervals']) == 6
+        assert {row[1:4] for row in stored} == {('block', 200, 4.0)}
+        assert dict((row[0], row[4]) for row in stored)['beta'] == pytest.approx(results['beta'])
+
+
+def loop_backtest_equity(close: pd.DataFrame, weights: pd.DataFrame, open_prices: pd.DataFrame, fill: str, cost_bps: float) -> np.ndarray:
+    """Reference bar-by-bar backtest holding share counts and cash, trading to the targets at the fill prices"""
+    close_matrix, target_matrix, open_matrix = close.ffill().to_numpy(), weights.to_numpy(), open_prices.to_numpy()
+    shares, cash, equity = np.zeros(close.shape[1]), 1.0, []
+    pending: np.ndarray | None = None
+    for row in range(len(close)):
+        orders: list[tuple[np.ndarray, np.ndarray]] = []
+        if fill == 'next_open' and pending is not None:
+            orders.append((pending, np.where(np.isfinite(open_matrix[row]), open_matrix[row], close_matrix[row - 1])))
+            pending = None
+        if np.isfinite(target_matrix[row]).any():
+            if fill == 'close':
+                orders.append((target_matrix[row], close_matrix[row]))
+            else:
+                pending = target_matrix[row]
+        for targets, prices in orders:
+            tradable = np.isfinite(prices)
+            targets = np.where(tradable, np.nan_to_num(targets), 0.0)
+            value = cash + np.nansum(shares * prices)
+            turnover = np.abs(targets - np.where(tradable, shares * prices / value, 0.0)).sum()
+            value *= 1 - turnover * cost_bps / 10_000
+            shares = np.where(tradable, targets * value / np.where(tradable, prices, 1.0), 0.0)
+            cash = value * (1 - targets.sum())
+        equity.append(cash + np.nansum(shares * close_matrix[row]))
+    return np.array(equity)
+
+
+class TestBacktester:
+    """Testing the vectorized signal backtesting engine"""
+
+    def test_equity_matches_bar_by_bar_loop(self) -> None:
+        rng = np.random.default_rng(12)
+        close = make_price_panel(periods=80, assets=4, seed=12)
+        open_prices = close.shift(1) * np.exp(rng.normal(0, 0.004, close.shape))
+        close.iloc[:15, 3] = np.nan
+        open_prices.iloc[:15, 3] = np.nan
+        weights = pd.DataFrame(rng.normal(size=close.shape), index=close.index, columns=close.columns)
+        weights = weights.div(weights.abs().sum(axis=1), axis=0) * 0.8
+        weights[rng.random(len(close)) < 0.6] = np.nan
+
+        for fill in ('close', 'next_open'):
+            result = run_backtest(close, weights, open_prices, fill=fill, commission_bps=6, slippage_bps=4)
+            np.testing.assert_allclose(result.equity.to_numpy(), loop_backtest_equity(close, weights, open_prices, fill, 10))
+            assert result.commissions.sum() == pytest.approx(1.5 * result.slippage.sum())
+            if fill == 'close':
+                order_rows = weights.notna().any(axis=1).to_numpy() & (np.arange(len(close)) >= 15)
+                np.testing.assert_allclose(result.positions[order_rows].to_numpy(), weights[order_rows].fillna(0.0).to_numpy())
+
+        with pytest.raises(ValueError):
+            run_backtest(close, weights, fill='next_open')
+
+    def test_signals_and_strategies(self) -> None:
+        close = make_price_panel(periods=150, assets=5, seed=3)
+        weights = signals_to_weights(generate_signals(close, 'momentum', lookback=20, top=2), 'monthly')
+        order_rows = weights.dropna(how='all')
+        assert set(pd.DatetimeIndex(order_rows.index).month) == set(pd.DatetimeIndex(close.index).month)
+        assert (order_rows.iloc[1:].gt(0).sum(axis=1) == 2).all()
+        np.testing.assert_allclose(order_rows.iloc[1:].sum(axis=1), 1.0)
+
+        buy_and_hold = run_backtest(close, signals_to_weights(generate_signals(close, 'buy_and_hold')))
+        expected = (close / close.iloc[0]).mean(axis=1)
+        np.testing.assert_allclose(buy_and_hold.equity.to_numpy(), expected.to_numpy())
+        assert (buy_and_hold.turnover.iloc[1:] == 0).all()
+
+        crossover = generate_signals(close, 'sma_crossover', fast=5, slow=30)
+        assert (crossover.iloc[:29] == 0).all().all()
+        with pytest.raises(ValueError):
+            generate_signals(close, 'sma_crossover', fast=30, slow=5)
+
+    def test_backtest_request_persists_run(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        close = make_price_panel(periods=60, assets=3, seed=8)
+        for ticker, column in close.items():
+            data_loader.insert_daily_data(str(ticker), as_ohlcv(column))
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(close.mean(axis=1)))
+
+        args = build_parser().parse_args(['backtest', '-tickers', *close.columns, '-strategy', 'equal_weight', '-rebalance', '5', '-commission', '10'])
+        result, run = make_flow_controller(data_loader).dispatch_backtest_request(
+            args.tickers, args.benchmark, '2024-01-01', '2024-12-31', args.strategy, rebalance=int(args.rebalance), commission_bps=args.commission
+        )
+
+        stored = data_loader.prod_db_connection.execute('SELECT strategy, parameters, beta, trades FROM backtest_results').fetchall()
+        assert stored == [('equal_weight', '{"rebalance": 5}', pytest.approx(run['beta']), 12)]
+        curve = data_loader.get_backtest_equity_curve(run['backtest_id'])
+        np.testing.assert_allclose(curve['equity'].to_numpy(), result.equity.to_numpy())
+        assert run['beta'] == pytest.approx(1.0, abs=0.1)
+        with pytest.raises(LookupError):
+            make_flow_controller(data_loader).dispatch_backtest_request(['MISSING'], 'NIFTY50', '2024-01-01', '2024-12-31', 'equal_weight')
+
+
+class TestParameterSweep:
+    """Testing the shared memory parameter sweep runner"""
+
+    def test_parameter_sets_and_specs(self) -> None:
+        assert parse_parameter_values('lookback=20:60:20') == ('lookback', [20, 40, 60])
+        assert parse_parameter_values('rebalance=weekly,5') == ('rebalance', ['weekly', 5])
+        grid = grid_parameter_sets({'lookback': [20, 40], 'top': [1, 2, 3]})
+        assert len(grid) == 6 and grid[1] == {'lookback': 20, 'top': 2}
+
+        space = {'lookback': list(range(100)), 'top': list(range(100))}
+        samples = random_parameter_sets(space, 50, seed=4)
+        assert len({tuple(sample.values()) for sample in samples}) == 50
+        assert samples == random_parameter_sets(space, 50, seed=4)
+        assert len(random_parameter_sets({'top': [1, 2]}, 10)) == 2
+
+    def test_shared_panel_views_and_pool_match_serial(self) -> None:
+        close = make_price_panel(periods=120, assets=4, seed=6)
+        panel = PricePanel(close=close, benchmark_close=close.mean(axis=1), open_prices=close.shift(1))
+        with SharedPricePanel(panel) as shared_panel:
+            memory, attached = attach_price_panel(shared_panel.descriptor)
+            pd.testing.assert_frame_equal(attached.close, close)
+            assert attached.open_prices is not None and attached.open_prices.iloc[1:].equals(close.shift(1).iloc[1:])
+            assert np.shares_memory(attached.close.to_numpy(), np.ndarray(close.shape, buffer=memory.buf))
+            del attached
+            memory.close()
+
+        parameter_sets = grid_parameter_sets({'strategy': ['momentum'], 'lookback': [10, 30], 'top': [1, 2], 'fill': ['close', 'next_open']})
+        streamed: list[dict[str, Any]] = []
+        serial = run_parameter_sweep(panel, 'backtest', parameter_sets, workers=1)
+        pooled = run_parameter_sweep(panel, 'backtest', parameter_sets, workers=2, on_result=lambda parameters, metrics, elapsed: streamed.append(parameters))
+        pd.testing.assert_frame_equal(serial, pooled)
+        assert sorted(map(str, streamed)) == sorted(map(str, parameter_sets))
+
+        rolling = run_parameter_sweep(panel, 'rolling_metrics', [{'window': 20}, {'window': 60}], workers=1)
+        assert rolling['beta_std'].iloc[0] > rolling['beta_std'].iloc[1]
+        with pytest.raises(ValueError):
+            run_parameter_sweep(panel, 'optimizer', parameter_sets)
+
+    def test_sweep_request_streams_and_resumes(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        close = make_price_panel(periods=90, assets=3, seed=2)
+        for ticker, column in close.items():
+            data_loader.insert_daily_data(str(ticker), as_ohlcv(column))
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(close.mean(axis=1)))
+        flow_controller = make_flow_controller(data_loader)
+        fixed = {'strategy': 'sma_crossover', 'commission_bps': 5}
+
+        first = flow_controller.dispatch_parameter_sweep_request(list(close.columns), 'NIFTY50', '2024-01-01', '2024-12-31', 'backtest', {'fast': [5], 'slow': [20, 40]}, fixed)
+        assert data_loader.prod_db_connection.execute('SELECT COUNT(*) FROM parameter_sweep_results').fetchone() == (2,)
+
+        evaluated: list[int] = []
+        original = parameter_sweep.run_parameter_sweep
+
+        def counting_sweep(panel: PricePanel, evaluator: str, parameter_sets: Any, **options: Any) -> pd.DataFrame:
+            evaluated.append(len(parameter_sets))
+            return original(panel, evaluator, parameter_sets, **options)
+
+        monkeypatch.setattr('src.flow_controller.run_parameter_sweep', counting_sweep)
+        resumed = flow_controller.dispatch_parameter_sweep_request(list(close.columns), 'NIFTY50', '2024-01-01', '2024-12-31', 'backtest', {'fast': [5, 10], 'slow': [20, 40]}, fixed)
+
+        assert evaluated == [2]
+        assert len(resumed) == 4
+        pd.testing.assert_frame_equal(resumed.iloc[[0, 1]].reset_index(drop=True), first)
+
+        corrected = close.iloc[:, 0].copy()
+        corrected.iloc[-10:] *= 1.1
+        data_loader.insert_daily_data(str(close.columns[0]), as_ohlcv(corrected))
+        flow_controller.dispatch_parameter_sweep_request(list(close.columns), 'NIFTY50', '2024-01-01', '2024-12-31', 'backtest', {'fast': [5, 10], 'slow': [20, 40]}, fixed)
+        assert evaluated == [2, 4]
+
+
+
+class TestWalkForward:
+    """Testing the walk-forward folds and their prefix-summed window statistics"""
+
+    def test_fold_layout(self) -> None:
+        rolling = walk_forward_folds(100, train_size=40, test_size=20)
+        assert rolling.train_start.tolist() == [0, 20, 40] and rolling.test_end.tolist() == [60, 80, 100]
+        assert (rolling.train_end - rolling.train_start == 40).all() and (rolling.test_start == rolling.train_end).all()
+
+        expanding = walk_forward_folds(100, train_size=40, test_size=10, step=25, mode='expanding', gap=5)
+        assert (expanding.train_start == 0).all() and expanding.train_end.tolist() == [40, 65]
+        assert expanding.test_start.tolist() == [45, 70] and expanding.test_end.tolist() == [55, 80]
+        with pytest.raises(ValueError):
+            walk_forward_folds(30, train_size=40, test_size=10)
+        with pytest.raises(ValueError):
+            walk_forward_folds(100, train_size=40, test_size=10, mode='anchored')
+
+    def test_window_metrics_match_direct_computation(self) -> None:
+        close = make_price_panel(periods=160, assets=3, seed=9)
+        close.iloc[:30, 2] = np.nan
+        benchmark = close.mean(axis=1).rename('benchmark')
+        folds = walk_forward_folds(len(close) - 1, train_size=50, test_size=25, mode='expanding')
+        report = walk_forward_pair_metrics(close, benchmark, folds)
+        assert len(report) == len(folds) * 3
+
+        for fold in range(len(folds)):
+            for window in ('train', 'test'):
+                start, end = getattr(folds, f'{window}_start')[fold], getattr(folds, f'{window}_end')[fold]
+                direct = compute_cross_sectional_metrics(close.to_numpy()[start:end + 1], benchmark.to_numpy()[start:end + 1])
+                rows = report[report['fold'] == fold]
+                for metric in ('beta', 'sharpe_ratio', 'log_returns_alpha', 'correlation_coefficient'):
+                    np.testing.assert_allclose(rows[f'{window}_{metric}'].to_numpy(), direct[metric], rtol=1e-9, atol=1e-12)
+
+        first_test = slice(folds.test_start[0], folds.test_end[0] + 1)
+        reference = pd.DataFrame({'ticker_close': close.iloc[first_test, 0], 'benchmark_close': benchmark.iloc[first_test]})
+        calculate_log_returns(reference)
+        reference = reference.dropna()
+        assert report['test_beta'].iloc[0] == pytest.approx(calculate_beta(reference))
+        assert report['test_sharpe_ratio'].iloc[0] == pytest.approx(calculate_sharp_ratio(reference))
+        assert pd.Timestamp(report['test_start'].iloc[0]) == close.index[folds.test_start[0] + 1]
+
+        statistics = WindowStatistics(close.to_numpy(), benchmark.to_numpy())
+        whole = statistics.metrics([0], [statistics.observations])
+        np.testing.assert_allclose(whole['beta'][0], compute_cross_sectional_metrics(close.to_numpy(), benchmark.to_numpy())['beta'])
+
+    def test_strategy_selection_uses_train_windows(self) -> None:
+        close = make_price_panel(periods=200, assets=4, seed=12)
+        panel = PricePanel(close=close, benchmark_close=close.mean(axis=1))
+        parameter_sets = grid_parameter_sets({'strategy': ['momentum'], 'lookback': [5, 20, 60], 'top': [1, 2]})
+        folds = walk_forward_folds(len(close) - 1, train_size=80, test_size=30)
+        report = walk_forward_strategy(panel, parameter_sets, folds)
+        assert report.equals(walk_forward_strategy(panel, parameter_sets, folds, workers=2))
+
+        equity = np.column_stack([backtest_parameter_set(panel, parameters).equity.to_numpy() for parameters in parameter_sets])
+        benchmark = panel.benchmark_close.to_numpy()
+        for fold in range(len(folds)):
+            train = slice(folds.train_start[fold], folds.train_end[fold] + 1)
+            train_sharpe = compute_cross_sectional_metrics(equity[train], benchmark[train])['sharpe_ratio']
+            assert report['train_sharpe_ratio'].iloc[fold] == pytest.approx(np.nanmax(train_sharpe))
+            test = slice(folds.test_start[fold], folds.test_end[fold] + 1)
+            selected = int(np.nanargmax(train_sharpe))
+            assert report['test_sharpe_ratio'].iloc[fold] == pytest.approx(compute_cross_sectional_metrics(equity[test], benchmark[test])['sharpe_ratio'][selected])
+        with pytest.raises(ValueError):
+            walk_forward_strategy(panel, parameter_sets, folds, selection_metric='max_drawdown')
+
+    def test_walk_forward_request_persists_folds(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        close = make_price_panel(periods=120, assets=2, seed=3)
+        for ticker, column in close.items():
+            data_loader.insert_daily_data(str(ticker), as_ohlcv(column))
+        data_loader.insert_daily_data('NIFTY50', as_ohlcv(close.mean(axis=1)))
+        flow_controller = make_flow_controller(data_loader)
+
+        report, walk_forward_id = flow_controller.dispatch_walk_forward_request(list(close.columns), 'NIFTY50', '2024-01-01', '2024-12-31', 'pair_metrics', 60, 20)
+        stored = data_loader.get_walk_forward_results(walk_forward_id)
+        assert len(stored) == len(report) == 2 * 2
+        np.testing.assert_allclose(stored['test_beta'].to_numpy(), report['test_beta'].to_numpy())
+        assert (stored['test_end'] == report['test_end']).all()
+
+        strategy_report, strategy_id = flow_controller.dispatch_walk_forward_request(
+            list(close.columns), 'NIFTY50', '2024-01-01', '2024-12-31', 'strategy', 60, 20, parameter_space={'fast': [3, 5], 'slow': [10]},
+            fixed_parameters={'strategy': 'sma_crossover'}, workers=1
+        )
+        assert strategy_id != walk_forward_id
+        assert data_loader.get_walk_forward_results(strategy_id)['subject'].tolist() == strategy_report['parameters'].tolist()
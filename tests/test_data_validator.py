@@ -0,0 +1,79 @@
+import logging
+import sqlite3
+from collections.abc import Generator
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_loader.data_loader import DataLoader
+from src.data_validator import DataValidator
+
+logger = logging.getLogger("validation")
+
+
+@pytest.fixture(scope="function")
+def validator() -> Generator[DataValidator, Any, None]:
+    """A DataValidator backed by its own migrated in-memory database"""
+    conn = sqlite3.connect(':memory:')
+    yield DataValidator(DataLoader(conn))
+    conn.close()
+
+
+def make_close_frame(periods: int = 30, seed: int = 7) -> pd.DataFrame:
+    """Business-day close prices with a stale run and a single outlier"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, periods))
+    close[10:16] = close[10]
+    close[20] = close[19] * 1.8
+    index = pd.date_range(start='2025-01-01', periods=periods, freq='B', tz='UTC')
+    return pd.DataFrame({'close': close}, index=index)
+
+
+class TestValidationCache:
+    """Testing the content-hash cache in front of DataValidator.validate_and_clean"""
+
+    def test_cache_key_is_content_based(self) -> None:
+        df = make_close_frame()
+        key = DataValidator.compute_cache_key('TCS', df, ['close'])
+
+        assert key == DataValidator.compute_cache_key('TCS', df.copy(), ['close'])
+        assert key != DataValidator.compute_cache_key('INFY', df, ['close'])
+
+        changed = df.copy()
+        changed.loc[changed.index[5], "close"] = float(changed["close"].iloc[5]) + 0.01
+        assert key != DataValidator.compute_cache_key('TCS', changed, ['close'])
+
+    def test_cache_hit_skips_checks(self, validator: DataValidator, monkeypatch: pytest.MonkeyPatch) -> None:
+        df = make_close_frame()
+        first_df, first_report = validator.validate_and_clean('TCS', df, ['close'])
+        logs_after_first_run = validator.data_loader.get_validation_log('TCS')
+
+        def fail(*args: Any, **kwargs: Any) -> int:
+            raise AssertionError('checks must not run on a cache hit')
+
+        monkeypatch.setattr(validator, '_check_gaps', fail)
+        monkeypatch.setattr(validator, '_check_outliers', fail)
+        monkeypatch.setattr(validator, '_check_stale', fail)
+
+        second_df, second_report = validator.validate_and_clean('TCS', df, ['close'])
+
+        assert second_report == first_report
+        pd.testing.assert_frame_equal(first_df, second_df)
+        assert len(validator.data_loader.get_validation_log('TCS')) == len(logs_after_first_run)
+
+    def test_validation_log_restored_for_cached_input(self, validator: DataValidator) -> None:
+        df = make_close_frame()
+        _, report = validator.validate_and_clean('TCS', df, ['close'])
+        expected_logs = validator.data_loader.get_validation_log('TCS')[['date', 'issue_type', 'description']]
+        assert len(expected_logs) == sum(report.values())
+
+        validator.validate_and_clean('TCS', make_close_frame(seed=11), ['close'])
+        validator.validate_and_clean('TCS', df, ['close'])
+
+        restored_logs = validator.data_loader.get_validation_log('TCS')[['date', 'issue_type', 'description']]
+        pd.testing.assert_frame_equal(
+            expected_logs.sort_values(['date', 'issue_type']).reset_index(drop=True),
+            restored_logs.sort_values(['date', 'issue_type']).reset_index(drop=True),
+        )
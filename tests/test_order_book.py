@@ -0,0 +1,306 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+# The order book is a compiled extension, built with make rebuildCleanCpp
+pytest.importorskip('quantsim_core_engine')
+
+from quantsim_core_engine import (  # noqa: E402
+    ASK,
+    BID,
+    EVENT_DTYPE,
+    FILL_DTYPE,
+    IOC,
+    MARKET,
+    ORDER_DTYPE,
+    BatchAction,
+    EventLog,
+    EventLogWriter,
+    MarketEventType,
+    OrderBook,
+    convertCsvToEventLog,
+    replayEventLog
+)
+
+
+class TestOrderBook:
+    """Testing the C++ price-time priority matching engine"""
+
+    def make_book(self) -> OrderBook:
+        book = OrderBook()
+        book.addLimitOrder(1, 1, BID, 100, 9900)
+        book.addLimitOrder(2, 2, BID, 50, 9900)
+        book.addLimitOrder(3, 3, BID, 70, 9850)
+        book.addLimitOrder(4, 4, ASK, 80, 10000)
+        book.addLimitOrder(5, 5, ASK, 40, 10100)
+        return book
+
+    def test_top_of_book_and_depth(self) -> None:
+        book = self.make_book()
+        assert book.bestBid() == 9900 and book.bestAsk() == 10000
+        assert book.depth(BID, 5) == [(9900, 150), (9850, 70)]
+        assert book.depth(ASK, 1) == [(10000, 80)]
+        assert book.volumeAtPrice(BID, 9900) == 150 and book.volumeAtPrice(ASK, 9900) == 0
+        assert book.orderCount() == 5 and book.levelCount(BID) == 2
+        assert OrderBook().bestBid() is None
+
+    def test_price_time_priority(self) -> None:
+        book = self.make_book()
+        fills = book.addLimitOrder(6, 6, ASK, 180, 9850)
+        assert [(fill.makerId, fill.price, fill.volume) for fill in fills] == [(1, 9900, 100), (2, 9900, 50), (3, 9850, 30)]
+        assert all(fill.takerId == 6 and fill.takerSide == ASK for fill in fills)
+        assert book.bestBid() == 9850 and book.volumeAtPrice(BID, 9850) == 40
+        assert not book.hasOrder(1) and not book.hasOrder(6)
+
+        # The rest of a crossing limit order rests at its own price
+        book.addLimitOrder(7, 7, BID, 100, 10000)
+        assert book.bestBid() == 10000 and book.getOrder(7).volume == 20 and book.bestAsk() == 10100
+
+    def test_market_and_ioc_orders_never_rest(self) -> None:
+        book = self.make_book()
+        fills = book.submitMarketOrder(6, 6, BID, 200)
+        assert sum(fill.volume for fill in fills) == 120 and book.bestAsk() is None and not book.hasOrder(6)
+
+        book = self.make_book()
+        fills = book.submitIocOrder(7, 7, ASK, 200, 9900)
+        assert sum(fill.volume for fill in fills) == 150 and book.bestBid() == 9850 and not book.hasOrder(7)
+        assert book.submitOrder(8, 8, IOC, BID, 10, 9950) == [] and book.orderCount() == 3
+        assert len(book.submitOrder(9, 9, MARKET, ASK, 10, 0)) == 1
+
+    def test_cancel_and_modify(self) -> None:
+        book = self.make_book()
+        assert book.cancelOrder(1) and not book.cancelOrder(1)
+        assert book.volumeAtPrice(BID, 9900) == 50
+
+        # A volume reduction keeps the queue position, a volume increase loses it
+        book.addLimitOrder(10, 10, BID, 30, 9900)
+        assert book.modifyOrder(2, 11, 20, 9900) == []
+        assert book.volumeAtPrice(BID, 9900) == 50
+        book.modifyOrder(2, 12, 60, 9900)
+        fills = book.submitMarketOrder(11, 13, ASK, 40)
+        assert [(fill.makerId, fill.volume) for fill in fills] == [(10, 30), (2, 10)]
+
+        # A price change that crosses the spread trades like a new order
+        fills = book.modifyOrder(3, 14, 70, 10000)
+        assert [(fill.makerId, fill.takerId, fill.volume) for fill in fills] == [(4, 3, 70)]
+        assert book.volumeAtPrice(ASK, 10000) == 10
+
+        with pytest.raises(IndexError):
+            book.modifyOrder(99, 15, 10, 9900)
+        with pytest.raises(ValueError):
+            book.addLimitOrder(2, 16, BID, 10, 9700)
+        with pytest.raises(ValueError):
+            book.addLimitOrder(12, 16, BID, 0, 9700)
+
+    def test_tick_prices_and_pooled_orders(self) -> None:
+        book = OrderBook(tickSize=0.05, expectedOrders=1000)
+        assert book.tickSize == 0.05 and book.toTicks(101.15) == 2023 and book.toPrice(2023) == pytest.approx(101.15)
+        with pytest.raises(ValueError):
+            OrderBook(tickSize=0)
+
+        # Cancelled and filled orders give their slots back to the pool
+        for order_id in range(100):
+            book.addLimitOrder(order_id, order_id, BID, 10, 2000 - order_id % 5)
+        for order_id in range(0, 100, 2):
+            assert book.cancelOrder(order_id)
+        book.submitMarketOrder(1000, 100, ASK, 250)
+        for order_id in range(200, 300):
+            book.addLimitOrder(order_id, order_id, ASK, 10, 2100)
+        # 75 of the 100 new asks reuse the slots of the cancelled and filled bids
+        assert book.orderCount() == 125 and book.poolCapacity() == 125
+        assert book.getOrder(299).price == 2100 and book.bestBid() == 1998 and book.volumeAtPrice(BID, 1998) == 50
+
+    def test_random_flow_keeps_the_book_consistent(self) -> None:
+        rng = np.random.default_rng(3)
+        book = OrderBook()
+        resting: set[int] = set()
+        for order_id in range(3000):
+            action = rng.integers(0, 4)
+            if action == 0 and resting:
+                cancelled = int(rng.choice(sorted(resting)))
+                assert book.cancelOrder(cancelled)
+            elif action == 1 and resting:
+                modified = int(rng.choice(sorted(resting)))
+                book.modifyOrder(modified, order_id, int(rng.integers(1, 50)), int(rng.integers(9950, 10050)))
+            else:
+                side = BID if rng.random() < 0.5 else ASK
+                book.addLimitOrder(order_id, order_id, side, int(rng.integers(1, 50)), int(rng.integers(9950, 10050)))
+            resting = {order for order in resting | {order_id} if book.hasOrder(order)}
+
+            best_bid, best_ask = book.bestBid(), book.bestAsk()
+            assert best_bid is None or best_ask is None or best_bid < best_ask
+        volumes = {side: sum(volume for _, volume in book.depth(side, 1000)) for side in (BID, ASK)}
+        orders = [book.getOrder(order) for order in resting]
+        assert book.orderCount() == len(resting)
+        assert volumes[BID] == sum(order.volume for order in orders if order.recordType == BID)
+        assert volumes[ASK] == sum(order.volume for order in orders if order.recordType == ASK)
+
+
+class TestOrderBatch:
+    """Testing the NumPy batch submission of the order book"""
+
+    def make_orders(self) -> npt.NDArray[np.void]:
+        rows = [
+            (BatchAction.LIMIT, BID, 9900, 100, 1, 1),
+            (BatchAction.LIMIT, BID, 9900, 50, 2, 2),
+            (BatchAction.LIMIT, ASK, 10000, 80, 3, 3),
+            (BatchAction.CANCEL, BID, 0, 0, 1, 4),
+            (BatchAction.MODIFY, BID, 9900, 30, 2, 5),
+            (BatchAction.CANCEL, BID, 0, 0, 42, 6),
+            (BatchAction.LIMIT, ASK, 10100, 0, 4, 7),
+            (BatchAction.MARKET, BID, 0, 60, 5, 8),
+            (BatchAction.LIMIT, ASK, 9800, 40, 6, 9),
+        ]
+        orders = np.zeros(len(rows), dtype=ORDER_DTYPE)
+        for position, (action, side, price, qty, order_id, ts) in enumerate(rows):
+            orders[position] = (int(action), int(side), price, qty, order_id, ts)
+        return orders
+
+    def test_batch_matches_the_single_order_api(self) -> None:
+        book = OrderBook()
+        fills = np.zeros(10, dtype=FILL_DTYPE)
+        assert book.submitBatch(self.make_orders(), fills) == (9, 2, 2)
+        assert fills['taker'][:2].tolist() == [5, 6] and fills['maker'][:2].tolist() == [3, 2]
+        assert fills['qty'][:2].tolist() == [60, 30] and fills['price'][:2].tolist() == [10000, 9900]
+        assert fills['side'][:2].tolist() == [int(BID), int(ASK)]
+
+        reference = OrderBook()
+        reference.addLimitOrder(3, 3, ASK, 80, 10000)
+        reference.submitMarketOrder(5, 8, BID, 60)
+        reference.addLimitOrder(6, 9, ASK, 10, 9800)
+        assert book.depth(ASK, 5) == reference.depth(ASK, 5) and book.bestBid() is None
+
+    def test_full_fill_array_resumes(self) -> None:
+        book = OrderBook()
+        orders = np.zeros(6, dtype=ORDER_DTYPE)
+        orders['type'] = int(BatchAction.LIMIT)
+        orders['side'] = [int(ASK)] * 5 + [int(BID)]
+        orders['price'] = 10000
+        orders['qty'] = [10, 10, 10, 10, 10, 45]
+        orders['id'] = np.arange(6)
+        fills = np.zeros(2, dtype=FILL_DTYPE)
+
+        assert book.submitBatch(orders, fills) == (6, 2, 0) and book.pendingFillCount() == 3
+        assert book.submitBatch(orders[6:], fills) == (0, 2, 0) and fills['maker'].tolist() == [2, 3]
+        assert book.submitBatch(orders[6:], fills) == (0, 1, 0) and fills['maker'][0] == 4 and book.pendingFillCount() == 0
+
+    def test_only_record_arrays_are_accepted(self) -> None:
+        book = OrderBook()
+        fills = np.zeros(2, dtype=FILL_DTYPE)
+        with pytest.raises(TypeError):
+            book.submitBatch(np.zeros(2, dtype=np.float64), fills)
+        with pytest.raises(ValueError):
+            book.submitBatch(np.zeros(4, dtype=ORDER_DTYPE)[::2], fills)
+        fills.flags.writeable = False
+        with pytest.raises(ValueError):
+            book.submitBatch(np.zeros(2, dtype=ORDER_DTYPE), fills)
+
+    def test_threads_sharing_a_book_are_serialized(self) -> None:
+        book = OrderBook()
+        batches = []
+        for thread in range(4):
+            orders = np.zeros(5000, dtype=ORDER_DTYPE)
+            orders['type'] = int(BatchAction.LIMIT)
+            orders['side'] = int(BID)
+            orders['price'] = 9000 + np.arange(5000) % 50
+            orders['qty'] = 1
+            orders['id'] = thread * 10_000 + np.arange(5000)
+            batches.append(orders)
+
+        def submit(orders: npt.NDArray[np.void]) -> tuple[int, int, int]:
+            for position in range(0, len(orders), 500):
+                book.addLimitOrder(int(orders['id'][position]) + 5000, 0, ASK, 1, 20000)
+            return book.submitBatch(orders, np.zeros(1, dtype=FILL_DTYPE))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert list(executor.map(submit, batches)) == [(5000, 0, 0)] * 4
+        assert book.orderCount() == 20040 and book.levelCount(BID) == 50
+        assert book.volumeAtPrice(BID, 9000) == 400 and book.volumeAtPrice(ASK, 20000) == 40
+
+
+class TestEventLogReplay:
+    """Testing the binary event log, its replay and the CSV converter"""
+
+    csv_rows = [
+        'ts,type,side,id,price,qty,new_id',
+        '1,ADD,B,1,99.50,100,',
+        '2,A,S,2,100.00,50,',
+        '3,ADD,BUY,3,99.55,10,',
+        '4,E,,2,,20,',
+        '5,X,,1,,30,',
+        '6,U,,3,99.60,15,7',
+        '7,D,,2,,,',
+        '8,ADD,SELL,4,99.60,5,',
+    ]
+
+    def write_csv_log(self, tmp_path: Path) -> Path:
+        csv_path, log_path = tmp_path / 'events.csv', tmp_path / 'events.qsl'
+        csv_path.write_text('\n'.join(self.csv_rows) + '\n')
+        assert convertCsvToEventLog(str(csv_path), str(log_path), 0.01) == 8
+        return log_path
+
+    def test_csv_conversion_and_mapped_events(self, tmp_path: Path) -> None:
+        log = EventLog(str(self.write_csv_log(tmp_path)))
+        events = log.events()
+        assert log.eventCount == 8 and log.tickSize == 0.01 and not events.flags.writeable
+        assert events['price'].tolist() == [9950, 10000, 9955, 0, 0, 9960, 0, 9960]
+        assert events['type'].tolist() == [int(MarketEventType.ADD)] * 3 + [int(MarketEventType.EXECUTE), int(MarketEventType.CANCEL), int(MarketEventType.REPLACE), int(MarketEventType.CANCEL), int(MarketEventType.ADD)]
+        assert events['new_id'][5] == 7 and events['qty'][6] == 0
+
+        # The same records written from NumPy give the same file
+        copy_path = tmp_path / 'copy.qsl'
+        with EventLogWriter(str(copy_path), 0.01) as writer:
+            writer.write(np.array(events[:3]))
+            writer.write(np.array(events[3:]))
+        assert copy_path.read_bytes() == (tmp_path / 'events.qsl').read_bytes()
+
+    def test_replay_and_snapshots(self, tmp_path: Path) -> None:
+        book = OrderBook(0.01)
+        result = replayEventLog(book, EventLog(str(self.write_csv_log(tmp_path))), depthLevels=2, everyEvents=4)
+        assert (result['events'], result['fills'], result['volume'], result['rejected']) == (8, 2, 25, 0)
+        assert result['event_index'].tolist() == [4, 8] and result['time'].tolist() == [4, 8]
+        assert result['bid_price'].tolist() == [[9955, 9950], [9960, 9950]]
+        assert result['bid_volume'].tolist() == [[10, 100], [10, 70]]
+        assert result['ask_price'].tolist() == [[10000, 0], [0, 0]] and result['ask_volume'].tolist() == [[30, 0], [0, 0]]
+        # The replaced order 3 rests as order 7 and was half filled by the ask of order 4
+        assert not book.hasOrder(3) and book.getOrder(7).volume == 10
+
+        # Snapshots on a time grid show the book before the first event at or after every grid time
+        timed = replayEventLog(OrderBook(0.01), EventLog(str(tmp_path / 'events.qsl')), depthLevels=1, everyTime=3, first=1, count=5)
+        assert timed['events'] == 5 and timed['rejected'] == 1
+        assert timed['time'].tolist() == [5] and timed['event_index'].tolist() == [4]
+
+    def test_invalid_logs_are_refused(self, tmp_path: Path) -> None:
+        log_path = self.write_csv_log(tmp_path)
+        with pytest.raises(ValueError):
+            replayEventLog(OrderBook(0.05), EventLog(str(log_path)))
+        with pytest.raises(RuntimeError):
+            EventLog(str(tmp_path / 'events.csv'))
+        (tmp_path / 'truncated.qsl').write_bytes(log_path.read_bytes()[:-10])
+        with pytest.raises(RuntimeError):
+            EventLog(str(tmp_path / 'truncated.qsl'))
+        (tmp_path / 'bad.csv').write_text('ts,type,side,id,price,qty\n1,ADD,B,1,abc,10\n')
+        with pytest.raises(ValueError):
+            convertCsvToEventLog(str(tmp_path / 'bad.csv'), str(tmp_path / 'bad.qsl'), 0.01)
+        assert EVENT_DTYPE.itemsize == 48
+
+    def test_failed_writes_leave_no_log(self, tmp_path: Path) -> None:
+        csv_path, log_path = tmp_path / 'events.csv', tmp_path / 'events.qsl'
+        csv_path.write_text('\n'.join(self.csv_rows) + '\n1000,ADD,Q,99,10.00,5\n')
+        with pytest.raises(ValueError):
+            convertCsvToEventLog(str(csv_path), str(log_path), 0.01)
+        with pytest.raises(RuntimeError):
+            EventLog(str(log_path))
+        assert list(tmp_path.iterdir()) == [csv_path]
+        events = EventLog(str(self.write_csv_log(tmp_path))).events()
+        with pytest.raises(KeyError), EventLogWriter(str(tmp_path / 'aborted.qsl'), 0.01) as writer:
+            writer.write(np.array(events))
+            raise KeyError('aborted')
+        with pytest.raises(RuntimeError, match='not closed'):
+            EventLog(str(tmp_path / 'aborted.qsl'))
+        EventLogWriter(str(tmp_path / 'empty.qsl'), 0.01).discard()
+        with pytest.raises(RuntimeError, match='not closed'):
+            EventLog(str(tmp_path / 'empty.qsl'))
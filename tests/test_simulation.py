@@ -0,0 +1,458 @@
+import sqlite3
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pytest
+
+from src.analysis_module import AnalysisModule
+from src.circuit_breaker import CircuitBreaker
+from src.cli.parser import build_parser
+from src.data_loader.data_loader import DataLoader
+from src.data_validator import DataValidator
+from src.flow_controller import FlowController
+from src.cli.commands.simulate import build_convergence_target, run_simulate
+from src.modules.convergence import MIN_INITIAL_BATCH, ConvergenceTarget, histogram_estimate
+from src.modules.distribution_solver import (
+    convolve_pmfs,
+    exact_dice_sum_distribution,
+    exact_experiment_distribution,
+    pmf_power,
+    simulation_error_report
+)
+from src.modules.event_simulator import (
+    EventDistribution,
+    Stage,
+    build_alias_table,
+    coin_distribution,
+    dice_distribution,
+    load_distribution_spec,
+    parse_distribution_spec,
+    parse_stage_spec,
+    simulate_experiment,
+    simulate_experiment_until_converged,
+    simulate_stage_outcomes
+)
+from src.modules.option_pricer import (
+    MarketParameters,
+    OptionContract,
+    black_scholes_price,
+    convergence_report,
+    geometric_asian_price,
+    price_option
+)
+from src.modules.path_simulator import (
+    GBMModel,
+    MertonJumpModel,
+    calibrate_model,
+    generate_price_paths,
+    simulate_price_paths
+)
+from src.modules.probability import (
+    calculate_expected_value_in_multi_dice_roll,
+    calculate_variance_of_data,
+    display_distribution_table,
+    display_multiple_dice_simulation_parameters,
+    histogram_moments,
+    simulate_dice_sum_counts,
+    simulate_dice_until_converged
+)
+from src.modules.quasi_random import brownian_bridge, halton_points, inverse_normal_cdf, sobol_points
+
+
+def make_flow_controller(data_loader: DataLoader) -> FlowController:
+    """A FlowController wired to the given DataLoader"""
+    return FlowController(data_loader, CircuitBreaker(data_loader), DataValidator(data_loader), AnalysisModule(data_loader))
+
+
+class TestPathSimulator:
+    """Testing the chunked Monte Carlo price path simulator"""
+
+    def test_gbm_terminal_moments_match_the_lognormal(self) -> None:
+        model = GBMModel(drift=0.0003, volatility=0.015)
+        summary = simulate_price_paths(model, 100.0, steps=50, paths=200_000, seed=3, workers=1, memory_budget_mb=2).summary()
+
+        log_mean, log_variance = 50 * 0.0003, 50 * 0.015 ** 2
+        expected_mean = 100 * np.exp(log_mean + log_variance / 2)
+        expected_std = expected_mean * np.sqrt(np.expm1(log_variance))
+        assert summary['terminal_mean'] == pytest.approx(expected_mean, rel=2e-3)
+        assert summary['terminal_std'] == pytest.approx(expected_std, rel=1e-2)
+        assert summary['terminal_q50'] == pytest.approx(100 * np.exp(log_mean), rel=2e-3)
+
+    def test_streaming_statistics_match_the_full_path_matrix(self) -> None:
+        model = GBMModel(drift=0.0, volatility=0.02)
+        statistics = simulate_price_paths(model, 50.0, steps=30, paths=5_000, seed=11, workers=1, memory_budget_mb=0.1)
+        prices = np.concatenate(list(generate_price_paths(model, 50.0, steps=30, paths=5_000, seed=11, memory_budget_mb=0.1)), axis=1)
+
+        summary = statistics.summary()
+        running_peak = np.maximum(np.maximum.accumulate(prices, axis=0), 50.0)
+        assert summary['terminal_mean'] == pytest.approx(prices[-1].mean())
+        assert summary['terminal_std'] == pytest.approx(prices[-1].std(ddof=1))
+        assert summary['probability_of_loss'] == pytest.approx((prices[-1] < 50.0).mean())
+        assert summary['expected_maximum_drawdown'] == pytest.approx((1 - prices / running_peak).max(axis=0).mean())
+        np.testing.assert_allclose(statistics.mean_path(), prices.mean(axis=1))
+        np.testing.assert_allclose(statistics.step_std(), prices.std(axis=1, ddof=1))
+
+    def test_results_do_not_depend_on_the_worker_count(self) -> None:
+        model = MertonJumpModel(drift=0.0002, volatility=0.01, jump_intensity=0.05, jump_mean=-0.03, jump_volatility=0.02)
+        single = simulate_price_paths(model, 100.0, steps=20, paths=4_000, seed=5, workers=1, memory_budget_mb=0.2)
+        pooled = simulate_price_paths(model, 100.0, steps=20, paths=4_000, seed=5, workers=2, memory_budget_mb=0.2)
+
+        assert single.summary() == pooled.summary()
+
+    def test_merton_calibration_recovers_the_jumps(self) -> None:
+        rng = np.random.default_rng(8)
+        log_returns = rng.normal(0.0005, 0.01, 5_000)
+        jump_days = rng.random(5_000) < 0.02
+        log_returns[jump_days] += rng.normal(-0.08, 0.01, jump_days.sum())
+        model = calibrate_model(100 * np.exp(np.concatenate([[0], np.cumsum(log_returns)])), 'merton')
+
+        assert isinstance(model, MertonJumpModel)
+        assert model.jump_intensity == pytest.approx(0.02, rel=0.15)
+        assert model.jump_mean == pytest.approx(-0.08, abs=0.01)
+        assert model.volatility == pytest.approx(0.01, rel=0.05)
+
+    def test_path_simulation_request_and_cli(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        index = pd.date_range(start='2025-01-01', periods=60, freq='B', tz='UTC')
+        close = pd.Series(100 * np.exp(np.cumsum(np.random.default_rng(2).normal(0, 0.01, 60))), index=index)
+        data_loader.insert_daily_data('TCS', pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume': 10}))
+
+        args = build_parser().parse_args(['montecarlo', '-ticker', 'TCS', '-model', 'bootstrap', '-paths', '1000', '-steps', '10', '-seed', '1', '-workers', '1'])
+        statistics = make_flow_controller(data_loader).dispatch_path_simulation_request(
+            args.ticker, '2025-01-01', '2025-06-30', model=args.model, steps=args.steps, paths=args.paths, seed=args.seed, workers=args.workers
+        )
+
+        assert statistics.paths == 1000
+        assert statistics.initial_price == pytest.approx(close.iloc[-1])
+        with pytest.raises(LookupError):
+            make_flow_controller(data_loader).dispatch_path_simulation_request('UNKNOWN', '2025-01-01', '2025-06-30')
+
+
+class TestQuasiRandom:
+    """Testing the low discrepancy sequences, the inverse normal CDF and the Brownian bridge"""
+
+    def test_inverse_normal_cdf_matches_the_standard_library(self) -> None:
+        probabilities = np.concatenate([np.linspace(1e-10, 1e-3, 50), np.linspace(0.001, 0.999, 999), 1 - np.linspace(1e-10, 1e-3, 50)])
+        expected = [NormalDist().inv_cdf(p) for p in probabilities]
+        np.testing.assert_allclose(inverse_normal_cdf(probabilities), expected, atol=1e-8)
+
+    def test_sobol_points_are_stratified_and_consistent_across_blocks(self) -> None:
+        points = sobol_points(0, 1024, 8)
+        for dimension in range(8):
+            assert np.all(np.bincount((points[:, dimension] * 32).astype(int), minlength=32) == 32)
+        cells = (points[:, 0] * 32).astype(int) * 32 + (points[:, 1] * 32).astype(int)
+        assert np.all(np.bincount(cells, minlength=1024) == 1)
+
+        np.testing.assert_array_equal(np.concatenate([sobol_points(0, 300, 8), sobol_points(300, 724, 8)]), points)
+        np.testing.assert_array_equal(np.concatenate([halton_points(0, 10, 3), halton_points(10, 5, 3)]), halton_points(0, 15, 3))
+
+    def test_brownian_bridge_has_the_brownian_covariance(self) -> None:
+        normals = np.random.default_rng(4).standard_normal((200_000, 6))
+        covariance = np.cov(brownian_bridge(normals), rowvar=False)
+        times = np.arange(1, 7) / 6
+        np.testing.assert_allclose(covariance, np.minimum.outer(times, times), atol=0.01)
+
+
+class TestOptionPricer:
+    """Testing the variance-reduced Monte Carlo option pricer"""
+
+    market = MarketParameters(spot=100.0, volatility=0.25, rate=0.05, dividend_yield=0.01)
+
+    def test_european_prices_match_black_scholes(self) -> None:
+        for option_type in ('call', 'put'):
+            contract = OptionContract('european', option_type, strike=105.0, maturity=1.0)
+            expected = black_scholes_price(self.market, 105.0, 1.0, option_type)
+            for options in ({}, {'antithetic': True, 'control_variate': True}, {'sampler': 'sobol'}, {'sampler': 'halton'}):
+                result = price_option(contract, self.market, paths=64_000, seed=1, **options)
+                assert abs(result.price - expected) < 4 * result.standard_error
+
+    def test_geometric_asian_closed_form_matches_the_simulation(self) -> None:
+        contract = OptionContract('asian', 'call', strike=100.0, maturity=1.0, monitoring_steps=12)
+        normals = np.random.default_rng(6).standard_normal((400_000, 12))
+        log_prices = np.log(100.0) + (0.04 - 0.25 ** 2 / 2) * np.arange(1, 13) / 12 + 0.25 * np.cumsum(normals, axis=1) * np.sqrt(1 / 12)
+        payoffs = np.exp(-0.05) * np.maximum(np.exp(log_prices.mean(axis=1)) - 100.0, 0)
+
+        expected = geometric_asian_price(self.market, 100.0, 1.0, 12, 'call')
+        assert payoffs.mean() == pytest.approx(expected, abs=4 * payoffs.std() / np.sqrt(len(payoffs)))
+        assert price_option(contract, self.market, paths=50_000, seed=2, control_variate=True).price < expected + 1.0
+
+    def test_variance_reduction_lowers_the_standard_error(self) -> None:
+        contract = OptionContract('asian', 'call', strike=100.0, maturity=1.0, monitoring_steps=32)
+        plain = price_option(contract, self.market, paths=40_000, seed=3)
+        antithetic = price_option(contract, self.market, paths=40_000, seed=3, antithetic=True)
+        controlled = price_option(contract, self.market, paths=40_000, seed=3, control_variate=True)
+        quasi_random = price_option(contract, self.market, paths=40_000, seed=3, sampler='sobol', use_brownian_bridge=True)
+
+        assert antithetic.standard_error < plain.standard_error
+        assert controlled.standard_error < plain.standard_error / 10
+        assert quasi_random.standard_error < plain.standard_error / 3
+        assert abs(controlled.price - plain.price) < 4 * plain.standard_error
+
+    def test_barrier_parity_and_convergence_report(self) -> None:
+        knock_out = OptionContract('barrier', 'call', strike=100.0, maturity=0.5, monitoring_steps=26, barrier=90.0, barrier_type='down-and-out')
+        knock_in = OptionContract('barrier', 'call', strike=100.0, maturity=0.5, monitoring_steps=26, barrier=90.0, barrier_type='down-and-in')
+        vanilla = black_scholes_price(self.market, 100.0, 0.5, 'call')
+        out_price = price_option(knock_out, self.market, paths=100_000, seed=4, antithetic=True)
+        in_price = price_option(knock_in, self.market, paths=100_000, seed=4, antithetic=True)
+        assert out_price.price + in_price.price == pytest.approx(vanilla, abs=4 * (out_price.standard_error + in_price.standard_error))
+
+        report = convergence_report(knock_out, self.market, path_counts=(2_000, 8_000), seed=4)
+        assert list(report.columns) == ['configuration', 'paths', 'price', 'standard_error', 'elapsed_seconds', 'efficiency', 'speedup']
+        assert len(report) == 12
+        assert (report.loc[report['configuration'] == 'plain', 'speedup'] == 1).all()
+
+        reordered = convergence_report(knock_out, self.market, path_counts=(2_000, 3_000), configurations=[{'antithetic': True}, {}], seed=4)
+        plain = reordered[reordered['configuration'] == 'plain'].set_index('paths')['efficiency']
+        antithetic = reordered[reordered['configuration'] != 'plain']
+        np.testing.assert_allclose(antithetic['speedup'], antithetic['efficiency'].to_numpy() / plain.loc[[2_000, 3_000]].to_numpy())
+        with pytest.raises(ValueError):
+            convergence_report(knock_out, self.market, configurations=[{'antithetic': True}])
+
+    def test_option_pricing_request(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        index = pd.date_range(start='2025-01-01', periods=120, freq='B', tz='UTC')
+        close = pd.Series(100 * np.exp(np.cumsum(np.random.default_rng(7).normal(0, 0.015, 120))), index=index)
+        data_loader.insert_daily_data('INFY', pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume': 10}))
+
+        contract = OptionContract('european', 'call', strike=float(close.iloc[-1]), maturity=0.25)
+        result = make_flow_controller(data_loader).dispatch_option_pricing_request(
+            'INFY', '2025-01-01', '2025-12-31', contract, paths=20_000, rate=0.0, seed=1, control_variate=True
+        )
+        volatility = np.diff(np.log(close.to_numpy())).std(ddof=1) * np.sqrt(252)
+        expected = black_scholes_price(MarketParameters(float(close.iloc[-1]), float(volatility), 0.0), contract.strike, 0.25, 'call')
+        assert result.paths == 20_000
+        assert result.price == pytest.approx(expected, abs=4 * result.standard_error)
+
+
+class TestProbability:
+    """Testing the vectorized dice simulation"""
+
+    def test_dice_sums_are_seeded_and_chunk_bounded(self) -> None:
+        counts = simulate_dice_sum_counts(3, 6, 600_000, chunk_size=70_000, seed=8)
+        assert counts.shape == (16,) and counts.sum() == 600_000
+        assert (counts == simulate_dice_sum_counts(3, 6, 600_000, chunk_size=70_000, seed=8)).all()
+
+        mean, variance = histogram_moments(np.arange(3, 19), counts)
+        assert mean == pytest.approx(10.5, abs=0.02)
+        assert variance == pytest.approx(3 * 35 / 12, rel=0.02)
+
+        # More combinations than the lookup table holds: the dice are drawn one at a time
+        many = simulate_dice_sum_counts(6, 10, 200_000, chunk_size=50_000, seed=2)
+        assert many.shape == (55,) and histogram_moments(np.arange(6, 61), many)[0] == pytest.approx(33.0, abs=0.05)
+        with pytest.raises(ValueError):
+            simulate_dice_sum_counts(2, 6, 0)
+
+    def test_distribution_table_moments(self) -> None:
+        table = display_multiple_dice_simulation_parameters(dice_number=2, sides_per_dice=6, total_rolls=200_000, seed=1)
+        assert list(table) == list(range(2, 13)) and sum(count for count, _ in table.values()) == 200_000
+        assert calculate_expected_value_in_multi_dice_roll(table) == pytest.approx(7.0, abs=0.03)
+        assert calculate_variance_of_data(table) == pytest.approx(35 / 6, rel=0.02)
+        assert calculate_variance_of_data({1: [1.0, 0.5], 3: [1.0, 0.5]}) == pytest.approx(1.0)
+
+    def test_simulation_parser_options(self) -> None:
+        args = build_parser().parse_args(['simulation', '-tries', '1000', '-chunk', '250', '-seed', '3'])
+        assert (args.totalTries, args.chunkSize, args.seed) == (1000, 250, 3)
+
+
+class TestEventSimulator:
+    """Testing the alias method sampler and the chunked multi-stage experiments"""
+
+    def test_alias_table_reproduces_the_probabilities(self) -> None:
+        probabilities = np.random.default_rng(0).dirichlet(np.ones(37))
+        alias_probabilities, aliases = build_alias_table(probabilities)
+        reconstructed = alias_probabilities.copy()
+        np.add.at(reconstructed, aliases, 1 - alias_probabilities)
+        np.testing.assert_allclose(reconstructed / len(probabilities), probabilities, atol=1e-12)
+
+        distribution = parse_distribution_spec(['1=0.2', '2=0.3', '5=0.5'])
+        draws = distribution.sample(np.random.default_rng(1), 400_000)
+        assert set(np.unique(draws)) == {1.0, 2.0, 5.0}
+        assert (draws == 5).mean() == pytest.approx(0.5, abs=0.005)
+
+    def test_distribution_specs(self, tmp_path: Path) -> None:
+        mixture = parse_distribution_spec(['0:1=3', '1:4=1', '10=0'])
+        assert not mixture.is_discrete and mixture.bounds() == (0.0, 4.0)
+        assert mixture.moments() == pytest.approx((1.0, 1.0))
+
+        spec_file = tmp_path / 'pmf.csv'
+        spec_file.write_text('# value,weight\n1,1\n2,3\n')
+        assert load_distribution_spec(spec_file).probabilities.tolist() == [0.25, 0.75]
+        with pytest.raises(ValueError):
+            parse_distribution_spec(['heads=1'])
+        with pytest.raises(ValueError):
+            parse_distribution_spec(['1=-1', '2=2'])
+
+    def test_multi_stage_experiment_moments(self) -> None:
+        # Roll a die, then toss that many coins: E = 3.5 / 2, Var = E[N] / 4 + Var(N) / 4
+        stages = [parse_stage_spec('1xdice6'), parse_stage_spec('prevxcoin')]
+        statistics = simulate_experiment(stages, 400_000, chunk_size=150_000, seed=3)
+        assert statistics.trials == 400_000 and statistics.histogram.sum() == 400_000
+        assert statistics.mean == pytest.approx(1.75, abs=0.01)
+        assert statistics.variance == pytest.approx(3.5 / 4 + 35 / 48, rel=0.02)
+        table = statistics.distribution_table()
+        assert table['outcome'].tolist() == list(range(7)) and table['probability'].sum() == pytest.approx(1.0)
+
+        many_coins = simulate_experiment([Stage(coin_distribution(0.3), 500)], 100_000, seed=4)
+        assert many_coins.mean == pytest.approx(150, abs=0.1) and many_coins.variance == pytest.approx(105, rel=0.03)
+
+        custom = parse_distribution_spec(['0:1=3', '1:4=1'])
+        continuous = simulate_experiment([Stage(custom, 2)], 200_000, seed=5)
+        assert not continuous.integer_outcomes and continuous.mean == pytest.approx(2.0, abs=0.02)
+
+        with pytest.raises(ValueError):
+            simulate_experiment([Stage(custom, None)], 10)
+        with pytest.raises(ValueError):
+            simulate_experiment([Stage(custom, 1), Stage(dice_distribution(), None)], 10)
+        with pytest.raises(ValueError):
+            parse_stage_spec('2xcustom')
+
+    def test_stages_sample_at_most_a_chunk_at_once(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        sizes: list[int] = []
+        sample = EventDistribution.sample
+
+        def recording_sample(distribution: EventDistribution, rng: np.random.Generator, size: int) -> npt.NDArray[np.float64]:
+            sizes.append(size)
+            return sample(distribution, rng, size)
+
+        monkeypatch.setattr(EventDistribution, 'sample', recording_sample)
+        custom = parse_distribution_spec(['0:1=3', '1:4=1'])
+        stages = [Stage(dice_distribution(), 30), Stage(custom, None)]
+        outcomes = simulate_stage_outcomes(np.random.default_rng(6), stages, 2_000, chunk_size=1_000)
+        assert max(sizes) <= 1_000 and sum(sizes) > 200_000
+        assert outcomes.mean() == pytest.approx(105.0, rel=0.02)
+
+        sizes.clear()
+        long_stage = simulate_stage_outcomes(np.random.default_rng(7), [Stage(custom, 2_500)], 100, chunk_size=1_000)
+        assert sizes == [1_000] * 250 and long_stage.mean() == pytest.approx(2_500, rel=0.01)
+        wide_stage = simulate_stage_outcomes(np.random.default_rng(8), [Stage(custom, 4)], 1_000, chunk_size=100)
+        assert sizes[250:] == [100] * 40 and wide_stage.shape == (1_000,)
+
+    def test_results_do_not_depend_on_the_workers(self) -> None:
+        stages = [Stage(dice_distribution(4), 2), Stage(coin_distribution(), None)]
+        streamed: list[int] = []
+        serial = simulate_experiment(stages, 90_000, chunk_size=20_000, seed=9, workers=1, on_chunk=lambda running: streamed.append(running.trials))
+        pooled = simulate_experiment(stages, 90_000, chunk_size=20_000, seed=9, workers=2)
+        assert (serial.histogram == pooled.histogram).all() and serial.mean == pooled.mean
+        assert streamed == [20_000, 40_000, 60_000, 80_000, 90_000]
+
+    def test_simulation_command_runs_coin_and_custom_types(self, capsys: pytest.CaptureFixture[str]) -> None:
+        parser = build_parser()
+        run_simulate(parser.parse_args(['simulation', '-type', 'coin', '-multi', '-dice', '3', '-tries', '1000', '-seed', '1']), make_flow_controller(DataLoader(sqlite3.connect(':memory:'))))
+        assert 'trials per second' in capsys.readouterr().out
+        with pytest.raises(ValueError):
+            run_simulate(parser.parse_args(['simulation', '-type', 'custom', '-tries', '10']), make_flow_controller(DataLoader(sqlite3.connect(':memory:'))))
+
+
+class TestDistributionSolver:
+    """Testing the exact FFT convolution distributions against direct enumeration and the simulators"""
+
+    def test_fft_convolution_powers(self) -> None:
+        rng = np.random.default_rng(2)
+        first, second = rng.dirichlet(np.ones(700)), rng.dirichlet(np.ones(300))
+        np.testing.assert_allclose(convolve_pmfs(first, second), np.convolve(first, second), atol=1e-15)
+
+        die = np.full(6, 1 / 6)
+        repeated = np.ones(1)
+        for _ in range(13):
+            repeated = np.convolve(repeated, die)
+        np.testing.assert_allclose(pmf_power(die, 13), repeated, atol=1e-15)
+
+        three_dice = exact_dice_sum_distribution(3, 6)
+        assert three_dice.offset == 3 and three_dice.as_dict()[10] == pytest.approx(27 / 216)
+        many_dice = exact_dice_sum_distribution(2000, 6)
+        assert many_dice.probabilities.sum() == pytest.approx(1.0)
+        assert many_dice.moments() == pytest.approx((7000.0, 2000 * 35 / 12))
+
+    def test_compound_stage_matches_enumeration(self) -> None:
+        exact = exact_experiment_distribution([parse_stage_spec('1xdice3'), parse_stage_spec('prevxdice4')])
+        expected: dict[int, float] = {}
+        for first in range(1, 4):
+            for faces in np.ndindex(*(4,) * first):
+                total = first + sum(faces)
+                expected[total] = expected.get(total, 0.0) + 1 / 3 / 4 ** first
+        assert exact.as_dict() == pytest.approx({outcome: expected.get(outcome, 0.0) for outcome in exact.as_dict()})
+        with pytest.raises(ValueError):
+            exact_experiment_distribution([Stage(parse_distribution_spec(['0:1=1']), 1)])
+
+    def test_error_report_against_simulation(self, capsys: pytest.CaptureFixture[str]) -> None:
+        exact = exact_dice_sum_distribution(2, 6)
+        perfect = simulation_error_report(exact, exact.outcomes, exact.probabilities * 36)
+        assert perfect['total_variation_distance'] == pytest.approx(0.0, abs=1e-12)
+
+        counts = simulate_dice_sum_counts(2, 6, 1_000_000, seed=6)
+        report = simulation_error_report(exact, np.arange(2, 13), counts)
+        assert report['total_variation_distance'] < 0.005 and report['max_z_score'] < 5
+        assert abs(report['mean_error']) < 0.01
+
+        table = display_multiple_dice_simulation_parameters(dice_number=2, sides_per_dice=6, total_rolls=1000, seed=6)
+        display_distribution_table(table, exact_probabilities=exact.as_dict())
+        assert 'Exact probability: 0.1666666667' in capsys.readouterr().out
+
+        with pytest.raises(ValueError):
+            simulation_error_report(exact, [2.5, 7.0], [1, 1])
+        parser = build_parser()
+        binned = parser.parse_args(['simulation', '-type', 'dice', '-stages', '1000xdice2000', '-exact', '-tries', '10'])
+        with pytest.raises(ValueError, match='binned'):
+            run_simulate(binned, make_flow_controller(DataLoader(sqlite3.connect(':memory:'))))
+
+
+class TestConvergence:
+    """Testing the convergence-controlled batch runs"""
+
+    def test_target_and_batch_sizes(self) -> None:
+        target = ConvergenceTarget(interval_width=0.02, confidence_level=0.95, initial_batch=1000, max_samples=50_000)
+        assert target.required_standard_error() == pytest.approx(0.02 / (2 * NormalDist().inv_cdf(0.975)))
+        # Four times too wide needs 16 times the samples, but a batch at most doubles them
+        assert target.next_batch(1000, 4 * target.required_standard_error()) == 1000
+        assert target.next_batch(10_000, 1.2 * target.required_standard_error()) in (5840, 5841)
+        assert target.next_batch(40_000, 4 * target.required_standard_error()) == 10_000
+        assert histogram_estimate([0, 1], [500, 500], 'table') == pytest.approx((0.5, 0.5 / np.sqrt(1000)))
+        with pytest.raises(ValueError):
+            ConvergenceTarget()
+        with pytest.raises(ValueError):
+            histogram_estimate([0, 1], [1, 1], 'median')
+
+    def test_dice_and_events_stop_at_the_target(self) -> None:
+        target = ConvergenceTarget(standard_error=0.001, initial_batch=5000)
+        counts, result = simulate_dice_until_converged(2, 6, target, seed=4)
+        trace = result.trace
+        assert result.converged and trace['standard_error'].iloc[-1] <= 0.001 < trace['standard_error'].iloc[-2]
+        assert trace['samples'].iloc[-1] == counts.sum() and trace['samples'].is_monotonic_increasing
+        assert (trace['elapsed_seconds'].diff().dropna() >= 0).all()
+        assert (simulate_dice_until_converged(2, 6, target, seed=4)[0] == counts).all()
+        # The least precise probability is 1 / 6, which needs about 138 889 rolls, and a batch at most doubles the rolls
+        assert 120_000 < counts.sum() < 2 * 138_889
+
+        statistics, event_result = simulate_experiment_until_converged([parse_stage_spec('1xdice6'), parse_stage_spec('prevxcoin')], ConvergenceTarget(interval_width=0.02), seed=5)
+        assert event_result.converged and statistics.summary()['standard_error'] * 2 * NormalDist().inv_cdf(0.975) <= 0.02
+        assert statistics.mean == pytest.approx(1.75, abs=0.02)
+
+        capped = simulate_dice_until_converged(2, 6, ConvergenceTarget(standard_error=1e-6, initial_batch=1000, max_samples=7000), seed=1)[1]
+        assert not capped.converged and capped.summary()['samples'] == 7000
+
+        with pytest.raises(ValueError):
+            simulate_dice_until_converged(2, 11, target)
+        with pytest.raises(ValueError):
+            simulate_dice_until_converged(5, 6, target)
+
+    def test_command_line_runs_start_with_a_minimum_batch(self) -> None:
+        args = build_parser().parse_args(['simulation', '-type', 'dice', '-multi', '-dice', '2', '-targetse', '0.01'])
+        targets = [build_convergence_target(args, initial_batch) for initial_batch in (args.totalTries, 50_000)]
+        assert [target.initial_batch if target else None for target in targets] == [MIN_INITIAL_BATCH, 50_000]
+
+    def test_path_simulation_until_converged(self) -> None:
+        data_loader = DataLoader(sqlite3.connect(':memory:'))
+        index = pd.date_range(start='2025-01-01', periods=60, freq='B', tz='UTC')
+        close = pd.Series(100 * np.exp(np.cumsum(np.random.default_rng(7).normal(0, 0.01, 60))), index=index)
+        data_loader.insert_daily_data('TCS', pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume': 10}))
+
+        target = ConvergenceTarget(standard_error=0.05, initial_batch=2000)
+        statistics, result = make_flow_controller(data_loader).dispatch_converged_path_simulation_request(
+            'TCS', '2025-01-01', '2025-06-30', target, steps=20, seed=2, workers=1
+        )
+        assert result.converged and statistics.paths == result.summary()['samples']
+        assert np.sqrt(statistics.terminal_m2 / (statistics.paths - 1) / statistics.paths) <= 0.05
+        assert result.summary()['estimate'] == pytest.approx(statistics.terminal_mean)